@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+Benchmark de arranque de la CLI - Polioxxo
+
+Mide, en procesos nuevos:
+1. El tiempo de `polioxxo <comando> --help` (solo argparse, sin etapas)
+2. El tiempo de importar los módulos que carga cada subcomando
+3. El tiempo total de los comandos ligeros (cache stats, query)
+
+Uso:
+    python benchmarks/bench_cli_startup.py [--repeticiones 5] [--check]
+
+Con --check termina con error si un comando ligero supera LIGHT_BUDGET_MS.
+"""
+
+import sys
+import os
+
+# Agregar ruta del proyecto al path de Python
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import argparse
+import statistics
+import subprocess
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+MAIN = str(ROOT / 'scripts' / 'main.py')
+
+LIGHT_BUDGET_MS = 300
+
+# subcomando -> módulos que importa al ejecutarse
+SUBCOMMAND_MODULES = {
+    'download': ['scripts.download_data'],
+    'process': ['scripts.process_data'],
+    'districts': ['scripts.analyze_districts'],
+    'analyze': ['scripts.analyze'],
+    'maps': ['scripts.create_map', 'scripts.create_district_map', 'scripts.create_unified_map'],
+    'nationwide': ['scripts.nationwide'],
+    'serve': ['scripts.query_service'],
+    'query': ['scripts.query_service'],
+    'cache': ['scripts.cache_manager'],
+    'profile': ['scripts.profiling'],
+    'metrics': ['scripts.metrics_exporter'],
+    'publish': ['scripts.publish'],
+}
+
+LIGHT_COMMANDS = [
+    ['--help'],
+    ['cache', 'stats'],
+    ['query', 'partidos'],
+    ['query', 'alcaldias', 'CUAUHTEMOC'],
+]
+
+
+def _wall_ms(argv, repeats):
+    samples = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        subprocess.run(argv, cwd=ROOT, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        samples.append((time.perf_counter() - start) * 1000)
+    return min(samples), statistics.median(samples)
+
+
+def run(repeats=5):
+    """Lista de (medición, mínimo ms, mediana ms)"""
+    rows = [('python -c pass',) + _wall_ms([sys.executable, '-c', 'pass'], repeats)]
+    for command in SUBCOMMAND_MODULES:
+        rows.append((f'{command} --help',) + _wall_ms([sys.executable, MAIN, command, '--help'], repeats))
+    for command, modules in SUBCOMMAND_MODULES.items():
+        code = '; '.join(f'import {m}' for m in modules)
+        rows.append((f'import {command}',) + _wall_ms([sys.executable, '-c', code], repeats))
+    for argv in LIGHT_COMMANDS:
+        rows.append((' '.join(argv),) + _wall_ms([sys.executable, MAIN] + argv, repeats))
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark de arranque de la CLI')
+    parser.add_argument('--repeticiones', type=int, default=5)
+    parser.add_argument('--check', action='store_true',
+                        help=f'Fallar si un comando ligero supera {LIGHT_BUDGET_MS} ms')
+    args = parser.parse_args()
+
+    rows = run(args.repeticiones)
+    print(f"{'medición':<34}{'mín ms':>10}{'mediana ms':>12}")
+    for name, best, median in rows:
+        print(f"{name:<34}{best:>10.0f}{median:>12.0f}")
+
+    light = {' '.join(argv) for argv in LIGHT_COMMANDS}
+    slow = [(name, median) for name, _, median in rows if name in light and median > LIGHT_BUDGET_MS]
+    for name, median in slow:
+        print(f"⚠️ {name}: {median:.0f} ms > {LIGHT_BUDGET_MS} ms")
+    return not (args.check and slow)
+
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
@@ -0,0 +1,94 @@
+"""
+Ciudades soportadas por Polioxxo
+
+Cada ciudad define sus archivos de entrada, la fuente electoral, el CRS
+proyectado y el encuadre de los mapas. La ciudad activa se toma de
+POLIOXXO_CITY (cdmx por omisión); las demás escriben en su propia
+partición (data/raw/<clave>, data/processed/<clave>, maps/<clave>,
+reports/<clave>).
+"""
+
+import os
+from dataclasses import dataclass
+
+DEFAULT_CITY = 'cdmx'
+
+
+@dataclass(frozen=True)
+class CityConfig:
+    clave: str
+    nombre: str
+    limites: str                     # GeoJSON de alcaldías/municipios en data/raw
+    oxxos: str                       # GeoJSON de Oxxos en data/raw
+    centro: tuple                    # (lat, lon) de los mapas
+    limites_qa: tuple                # (minx, miny, maxx, maxy) en lon/lat para geometry_qa
+    elecciones: str = None           # CSV región,partido_ganador,votos_totales,porcentaje
+    crs: str = 'EPSG:6372'           # proyectado para áreas y distancias (LCC de México)
+    zoom: int = 10
+    regiones: tuple = ()             # nombres en el orden de sus ids enteros
+    distritos_sinteticos: bool = False
+
+
+CITIES = {
+    'cdmx': CityConfig(
+        clave='cdmx', nombre='CDMX',
+        limites='alcaldias_cdmx.geojson', oxxos='oxxos_cdmx.geojson',
+        centro=(19.4326, -99.1332), limites_qa=(-99.7, 18.8, -98.5, 20.0),
+        # Las 16 alcaldías en orden de clave INEGI (09001 ... 09016)
+        regiones=(
+            "AZCAPOTZALCO", "COYOACÁN", "CUAJIMALPA DE MORELOS", "GUSTAVO A. MADERO",
+            "IZTACALCO", "IZTAPALAPA", "LA MAGDALENA CONTRERAS", "MILPA ALTA",
+            "ÁLVARO OBREGÓN", "TLÁHUAC", "TLALPAN", "XOCHIMILCO",
+            "BENITO JUÁREZ", "CUAUHTÉMOC", "MIGUEL HIDALGO", "VENUSTIANO CARRANZA",
+        ),
+        distritos_sinteticos=True,
+    ),
+    'gdl': CityConfig(
+        clave='gdl', nombre='Guadalajara',
+        limites='municipios_gdl.geojson', oxxos='oxxos_gdl.geojson', elecciones='elecciones_gdl.csv',
+        centro=(20.6597, -103.3496), limites_qa=(-103.9, 20.2, -102.9, 21.1),
+        regiones=(
+            "GUADALAJARA", "ZAPOPAN", "SAN PEDRO TLAQUEPAQUE", "TONALÁ",
+            "TLAJOMULCO DE ZÚÑIGA", "EL SALTO", "JUANACATLÁN",
+            "IXTLAHUACÁN DE LOS MEMBRILLOS", "ZAPOTLANEJO", "ACATLÁN DE JUÁREZ",
+        ),
+    ),
+    'mty': CityConfig(
+        clave='mty', nombre='Monterrey',
+        limites='municipios_mty.geojson', oxxos='oxxos_mty.geojson', elecciones='elecciones_mty.csv',
+        centro=(25.6866, -100.3161), limites_qa=(-100.8, 25.2, -99.8, 26.2),
+        regiones=(
+            "MONTERREY", "GUADALUPE", "SAN NICOLÁS DE LOS GARZA", "APODACA",
+            "GENERAL ESCOBEDO", "SANTA CATARINA", "SAN PEDRO GARZA GARCÍA",
+            "JUÁREZ", "GARCÍA", "SANTIAGO", "CADEREYTA JIMÉNEZ", "SALINAS VICTORIA",
+        ),
+    ),
+    'pue': CityConfig(
+        clave='pue', nombre='Puebla',
+        limites='municipios_pue.geojson', oxxos='oxxos_pue.geojson', elecciones='elecciones_pue.csv',
+        centro=(19.0414, -98.2063), limites_qa=(-98.6, 18.7, -97.8, 19.4),
+        regiones=(
+            "PUEBLA", "SAN ANDRÉS CHOLULA", "SAN PEDRO CHOLULA", "CUAUTLANCINGO",
+            "AMOZOC", "CORONANGO", "OCOYUCAN", "JUAN C. BONILLA",
+        ),
+    ),
+}
+
+
+def active_city_key():
+    """Clave de la ciudad activa (POLIOXXO_CITY, leída en cada llamada)"""
+    return os.environ.get('POLIOXXO_CITY', DEFAULT_CITY)
+
+
+def get_city(key=None):
+    """Configuración de una ciudad (la activa si no se indica)"""
+    key = key or active_city_key()
+    if key not in CITIES:
+        raise KeyError(f"Ciudad desconocida: {key} (disponibles: {', '.join(CITIES)})")
+    return CITIES[key]
+
+
+def set_active_city(key):
+    """Activa una ciudad para este proceso y sus subprocesos"""
+    get_city(key)
+    os.environ['POLIOXXO_CITY'] = key
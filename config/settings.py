@@ -0,0 +1,155 @@
+"""
+Configuración del proyecto Polioxxo
+
+Los valores se pueden sobrescribir con variables de entorno POLIOXXO_*.
+"""
+
+import os
+
+# --- Caché de artefactos (scripts/cache_manager.py) ---
+
+# Espacio máximo en disco para artefactos de caché (MB)
+CACHE_BUDGET_MB = float(os.environ.get('POLIOXXO_CACHE_BUDGET_MB', 2048))
+
+# Los artefactos usados hace menos de este tiempo nunca se desalojan (segundos)
+CACHE_MIN_RESIDENCY_S = float(os.environ.get('POLIOXXO_CACHE_MIN_RESIDENCY_S', 3600))
+
+# Índice de artefactos (relativo al directorio procesado de cada ciudad,
+# data/processed[/<clave>])
+CACHE_INDEX = os.environ.get('POLIOXXO_CACHE_INDEX', 'cache_index.sqlite')
+
+# Directorio y patrón de los artefactos de cada etapa (relativos al
+# directorio procesado de cada ciudad); los archivos que coincidan sin estar
+# en el índice se adoptan al verificar
+CACHE_DIRS = {
+    'coverage': ('coverage', 'superficie_*.npz'),
+    'service_areas': ('service_areas', 'areas_*.npz'),
+    'geometry_qa': ('qa', 'banderas_*.npz'),
+}
+
+# --- Ejecución multi-ciudad (scripts/multi_city.py) ---
+
+# Trabajadores simultáneos (0 = uno por CPU)
+MULTI_CITY_WORKERS = int(os.environ.get('POLIOXXO_MULTI_CITY_WORKERS', 0))
+
+# Límite de memoria de cada trabajador (MB, 0 = sin límite)
+MULTI_CITY_WORKER_MEMORY_MB = int(os.environ.get('POLIOXXO_MULTI_CITY_WORKER_MEMORY_MB', 4096))
+
+# Memoria total para trabajadores (MB, 0 = sin presupuesto); limita cuántos
+# corren a la vez: presupuesto // memoria por trabajador
+MULTI_CITY_MEMORY_BUDGET_MB = int(os.environ.get('POLIOXXO_MULTI_CITY_MEMORY_BUDGET_MB', 0))
+
+# --- Corrida nacional por bloques (scripts/nationwide.py) ---
+
+# Memoria estimada máxima por bloque (MB); los bloques que la excedan se
+# dividen en cuadrantes hasta caber o llegar al tamaño mínimo
+NATIONWIDE_CHUNK_MEMORY_MB = int(os.environ.get('POLIOXXO_NATIONWIDE_CHUNK_MEMORY_MB', 512))
+
+# Tamaño de la malla inicial y tamaño mínimo de un bloque (grados)
+NATIONWIDE_TILE_DEG = float(os.environ.get('POLIOXXO_NATIONWIDE_TILE_DEG', 2.0))
+NATIONWIDE_MIN_TILE_DEG = float(os.environ.get('POLIOXXO_NATIONWIDE_MIN_TILE_DEG', 0.05))
+
+# Margen con que se leen los límites alrededor de cada bloque (grados), para
+# que los Oxxos junto al borde encuentren su polígono
+NATIONWIDE_MARGIN_DEG = float(os.environ.get('POLIOXXO_NATIONWIDE_MARGIN_DEG', 0.1))
+
+# Bytes en memoria por byte en disco al estimar el costo de un bloque
+# (geometrías, proyección e índice espacial)
+NATIONWIDE_MEMORY_FACTOR = float(os.environ.get('POLIOXXO_NATIONWIDE_MEMORY_FACTOR', 4.0))
+
+# Entradas en data/raw/nacional: Oxxos y capas de límites de lo más grueso a
+# lo más fino, nombre -> (archivo, columna clave, capa padre, buffer en metros)
+NATIONWIDE_OXXOS = os.environ.get('POLIOXXO_NATIONWIDE_OXXOS', 'oxxos_mexico.gpkg')
+NATIONWIDE_LAYERS = {
+    'municipio': ('municipios_mexico.gpkg', 'CVEGEO', None, 1000),
+    'seccion': ('secciones_mexico.gpkg', 'CLAVEGEO', 'municipio', 0),
+}
+
+# --- Perfil de ejecución por etapa (scripts/profiling.py) ---
+
+# Escribir logs/profiles/<run-id>/run_profile.json en cada corrida
+PROFILE_ENABLED = os.environ.get('POLIOXXO_PROFILE', '1') != '0'
+
+# Sitios de asignación de memoria por etapa (tracemalloc; 0 = desactivado,
+# agrega costo a la corrida)
+PROFILE_TRACEMALLOC_TOP = int(os.environ.get('POLIOXXO_PROFILE_TRACEMALLOC_TOP', 0))
+
+# Corridas con perfil que se conservan
+PROFILE_KEEP_RUNS = int(os.environ.get('POLIOXXO_PROFILE_KEEP_RUNS', 30))
+
+# Crecimiento (%) que cuenta como regresión al comparar corridas; las etapas
+# más cortas que PROFILE_MIN_SECONDS no cuentan como regresión de tiempo
+PROFILE_REGRESSION_PCT = float(os.environ.get('POLIOXXO_PROFILE_REGRESSION_PCT', 20))
+PROFILE_MIN_SECONDS = float(os.environ.get('POLIOXXO_PROFILE_MIN_SECONDS', 0.05))
+
+# Perfilado bajo demanda (--profile): etapas a perfilar (patrones separados
+# por coma, '*' = todas; vacío = ninguna), modo (cprofile o muestreo),
+# intervalo del muestreador de pilas y funciones en el resumen del log
+PROFILE_STAGES = os.environ.get('POLIOXXO_PROFILE_STAGES', '')
+PROFILE_MODE = os.environ.get('POLIOXXO_PROFILE_MODE', 'cprofile')
+PROFILE_SAMPLE_INTERVAL_MS = float(os.environ.get('POLIOXXO_PROFILE_SAMPLE_INTERVAL_MS', 5))
+PROFILE_TOP_FUNCTIONS = int(os.environ.get('POLIOXXO_PROFILE_TOP_FUNCTIONS', 10))
+
+# --- Métricas para Prometheus (scripts/metrics_exporter.py) ---
+
+# Escribir un .prom (textfile collector de node_exporter) al final de cada corrida
+METRICS_EXPORT = os.environ.get('POLIOXXO_METRICS_EXPORT', '1') != '0'
+
+# Directorio de los .prom (relativo a la raíz del proyecto o absoluto, p. ej.
+# el --collector.textfile.directory de node_exporter)
+METRICS_TEXTFILE_DIR = os.environ.get('POLIOXXO_METRICS_TEXTFILE_DIR', 'logs/metrics')
+
+# --- Logging (scripts/log_config.py) ---
+
+# Formato de logs/polioxxo.log: 'json' (un registro por línea) o 'texto'
+LOG_FILE_FORMAT = os.environ.get('POLIOXXO_LOG_FILE_FORMAT', 'json')
+
+# Registros INFO/DEBUG por sitio de llamada en cada ventana (0 = sin límite);
+# WARNING y superiores nunca se suprimen
+LOG_RATE_LIMIT = int(os.environ.get('POLIOXXO_LOG_RATE_LIMIT', 50))
+LOG_RATE_WINDOW_S = float(os.environ.get('POLIOXXO_LOG_RATE_WINDOW_S', 60))
+
+# Líneas por elemento (alcaldía, distrito) que se muestran en un listado del log
+LOG_ITEM_LIMIT = int(os.environ.get('POLIOXXO_LOG_ITEM_LIMIT', 20))
+
+# --- Publicación versionada (scripts/publish.py) ---
+
+# Publicar las salidas como versión nueva al terminar cada etapa que escribe
+PUBLISH_ENABLED = os.environ.get('POLIOXXO_PUBLISH', '1') != '0'
+
+# Versiones que se conservan, tanto publicadas como del almacén y del cubo
+# (la activa nunca se borra)
+PUBLISH_KEEP_VERSIONS = int(os.environ.get('POLIOXXO_PUBLISH_KEEP_VERSIONS', 5))
+
+# Una versión reemplazada hace menos de esto no se borra aunque exceda las
+# retenidas: un lector que ya la resolvió puede seguir leyéndola (segundos)
+PUBLISH_GRACE_S = float(os.environ.get('POLIOXXO_PUBLISH_GRACE_S', 60))
+
+# Salidas de data/processed que forman una versión (archivos o directorios)
+PUBLISHED_OUTPUTS = [
+    'datos_combinados.gpkg',
+    'oxxos_con_alcaldia.gpkg',
+    'oxxos_con_distrito.gpkg',
+    'distritos_electorales.gpkg',
+    'areas_servicio.gpkg',
+    'metricas.json',
+    'reporte_procesamiento.txt',
+    'store',
+    'cube',
+]
+
+# --- Superficie de cobertura (scripts/coverage.py) ---
+
+# Lado de la celda de la superficie de distancia (metros). Con 50 m la malla
+# de CDMX tiene ~0.65 M celdas; 10 m da la superficie fina (~16 M celdas,
+# 25 veces más memoria y tiempo)
+COVERAGE_RESOLUTION_M = float(os.environ.get('POLIOXXO_COVERAGE_RESOLUTION_M', 50))
+
+# --- Cubo de agregados (scripts/cube.py) ---
+
+# Lado de la celda de la malla del cubo (metros, CRS proyectado de la ciudad)
+CUBE_CELL_M = float(os.environ.get('POLIOXXO_CUBE_CELL_M', 1000))
+
+# Los agregados de una y dos dimensiones con más celdas que esto no se
+# materializan (se calculan al pedirlos desde el cuboide base)
+CUBE_MAX_DENSE_CELLS = int(os.environ.get('POLIOXXO_CUBE_MAX_DENSE_CELLS', 1_000_000))
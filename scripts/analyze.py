@@ -5,19 +5,36 @@ Script de análisis estadístico avanzado de Oxxos en CDMX
 
 import sys
 import os
+import json
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 import geopandas as gpd
 import pandas as pd
-import matplotlib.pyplot as plt
-import seaborn as sns
 from pathlib import Path
 import logging
 from scripts.utils import setup_logging, get_project_paths
-import numpy as np
+from scripts.catalog import ensure_region_keys
+from scripts.cube import cube_for
+from scripts.scope import read_layer, scoped_path
+from scripts.spatial_stats import compute_point_pattern_stats
+from scripts.resampling import ResamplingEngine, log_significance
+from scripts.boundaries import projected_crs
+from scripts.figures import figure_job, render_figures
+from scripts.profiling import profiled
+from scripts.publish import publish_outputs
+from scripts.metrics import (
+    load_metrics, save_metrics, metrics_path, alcaldia_metrics, significance_section,
+    render_detailed_report, write_report
+)
 
-def load_processed_data():
-    """Carga los datos procesados"""
+MIN_SIGNIFICANCE_REGIONS = 3
+
+@profiled('load.procesados')
+def load_processed_data(scope=None):
+    """
+    Carga los datos procesados; con `scope` (scripts/scope.py) solo lee las
+    alcaldías y Oxxos de la caja o región
+    """
     logger = setup_logging('polioxxo.analyze')
     paths = get_project_paths()
     
@@ -27,7 +44,8 @@ def load_processed_data():
         if not datos_path.exists():
             raise FileNotFoundError(f"Datos no encontrados: {datos_path}")
         
-        datos = gpd.read_file(datos_path)
+        datos = read_layer(datos_path, scope)
+        ensure_region_keys(datos, 'alcaldia')
         logger.info(f"Cargados datos de {len(datos)} alcaldías")
         
         # Cargar Oxxos
@@ -35,23 +53,25 @@ def load_processed_data():
         if not oxxos_path.exists():
             raise FileNotFoundError(f"Oxxos no encontrados: {oxxos_path}")
         
-        oxxos = gpd.read_file(oxxos_path)
+        oxxos = read_layer(oxxos_path, scope)
+        ensure_region_keys(oxxos, 'alcaldia')
         logger.info(f"Cargados {len(oxxos)} Oxxos")
         
+        if scope is not None:
+            # En una corrida acotada, cada alcaldía cuenta solo sus Oxxos dentro del alcance
+            datos['num_oxxos'] = datos['alcaldia_id'].map(oxxos['alcaldia_id'].value_counts()).fillna(0).astype(int)
+        
         return datos, oxxos
         
     except Exception as e:
         logger.error(f"Error cargando datos: {e}")
         return None, None
 
-def analyze_distribution():
+@profiled('analyze.distribucion', rows=None)
+def analyze_distribution(datos, oxxos):
     """Analiza la distribución de Oxxos por alcaldía"""
     logger = setup_logging('polioxxo.analyze')
     
-    datos, oxxos = load_processed_data()
-    if datos is None or oxxos is None:
-        return False
-    
     logger.info("=== ANÁLISIS DE DISTRIBUCIÓN ===")
     
     # Estadísticas básicas
@@ -85,122 +105,48 @@ def analyze_distribution():
     
     return stats
 
-def analyze_political_correlation():
-    """Analiza correlación entre partidos políticos y número de Oxxos"""
+@profiled('analyze.partidos', rows=None)
+def analyze_political_correlation(cube):
+    """
+    Analiza correlación entre partidos políticos y número de Oxxos (lecturas
+    del cubo de agregados por partido ganador de la alcaldía)
+    """
     logger = setup_logging('polioxxo.analyze')
     
-    datos, _ = load_processed_data()
-    if datos is None:
-        return False
-    
     logger.info("\n=== ANÁLISIS POR PARTIDO POLÍTICO ===")
     
-    # Análisis por partido
-    por_partido = datos.groupby('partido_ganador').agg({
-        'num_oxxos': ['count', 'sum', 'mean', 'std'],
-        'votos_totales': ['mean', 'sum']
-    }).round(2)
+    # Análisis por partido: alcaldías ganadas, Oxxos y promedio
+    por_partido = cube.party_table('partido')
     
     logger.info("\nESTADÍSTICAS POR PARTIDO:")
-    for partido in datos['partido_ganador'].unique():
-        subset = datos[datos['partido_ganador'] == partido]
-        alcaldias_count = len(subset)
-        total_oxxos = subset['num_oxxos'].sum()
-        promedio_oxxos = subset['num_oxxos'].mean()
-        
-        logger.info(f"\n{partido}:")
-        logger.info(f"  Alcaldías: {alcaldias_count}")
-        logger.info(f"  Total Oxxos: {total_oxxos:,}")
-        logger.info(f"  Promedio Oxxos por alcaldía: {promedio_oxxos:.1f}")
+    for fila in por_partido.itertuples(index=False):
+        logger.info(f"\n{fila.partido}:")
+        logger.info(f"  Alcaldías: {fila.unidades}")
+        logger.info(f"  Total Oxxos: {fila.total_oxxos:,}")
+        logger.info(f"  Promedio Oxxos por alcaldía: {fila.promedio_oxxos:.1f}")
     
     return por_partido
 
-def create_visualizations():
-    """Crea visualizaciones del análisis"""
+def create_visualizations(datos, scope=None):
+    """Crea visualizaciones del análisis (solo las que cambiaron)"""
     logger = setup_logging('polioxxo.analyze')
     
-    datos, _ = load_processed_data()
-    if datos is None:
-        return False
-    
     paths = get_project_paths()
     plots_dir = paths['reports'] 
-    plots_dir.mkdir(exist_ok=True)
-    
-    # Configurar estilo
-    plt.style.use('default')
-    sns.set_palette("husl")
+    plots_dir.mkdir(parents=True, exist_ok=True)
     
     try:
-        # 1. Distribución de Oxxos por alcaldía
-        fig, (ax1, ax2) = plt.subplots(1, 2, figsize=(15, 6))
-        
-        # Gráfico de barras
-        datos_sorted = datos.sort_values('num_oxxos', ascending=True)
-        bars = ax1.barh(datos_sorted['alcaldia'], datos_sorted['num_oxxos'])
-        ax1.set_xlabel('Número de Oxxos')
-        ax1.set_title('Distribución de Oxxos por Alcaldía')
-        ax1.tick_params(axis='y', labelsize=8)
-        
-        # Colorear por partido
-        colors = {'MORENA': '#8B4513', 'PAN': '#0080FF', 'PRI': '#FF0000'}
-        for i, (bar, partido) in enumerate(zip(bars, datos_sorted['partido_ganador'])):
-            bar.set_color(colors.get(partido, '#808080'))
-        
-        # Histograma
-        ax2.hist(datos['num_oxxos'], bins=8, edgecolor='black', alpha=0.7)
-        ax2.set_xlabel('Número de Oxxos')
-        ax2.set_ylabel('Frecuencia')
-        ax2.set_title('Histograma de Distribución')
-        ax2.axvline(datos['num_oxxos'].mean(), color='red', linestyle='--', label=f'Media: {datos["num_oxxos"].mean():.1f}')
-        ax2.legend()
-        
-        plt.tight_layout()
-        plt.savefig(plots_dir / 'distribucion_oxxos.png', dpi=300, bbox_inches='tight')
-        plt.close()
-        
-        # 2. Análisis por partido político
-        fig, (ax1, ax2) = plt.subplots(1, 2, figsize=(12, 5))
-        
-        # Total de Oxxos por partido
-        partido_stats = datos.groupby('partido_ganador')['num_oxxos'].sum().sort_values(ascending=False)
-        ax1.bar(partido_stats.index, partido_stats.values, color=[colors.get(p, '#808080') for p in partido_stats.index])
-        ax1.set_ylabel('Total de Oxxos')
-        ax1.set_title('Total de Oxxos por Partido')
-        
-        # Número de alcaldías por partido
-        alcaldias_por_partido = datos['partido_ganador'].value_counts()
-        ax2.pie(alcaldias_por_partido.values, labels=alcaldias_por_partido.index, autopct='%1.1f%%', 
-                colors=[colors.get(p, '#808080') for p in alcaldias_por_partido.index])
-        ax2.set_title('Distribución de Alcaldías por Partido')
-        
-        plt.tight_layout()
-        plt.savefig(plots_dir / 'analisis_partidos.png', dpi=300, bbox_inches='tight')
-        plt.close()
-        
-        # 3. Correlación entre votos y Oxxos
-        plt.figure(figsize=(10, 6))
-        
-        # Scatter plot
-        for partido in datos['partido_ganador'].unique():
-            subset = datos[datos['partido_ganador'] == partido]
-            plt.scatter(subset['votos_totales'], subset['num_oxxos'], 
-                       label=partido, alpha=0.7, s=60, color=colors.get(partido, '#808080'))
-        
-        plt.xlabel('Votos Totales')
-        plt.ylabel('Número de Oxxos')
-        plt.title('Relación entre Votos Totales y Número de Oxxos')
-        plt.legend()
-        
-        # Línea de tendencia
-        z = np.polyfit(datos['votos_totales'], datos['num_oxxos'], 1)
-        p = np.poly1d(z)
-        plt.plot(datos['votos_totales'], p(datos['votos_totales']), 
-                "r--", alpha=0.8, label=f'Tendencia (R² = {np.corrcoef(datos["votos_totales"], datos["num_oxxos"])[0,1]**2:.3f})')
-        
-        plt.tight_layout()
-        plt.savefig(plots_dir / 'correlacion_votos_oxxos.png', dpi=300, bbox_inches='tight')
-        plt.close()
+        # Cada gráfica depende solo de esta tabla de 16 filas
+        tabla = pd.DataFrame(datos[['alcaldia', 'num_oxxos', 'partido_ganador', 'votos_totales']])
+        jobs = [
+            figure_job('distribucion_oxxos', tabla[['alcaldia', 'num_oxxos', 'partido_ganador']],
+                       scoped_path(plots_dir / 'distribucion_oxxos.png', scope)),
+            figure_job('analisis_partidos', tabla[['num_oxxos', 'partido_ganador']],
+                       scoped_path(plots_dir / 'analisis_partidos.png', scope)),
+            figure_job('correlacion_votos_oxxos', tabla[['votos_totales', 'num_oxxos', 'partido_ganador']],
+                       scoped_path(plots_dir / 'correlacion_votos_oxxos.png', scope)),
+        ]
+        render_figures(jobs)
         
         logger.info(f"Visualizaciones guardadas en: {plots_dir}")
         return True
@@ -209,120 +155,132 @@ def create_visualizations():
         logger.error(f"Error creando visualizaciones: {e}")
         return False
 
-def create_detailed_report():
-    """Crea un reporte detallado del análisis"""
+@profiled('analyze.patrones', rows=None)
+def analyze_point_patterns(datos, oxxos, districts=None, scope=None):
+    """
+    Estadística de patrón de puntos (Clark–Evans, distancias NN, K/L de
+    Ripley) por alcaldía y, si existen, por distrito electoral. Sin
+    `districts`, se leen de distritos_electorales.gpkg (dentro de `scope`).
+
+    Retorna {nivel: resumen} y guarda las curvas K/L en reports/.
+    """
     logger = setup_logging('polioxxo.analyze')
-    
-    datos, oxxos = load_processed_data()
-    if datos is None or oxxos is None:
-        return False
-    
     paths = get_project_paths()
-    
-    # Realizar análisis
-    stats = analyze_distribution()
-    political_analysis = analyze_political_correlation()
-    
-    # Crear reporte
-    report_content = f"""
-=== REPORTE DETALLADO DE ANÁLISIS ===
-Análisis de Oxxos en CDMX por Alcaldías y Partidos Políticos
+    resultados = {}
 
-RESUMEN EJECUTIVO:
-- Total de Oxxos analizados: {len(oxxos):,}
-- Total de alcaldías: {len(datos)}
-- Promedio de Oxxos por alcaldía: {datos['num_oxxos'].mean():.1f}
-- Alcaldía con más Oxxos: {datos.loc[datos['num_oxxos'].idxmax(), 'alcaldia']} ({datos['num_oxxos'].max()} Oxxos)
-- Alcaldía with menos Oxxos: {datos.loc[datos['num_oxxos'].idxmin(), 'alcaldia']} ({datos['num_oxxos'].min()} Oxxos)
+    try:
+        if scope is not None:
+            datos = scope.window(datos)
+        resumen, curvas = compute_point_pattern_stats(oxxos, datos, 'alcaldia')
+        resultados['alcaldia'] = resumen
+        curvas.to_csv(scoped_path(paths['reports'] / 'ripley_alcaldias.csv', scope), index=False)
 
-DISTRIBUCIÓN POR PARTIDO:
-"""
-    
-    for partido in datos['partido_ganador'].unique():
-        subset = datos[datos['partido_ganador'] == partido]
-        total_alcaldias = len(subset)
-        total_oxxos = subset['num_oxxos'].sum()
-        promedio_oxxos = subset['num_oxxos'].mean()
-        
-        report_content += f"""
-{partido}:
-  - Alcaldías controladas: {total_alcaldias} ({total_alcaldias/len(datos)*100:.1f}%)
-  - Total de Oxxos: {total_oxxos:,} ({total_oxxos/len(oxxos)*100:.1f}%)
-  - Promedio de Oxxos por alcaldía: {promedio_oxxos:.1f}
-"""
-    
-    report_content += f"""
+        districts_path = paths['data_processed'] / 'distritos_electorales.gpkg'
+        if districts is None and districts_path.exists():
+            districts = read_layer(districts_path, scope)
+        if districts is not None and 'distrito' in oxxos.columns:
+            ensure_region_keys(districts, 'distrito')
+            if scope is not None:
+                districts = scope.window(districts)
+            resumen, curvas = compute_point_pattern_stats(oxxos, districts, 'distrito')
+            resultados['distrito'] = resumen
+            curvas.to_csv(scoped_path(paths['reports'] / 'ripley_distritos.csv', scope), index=False)
 
-RANKING DE ALCALDÍAS (por número de Oxxos):
-"""
-    
-    for i, (_, row) in enumerate(datos.sort_values('num_oxxos', ascending=False).iterrows(), 1):
-        report_content += f"{i:2d}. {row['alcaldia']}: {row['num_oxxos']} Oxxos ({row['partido_ganador']})\n"
-    
-    report_content += f"""
+        return resultados
 
-ESTADÍSTICAS DESCRIPTIVAS:
-- Media: {datos['num_oxxos'].mean():.2f}
-- Mediana: {datos['num_oxxos'].median():.2f}
-- Desviación estándar: {datos['num_oxxos'].std():.2f}
-- Mínimo: {datos['num_oxxos'].min()}
-- Máximo: {datos['num_oxxos'].max()}
-- Rango intercuartílico: {datos['num_oxxos'].quantile(0.75) - datos['num_oxxos'].quantile(0.25):.2f}
+    except Exception as e:
+        logger.error(f"Error en análisis de patrón espacial: {e}")
+        return resultados
 
-CONCLUSIONES:
-1. Hay una distribución desigual de Oxxos entre alcaldías
-2. {datos['partido_ganador'].mode()[0]} controla la mayoría de alcaldías ({datos['partido_ganador'].value_counts().iloc[0]} de {len(datos)})
-3. La correlación entre votos y número de Oxxos es: {np.corrcoef(datos['votos_totales'], datos['num_oxxos'])[0,1]:.3f}
-"""
+@profiled('analyze.significancia', rows=None)
+def analyze_significance(datos):
+    """
+    IC bootstrap y valores p por permutación a nivel alcaldía: correlación
+    votos vs Oxxos y densidad de Oxxos por partido
+    """
+    logger = setup_logging('polioxxo.analyze')
+
+    if len(datos) < MIN_SIGNIFICANCE_REGIONS:
+        logger.info(f"Significancia omitida: {len(datos)} alcaldías en el alcance")
+        return None, None
+
+    try:
+        engine = ResamplingEngine()
+        area_km2 = datos.to_crs(projected_crs()).area / 1e6
+        correlation = engine.correlation(datos['votos_totales'], datos['num_oxxos'])
+        densities = engine.group_density(datos['num_oxxos'], area_km2, datos['partido_ganador'])
+        log_significance(logger, "SIGNIFICANCIA (ALCALDÍAS)", correlation, densities)
+        return correlation, densities
+
+    except Exception as e:
+        logger.error(f"Error en análisis de significancia: {e}")
+        return None, None
+
+@profiled('report.detallado', rows=None)
+def create_detailed_report(datos, oxxos, districts=None, scope=None):
+    """
+    Crea el reporte detallado desde el documento de métricas; solo calcula
+    las secciones que aún no existen (significancia y patrón espacial).
+    Una corrida acotada usa su propio documento y reporte (con sufijo).
+    """
+    logger = setup_logging('polioxxo.analyze')
+    
+    paths = get_project_paths()
+    metrics_file = scoped_path(metrics_path(), scope)
+    documento = load_metrics(metrics_file)
+    if not documento.alcaldias:
+        documento.update('alcaldias', **alcaldia_metrics(datos, len(oxxos)))
+    
+    correlation, densities = analyze_significance(scope.window(datos) if scope is not None else datos)
+    if correlation is not None:
+        documento.significancia['alcaldia'] = significance_section(correlation, densities)
+    
+    patrones = analyze_point_patterns(datos, oxxos, districts, scope)
+    documento.update('analisis', patrones={
+        level: json.loads(resumen.to_json(orient='records', force_ascii=False))
+        for level, resumen in patrones.items()
+    })
+    save_metrics(documento, metrics_file)
     
     # Guardar reporte
-    report_path = paths['reports'] / 'reporte_analisis_detallado.txt'
     try:
-        with open(report_path, 'w', encoding='utf-8') as f:
-            f.write(report_content)
+        report_path = write_report(render_detailed_report(documento),
+                                   scoped_path(paths['reports'] / 'reporte_analisis_detallado.txt', scope))
         logger.info(f"Reporte detallado guardado: {report_path}")
         return True
     except Exception as e:
         logger.error(f"Error guardando reporte: {e}")
         return False
 
-def main():
-    """Función principal de análisis"""
+def run_analysis(datos, oxxos, districts=None, scope=None):
+    """Análisis estadístico sobre datos ya cargados (alcaldías y Oxxos)"""
     logger = setup_logging('polioxxo.analyze')
     
-    logger.info("🔍 INICIANDO ANÁLISIS ESTADÍSTICO DETALLADO")
-    logger.info("=" * 50)
-    
     try:
         # Realizar análisis
-        stats = analyze_distribution()
+        stats = analyze_distribution(datos, oxxos)
         if not stats:
             logger.error("Fallo en análisis de distribución")
             return False
         
-        political_analysis = analyze_political_correlation()
+        political_analysis = analyze_political_correlation(cube_for(oxxos, datos, districts, scope))
         if political_analysis is False:
             logger.error("Fallo en análisis político")
             return False
         
         # Crear visualizaciones
-        if create_visualizations():
+        if create_visualizations(datos, scope):
             logger.info("✅ Visualizaciones creadas")
         else:
             logger.warning("⚠️ Error creando visualizaciones")
         
         # Crear reporte detallado
-        if create_detailed_report():
+        if create_detailed_report(datos, oxxos, districts, scope):
             logger.info("✅ Reporte detallado creado")
         else:
             logger.warning("⚠️ Error creando reporte")
         
-        logger.info("=" * 50)
         logger.info("🎉 ANÁLISIS COMPLETADO EXITOSAMENTE")
-        
-        paths = get_project_paths()
-        logger.info(f"📊 Reportes en: {paths['reports']}")
-        
         return True
         
     except Exception as e:
@@ -331,6 +289,29 @@ def main():
         traceback.print_exc()
         return False
 
+def main(scope=None):
+    """Función principal de análisis (opcionalmente acotada a `scope`)"""
+    logger = setup_logging('polioxxo.analyze')
+    
+    logger.info("🔍 INICIANDO ANÁLISIS ESTADÍSTICO DETALLADO")
+    logger.info("=" * 50)
+    
+    datos, oxxos = load_processed_data(scope)
+    if datos is None or oxxos is None:
+        return False
+    
+    if not run_analysis(datos, oxxos, scope=scope):
+        return False
+    if scope is None:
+        publish_outputs()
+    
+    logger.info("=" * 50)
+    paths = get_project_paths()
+    logger.info(f"📊 Reportes en: {paths['reports']}")
+    return True
+
 if __name__ == "__main__":
+    from scripts.profiling import consume_profile_args
+    consume_profile_args(run='analyze')
     success = main()
     sys.exit(0 if success else 1)
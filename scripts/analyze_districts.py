@@ -19,17 +19,30 @@ sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 import geopandas as gpd
 import pandas as pd
 import numpy as np
-import matplotlib.pyplot as plt
-import seaborn as sns
 from shapely.geometry import Point, Polygon
 import logging
 
 from scripts.utils import (
-    setup_logging, get_project_paths, validate_geometry, 
+    setup_logging, get_project_paths, 
     ensure_same_crs, save_geodataframe, load_geodataframe,
     create_electoral_districts
 )
+from scripts.boundaries import BoundaryRegistry, projected_crs
+from scripts.catalog import add_region_keys, ensure_region_keys, get_catalog
+from scripts.point_store import PointStore
+from scripts.cube import build_cube, cube_for
+from config.cities import get_city
+from scripts.processed_store import write_processed_store
+from scripts.resampling import ResamplingEngine, grid_party_units, log_significance
+from scripts.figures import figure_job, render_figures
+from scripts.profiling import profiled
+from scripts.publish import publish_outputs
+from scripts.metrics import (
+    load_metrics, save_metrics, district_metrics, significance_section,
+    render_district_report, write_report
+)
 
+@profiled('districts.sinteticos')
 def create_synthetic_districts():
     """
     Crea geometrías sintéticas de distritos electorales basadas en alcaldías
@@ -87,6 +100,8 @@ def create_synthetic_districts():
         
         # Crear GeoDataFrame
         gdf_districts = gpd.GeoDataFrame(district_geometries, crs='EPSG:4326')
+        add_region_keys(gdf_districts, 'distrito', register=True)
+        add_region_keys(gdf_districts, 'alcaldia')
         
         logger.info(f"Creados {len(gdf_districts)} distritos electorales con geometrías")
         return gdf_districts
@@ -95,6 +110,7 @@ def create_synthetic_districts():
         logger.error(f"Error creando distritos sintéticos: {e}")
         return None
 
+@profiled('assign.distritos')
 def assign_oxxos_to_districts(oxxos, districts):
     """
     Asigna cada Oxxo a su distrito electoral correspondiente
@@ -105,81 +121,14 @@ def assign_oxxos_to_districts(oxxos, districts):
     try:
         logger.info(f"ENTRADA: {len(oxxos)} Oxxos, {len(districts)} distritos")
         
-        # Convertir a sistema proyectado
-        target_crs = "EPSG:3857"  # Web Mercator para cálculos
-        oxxos_proj = oxxos.to_crs(target_crs)
-        districts_proj = districts.to_crs(target_crs)
-        
-        # Crear copia de trabajo
-        oxxos_resultado = oxxos.copy()
-        oxxos_resultado['distrito'] = None
-        oxxos_resultado['diputado_ganador'] = None
-        
-        # Buffer para mejorar asignación
-        districts_buffered = districts_proj.copy()
-        districts_buffered['geometry'] = districts_buffered.geometry.buffer(500)  # 500m buffer
-        
-        # ESTRATEGIA 1: Spatial join directo
-        try:
-            resultado_join = gpd.sjoin(
-                oxxos_proj,
-                districts_buffered[['distrito', 'diputado_ganador', 'geometry']],
-                how='left',
-                predicate='intersects'
-            )
-            
-            # Copiar resultados válidos
-            mask_asignados = ~pd.isna(resultado_join['distrito'])
-            for idx in resultado_join.index[mask_asignados]:
-                if idx in oxxos_resultado.index:
-                    oxxos_resultado.loc[idx, 'distrito'] = resultado_join.loc[idx, 'distrito']
-                    oxxos_resultado.loc[idx, 'diputado_ganador'] = resultado_join.loc[idx, 'diputado_ganador']
-            
-            asignados_join = mask_asignados.sum()
-            logger.info(f"SPATIAL JOIN: {asignados_join} Oxxos asignados a distritos")
-            
-        except Exception as e:
-            logger.warning(f"Spatial join falló: {e}")
-            asignados_join = 0
-        
-        # ESTRATEGIA 2: Asignación por proximidad para los no asignados
-        sin_asignar = pd.isna(oxxos_resultado['distrito'])
-        if sin_asignar.sum() > 0:
-            logger.info(f"PROXIMIDAD: Asignando {sin_asignar.sum()} Oxxos restantes por proximidad...")
-            
-            # Crear centroides de distritos
-            centroides = districts_proj.copy()
-            centroides['geometry'] = centroides.geometry.centroid
-            
-            for idx in oxxos_resultado.index[sin_asignar]:
-                try:
-                    punto_oxxo = oxxos_proj.loc[idx, 'geometry']
-                    if punto_oxxo is not None:
-                        distancias = centroides.geometry.distance(punto_oxxo)
-                        idx_cercano = distancias.idxmin()
-                        oxxos_resultado.loc[idx, 'distrito'] = centroides.loc[idx_cercano, 'distrito']
-                        oxxos_resultado.loc[idx, 'diputado_ganador'] = centroides.loc[idx_cercano, 'diputado_ganador']
-                except Exception as e:
-                    # Asignar al primer distrito como último recurso
-                    oxxos_resultado.loc[idx, 'distrito'] = districts['distrito'].iloc[0]
-                    oxxos_resultado.loc[idx, 'diputado_ganador'] = districts['diputado_ganador'].iloc[0]
-        
-        # VERIFICACIÓN FINAL
-        oxxos_sin_asignar = pd.isna(oxxos_resultado['distrito']).sum()
-        oxxos_con_distrito = len(oxxos_resultado) - oxxos_sin_asignar
-        
-        logger.info("=== RESULTADO ASIGNACIÓN DISTRITOS ===")
-        logger.info(f"Oxxos totales: {len(oxxos_resultado)}")
-        logger.info(f"Oxxos asignados a distritos: {oxxos_con_distrito}")
-        logger.info(f"Oxxos sin distrito: {oxxos_sin_asignar}")
-        
-        # Mostrar distribución por distrito
-        if oxxos_con_distrito > 0:
-            distribucion = oxxos_resultado['distrito'].value_counts()
-            logger.info("=== DISTRIBUCIÓN POR DISTRITO ===")
-            for distrito, count in distribucion.head(10).items():
-                logger.info(f"{distrito}: {count} Oxxos")
+        registry = BoundaryRegistry()
+        registry.add_layer(
+            'distrito', districts, key='distrito',
+            attributes=['distrito_id', 'diputado_ganador'], buffer=500  # 500m buffer
+        )
+        oxxos_resultado = registry.assign(oxxos)
         
+        log_district_assignment(oxxos_resultado)
         return oxxos_resultado
         
     except Exception as e:
@@ -188,46 +137,69 @@ def assign_oxxos_to_districts(oxxos, districts):
         traceback.print_exc()
         return None
 
-def analyze_districts_vs_alcaldias(oxxos_with_districts, districts_data):
+def log_district_assignment(oxxos_resultado):
     """
-    Análisis comparativo entre distritos y alcaldías
+    Resume en el log la asignación de Oxxos a distritos
+    """
+    logger = setup_logging('polioxxo.districts')
+    
+    oxxos_sin_asignar = pd.isna(oxxos_resultado['distrito']).sum()
+    oxxos_con_distrito = len(oxxos_resultado) - oxxos_sin_asignar
+    
+    logger.info("=== RESULTADO ASIGNACIÓN DISTRITOS ===")
+    logger.info(f"Oxxos totales: {len(oxxos_resultado)}")
+    logger.info(f"Oxxos asignados a distritos: {oxxos_con_distrito}")
+    logger.info(f"Oxxos sin distrito: {oxxos_sin_asignar}")
+    
+    # Mostrar distribución por distrito
+    if oxxos_con_distrito > 0:
+        distribucion = oxxos_resultado['distrito'].value_counts()
+        logger.info("=== DISTRIBUCIÓN POR DISTRITO ===")
+        for distrito, count in distribucion.head(10).items():
+            logger.info(f"{distrito}: {count} Oxxos")
+
+@profiled('districts.comparacion')
+def analyze_districts_vs_alcaldias(oxxos_with_districts, districts_data, cube=None):
+    """
+    Análisis comparativo entre distritos y alcaldías (lecturas del cubo de
+    agregados de la corrida o, sin él, de uno construido con estos Oxxos)
     """
     logger = setup_logging('polioxxo.districts')
     logger.info("Realizando análisis comparativo distritos vs alcaldías...")
     
     try:
-        # Estadísticas por distrito
-        stats_distritos = oxxos_with_districts.groupby('distrito').size().reset_index(name='num_oxxos_distrito')
+        if cube is None:
+            cube = cube_for(oxxos_with_districts, districts=districts_data)
+        
+        # Estadísticas por distrito (join por id entero)
+        por_distrito = cube.rollup('distrito')[:-1]
+        ids = np.flatnonzero(por_distrito)
+        stats_distritos = pd.DataFrame({'distrito_id': ids, 'num_oxxos_distrito': por_distrito[ids]})
         
         # Merge con datos de distritos
-        districts_df = districts_data[['distrito', 'alcaldia', 'diputado_ganador', 'votos_distrito', 'participacion']].copy()
-        stats_completas = stats_distritos.merge(districts_df, on='distrito', how='left')
-        
-        # Estadísticas por alcaldía (para comparar)
-        stats_alcaldias = oxxos_with_districts.groupby('alcaldia').agg({
-            'distrito': 'nunique',
-            'name': 'count'
-        }).reset_index()
-        stats_alcaldias.columns = ['alcaldia', 'num_distritos', 'num_oxxos_total']
-        
-        # Análisis por partido en distritos
-        partido_analysis = stats_completas.groupby('diputado_ganador').agg({
-            'num_oxxos_distrito': ['sum', 'mean', 'count'],
-            'votos_distrito': 'sum',
-            'participacion': 'mean'
-        }).round(2)
+        districts_df = districts_data[['distrito_id', 'distrito', 'alcaldia', 'diputado_ganador', 'votos_distrito', 'participacion']].copy()
+        stats_completas = stats_distritos.merge(districts_df, on='distrito_id', how='left')
+        
+        # Estadísticas por alcaldía (para comparar): filas del agregado alcaldía x distrito
+        alcaldia_distrito = cube.rollup('alcaldia', 'distrito')[:-1]
+        totales = alcaldia_distrito.sum(axis=1)
+        ids = np.flatnonzero(totales)
+        stats_alcaldias = pd.DataFrame({
+            'alcaldia_id': ids,
+            'num_distritos': (alcaldia_distrito[ids, :-1] > 0).sum(axis=1),
+            'num_oxxos_total': totales[ids],
+        })
+        stats_alcaldias.insert(0, 'alcaldia', get_catalog('alcaldia').categorical(stats_alcaldias['alcaldia_id']))
+        
+        # Análisis por partido en distritos (distritos con algún Oxxo)
+        partido_analysis = cube.party_table('partido_distrito', nonempty=True)
         
         logger.info("\n=== ANÁLISIS POR PARTIDO (DISTRITOS) ===")
-        for partido in stats_completas['diputado_ganador'].unique():
-            subset = stats_completas[stats_completas['diputado_ganador'] == partido]
-            total_distritos = len(subset)
-            total_oxxos = subset['num_oxxos_distrito'].sum()
-            promedio_oxxos = subset['num_oxxos_distrito'].mean()
-            
-            logger.info(f"\n{partido}:")
-            logger.info(f"  Distritos controlados: {total_distritos}")
-            logger.info(f"  Total Oxxos en sus distritos: {total_oxxos:,}")
-            logger.info(f"  Promedio Oxxos por distrito: {promedio_oxxos:.1f}")
+        for fila in partido_analysis.itertuples(index=False):
+            logger.info(f"\n{fila.partido}:")
+            logger.info(f"  Distritos controlados: {fila.unidades}")
+            logger.info(f"  Total Oxxos en sus distritos: {fila.total_oxxos:,}")
+            logger.info(f"  Promedio Oxxos por distrito: {fila.promedio_oxxos:.1f}")
         
         return stats_completas, stats_alcaldias, partido_analysis
         
@@ -235,87 +207,48 @@ def analyze_districts_vs_alcaldias(oxxos_with_districts, districts_data):
         logger.error(f"Error en análisis comparativo: {e}")
         return None, None, None
 
-def create_district_visualizations():
+def create_district_visualizations(oxxos_districts=None):
     """
-    Crea visualizaciones específicas de análisis por distritos
+    Crea visualizaciones específicas de análisis por distritos (solo las
+    que cambiaron). Sin `oxxos_districts`, los lee de oxxos_con_distrito.gpkg
     """
     logger = setup_logging('polioxxo.districts')
     logger.info("Creando visualizaciones de análisis por distritos...")
     
     paths = get_project_paths()
     reports_dir = paths['reports']
-    reports_dir.mkdir(exist_ok=True)
+    reports_dir.mkdir(parents=True, exist_ok=True)
     
     try:
         # Cargar datos procesados
-        oxxos_path = paths['data_processed'] / 'oxxos_con_distrito.gpkg'
-        if not oxxos_path.exists():
-            logger.warning("Datos de distritos no encontrados. Ejecuta primero el análisis de distritos.")
-            return False
-        
-        oxxos_districts = gpd.read_file(oxxos_path)
-        
-        # Configurar estilo
-        plt.style.use('default')
-        sns.set_palette("husl")
-        
-        # 1. Distribución de Oxxos por distrito
-        fig, (ax1, ax2) = plt.subplots(1, 2, figsize=(16, 8))
+        if oxxos_districts is None:
+            oxxos_path = paths['data_processed'] / 'oxxos_con_distrito.gpkg'
+            if not oxxos_path.exists():
+                logger.warning("Datos de distritos no encontrados. Ejecuta primero el análisis de distritos.")
+                return False
+            
+            oxxos_districts = gpd.read_file(oxxos_path, columns=['distrito', 'alcaldia', 'diputado_ganador'])
         
-        # Top 10 distritos
+        # 1. Top 10 distritos y top 8 alcaldías por número de Oxxos
         top_districts = oxxos_districts['distrito'].value_counts().head(10)
-        colors_parties = {'MORENA': '#8B4513', 'PAN': '#0080FF', 'PRI': '#FF0000'}
-        
-        bars = ax1.barh(range(len(top_districts)), top_districts.values)
-        ax1.set_yticks(range(len(top_districts)))
-        ax1.set_yticklabels(top_districts.index, fontsize=8)
-        ax1.set_xlabel('Número de Oxxos')
-        ax1.set_title('Top 10 Distritos con más Oxxos')
-        
-        # Comparación Alcaldías vs Distritos
         alcaldia_counts = oxxos_districts['alcaldia'].value_counts().head(8)
-        district_counts = oxxos_districts['distrito'].value_counts().head(8)
-        
-        x = np.arange(len(alcaldia_counts))
-        width = 0.35
-        
-        ax2.bar(x - width/2, alcaldia_counts.values, width, label='Por Alcaldía', alpha=0.8)
-        # ax2.bar(x + width/2, district_counts.values[:len(alcaldia_counts)], width, label='Por Distrito', alpha=0.8)
-        
-        ax2.set_xlabel('Divisiones Territoriales')
-        ax2.set_ylabel('Número de Oxxos')
-        ax2.set_title('Comparación: Alcaldías vs Distritos')
-        ax2.set_xticks(x)
-        ax2.set_xticklabels(alcaldia_counts.index, rotation=45, ha='right', fontsize=8)
-        ax2.legend()
-        
-        plt.tight_layout()
-        plt.savefig(reports_dir / 'analisis_distritos_electorales.png', dpi=300, bbox_inches='tight')
-        plt.close()
-        
-        # 2. Análisis por partido político en distritos
+        conteos = pd.concat([
+            pd.DataFrame({'nivel': 'distrito', 'region': top_districts.index.astype(str),
+                          'num_oxxos': top_districts.to_numpy()}),
+            pd.DataFrame({'nivel': 'alcaldia', 'region': alcaldia_counts.index.astype(str),
+                          'num_oxxos': alcaldia_counts.to_numpy()}),
+        ], ignore_index=True)
+        jobs = [figure_job('analisis_distritos', conteos, reports_dir / 'analisis_distritos_electorales.png')]
+        
+        # 2. Oxxos por partido ganador del distrito
         if 'diputado_ganador' in oxxos_districts.columns:
-            fig, (ax1, ax2) = plt.subplots(1, 2, figsize=(14, 6))
-            
-            # Distribución por partido
             partido_counts = oxxos_districts['diputado_ganador'].value_counts()
-            colors = [colors_parties.get(p, '#808080') for p in partido_counts.index]
-            
-            ax1.pie(partido_counts.values, labels=partido_counts.index, autopct='%1.1f%%', 
-                    colors=colors, startangle=90)
-            ax1.set_title('Oxxos por Partido Ganador\n(Distritos Electorales)')
-            
-            # Comparación partido vs total de Oxxos
-            partido_oxxos = oxxos_districts.groupby('diputado_ganador').size()
-            ax2.bar(partido_oxxos.index, partido_oxxos.values, 
-                    color=[colors_parties.get(p, '#808080') for p in partido_oxxos.index])
-            ax2.set_ylabel('Total de Oxxos')
-            ax2.set_title('Total de Oxxos por Partido\n(Distritos Electorales)')
-            ax2.tick_params(axis='x', rotation=45)
-            
-            plt.tight_layout()
-            plt.savefig(reports_dir / 'partidos_distritos_electorales.png', dpi=300, bbox_inches='tight')
-            plt.close()
+            partidos = pd.DataFrame({'partido': partido_counts.index.astype(str),
+                                     'num_oxxos': partido_counts.to_numpy()})
+            jobs.append(figure_job('partidos_distritos', partidos,
+                                   reports_dir / 'partidos_distritos_electorales.png'))
+        
+        render_figures(jobs)
         
         logger.info(f"Visualizaciones de distritos guardadas en: {reports_dir}")
         return True
@@ -324,70 +257,53 @@ def create_district_visualizations():
         logger.error(f"Error creando visualizaciones de distritos: {e}")
         return False
 
-def create_district_report(stats_completas, stats_alcaldias):
+@profiled('districts.significancia', rows=None)
+def analyze_district_significance(stats_completas, districts, oxxos_with_districts):
     """
-    Crea reporte detallado del análisis de distritos electorales
+    IC bootstrap y valores p por permutación a nivel distrito y malla
     """
     logger = setup_logging('polioxxo.districts')
-    paths = get_project_paths()
-    
-    try:
-        report_content = f"""
-=== REPORTE DETALLADO: ANÁLISIS POR DISTRITOS ELECTORALES ===
-Análisis de Oxxos en CDMX por Distritos Electorales vs Alcaldías
 
-RESUMEN EJECUTIVO:
-- Total de distritos analizados: {len(stats_completas)}
-- Total de alcaldías con distritos: {len(stats_alcaldias)}
-- Promedio de Oxxos por distrito: {stats_completas['num_oxxos_distrito'].mean():.1f}
-- Distrito con más Oxxos: {stats_completas.loc[stats_completas['num_oxxos_distrito'].idxmax(), 'distrito']} ({stats_completas['num_oxxos_distrito'].max()} Oxxos)
+    try:
+        engine = ResamplingEngine()
+        areas = districts.set_index('distrito_id').to_crs(projected_crs()).area / 1e6
+        stats = stats_completas.assign(area_km2=stats_completas['distrito_id'].map(areas))
 
-ANÁLISIS POR PARTIDO (DISTRITOS):
-"""
-        
-        for partido in stats_completas['diputado_ganador'].unique():
-            subset = stats_completas[stats_completas['diputado_ganador'] == partido]
-            total_distritos = len(subset)
-            total_oxxos = subset['num_oxxos_distrito'].sum()
-            promedio_oxxos = subset['num_oxxos_distrito'].mean()
-            
-            report_content += f"""
-{partido}:
-  - Distritos controlados: {total_distritos} ({total_distritos/len(stats_completas)*100:.1f}%)
-  - Total de Oxxos: {total_oxxos:,}
-  - Promedio de Oxxos por distrito: {promedio_oxxos:.1f}
-  - Participación promedio: {subset['participacion'].mean():.1f}%
-"""
-        
-        report_content += f"""
+        significance = {
+            'distrito': (
+                engine.correlation(stats['votos_distrito'], stats['num_oxxos_distrito']),
+                engine.group_density(stats['num_oxxos_distrito'], stats['area_km2'], stats['diputado_ganador']),
+            )
+        }
+        grid = grid_party_units(oxxos_with_districts, districts)
+        significance['malla'] = (None, engine.group_density(grid['num_oxxos'], grid['area_km2'], grid['partido']))
 
-RANKING DE DISTRITOS (por número de Oxxos):
-"""
-        
-        for i, (_, row) in enumerate(stats_completas.sort_values('num_oxxos_distrito', ascending=False).iterrows(), 1):
-            report_content += f"{i:2d}. {row['distrito']}: {row['num_oxxos_distrito']} Oxxos ({row['diputado_ganador']}) - {row['alcaldia']}\n"
-        
-        report_content += f"""
+        for level, (correlation, densities) in significance.items():
+            log_significance(logger, f"SIGNIFICANCIA ({level.upper()})", correlation, densities)
+        return significance
 
-COMPARACIÓN ALCALDÍAS vs DISTRITOS:
-"""
-        
-        for _, row in stats_alcaldias.iterrows():
-            report_content += f"- {row['alcaldia']}: {row['num_distritos']} distritos, {row['num_oxxos_total']} Oxxos totales\n"
-        
-        report_content += f"""
+    except Exception as e:
+        logger.error(f"Error en análisis de significancia: {e}")
+        return None
 
-CONCLUSIONES DISTRITOS ELECTORALES:
-1. Distribución más granular que alcaldías permite mejor análisis político
-2. {stats_completas['diputado_ganador'].mode()[0]} domina en {stats_completas['diputado_ganador'].value_counts().iloc[0]} de {len(stats_completas)} distritos
-3. Correlación entre densidad de Oxxos y participación electoral
-4. Algunas alcaldías tienen múltiples distritos con diferentes orientaciones políticas
-"""
+@profiled('report.distritos', rows=None)
+def create_district_report(stats_completas, stats_alcaldias, significance=None):
+    """
+    Actualiza la sección de distritos del documento de métricas y genera
+    el reporte de distritos electorales a partir de él
+    """
+    logger = setup_logging('polioxxo.districts')
+    paths = get_project_paths()
+    
+    try:
+        documento = load_metrics()
+        for level, (correlation, densities) in (significance or {}).items():
+            documento.significancia[level] = significance_section(correlation, densities)
+        documento.update('distritos', **district_metrics(stats_completas, stats_alcaldias))
+        save_metrics(documento)
         
-        # Guardar reporte
-        report_path = paths['reports'] / 'reporte_distritos_electorales.txt'
-        with open(report_path, 'w', encoding='utf-8') as f:
-            f.write(report_content)
+        report_path = write_report(render_district_report(documento),
+                                   paths['reports'] / 'reporte_distritos_electorales.txt')
         
         logger.info(f"Reporte de distritos guardado: {report_path}")
         return True
@@ -396,70 +312,87 @@ CONCLUSIONES DISTRITOS ELECTORALES:
         logger.error(f"Error creando reporte de distritos: {e}")
         return False
 
-def main():
-    """Función principal de análisis por distritos electorales"""
+def run_district_analysis(oxxos, districts=None, writer=None, persist_shared=True):
+    """
+    Análisis por distritos sobre Oxxos ya cargados (GeoDataFrame o
+    PointStore). Los archivos se escriben a través de `writer` (síncrono por
+    omisión); con `persist_shared=False` no se reescriben las geometrías de
+    distritos ni el almacén procesado, que process_data ya escribió.
+    """
+    from scripts.pipeline import InlineWriter
+    
     logger = setup_logging('polioxxo.districts')
     paths = get_project_paths()
-    
-    logger.info("🗳️ INICIANDO ANÁLISIS POR DISTRITOS ELECTORALES")
-    logger.info("=" * 60)
+    writer = writer or InlineWriter()
     
     try:
-        # 1. Crear distritos sintéticos
-        logger.info("Paso 1: Creando distritos electorales...")
-        districts = create_synthetic_districts()
+        # 1. Distritos electorales
         if districts is None:
-            logger.error("Error creando distritos")
-            return False
-        
-        # 2. Cargar Oxxos existentes
-        logger.info("Paso 2: Cargando datos de Oxxos...")
-        oxxos_path = paths['data_processed'] / 'oxxos_con_alcaldia.gpkg'
-        if not oxxos_path.exists():
-            logger.error("Datos de Oxxos no encontrados. Ejecuta primero process_data.py")
-            return False
-        
-        oxxos = gpd.read_file(oxxos_path)
-        logger.info(f"Cargados {len(oxxos)} Oxxos")
-        
-        # 3. Asignar Oxxos a distritos
-        logger.info("Paso 3: Asignando Oxxos a distritos...")
-        oxxos_with_districts = assign_oxxos_to_districts(oxxos, districts)
-        if oxxos_with_districts is None:
-            logger.error("Error en asignación de distritos")
-            return False
-        
-        # 4. Análisis comparativo
+            if not get_city().distritos_sinteticos:
+                logger.error(f"No hay distritos electorales configurados para {get_city().nombre}")
+                return False
+            logger.info("Paso 1: Creando distritos electorales...")
+            districts = create_synthetic_districts()
+            if districts is None:
+                logger.error("Error creando distritos")
+                return False
+        
+        if isinstance(oxxos, PointStore):
+            oxxos = oxxos.to_geodataframe()
+            ensure_region_keys(oxxos, 'alcaldia')
+            if 'distrito' in oxxos.columns:
+                ensure_region_keys(oxxos, 'distrito')
+        
+        # 3. Asignar Oxxos a distritos (process_data.py ya lo hace en la misma
+        #    pasada que las alcaldías; solo se reasigna con datos antiguos)
+        if 'distrito' in oxxos.columns and oxxos['distrito'].notna().all():
+            logger.info("Paso 3: Distritos ya asignados por process_data.py")
+            oxxos_with_districts = oxxos
+            log_district_assignment(oxxos_with_districts)
+        else:
+            logger.info("Paso 3: Asignando Oxxos a distritos...")
+            oxxos_with_districts = assign_oxxos_to_districts(oxxos, districts)
+            if oxxos_with_districts is None:
+                logger.error("Error en asignación de distritos")
+                return False
+        
+        # 4. Análisis comparativo (el cubo de la corrida solo sirve si los
+        #    distritos no se reasignaron aquí)
         logger.info("Paso 4: Realizando análisis comparativo...")
+        cube = (cube_for(oxxos_with_districts, districts=districts) if oxxos_with_districts is oxxos
+                else build_cube(oxxos_with_districts, districts=districts))
         stats_completas, stats_alcaldias, partido_analysis = analyze_districts_vs_alcaldias(
-            oxxos_with_districts, districts
+            oxxos_with_districts, districts, cube
         )
         
         # 5. Guardar datos procesados
         logger.info("Paso 5: Guardando datos procesados...")
         oxxos_districts_path = paths['data_processed'] / 'oxxos_con_distrito.gpkg'
-        if not save_geodataframe(oxxos_with_districts, oxxos_districts_path):
+        if not writer.submit(oxxos_districts_path.name, save_geodataframe,
+                             oxxos_with_districts.copy(deep=False), oxxos_districts_path):
             logger.error("Error guardando datos de distritos")
             return False
         
-        districts_path = paths['data_processed'] / 'distritos_electorales.gpkg'
-        if not save_geodataframe(districts, districts_path):
-            logger.error("Error guardando geometrías de distritos")
-            return False
+        if persist_shared:
+            districts_path = paths['data_processed'] / 'distritos_electorales.gpkg'
+            if not writer.submit(districts_path.name, save_geodataframe, districts.copy(deep=False), districts_path):
+                logger.error("Error guardando geometrías de distritos")
+                return False
+            
+            # Actualizar el almacén con mapeo a memoria (conserva la capa de alcaldías)
+            writer.submit('almacén procesado', write_processed_store,
+                          PointStore.from_geodataframe(oxxos_with_districts), {'distrito': districts})
         
         # 6. Crear visualizaciones
         logger.info("Paso 6: Creando visualizaciones...")
-        create_district_visualizations()
+        create_district_visualizations(oxxos_with_districts)
         
         # 7. Crear reporte
         logger.info("Paso 7: Creando reporte...")
-        create_district_report(stats_completas, stats_alcaldias)
+        significance = analyze_district_significance(stats_completas, districts, oxxos_with_districts)
+        create_district_report(stats_completas, stats_alcaldias, significance)
         
-        logger.info("=" * 60)
         logger.info("🎉 ANÁLISIS DE DISTRITOS COMPLETADO EXITOSAMENTE")
-        logger.info(f"📊 Reportes en: {paths['reports']}")
-        logger.info(f"🗺️ Para crear mapa de distritos: python scripts/create_district_map.py")
-        
         return True
         
     except Exception as e:
@@ -468,6 +401,42 @@ def main():
         traceback.print_exc()
         return False
 
+def main():
+    """Función principal de análisis por distritos electorales"""
+    logger = setup_logging('polioxxo.districts')
+    paths = get_project_paths()
+    
+    logger.info("🗳️ INICIANDO ANÁLISIS POR DISTRITOS ELECTORALES")
+    logger.info("=" * 60)
+    
+    # 2. Cargar Oxxos existentes
+    logger.info("Paso 2: Cargando datos de Oxxos...")
+    oxxos_path = paths['data_processed'] / 'oxxos_con_alcaldia.gpkg'
+    if not oxxos_path.exists():
+        logger.error("Datos de Oxxos no encontrados. Ejecuta primero process_data.py")
+        return False
+    
+    try:
+        oxxos = gpd.read_file(oxxos_path)
+    except Exception as e:
+        logger.error(f"Error cargando Oxxos: {e}")
+        return False
+    ensure_region_keys(oxxos, 'alcaldia')
+    if 'distrito' in oxxos.columns:
+        ensure_region_keys(oxxos, 'distrito')
+    logger.info(f"Cargados {len(oxxos)} Oxxos")
+    
+    if not run_district_analysis(oxxos):
+        return False
+    publish_outputs()
+    
+    logger.info("=" * 60)
+    logger.info(f"📊 Reportes en: {paths['reports']}")
+    logger.info(f"🗺️ Para crear mapa de distritos: python scripts/create_district_map.py")
+    return True
+
 if __name__ == "__main__":
+    from scripts.profiling import consume_profile_args
+    consume_profile_args(run='districts')
     success = main()
     sys.exit(0 if success else 1)
@@ -0,0 +1,312 @@
+#!/usr/bin/env python3
+"""
+Registro de capas de límites territoriales - Polioxxo
+
+Este módulo:
+1. Registra N capas de límites (alcaldía, distrito local, distrito federal,
+   sección electoral, colonia, ...)
+2. Proyecta cada capa una sola vez y construye su índice espacial
+3. Asigna cada Oxxo a todas las capas en una sola pasada sobre sus
+   coordenadas, produciendo una tabla ancha
+"""
+
+import sys
+import os
+
+# Agregar ruta del proyecto al path de Python
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+import pandas as pd
+import geopandas as gpd
+import shapely
+
+from scripts.utils import setup_logging
+from scripts.point_store import PointStore
+from scripts.profiling import count
+from config.cities import get_city
+
+# CRS de respaldo si la proyección de la ciudad falla
+FALLBACK_CRS = "EPSG:3857"
+
+
+
+def projected_crs():
+    """
+    CRS proyectado de la ciudad activa (EPSG:6372, Mexico ITRF2008 / LCC, por
+    omisión); se consulta en cada llamada para respetar set_active_city
+    """
+    return get_city().crs
+
+
+# Códigos de método de asignación (equivalentes a ESTRATEGIA 1/2/3)
+METHOD_NONE = 0
+METHOD_JOIN = 1
+METHOD_PROXIMITY = 2
+METHOD_FORCED = 3
+METHOD_NAMES = {
+    METHOD_JOIN: 'join',
+    METHOD_PROXIMITY: 'proximidad',
+    METHOD_FORCED: 'forzado',
+}
+
+
+class BoundaryLayer:
+    """
+    Capa de límites proyectada con sus índices espaciales
+    """
+
+    def __init__(self, name, gdf, key, attributes=None, buffer=0.0, crs=None,
+                 parent=None, parent_key=None):
+        if key not in gdf.columns:
+            raise KeyError(f"La capa '{name}' no tiene la columna clave '{key}'")
+        if parent is not None and parent_key not in gdf.columns:
+            raise KeyError(f"La capa '{name}' no tiene la columna del padre '{parent_key}'")
+
+        self.name = name
+        self.key = key
+        self.attributes = [a for a in (attributes or []) if a in gdf.columns and a != key]
+        self.buffer = buffer
+
+        crs = crs or projected_crs()
+        proj = gdf.to_crs(crs) if gdf.crs is not None else gdf
+        geoms = np.asarray(proj.geometry.values, dtype=object)
+
+        self.geometries = geoms
+        self.search_geometries = shapely.buffer(geoms, buffer) if buffer else geoms
+        self.centroids = shapely.centroid(geoms)
+        self.keys = proj[key].to_numpy()
+        self.table = proj[[key] + self.attributes].reset_index(drop=True)
+
+        self.tree = shapely.STRtree(self.search_geometries)
+        self.centroid_tree = shapely.STRtree(self.centroids)
+
+        # Jerarquía: cada polígono conoce la clave de su polígono padre
+        self.parent = parent
+        self.parent_key = parent_key
+        self.parent_values = proj[parent_key].to_numpy() if parent is not None else None
+        self._children = {}
+
+    def __len__(self):
+        return len(self.geometries)
+
+    def _candidates(self, parent_value):
+        """
+        Subíndices (miembros, árbol, árbol de centroides) de los hijos de un padre
+        """
+        cached = self._children.get(parent_value)
+        if cached is None:
+            members = np.flatnonzero(self.parent_values == parent_value)
+            if len(members):
+                cached = (
+                    members,
+                    shapely.STRtree(self.search_geometries[members]),
+                    shapely.STRtree(self.centroids[members]),
+                )
+            else:
+                cached = (members, None, None)
+            self._children[parent_value] = cached
+        return cached
+
+    def _match(self, points, result, method, members=None, tree=None, centroid_tree=None):
+        """
+        ESTRATEGIAS 1 y 2 sobre un conjunto de candidatos (todos por defecto)
+        """
+        if tree is None:
+            tree, centroid_tree = self.tree, self.centroid_tree
+        geometries = self.geometries if members is None else self.geometries[members]
+
+        # ESTRATEGIA 1: intersección con polígonos (con buffer) vía índice.
+        # Si un punto cae en varios buffers se elige el polígono más cercano.
+        p_idx, g_idx = tree.query(points, predicate='intersects')
+        if len(p_idx):
+            dist = shapely.distance(points[p_idx], geometries[g_idx])
+            order = np.lexsort((g_idx, dist, p_idx))
+            p_sorted = p_idx[order]
+            first = np.flatnonzero(np.r_[True, p_sorted[1:] != p_sorted[:-1]])
+            local = g_idx[order][first]
+            result[p_sorted[first]] = local if members is None else members[local]
+            method[p_sorted[first]] = METHOD_JOIN
+
+        # ESTRATEGIA 2: centroide más cercano para los restantes
+        valid = ~(shapely.is_missing(points) | shapely.is_empty(points))
+        pending = np.flatnonzero((result < 0) & valid)
+        if len(pending):
+            in_idx, tree_idx = centroid_tree.query_nearest(points[pending], all_matches=False)
+            result[pending[in_idx]] = tree_idx if members is None else members[tree_idx]
+            method[pending[in_idx]] = METHOD_PROXIMITY
+
+    def locate(self, points, parent_values=None):
+        """
+        Resuelve el índice de polígono de cada punto proyectado.
+
+        Si la capa tiene padre y se pasan `parent_values` (la clave del padre
+        ya resuelta para cada punto), cada punto solo se compara contra los
+        hijos de su padre. Retorna (indices, metodos).
+        """
+        n = len(points)
+        result = np.full(n, -1, dtype=np.int64)
+        method = np.full(n, METHOD_NONE, dtype=np.int8)
+        if n == 0 or len(self) == 0:
+            return result, method
+
+        if self.parent is None or parent_values is None:
+            self._match(points, result, method)
+        else:
+            # Un bloque de consultas por padre, no por punto
+            codes, uniques = pd.factorize(parent_values)
+            order = np.argsort(codes, kind='stable')
+            bounds = np.searchsorted(codes[order], np.arange(len(uniques) + 1))
+            orphans = [order[:bounds[0]]]  # puntos sin padre (código -1)
+            for code, parent_value in enumerate(uniques):
+                group = order[bounds[code]:bounds[code + 1]]
+                members, tree, centroid_tree = self._candidates(parent_value)
+                if tree is None:
+                    orphans.append(group)
+                    continue
+                sub_result = np.full(len(group), -1, dtype=np.int64)
+                sub_method = np.full(len(group), METHOD_NONE, dtype=np.int8)
+                self._match(points[group], sub_result, sub_method, members, tree, centroid_tree)
+                result[group] = sub_result
+                method[group] = sub_method
+
+            # Padres sin hijos registrados: búsqueda contra toda la capa
+            orphans = np.concatenate(orphans)
+            if len(orphans):
+                sub_result = np.full(len(orphans), -1, dtype=np.int64)
+                sub_method = np.full(len(orphans), METHOD_NONE, dtype=np.int8)
+                self._match(points[orphans], sub_result, sub_method)
+                result[orphans] = sub_result
+                method[orphans] = sub_method
+
+        # ESTRATEGIA 3: garantizar que ningún punto quede sin asignar
+        forced = result < 0
+        if forced.any():
+            result[forced] = 0
+            method[forced] = METHOD_FORCED
+
+        return result, method
+
+
+class BoundaryRegistry:
+    """
+    Registro de capas de límites para asignación en una sola pasada
+    """
+
+    def __init__(self, crs=None):
+        self.crs = crs or projected_crs()
+        self.layers = {}
+        self.last_stats = {}
+
+    def add_layer(self, name, gdf, key, attributes=None, buffer=0.0, parent=None, parent_key=None):
+        """
+        Registra una capa; se proyecta y se indexa una sola vez.
+
+        `parent` es el nombre de una capa ya registrada que contiene a esta
+        (alcaldía ⊃ distrito ⊃ sección) y `parent_key` la columna de esta capa
+        con la clave del padre; con ellos la asignación poda candidatos.
+        """
+        logger = setup_logging('polioxxo.boundaries')
+        if parent is not None:
+            if parent not in self.layers:
+                raise KeyError(f"La capa padre '{parent}' debe registrarse antes de '{name}'")
+            parent_key = parent_key or self.layers[parent].key
+
+        try:
+            layer = BoundaryLayer(name, gdf, key, attributes, buffer, self.crs, parent, parent_key)
+        except Exception as e:
+            if self.crs == FALLBACK_CRS or self.layers:
+                raise
+            logger.warning(f"Proyección {self.crs} falló ({e}), usando {FALLBACK_CRS}")
+            self.crs = FALLBACK_CRS
+            layer = BoundaryLayer(name, gdf, key, attributes, buffer, self.crs, parent, parent_key)
+
+        self.layers[name] = layer
+        jerarquia = f", dentro de {parent}" if parent else ""
+        logger.info(f"Capa registrada: {name} ({len(layer)} polígonos, buffer {buffer:g} m{jerarquia})")
+        return layer
+
+    def project_points(self, points):
+        """
+        Proyecta un PointStore, GeoDataFrame o GeoSeries de puntos al CRS del registro
+        """
+        if isinstance(points, PointStore):
+            x, y = points.projected_xy(self.crs)
+            return shapely.points(x, y)
+        geoseries = points.geometry if isinstance(points, gpd.GeoDataFrame) else points
+        if geoseries.crs is not None and geoseries.crs != self.crs:
+            geoseries = geoseries.to_crs(self.crs)
+        return np.asarray(geoseries.values, dtype=object)
+
+    def locate(self, points_proj):
+        """
+        Índices de polígono por capa para puntos ya proyectados
+        """
+        located = {}
+        for name, layer in self.layers.items():
+            parent_values = None
+            if layer.parent is not None:
+                parent_layer = self.layers[layer.parent]
+                parent_values = parent_layer.keys[located[layer.parent][0]]
+            located[name] = layer.locate(points_proj, parent_values)
+        return located
+
+    def assign(self, points):
+        """
+        Asigna cada punto a todas las capas registradas.
+
+        Proyecta los puntos una sola vez y hace una pasada de consultas al
+        índice por capa. Retorna una copia de `points` (PointStore o
+        GeoDataFrame, en su CRS original) con las columnas clave y atributos
+        de cada capa.
+        """
+        logger = setup_logging('polioxxo.boundaries')
+        logger.info(f"Asignando {len(points)} puntos a {len(self.layers)} capas: {list(self.layers)}")
+
+        points_proj = self.project_points(points)
+        located = self.locate(points_proj)
+
+        resultado = points.copy()
+        is_store = isinstance(resultado, PointStore)
+        self.last_stats = {}
+        for name, (indices, method) in located.items():
+            layer = self.layers[name]
+            values = layer.table.iloc[indices].reset_index(drop=True)
+            values.index = resultado.index
+            values = values.rename(columns={layer.key: name})
+            for column in values.columns:
+                if is_store:
+                    resultado[column] = values[column].array
+                else:
+                    resultado[column] = values[column]
+
+            counts = np.bincount(method, minlength=len(METHOD_NAMES) + 1)
+            self.last_stats[name] = {METHOD_NAMES[m]: int(counts[m]) for m in METHOD_NAMES}
+            count(f'asignacion.{name}', self.last_stats[name])
+            logger.info(f"[{name}] " + ", ".join(f"{k}: {v}" for k, v in self.last_stats[name].items()))
+            if self.last_stats[name]['forzado']:
+                logger.warning(f"[{name}] {self.last_stats[name]['forzado']} puntos con asignación forzada")
+
+        return resultado
+
+
+def rollup_counts(assigned, levels):
+    """
+    Conteos por cada nivel de la jerarquía a partir de una sola agregación.
+
+    `levels` va de lo más grueso a lo más fino (p. ej. ['alcaldia',
+    'distrito', 'seccion']). Se agrupa una vez por el nivel más fino y los
+    niveles superiores se obtienen sumando esos conteos hacia arriba.
+    Retorna {nivel: Series de conteos indexada por el prefijo de niveles}.
+    """
+    levels = [level for level in levels if level in assigned.columns]
+    if not levels:
+        return {}
+
+    finest = assigned.groupby(levels, observed=True, dropna=False).size()
+    rollups = {levels[-1]: finest}
+    for depth in range(len(levels) - 1, 0, -1):
+        rollups[levels[depth - 1]] = rollups[levels[depth]].groupby(
+            level=list(range(depth)), observed=True, dropna=False
+        ).sum()
+    return rollups
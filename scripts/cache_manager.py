@@ -0,0 +1,289 @@
+#!/usr/bin/env python3
+"""
+Administrador de caché de artefactos - Polioxxo
+
+Este módulo:
+1. Lleva un índice (SQLite) por ciudad de los artefactos de caché con
+   tamaño, último acceso, etapa que los produjo y checksum
+2. Mantiene el total dentro de un presupuesto de disco desalojando primero
+   los artefactos menos usados recientemente (LRU); los usados hace poco
+   nunca se desalojan
+3. Ofrece los comandos stats, prune y verify
+
+Uso:
+    python scripts/cache_manager.py stats
+    python scripts/cache_manager.py prune [--budget-mb N] [--dry-run]
+    python scripts/cache_manager.py verify
+"""
+
+import sys
+import os
+
+# Agregar ruta del proyecto al path de Python
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import argparse
+import hashlib
+import sqlite3
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+from scripts.utils import setup_logging, get_project_paths
+from scripts.profiling import count
+from config import settings
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS artifacts (
+    path TEXT PRIMARY KEY,
+    stage TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    created REAL NOT NULL,
+    last_access REAL NOT NULL,
+    hits INTEGER NOT NULL DEFAULT 0,
+    checksum TEXT
+)
+"""
+
+
+def file_checksum(path, chunk=1 << 20):
+    digest = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(chunk), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class CacheManager:
+    """
+    Índice de artefactos de caché de una ciudad (la activa por omisión) con
+    desalojo LRU por presupuesto de disco
+    """
+
+    def __init__(self, index_path=None, budget_mb=None, min_residency=None, root=None, city=None):
+        paths = get_project_paths(city)
+        self.root = Path(root or paths['base'])
+        self.processed_dir = self.root / paths['data_processed'].relative_to(paths['base'])
+        self.index_path = Path(index_path or self.processed_dir / settings.CACHE_INDEX)
+        self.budget = int((budget_mb if budget_mb is not None else settings.CACHE_BUDGET_MB) * 1024 * 1024)
+        self.min_residency = settings.CACHE_MIN_RESIDENCY_S if min_residency is None else min_residency
+
+    @contextmanager
+    def _connect(self):
+        self.index_path.parent.mkdir(parents=True, exist_ok=True)
+        conn = sqlite3.connect(self.index_path, timeout=30)
+        try:
+            with conn:
+                conn.execute(SCHEMA)
+                yield conn
+        finally:
+            conn.close()
+
+    def _key(self, path):
+        path = Path(path).resolve()
+        try:
+            return str(path.relative_to(self.root.resolve()))
+        except ValueError:
+            return str(path)
+
+    def _path(self, key):
+        path = Path(key)
+        return path if path.is_absolute() else self.root / path
+
+    # --- Registro y accesos ---
+
+    def register(self, path, stage, enforce=True):
+        """Registra (o actualiza) un artefacto recién escrito"""
+        path = Path(path)
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT INTO artifacts (path, stage, size, created, last_access, checksum) "
+                "VALUES (?, ?, ?, ?, ?, ?) ON CONFLICT(path) DO UPDATE SET "
+                "stage=excluded.stage, size=excluded.size, created=excluded.created, "
+                "last_access=excluded.last_access, checksum=excluded.checksum",
+                (self._key(path), stage, path.stat().st_size, now, now, file_checksum(path)),
+            )
+        if enforce:
+            self.enforce_budget()
+
+    def touch(self, path):
+        """Marca un acierto de caché (el artefacto se vuelve el más reciente)"""
+        with self._connect() as conn:
+            conn.execute("UPDATE artifacts SET last_access = ?, hits = hits + 1 WHERE path = ?",
+                         (time.time(), self._key(path)))
+
+    def artifacts(self):
+        """Artefactos del índice (dicts), del menos al más recientemente usado"""
+        with self._connect() as conn:
+            conn.row_factory = sqlite3.Row
+            return [dict(row) for row in conn.execute("SELECT * FROM artifacts ORDER BY last_access")]
+
+    def total_size(self):
+        with self._connect() as conn:
+            return conn.execute("SELECT COALESCE(SUM(size), 0) FROM artifacts").fetchone()[0]
+
+    def _forget(self, conn, keys):
+        conn.executemany("DELETE FROM artifacts WHERE path = ?", [(k,) for k in keys])
+
+    # --- Operaciones ---
+
+    def stats(self):
+        """Resumen por etapa: artefactos, MB, aciertos y horas desde el último acceso"""
+        now = time.time()
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT stage, COUNT(*), SUM(size), SUM(hits), MAX(last_access), MIN(last_access) "
+                "FROM artifacts GROUP BY stage ORDER BY SUM(size) DESC").fetchall()
+        return [{
+            'etapa': stage, 'artefactos': count, 'mb': size / (1024 * 1024), 'aciertos': hits,
+            'horas_sin_uso_min': (now - newest) / 3600, 'horas_sin_uso_max': (now - oldest) / 3600,
+        } for stage, count, size, hits, newest, oldest in rows]
+
+    def prune(self, budget=None, dry_run=False):
+        """
+        Desaloja artefactos del menos al más reciente hasta quedar dentro del
+        presupuesto (bytes). Retorna la lista de rutas desalojadas.
+        """
+        budget = self.budget if budget is None else budget
+        cutoff = time.time() - self.min_residency
+        evicted = []
+        with self._connect() as conn:
+            rows = conn.execute("SELECT path, size, last_access FROM artifacts ORDER BY last_access").fetchall()
+            total = sum(size for _, size, _ in rows)
+            for key, size, last_access in rows:
+                if total <= budget:
+                    break
+                if last_access > cutoff:
+                    # Todo lo que sigue es más reciente: artefactos calientes
+                    break
+                if not dry_run:
+                    self._path(key).unlink(missing_ok=True)
+                evicted.append(key)
+                total -= size
+            if not dry_run:
+                self._forget(conn, evicted)
+        return evicted
+
+    def enforce_budget(self):
+        if self.total_size() > self.budget:
+            evicted = self.prune()
+            if evicted:
+                setup_logging('polioxxo.cache').info(
+                    f"🧹 {len(evicted)} artefactos desalojados para respetar el presupuesto de caché")
+
+    def verify(self, adopt=True):
+        """
+        Comprueba que cada artefacto exista y conserve su checksum; elimina
+        los dañados y olvida los que ya no existen. Con `adopt`, registra
+        los archivos de los directorios de caché que no estén en el índice.
+        """
+        result = {'ok': 0, 'faltantes': [], 'corruptos': [], 'adoptados': []}
+        with self._connect() as conn:
+            rows = conn.execute("SELECT path, size, checksum FROM artifacts").fetchall()
+            known = set()
+            for key, size, checksum in rows:
+                path = self._path(key)
+                known.add(key)
+                if not path.exists():
+                    result['faltantes'].append(key)
+                elif path.stat().st_size != size or file_checksum(path) != checksum:
+                    path.unlink()
+                    result['corruptos'].append(key)
+                else:
+                    result['ok'] += 1
+            self._forget(conn, result['faltantes'] + result['corruptos'])
+
+        if adopt:
+            for stage, (directory, pattern) in settings.CACHE_DIRS.items():
+                for path in sorted((self.processed_dir / directory).glob(pattern)):
+                    if self._key(path) not in known:
+                        self.register(path, stage, enforce=False)
+                        result['adoptados'].append(self._key(path))
+        return result
+
+
+_managers = {}
+
+
+def get_cache_manager():
+    """Administrador de la ciudad activa (uno por ciudad y proceso)"""
+    from config.cities import active_city_key
+    city = active_city_key()
+    if city not in _managers:
+        _managers[city] = CacheManager(city=city)
+    return _managers[city]
+
+
+def cache_stored(path, stage):
+    """Registra un artefacto recién escrito (un fallo de caché); la caché nunca detiene el pipeline"""
+    count(f'cache.{stage}', {'fallos': 1})
+    try:
+        get_cache_manager().register(path, stage)
+    except Exception as e:
+        setup_logging('polioxxo.cache').warning(f"No se pudo registrar {Path(path).name} en el índice de caché: {e}")
+
+
+def cache_hit(path, stage=None):
+    """Registra un acierto de caché"""
+    if stage:
+        count(f'cache.{stage}', {'aciertos': 1})
+    try:
+        get_cache_manager().touch(path)
+    except Exception as e:
+        setup_logging('polioxxo.cache').warning(f"No se pudo actualizar el índice de caché: {e}")
+
+
+def main(argv=None):
+    """Comandos stats, prune y verify"""
+    parser = argparse.ArgumentParser(description='Caché de artefactos de Polioxxo')
+    parser.add_argument('command', choices=['stats', 'prune', 'verify'])
+    parser.add_argument('--budget-mb', type=float, help='Presupuesto de disco (MB)')
+    parser.add_argument('--dry-run', action='store_true', help='Solo mostrar qué se desalojaría')
+    args = parser.parse_args(argv)
+
+    logger = setup_logging('polioxxo.cache')
+    manager = CacheManager(budget_mb=args.budget_mb)
+
+    try:
+        if args.command == 'stats':
+            stats = manager.stats()
+            if not stats:
+                logger.info("La caché está vacía")
+            else:
+                total = sum(row['mb'] for row in stats)
+                logger.info(f"📦 CACHÉ: {total:.1f} MB de {manager.budget / (1024 * 1024):.0f} MB")
+                logger.info(f"  {'etapa':<16}{'artefactos':>11}{'MB':>10}{'aciertos':>10}{'horas sin uso':>16}")
+                for row in stats:
+                    logger.info(f"  {row['etapa']:<16}{row['artefactos']:>11}{row['mb']:>10.2f}{row['aciertos']:>10}"
+                                f"{row['horas_sin_uso_min']:>7.1f} - {row['horas_sin_uso_max']:<6.1f}")
+
+        elif args.command == 'prune':
+            before = manager.total_size()
+            evicted = manager.prune(dry_run=args.dry_run)
+            verb = "Se desalojarían" if args.dry_run else "Desalojados"
+            logger.info(f"🧹 {verb} {len(evicted)} artefactos")
+            for key in evicted:
+                logger.info(f"  - {key}")
+            if not args.dry_run:
+                freed = (before - manager.total_size()) / (1024 * 1024)
+                logger.info(f"💾 Espacio liberado: {freed:.2f} MB")
+
+        elif args.command == 'verify':
+            result = manager.verify()
+            logger.info(f"✅ {result['ok']} artefactos íntegros")
+            for label in ('faltantes', 'corruptos', 'adoptados'):
+                if result[label]:
+                    logger.info(f"  {label}: {len(result[label])}")
+                    for key in result[label]:
+                        logger.info(f"    - {key}")
+        return True
+
+    except Exception as e:
+        logger.error(f"Error en la caché: {e}")
+        return False
+
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+"""
+Catálogo de regiones con identificadores enteros estables - Polioxxo
+
+Este módulo:
+1. Normaliza nombres de regiones (acentos, puntuación, espacios, alias)
+   con memoización
+2. Asigna a cada región un id entero estable por nivel (alcaldía, distrito)
+3. Convierte columnas de nombres a ids o a pandas Categorical cuyos
+   códigos coinciden con los ids, para que los joins se hagan sobre enteros
+"""
+
+import sys
+import os
+
+# Agregar ruta del proyecto al path de Python
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import re
+import unicodedata
+from functools import lru_cache
+
+from config.cities import get_city, active_city_key
+
+# Variantes de nombre que aparecen en las distintas fuentes
+NAME_ALIASES = {
+    'CUAJIMALPA': 'CUAJIMALPA DE MORELOS',
+    'MAGDALENA CONTRERAS': 'LA MAGDALENA CONTRERAS',
+    'GAM': 'GUSTAVO A MADERO',
+}
+
+_PUNCTUATION = re.compile(r"[^\w\s]")
+_SPACES = re.compile(r"\s+")
+
+
+@lru_cache(maxsize=None)
+def normalize_name(name):
+    """
+    Normaliza un nombre de región: sin acentos, sin puntuación, mayúsculas
+    """
+    if name is None:
+        return ''
+    text = unicodedata.normalize('NFKD', str(name))
+    text = ''.join(ch for ch in text if not unicodedata.combining(ch))
+    text = _PUNCTUATION.sub(' ', text.upper())
+    text = _SPACES.sub(' ', text).strip()
+    return NAME_ALIASES.get(text, text)
+
+
+class RegionCatalog:
+    """
+    Mapeo nombre normalizado -> id entero estable para un nivel territorial
+    """
+
+    def __init__(self, level, names=()):
+        self.level = level
+        self._ids = {}
+        self.labels = []
+        for name in names:
+            self.register(name)
+
+    def __len__(self):
+        return len(self.labels)
+
+    def __contains__(self, name):
+        return normalize_name(name) in self._ids
+
+    def register(self, name):
+        """
+        Registra un nombre (si es nuevo) y retorna su id
+        """
+        key = normalize_name(name)
+        region_id = self._ids.get(key)
+        if region_id is None:
+            region_id = len(self.labels)
+            self._ids[key] = region_id
+            self.labels.append(str(name).strip())
+        return region_id
+
+    def id_of(self, name, default=-1):
+        """Id de un nombre, o `default` si no está en el catálogo"""
+        return self._ids.get(normalize_name(name), default)
+
+    def label(self, region_id):
+        """Nombre de despliegue de un id"""
+        return self.labels[region_id]
+
+    def ids(self, names, register=False):
+        """
+        Ids enteros (int32) para una serie de nombres; -1 si no se conocen.
+
+        La normalización se hace una vez por nombre distinto, no por fila.
+        """
+        import numpy as np
+        import pandas as pd
+        names = pd.Series(names)
+        codes, uniques = pd.factorize(names)
+        if register:
+            lookup = np.array([self.register(u) for u in uniques], dtype=np.int32)
+        else:
+            lookup = np.array([self.id_of(u) for u in uniques], dtype=np.int32)
+        result = np.full(len(names), -1, dtype=np.int32)
+        known = codes >= 0
+        result[known] = lookup[codes[known]]
+        return result
+
+    def categorical(self, values):
+        """
+        Categorical con las etiquetas del catálogo; los códigos son los ids.
+
+        Acepta nombres (en cualquier variante) o ids enteros.
+        """
+        import numpy as np
+        import pandas as pd
+        values = pd.Series(values)
+        if pd.api.types.is_integer_dtype(values):
+            codes = values.to_numpy(dtype=np.int32)
+        else:
+            codes = self.ids(values)
+        return pd.Categorical.from_codes(codes, categories=pd.Index(self.labels))
+
+
+def get_catalog(level, city=None):
+    """
+    Catálogo compartido por ciudad y nivel, sembrado en un orden estable (las
+    alcaldías o municipios de la ciudad, config/cities.py)
+    """
+    return _city_catalog(city or active_city_key(), level)
+
+
+@lru_cache(maxsize=None)
+def _city_catalog(city, level):
+    config = get_city(city)
+    if level == 'alcaldia':
+        return RegionCatalog(level, config.regiones)
+    if level == 'distrito' and config.distritos_sinteticos:
+        from scripts.utils import create_electoral_districts
+        return RegionCatalog(level, sorted(create_electoral_districts()))
+    # Sin lista fija: los distritos de la ciudad se registran al leerlos
+    return RegionCatalog(level)
+
+
+def add_region_keys(df, level, column=None, register=False):
+    """
+    Agrega la columna `<level>_id` y convierte `column` a Categorical.
+
+    Retorna el mismo DataFrame modificado.
+    """
+    column = column or level
+    catalog = get_catalog(level)
+    ids = catalog.ids(df[column], register=register)
+    df[f'{level}_id'] = ids
+    df[column] = catalog.categorical(ids)
+    return df
+
+
+def ensure_region_keys(df, level, column=None):
+    """
+    Garantiza `<level>_id` y la columna Categorical tras leer de disco.
+
+    Si el id ya existe (archivos escritos por process_data.py) se reconstruye
+    el Categorical desde los ids; si no, se deriva de los nombres.
+    """
+    column = column or level
+    id_column = f'{level}_id'
+    catalog = get_catalog(level)
+    if id_column in df.columns and df[id_column].fillna(-1).max() < len(catalog):
+        df[id_column] = df[id_column].fillna(-1).astype('int32')
+        df[column] = catalog.categorical(df[id_column])
+    elif column in df.columns:
+        add_region_keys(df, level, column, register=True)
+    return df
@@ -170,7 +170,7 @@ def clean_cache():
     logger = setup_logging('polioxxo.clean')
     paths = get_project_paths()
     
-    project_root = paths['project_root']
+    project_root = paths['base']
     
     try:
         # Limpiar __pycache__
@@ -199,6 +199,23 @@ def clean_cache():
         logger.error(f"Error limpiando cache: {e}")
         return False
 
+def prune_artifacts(budget_mb=None):
+    """Desaloja artefactos de caché (LRU) hasta respetar el presupuesto"""
+    from scripts.cache_manager import CacheManager
+    logger = setup_logging('polioxxo.clean')
+    
+    try:
+        manager = CacheManager(budget_mb=budget_mb)
+        manager.verify()
+        evicted = manager.prune()
+        logger.info(f"✅ {len(evicted)} artefactos de caché desalojados "
+                    f"({manager.total_size() / (1024 * 1024):.1f} MB en caché)")
+        return True
+        
+    except Exception as e:
+        logger.error(f"Error podando artefactos de caché: {e}")
+        return False
+
 def show_disk_usage():
     """Muestra el uso de disco antes y después de la limpieza"""
     logger = setup_logging('polioxxo.clean')
@@ -210,7 +227,7 @@ def show_disk_usage():
         
         # Calcular tamaños por categoría
         for category, path in paths.items():
-            if category == 'project_root':
+            if category in ('base', 'scripts'):
                 continue
             
             if path.exists():
@@ -242,6 +259,9 @@ def main():
     parser.add_argument('--reports', action='store_true', help='Limpiar reportes')
     parser.add_argument('--logs', action='store_true', help='Limpiar logs')
     parser.add_argument('--cache', action='store_true', help='Limpiar cache')
+    parser.add_argument('--artifacts', action='store_true',
+                        help='Podar artefactos de caché por LRU en vez de borrar directorios')
+    parser.add_argument('--budget-mb', type=float, help='Presupuesto de caché para --artifacts (MB)')
     parser.add_argument('--dry-run', action='store_true', help='Solo mostrar qué se limpiaría')
     
     args = parser.parse_args()
@@ -261,6 +281,11 @@ def main():
     success = True
     
     try:
+        if args.artifacts:
+            success &= prune_artifacts(args.budget_mb)
+            show_disk_usage()
+            return success
+        
         # Determinar qué limpiar
         clean_all = args.all or not any([args.raw, args.processed, args.maps, args.reports, args.logs, args.cache])
         
@@ -0,0 +1,498 @@
+#!/usr/bin/env python3
+"""
+Superficie de distancia al Oxxo más cercano y "desiertos" - Polioxxo
+
+Este módulo:
+1. Rasteriza la extensión de CDMX a una resolución configurable
+2. Calcula la distancia de cada celda al Oxxo más cercano (transformada
+   de distancia euclidiana, o KD-tree en lotes para distancias exactas)
+3. Resume la cobertura por alcaldía y por distrito (percentiles)
+4. Marca como desiertos las regiones conexas más allá de un umbral
+5. Guarda la superficie comprimida en caché y la expone como capa de mapa
+"""
+
+import sys
+import os
+
+# Agregar ruta del proyecto al path de Python
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import argparse
+import hashlib
+import json
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import shapely
+from scipy import ndimage
+from scipy.spatial import cKDTree
+
+from scripts.utils import setup_logging, get_project_paths
+from scripts.cache_manager import cache_hit, cache_stored
+from scripts.boundaries import projected_crs
+from scripts.spatial_stats import projected_coordinates
+from config import settings
+
+# Distancia a partir de la cual una celda se considera desierto (metros)
+DESERT_THRESHOLD = 1000
+
+# Área mínima de un desierto (km²)
+MIN_DESERT_AREA_KM2 = 0.25
+
+# Margen alrededor de la ciudad para no perder Oxxos vecinos (metros)
+GRID_PADDING = 2000
+
+COVERAGE_PERCENTILES = (50, 75, 90, 95)
+
+# En caché las distancias se guardan como metros enteros uint16
+CACHE_NODATA = np.iinfo(np.uint16).max
+
+# Bloque de filas por consulta en el método KD-tree
+KDTREE_BLOCK_ROWS = 256
+
+
+class CoverageSurface:
+    """
+    Superficie de distancias en una malla regular proyectada.
+
+    La fila 0 es el borde norte. `labels` guarda, por nivel territorial, el
+    índice de región de cada celda (-1 fuera de la ciudad).
+    """
+
+    def __init__(self, distance, x0, y1, resolution, crs=None, labels=None, regions=None):
+        self.distance = distance
+        self.x0 = float(x0)
+        self.y1 = float(y1)
+        self.resolution = float(resolution)
+        self.crs = crs or projected_crs()
+        self.labels = dict(labels or {})
+        # nivel -> lista de nombres en el orden de los índices de `labels`
+        self.regions = dict(regions or {})
+
+    @property
+    def shape(self):
+        return self.distance.shape
+
+    @property
+    def bounds(self):
+        """(xmin, ymin, xmax, ymax) en el CRS proyectado"""
+        height, width = self.shape
+        return (self.x0, self.y1 - height * self.resolution,
+                self.x0 + width * self.resolution, self.y1)
+
+    def _mercator_grid(self, max_pixels):
+        """
+        Malla regular en Web Mercator (EPSG:3857) que contiene la superficie:
+        (xmin, ymax, paso, ancho, alto). Es la malla que Leaflet estira
+        linealmente entre las esquinas de un ImageOverlay.
+        """
+        from pyproj import Transformer
+        transformer = Transformer.from_crs(self.crs, 'EPSG:3857', always_xy=True)
+        xmin, ymin, xmax, ymax = transformer.transform_bounds(*self.bounds, densify_pts=21)
+        step = max((xmax - xmin) / max_pixels, (ymax - ymin) / max_pixels, self.resolution)
+        width = int(np.ceil((xmax - xmin) / step))
+        height = int(np.ceil((ymax - ymin) / step))
+        return xmin, ymax, step, width, height
+
+    def bounds_latlon(self, max_pixels=2000):
+        """[[lat_min, lon_min], [lat_max, lon_max]] de la malla de mercator_image()"""
+        from pyproj import Transformer
+        xmin, ymax, step, width, height = self._mercator_grid(max_pixels)
+        transformer = Transformer.from_crs('EPSG:3857', 'EPSG:4326', always_xy=True)
+        lon, lat = transformer.transform([xmin, xmin + width * step], [ymax - height * step, ymax])
+        return [[lat[0], lon[0]], [lat[1], lon[1]]]
+
+    def mercator_image(self, values, max_pixels=2000, fill=np.nan):
+        """
+        Remuestrea `values` (con la forma de la malla) a la malla Web
+        Mercator: cada píxel toma la celda que contiene su centro
+        """
+        from pyproj import Transformer
+        xmin, ymax, step, width, height = self._mercator_grid(max_pixels)
+        cols = xmin + (np.arange(width) + 0.5) * step
+        rows = ymax - (np.arange(height) + 0.5) * step
+        xx, yy = np.meshgrid(cols, rows)
+        transformer = Transformer.from_crs('EPSG:3857', self.crs, always_xy=True)
+        x, y = transformer.transform(xx, yy)
+        col = np.floor((x - self.x0) / self.resolution)
+        row = np.floor((self.y1 - y) / self.resolution)
+        valid = (col >= 0) & (col < self.shape[1]) & (row >= 0) & (row < self.shape[0])
+        result = np.full((height, width), fill, dtype=np.result_type(values.dtype, np.asarray(fill).dtype))
+        result[valid] = values[row[valid].astype(np.intp), col[valid].astype(np.intp)]
+        return result
+
+    def save(self, path):
+        """
+        Guarda la superficie como .npz comprimido; las distancias se
+        redondean a metros enteros (uint16), suficiente a escala de celda y
+        varias veces más rápido de comprimir que float32
+        """
+        finite = np.isfinite(self.distance)
+        quantized = np.full(self.shape, CACHE_NODATA, dtype=np.uint16)
+        quantized[finite] = np.minimum(np.round(self.distance[finite]), CACHE_NODATA - 1)
+        meta = {
+            'x0': self.x0, 'y1': self.y1, 'resolution': self.resolution,
+            'crs': str(self.crs), 'regions': self.regions,
+        }
+        arrays = {f'labels_{level}': values for level, values in self.labels.items()}
+        np.savez_compressed(path, distance=quantized, meta=np.array(json.dumps(meta, ensure_ascii=False)),
+                            **arrays)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            meta = json.loads(str(data['meta']))
+            labels = {key[len('labels_'):]: data[key] for key in data.files if key.startswith('labels_')}
+            quantized = data['distance']
+        distance = quantized.astype(np.float32)
+        distance[quantized == CACHE_NODATA] = np.nan
+        return cls(distance, meta['x0'], meta['y1'], meta['resolution'], meta['crs'], labels, meta['regions'])
+
+
+def _grid_extent(regions_proj, resolution, padding=GRID_PADDING):
+    xmin, ymin, xmax, ymax = regions_proj.total_bounds
+    xmin, ymin = xmin - padding, ymin - padding
+    width = int(np.ceil((xmax + padding - xmin) / resolution))
+    height = int(np.ceil((ymax + padding - ymin) / resolution))
+    return xmin, ymin + height * resolution, width, height
+
+
+def rasterize_regions(geometries, x0, y1, resolution, shape):
+    """
+    Índice de región por celda (-1 fuera). Cada polígono solo se evalúa
+    dentro de la ventana de celdas de su bbox, sobre los centros de celda.
+    """
+    height, width = shape
+    labels = np.full(shape, -1, dtype=np.int16)
+    for index, geom in enumerate(geometries):
+        if geom is None or geom.is_empty:
+            continue
+        shapely.prepare(geom)
+        gx0, gy0, gx1, gy1 = geom.bounds
+        c0 = max(int((gx0 - x0) / resolution), 0)
+        c1 = min(int(np.ceil((gx1 - x0) / resolution)), width)
+        r0 = max(int((y1 - gy1) / resolution), 0)
+        r1 = min(int(np.ceil((y1 - gy0) / resolution)), height)
+        if c0 >= c1 or r0 >= r1:
+            continue
+        xs = x0 + (np.arange(c0, c1) + 0.5) * resolution
+        ys = y1 - (np.arange(r0, r1) + 0.5) * resolution
+        inside = shapely.contains_xy(geom, xs[np.newaxis, :], ys[:, np.newaxis])
+        window = labels[r0:r1, c0:c1]
+        window[inside & (window < 0)] = index
+    return labels
+
+
+def distance_edt(coords, x0, y1, resolution, shape):
+    """
+    Distancias por transformada euclidiana: los Oxxos se marcan en su celda
+    y el error máximo es de media diagonal de celda.
+    """
+    height, width = shape
+    cols = np.floor((coords[:, 0] - x0) / resolution).astype(np.int64)
+    rows = np.floor((y1 - coords[:, 1]) / resolution).astype(np.int64)
+    valid = (cols >= 0) & (cols < width) & (rows >= 0) & (rows < height)
+    empty = np.ones(shape, dtype=bool)
+    empty[rows[valid], cols[valid]] = False
+    if empty.all():
+        return np.full(shape, np.inf, dtype=np.float32)
+    return ndimage.distance_transform_edt(empty, sampling=resolution).astype(np.float32)
+
+
+def distance_kdtree(coords, x0, y1, resolution, shape, mask=None, block_rows=KDTREE_BLOCK_ROWS):
+    """
+    Distancias exactas desde el centro de cada celda con consultas en lote
+    al KD-tree (por bloques de filas). Con `mask`, solo se consultan las
+    celdas marcadas; el resto queda en NaN.
+    """
+    height, width = shape
+    tree = cKDTree(coords)
+    distance = np.full(shape, np.nan, dtype=np.float32)
+    xs = x0 + (np.arange(width) + 0.5) * resolution
+    for r0 in range(0, height, block_rows):
+        r1 = min(r0 + block_rows, height)
+        ys = y1 - (np.arange(r0, r1) + 0.5) * resolution
+        X, Y = np.meshgrid(xs, ys)
+        selected = np.ones(X.shape, dtype=bool) if mask is None else mask[r0:r1]
+        if not selected.any():
+            continue
+        dist, _ = tree.query(np.column_stack([X[selected], Y[selected]]), workers=-1)
+        distance[r0:r1][selected] = dist
+    return distance
+
+
+def surface_cache_key(coords, levels, resolution, method):
+    """Hash de puntos, límites, resolución y método"""
+    digest = hashlib.sha1()
+    digest.update(np.ascontiguousarray(coords, dtype=np.float64).tobytes())
+    for level, regions in levels.items():
+        digest.update(level.encode())
+        for wkb in shapely.to_wkb(np.asarray(regions.geometry.values, dtype=object)):
+            digest.update(wkb)
+    digest.update(f'{resolution}|{method}'.encode())
+    return digest.hexdigest()[:16]
+
+
+def default_cache_dir():
+    return get_project_paths()['data_processed'] / 'coverage'
+
+
+def compute_coverage_surface(points, levels, resolution=None, method='edt',
+                             crs=None, cache_dir=None, use_cache=True):
+    """
+    Superficie de distancia al Oxxo más cercano.
+
+    `levels` es un dict nivel -> GeoDataFrame de polígonos con la columna
+    del nivel (p. ej. {'alcaldia': alcaldias, 'distrito': distritos}); el
+    primero define la extensión de la ciudad. `method` es 'edt' (rápido) o
+    'kdtree' (exacto en los centros de celda). `resolution` en metros
+    (por omisión settings.COVERAGE_RESOLUTION_M).
+    """
+    logger = setup_logging('polioxxo.coverage')
+    resolution = settings.COVERAGE_RESOLUTION_M if resolution is None else resolution
+
+    crs = crs or projected_crs()
+    coords = projected_coordinates(points, crs)
+    levels_proj = {
+        level: (gdf.to_crs(crs) if gdf.crs is not None and gdf.crs != crs else gdf)
+        for level, gdf in levels.items()
+    }
+
+    cache_dir = Path(cache_dir or default_cache_dir())
+    key = surface_cache_key(coords, levels_proj, resolution, method)
+    cache_path = cache_dir / f'superficie_{key}.npz'
+    if use_cache and cache_path.exists():
+        logger.info(f"♻️ Superficie de cobertura desde caché: {cache_path.name}")
+        cache_hit(cache_path, 'coverage')
+        return CoverageSurface.load(cache_path)
+
+    city = next(iter(levels_proj.values()))
+    x0, y1, width, height = _grid_extent(city, resolution)
+    shape = (height, width)
+    logger.info(f"Malla de {width}x{height} celdas de {resolution:g} m ({width * height / 1e6:.1f} M celdas)")
+
+    labels, regions = {}, {}
+    for level, gdf in levels_proj.items():
+        labels[level] = rasterize_regions(np.asarray(gdf.geometry.values, dtype=object), x0, y1, resolution, shape)
+        regions[level] = [str(v) for v in gdf[level]]
+
+    if method == 'kdtree':
+        distance = distance_kdtree(coords, x0, y1, resolution, shape, mask=labels[next(iter(labels))] >= 0)
+    else:
+        distance = distance_edt(coords, x0, y1, resolution, shape)
+
+    surface = CoverageSurface(distance, x0, y1, resolution, crs, labels, regions)
+    try:
+        cache_dir.mkdir(parents=True, exist_ok=True)
+        surface.save(cache_path)
+        cache_stored(cache_path, 'coverage')
+        logger.info(f"💾 Superficie guardada en caché: {cache_path}")
+    except Exception as e:
+        logger.warning(f"No se pudo guardar la superficie en caché: {e}")
+    return surface
+
+
+def coverage_by_region(surface, level, percentiles=COVERAGE_PERCENTILES, threshold=DESERT_THRESHOLD):
+    """
+    Percentiles de distancia y porcentaje de área sin cobertura por región
+    """
+    labels = surface.labels[level].ravel()
+    distance = surface.distance.ravel()
+    cell_km2 = surface.resolution ** 2 / 1e6
+
+    inside = np.flatnonzero(labels >= 0)
+    order = inside[np.argsort(labels[inside], kind='stable')]
+    bounds = np.searchsorted(labels[order], np.arange(len(surface.regions[level]) + 1))
+
+    rows = []
+    for index, name in enumerate(surface.regions[level]):
+        values = distance[order[bounds[index]:bounds[index + 1]]]
+        values = values[np.isfinite(values)]
+        if not len(values):
+            continue
+        row = {level: name, 'area_km2': len(values) * cell_km2, 'distancia_media_m': float(values.mean())}
+        for p, v in zip(percentiles, np.percentile(values, percentiles)):
+            row[f'p{p}_m'] = float(v)
+        row['distancia_max_m'] = float(values.max())
+        row['pct_area_desierto'] = float((values > threshold).mean() * 100)
+        rows.append(row)
+    return pd.DataFrame(rows)
+
+
+def find_deserts(surface, threshold=DESERT_THRESHOLD, min_area_km2=MIN_DESERT_AREA_KM2, level='alcaldia'):
+    """
+    Regiones conexas (8-vecindad) dentro de la ciudad con distancia mayor al
+    umbral. Retorna (tabla de desiertos, raster de etiquetas de desierto).
+    """
+    labels = surface.labels[level]
+    mask = (surface.distance > threshold) & (labels >= 0)
+    components, count = ndimage.label(mask, structure=np.ones((3, 3), dtype=bool))
+    if count == 0:
+        return pd.DataFrame(), components
+
+    cell_km2 = surface.resolution ** 2 / 1e6
+    sizes = np.bincount(components.ravel(), minlength=count + 1)
+    keep = np.flatnonzero(sizes * cell_km2 >= min_area_km2)
+    keep = keep[keep > 0]
+    if not len(keep):
+        return pd.DataFrame(), np.zeros_like(components)
+
+    max_distance = ndimage.maximum(surface.distance, components, keep)
+    centers = ndimage.center_of_mass(mask, components, keep)
+
+    # Región dominante de cada desierto con un solo bincount de pares
+    n_regions = len(surface.regions[level])
+    selected = np.isin(components, keep)
+    pairs = components[selected].astype(np.int64) * n_regions + labels[selected]
+    pair_counts = np.bincount(pairs, minlength=(count + 1) * n_regions).reshape(count + 1, n_regions)
+    dominant = pair_counts[keep].argmax(axis=1)
+
+    rows_c = np.array([c[0] for c in centers])
+    cols_c = np.array([c[1] for c in centers])
+    x = surface.x0 + (cols_c + 0.5) * surface.resolution
+    y = surface.y1 - (rows_c + 0.5) * surface.resolution
+    from pyproj import Transformer
+    lon, lat = Transformer.from_crs(surface.crs, 'EPSG:4326', always_xy=True).transform(x, y)
+
+    deserts = pd.DataFrame({
+        'desierto': np.arange(1, len(keep) + 1),
+        level: [surface.regions[level][i] for i in dominant],
+        'area_km2': sizes[keep] * cell_km2,
+        'distancia_max_m': np.asarray(max_distance, dtype=float),
+        'lat': lat,
+        'lon': lon,
+    }).sort_values('area_km2', ascending=False, ignore_index=True)
+
+    relabel = np.zeros(count + 1, dtype=np.int32)
+    relabel[keep] = np.arange(1, len(keep) + 1)
+    return deserts, relabel[components]
+
+
+def coverage_image(surface, max_distance=2 * DESERT_THRESHOLD, max_pixels=2000, cmap='magma_r'):
+    """
+    Imagen RGBA (uint8) de la superficie en la malla Web Mercator de
+    `surface.bounds_latlon(max_pixels)`, transparente fuera de la ciudad
+    """
+    import matplotlib
+    distance = surface.mercator_image(surface.distance, max_pixels)
+    if surface.labels:
+        inside = surface.mercator_image(next(iter(surface.labels.values())), max_pixels, fill=-1) >= 0
+    else:
+        inside = np.isfinite(distance)
+    normalized = np.clip(np.nan_to_num(distance, nan=max_distance) / max_distance, 0, 1)
+    rgba = (matplotlib.colormaps[cmap](normalized) * 255).astype(np.uint8)
+    rgba[..., 3] = np.where(inside, 200, 0)
+    return rgba
+
+
+def add_coverage_overlay(m, surface, name='🏜️ Distancia al Oxxo más cercano', show=False,
+                         max_distance=2 * DESERT_THRESHOLD, opacity=0.7, max_pixels=2000):
+    """
+    Agrega la superficie a un mapa Folium como ImageOverlay, remuestreada a
+    Web Mercator para que cada píxel quede en su posición
+    """
+    import folium
+    overlay = folium.raster_layers.ImageOverlay(
+        image=coverage_image(surface, max_distance, max_pixels),
+        bounds=surface.bounds_latlon(max_pixels),
+        opacity=opacity,
+        name=name,
+        show=show,
+        interactive=False,
+        zindex=1,
+    )
+    overlay.add_to(m)
+    return overlay
+
+
+def load_latest_surface(cache_dir=None):
+    """Superficie más reciente de la caché, o None"""
+    cache_dir = Path(cache_dir or default_cache_dir())
+    candidates = sorted(cache_dir.glob('superficie_*.npz'), key=lambda p: p.stat().st_mtime)
+    return CoverageSurface.load(candidates[-1]) if candidates else None
+
+
+def create_coverage_report(por_alcaldia, por_distrito, deserts, surface, threshold, output_path):
+    """Reporte de texto de cobertura y desiertos"""
+    lines = [
+        "=== COBERTURA: DISTANCIA AL OXXO MÁS CERCANO ===",
+        f"Malla: {surface.shape[1]}x{surface.shape[0]} celdas de {surface.resolution:g} m",
+        f"Umbral de desierto: {threshold:g} m",
+        "",
+        "POR ALCALDÍA (metros):",
+    ]
+    for _, row in por_alcaldia.sort_values('p90_m', ascending=False).iterrows():
+        lines.append(f"- {row['alcaldia']}: mediana {row['p50_m']:.0f}, p90 {row['p90_m']:.0f}, "
+                     f"máx {row['distancia_max_m']:.0f}, {row['pct_area_desierto']:.1f}% desierto")
+    if por_distrito is not None and len(por_distrito):
+        lines += ["", "POR DISTRITO (metros):"]
+        for _, row in por_distrito.sort_values('p90_m', ascending=False).iterrows():
+            lines.append(f"- {row['distrito']}: mediana {row['p50_m']:.0f}, p90 {row['p90_m']:.0f}, "
+                         f"{row['pct_area_desierto']:.1f}% desierto")
+    lines += ["", f"DESIERTOS DE OXXO ({len(deserts)}):"]
+    for _, row in deserts.head(20).iterrows():
+        lines.append(f"- #{row['desierto']} {row['alcaldia']}: {row['area_km2']:.2f} km², "
+                     f"hasta {row['distancia_max_m']:.0f} m ({row['lat']:.4f}, {row['lon']:.4f})")
+    with open(output_path, 'w', encoding='utf-8') as f:
+        f.write("\n".join(lines) + "\n")
+
+
+def main(resolution=None, threshold=DESERT_THRESHOLD, method='edt'):
+    """Etapa de cobertura sobre los datos procesados"""
+    import geopandas as gpd
+    from scripts.catalog import ensure_region_keys
+
+    logger = setup_logging('polioxxo.coverage')
+    paths = get_project_paths()
+
+    logger.info("🏜️ CALCULANDO COBERTURA Y DESIERTOS DE OXXO")
+    logger.info("=" * 50)
+
+    try:
+        alcaldias_path = paths['data_processed'] / 'datos_combinados.gpkg'
+        oxxos_path = paths['data_processed'] / 'oxxos_con_alcaldia.gpkg'
+        if not alcaldias_path.exists() or not oxxos_path.exists():
+            logger.error("Datos procesados no encontrados. Ejecuta process_data.py primero")
+            return False
+
+        alcaldias = gpd.read_file(alcaldias_path)
+        ensure_region_keys(alcaldias, 'alcaldia')
+        oxxos = gpd.read_file(oxxos_path)
+        levels = {'alcaldia': alcaldias}
+
+        districts_path = paths['data_processed'] / 'distritos_electorales.gpkg'
+        if districts_path.exists():
+            districts = gpd.read_file(districts_path)
+            ensure_region_keys(districts, 'distrito')
+            levels['distrito'] = districts
+
+        surface = compute_coverage_surface(oxxos, levels, resolution, method)
+
+        por_alcaldia = coverage_by_region(surface, 'alcaldia', threshold=threshold)
+        por_distrito = coverage_by_region(surface, 'distrito', threshold=threshold) if 'distrito' in levels else None
+        deserts, _ = find_deserts(surface, threshold)
+
+        por_alcaldia.to_csv(paths['reports'] / 'cobertura_alcaldias.csv', index=False)
+        if por_distrito is not None:
+            por_distrito.to_csv(paths['reports'] / 'cobertura_distritos.csv', index=False)
+        deserts.to_csv(paths['reports'] / 'desiertos_oxxo.csv', index=False)
+        create_coverage_report(por_alcaldia, por_distrito, deserts, surface, threshold,
+                               paths['reports'] / 'reporte_cobertura.txt')
+
+        logger.info(f"✅ Cobertura calculada: {len(deserts)} desiertos de más de {threshold:g} m")
+        return True
+
+    except Exception as e:
+        logger.error(f"Error calculando cobertura: {e}")
+        return False
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Superficie de cobertura y desiertos de Oxxo')
+    parser.add_argument('--resolucion', type=float, metavar='M',
+                        help='Tamaño de celda en metros (por omisión POLIOXXO_COVERAGE_RESOLUTION_M)')
+    parser.add_argument('--metodo', choices=['edt', 'kdtree'], default='edt')
+    args = parser.parse_args()
+    success = main(args.resolucion, method=args.metodo)
+    sys.exit(0 if success else 1)
@@ -23,10 +23,17 @@ import json
 import logging
 
 from scripts.utils import setup_logging, get_project_paths, load_geodataframe
+from scripts.scope import read_layer, scoped_path
+from scripts.publish import published_dir
+from scripts.cube import cube_for
+from scripts.profiling import profiled
+from config.cities import get_city
 
-def create_district_electoral_map():
+@profiled('map.distritos', rows=None)
+def create_district_electoral_map(oxxos=None, districts=None, scope=None):
     """
-    Crea mapa interactivo de distritos electorales con Oxxos
+    Crea mapa interactivo de distritos electorales con Oxxos (lee los GPKG
+    procesados, dentro de `scope`, si no recibe los GeoDataFrames)
     """
     logger = setup_logging('polioxxo.district_map')
     paths = get_project_paths()
@@ -35,29 +42,34 @@ def create_district_electoral_map():
     
     try:
         # Cargar datos
-        oxxos_path = paths['data_processed'] / 'oxxos_con_distrito.gpkg'
-        districts_path = paths['data_processed'] / 'distritos_electorales.gpkg'
-        
-        if not oxxos_path.exists() or not districts_path.exists():
-            logger.error("Datos de distritos no encontrados. Ejecuta primero analyze_districts.py")
-            return False
-        
-        oxxos = gpd.read_file(oxxos_path)
-        districts = gpd.read_file(districts_path)
+        if oxxos is None or districts is None:
+            # Versión publicada fija: ambas capas salen de la misma versión
+            processed_dir = published_dir()
+            oxxos_path = processed_dir / 'oxxos_con_distrito.gpkg'
+            districts_path = processed_dir / 'distritos_electorales.gpkg'
+            
+            if not oxxos_path.exists() or not districts_path.exists():
+                logger.error("Datos de distritos no encontrados. Ejecuta primero analyze_districts.py")
+                return False
+            
+            oxxos = read_layer(oxxos_path, scope)
+            districts = read_layer(districts_path, scope)
         
         logger.info(f"Cargados {len(oxxos)} Oxxos y {len(districts)} distritos")
         
+        # Conteos de la leyenda: cubo de agregados de la corrida (o de estas capas)
+        cube = cube_for(oxxos, districts=districts, scope=scope)
+        
         # Convertir a WGS84 para Folium
         oxxos = oxxos.to_crs('EPSG:4326')
         districts = districts.to_crs('EPSG:4326')
         
-        # Crear mapa base centrado en CDMX
-        center_lat = 19.4326
-        center_lon = -99.1332
+        # Crear mapa base centrado en la ciudad activa
+        center_lat, center_lon = get_city().centro
         
         m = folium.Map(
             location=[center_lat, center_lon],
-            zoom_start=10,
+            zoom_start=get_city().zoom,
             tiles=None,
             width='100%',
             height='100%'
@@ -190,14 +202,14 @@ def create_district_electoral_map():
                     top: 10px; right: 10px; width: 200px; height: auto; 
                     background-color: white; border:2px solid grey; z-index:9999; 
                     font-size:14px; padding: 10px">
-        <h4>🗳️ Distritos Electorales CDMX</h4>
+        <h4>🗳️ Distritos Electorales ''' + get_city().nombre + '''</h4>
         <hr>
         '''
         
         for party, color in party_colors.items():
             if party != 'Sin datos':
-                count_districts = len(districts[districts['diputado_ganador'] == party])
-                count_oxxos = len(oxxos[oxxos['diputado_ganador'] == party]) if 'diputado_ganador' in oxxos.columns else 0
+                count_districts = cube.units('partido_distrito', party)
+                count_oxxos = cube.value(partido_distrito=party)
                 legend_html += f'''
                 <p><span style="color:{color}; font-size: 20px;">●</span> {party} 
                 <br><small>{count_districts} distritos, {count_oxxos} Oxxos</small></p>
@@ -225,7 +237,10 @@ def create_district_electoral_map():
         plugins.MeasureControl().add_to(m)
         
         # Guardar mapa
-        output_path = paths['maps'] / 'mapa_distritos_electorales_cdmx.html'
+        if scope is not None and len(districts):
+            minx, miny, maxx, maxy = districts.total_bounds
+            m.fit_bounds([[miny, minx], [maxy, maxx]])
+        output_path = scoped_path(paths['maps'] / f'mapa_distritos_electorales_{get_city().clave}.html', scope)
         m.save(str(output_path))
         
         logger.info(f"✅ Mapa de distritos guardado: {output_path}")
@@ -237,7 +252,8 @@ def create_district_electoral_map():
         traceback.print_exc()
         return False
 
-def create_comparison_map():
+@profiled('map.comparacion', rows=None)
+def create_comparison_map(alcaldias=None, districts=None, scope=None):
     """
     Crea mapa comparativo entre alcaldías y distritos
     """
@@ -248,15 +264,17 @@ def create_comparison_map():
     
     try:
         # Cargar datos
-        alcaldias_path = paths['data_processed'] / 'datos_combinados.gpkg'
-        districts_path = paths['data_processed'] / 'distritos_electorales.gpkg'
-        
-        if not alcaldias_path.exists() or not districts_path.exists():
-            logger.error("Datos no encontrados")
-            return False
-        
-        alcaldias = gpd.read_file(alcaldias_path)
-        districts = gpd.read_file(districts_path)
+        if alcaldias is None or districts is None:
+            processed_dir = published_dir()
+            alcaldias_path = processed_dir / 'datos_combinados.gpkg'
+            districts_path = processed_dir / 'distritos_electorales.gpkg'
+            
+            if not alcaldias_path.exists() or not districts_path.exists():
+                logger.error("Datos no encontrados")
+                return False
+            
+            alcaldias = read_layer(alcaldias_path, scope)
+            districts = read_layer(districts_path, scope)
         
         # Convertir a WGS84
         alcaldias = alcaldias.to_crs('EPSG:4326')
@@ -264,8 +282,8 @@ def create_comparison_map():
         
         # Crear mapa dual
         m = folium.Map(
-            location=[19.4326, -99.1332],
-            zoom_start=10,
+            location=list(get_city().centro),
+            zoom_start=get_city().zoom,
             tiles='CartoDB Positron'
         )
         
@@ -331,7 +349,10 @@ def create_comparison_map():
         m.get_root().html.add_child(folium.Element(legend_html))
         
         # Guardar
-        output_path = paths['maps'] / 'mapa_comparativo_alcaldias_distritos.html'
+        if scope is not None and len(alcaldias):
+            minx, miny, maxx, maxy = alcaldias.total_bounds
+            m.fit_bounds([[miny, minx], [maxy, maxx]])
+        output_path = scoped_path(paths['maps'] / 'mapa_comparativo_alcaldias_distritos.html', scope)
         m.save(str(output_path))
         
         logger.info(f"✅ Mapa comparativo guardado: {output_path}")
@@ -341,8 +362,8 @@ def create_comparison_map():
         logger.error(f"Error creando mapa comparativo: {e}")
         return False
 
-def main():
-    """Función principal"""
+def main(alcaldias=None, oxxos=None, districts=None, scope=None):
+    """Función principal; acepta los GeoDataFrames en memoria (pipeline.py)"""
     logger = setup_logging('polioxxo.district_map')
     
     logger.info("🗺️ INICIANDO CREACIÓN DE MAPAS DE DISTRITOS")
@@ -351,13 +372,13 @@ def main():
     try:
         # Crear mapa principal de distritos
         logger.info("Creando mapa principal de distritos...")
-        if not create_district_electoral_map():
+        if not create_district_electoral_map(oxxos, districts, scope):
             logger.error("Error en mapa de distritos")
             return False
         
         # Crear mapa comparativo
         logger.info("Creando mapa comparativo...")
-        if not create_comparison_map():
+        if not create_comparison_map(alcaldias, districts, scope):
             logger.error("Error en mapa comparativo")
             return False
         
@@ -365,7 +386,7 @@ def main():
         logger.info("=" * 50)
         logger.info("🎉 MAPAS DE DISTRITOS COMPLETADOS")
         logger.info(f"📁 Mapas guardados en: {paths['maps']}")
-        logger.info("- mapa_distritos_electorales_cdmx.html")
+        logger.info(f"- mapa_distritos_electorales_{get_city().clave}.html")
         logger.info("- mapa_comparativo_alcaldias_distritos.html")
         
         return True
@@ -375,5 +396,7 @@ def main():
         return False
 
 if __name__ == "__main__":
+    from scripts.profiling import consume_profile_args
+    consume_profile_args(run='maps')
     success = main()
     sys.exit(0 if success else 1)
@@ -3,38 +3,50 @@
 Script para crear mapa interactivo de Oxxos en CDMX
 """
 
+import sys
+import os
+
+# Agregar ruta del proyecto al path de Python
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
 import geopandas as gpd
 import folium
 from folium import plugins
 import pandas as pd
 from pathlib import Path
-import logging
+
+from scripts.utils import get_project_paths, setup_logging as utils_setup_logging
+from scripts.scope import read_layer, scoped_path
+from scripts.publish import published_dir
+from scripts.profiling import profiled
+from config.cities import get_city
 
 def setup_logging():
     """Configura logging"""
-    logging.basicConfig(
-        level=logging.INFO,
-        format='%(asctime)s - %(levelname)s - %(message)s'
-    )
-    return logging.getLogger('mapa_oxxos')
+    return utils_setup_logging('mapa_oxxos')
 
-def main():
-    """Función principal para crear el mapa"""
+@profiled('map.alcaldias', rows=None)
+def main(datos_combinados=None, oxxos_data=None, scope=None):
+    """
+    Función principal para crear el mapa; sin argumentos lee los GPKG
+    procesados, o recibe los GeoDataFrames en memoria (pipeline.py). Con
+    `scope` solo lee la caja o región y el mapa se guarda con sufijo.
+    """
     logger = setup_logging()
     logger.info("Iniciando creación del mapa...")
     
     try:
         # Directorios
-        base_dir = Path(__file__).parent.parent
-        processed_dir = base_dir / "data" / "processed"
-        output_dir = base_dir / "maps"
-        output_dir.mkdir(exist_ok=True)
+        paths = get_project_paths()
+        processed_dir = published_dir()
+        output_dir = paths['maps']
+        output_dir.mkdir(parents=True, exist_ok=True)
         
         # Cargar datos
-        logger.info("Cargando datos...")
-        
-        datos_combinados = gpd.read_file(processed_dir / "datos_combinados.gpkg")
-        oxxos_data = gpd.read_file(processed_dir / "oxxos_con_alcaldia.gpkg")
+        if datos_combinados is None or oxxos_data is None:
+            logger.info("Cargando datos...")
+            datos_combinados = read_layer(processed_dir / "datos_combinados.gpkg", scope)
+            oxxos_data = read_layer(processed_dir / "oxxos_con_alcaldia.gpkg", scope)
         
         logger.info(f"Datos cargados: {len(datos_combinados)} alcaldías, {len(oxxos_data)} Oxxos")
         
@@ -44,14 +56,13 @@ def main():
         if oxxos_data.crs != "EPSG:4326":
             oxxos_data = oxxos_data.to_crs("EPSG:4326")
         
-        # Centro del mapa (CDMX)
-        center_lat = 19.4326
-        center_lon = -99.1332
+        # Centro del mapa (ciudad activa)
+        center_lat, center_lon = get_city().centro
         
         # Crear mapa
         mapa = folium.Map(
             location=[center_lat, center_lon],
-            zoom_start=10,
+            zoom_start=get_city().zoom,
             tiles='OpenStreetMap'
         )
         
@@ -125,7 +136,7 @@ def main():
         <div style="position: fixed; top: 10px; left: 50px; width: 200px; 
                     background-color: white; border:2px solid grey; z-index:9999; 
                     font-size:14px; padding: 10px">
-        <h4>Mapa Oxxos CDMX</h4>
+        <h4>Mapa Oxxos {get_city().nombre}</h4>
         <p><b>{len(oxxos_data):,} Oxxos</b> en <b>{len(datos_combinados)} alcaldías</b></p>
         <hr>
         <p><span style="color:#8B4513">⬛</span> MORENA</p>
@@ -136,7 +147,10 @@ def main():
         mapa.get_root().html.add_child(folium.Element(leyenda_html))
         
         # Guardar mapa
-        mapa_path = output_dir / "mapa_oxxos_cdmx.html"
+        if scope is not None and len(datos_combinados):
+            minx, miny, maxx, maxy = datos_combinados.total_bounds
+            mapa.fit_bounds([[miny, minx], [maxy, maxx]])
+        mapa_path = scoped_path(output_dir / f"mapa_oxxos_{get_city().clave}.html", scope)
         mapa.save(str(mapa_path))
         
         logger.info(f"✅ Mapa guardado en: {mapa_path}")
@@ -157,4 +171,6 @@ def main():
         return None
 
 if __name__ == "__main__":
+    from scripts.profiling import consume_profile_args
+    consume_profile_args(run='maps')
     main()
@@ -23,10 +23,22 @@ import json
 import logging
 
 from scripts.utils import setup_logging, get_project_paths, load_geodataframe
+from scripts.catalog import ensure_region_keys
+from scripts.scope import read_layer, scoped_path
+from scripts.publish import published_dir
+from scripts.cube import cube_for
+from scripts.profiling import profiled
+from config.cities import get_city
+from scripts.coverage import compute_coverage_surface, add_coverage_overlay
 
-def create_unified_map():
+@profiled('map.unificado', rows=None)
+def create_unified_map(alcaldias=None, oxxos_alcaldia=None, districts=None, oxxos_distrito=None,
+                       scope=None):
     """
-    Crea mapa unificado con alcaldías y distritos electorales
+    Crea mapa unificado con alcaldías y distritos electorales. Sin
+    argumentos lee los cuatro GPKG procesados (dentro de `scope`);
+    pipeline.py pasa los GeoDataFrames en memoria (un solo frame de Oxxos
+    sirve para ambos)
     """
     logger = setup_logging('polioxxo.unified_map')
     paths = get_project_paths()
@@ -35,47 +47,60 @@ def create_unified_map():
     
     try:
         # Cargar todos los datos necesarios
-        logger.info("Cargando datos...")
-        
-        # Datos de alcaldías
-        alcaldias_path = paths['data_processed'] / 'datos_combinados.gpkg'
-        oxxos_alcaldia_path = paths['data_processed'] / 'oxxos_con_alcaldia.gpkg'
-        
-        # Datos de distritos
-        districts_path = paths['data_processed'] / 'distritos_electorales.gpkg'
-        oxxos_distrito_path = paths['data_processed'] / 'oxxos_con_distrito.gpkg'
-        
-        # Verificar que existan todos los archivos
-        required_files = [alcaldias_path, oxxos_alcaldia_path, districts_path, oxxos_distrito_path]
-        missing_files = [f for f in required_files if not f.exists()]
-        
-        if missing_files:
-            logger.error(f"Archivos faltantes: {missing_files}")
-            logger.info("Ejecuta primero: python scripts/analyze_districts.py")
-            return False
-        
-        # Cargar datos
-        alcaldias = gpd.read_file(alcaldias_path)
-        oxxos_alcaldia = gpd.read_file(oxxos_alcaldia_path)
-        districts = gpd.read_file(districts_path)
-        oxxos_distrito = gpd.read_file(oxxos_distrito_path)
+        if any(frame is None for frame in (alcaldias, oxxos_alcaldia, districts, oxxos_distrito)):
+            logger.info("Cargando datos...")
+            
+            # Versión publicada fija: las cuatro capas salen de la misma versión
+            processed_dir = published_dir()
+            
+            # Datos de alcaldías
+            alcaldias_path = processed_dir / 'datos_combinados.gpkg'
+            oxxos_alcaldia_path = processed_dir / 'oxxos_con_alcaldia.gpkg'
+            
+            # Datos de distritos
+            districts_path = processed_dir / 'distritos_electorales.gpkg'
+            oxxos_distrito_path = processed_dir / 'oxxos_con_distrito.gpkg'
+            
+            # Verificar que existan todos los archivos
+            required_files = [alcaldias_path, oxxos_alcaldia_path, districts_path, oxxos_distrito_path]
+            missing_files = [f for f in required_files if not f.exists()]
+            
+            if missing_files:
+                logger.error(f"Archivos faltantes: {missing_files}")
+                logger.info("Ejecuta primero: python scripts/analyze_districts.py")
+                return False
+            
+            # Cargar datos
+            alcaldias = read_layer(alcaldias_path, scope)
+            oxxos_alcaldia = read_layer(oxxos_alcaldia_path, scope)
+            districts = read_layer(districts_path, scope)
+            oxxos_distrito = read_layer(oxxos_distrito_path, scope)
         
         logger.info(f"Cargados: {len(alcaldias)} alcaldías, {len(districts)} distritos")
         logger.info(f"Oxxos: {len(oxxos_alcaldia)} con alcaldía, {len(oxxos_distrito)} con distrito")
         
+        # Claves enteras para los cruces Oxxo -> región
+        ensure_region_keys(alcaldias, 'alcaldia')
+        ensure_region_keys(oxxos_alcaldia, 'alcaldia')
+        ensure_region_keys(districts, 'distrito')
+        if 'distrito' in oxxos_distrito.columns:
+            ensure_region_keys(oxxos_distrito, 'distrito')
+        
+        # Conteos de la leyenda: cubo de agregados de la corrida (o de estas capas)
+        cube = cube_for(oxxos_alcaldia, alcaldias, districts, scope)
+        
         # Convertir todo a WGS84 para Folium
         alcaldias = alcaldias.to_crs('EPSG:4326')
         oxxos_alcaldia = oxxos_alcaldia.to_crs('EPSG:4326')
         districts = districts.to_crs('EPSG:4326')
         oxxos_distrito = oxxos_distrito.to_crs('EPSG:4326')
         
-        # Crear mapa base centrado en CDMX
-        center_lat = 19.4326
-        center_lon = -99.1332
+        # Crear mapa base centrado en la ciudad activa
+        center_lat, center_lon = get_city().centro
         
         m = folium.Map(
             location=[center_lat, center_lon],
-            zoom_start=10,
+            zoom_start=get_city().zoom,
             tiles=None,
             width='100%',
             height='100%'
@@ -146,6 +171,10 @@ def create_unified_map():
         logger.info("Agregando capa de distritos...")
         
         districts_group = folium.FeatureGroup(name='📊 Distritos Electorales', show=False)
+        oxxos_por_distrito = (
+            oxxos_distrito['distrito_id'].value_counts()
+            if 'distrito_id' in oxxos_distrito.columns else pd.Series(dtype=int)
+        )
         
         for _, district in districts.iterrows():
             if pd.isna(district.geometry):
@@ -154,7 +183,7 @@ def create_unified_map():
             color = party_colors.get(district.get('diputado_ganador', 'Sin datos'), '#808080')
             
             # Contar Oxxos en este distrito
-            oxxos_en_distrito = len(oxxos_distrito[oxxos_distrito['distrito'] == district['distrito']]) if 'distrito' in oxxos_distrito.columns else 0
+            oxxos_en_distrito = int(oxxos_por_distrito.get(district['distrito_id'], 0))
             
             # Popup de distrito
             votos_distrito = district.get('votos_distrito', 0)
@@ -197,6 +226,8 @@ def create_unified_map():
         # === SECCIÓN 3: OXXOS POR ALCALDÍAS ===
         logger.info("Agregando Oxxos por alcaldías...")
         
+        party_by_alcaldia = dict(zip(alcaldias['alcaldia_id'], alcaldias['partido_ganador']))
+        
         oxxos_alcaldia_clusters = {}
         for party in party_colors.keys():
             if party != 'Sin datos':
@@ -218,8 +249,7 @@ def create_unified_map():
             
             # Obtener partido de la alcaldía
             alcaldia_name = oxxo.get('alcaldia', 'Sin alcaldía')
-            alcaldia_info = alcaldias[alcaldias['alcaldia'] == alcaldia_name]
-            party = alcaldia_info['partido_ganador'].iloc[0] if len(alcaldia_info) > 0 else 'Sin datos'
+            party = party_by_alcaldia.get(oxxo.get('alcaldia_id', -1), 'Sin datos')
             
             color = party_colors.get(party, '#808080')
             
@@ -257,6 +287,8 @@ def create_unified_map():
         # === SECCIÓN 4: OXXOS POR DISTRITOS ===
         logger.info("Agregando Oxxos por distritos...")
         
+        party_by_district = dict(zip(districts['distrito_id'], districts['diputado_ganador']))
+        
         oxxos_district_clusters = {}
         for party in party_colors.keys():
             if party != 'Sin datos':
@@ -278,8 +310,7 @@ def create_unified_map():
             
             # Obtener partido del distrito
             distrito_name = oxxo.get('distrito', 'Sin distrito')
-            district_info = districts[districts['distrito'] == distrito_name]
-            party = district_info['diputado_ganador'].iloc[0] if len(district_info) > 0 else 'Sin datos'
+            party = party_by_district.get(oxxo.get('distrito_id', -1), 'Sin datos')
             
             color = party_colors.get(party, '#808080')
             
@@ -320,7 +351,7 @@ def create_unified_map():
                     top: 10px; right: 10px; width: 300px; height: auto; 
                     background-color: white; border:2px solid grey; z-index:9999; 
                     font-size:12px; padding: 15px; border-radius: 5px;">
-        <h3 style="margin-top: 0;">🗺️ Mapa Unificado CDMX</h3>
+        <h3 style="margin-top: 0;">🗺️ Mapa Unificado ''' + get_city().nombre + '''</h3>
         <hr>
         
         <h4>🎨 Partidos Políticos:</h4>
@@ -328,8 +359,8 @@ def create_unified_map():
         
         for party, color in party_colors.items():
             if party != 'Sin datos':
-                count_alcaldias = len(alcaldias[alcaldias['partido_ganador'] == party])
-                count_districts = len(districts[districts['diputado_ganador'] == party])
+                count_alcaldias = cube.units('partido', party)
+                count_districts = cube.units('partido_distrito', party)
                 legend_html += f'''
                 <p style="margin: 5px 0;"><span style="color:{color}; font-size: 16px;">●</span> <b>{party}</b><br>
                 <small style="margin-left: 20px;">Alcaldías: {count_alcaldias} | Distritos: {count_districts}</small></p>
@@ -349,6 +380,13 @@ def create_unified_map():
         
         m.get_root().html.add_child(folium.Element(legend_html))
         
+        # === SUPERFICIE DE COBERTURA (caché de coverage.py) ===
+        try:
+            surface = compute_coverage_surface(oxxos_alcaldia, {'alcaldia': alcaldias, 'distrito': districts})
+            add_coverage_overlay(m, surface)
+        except Exception as e:
+            logger.warning(f"No se agregó la capa de cobertura: {e}")
+        
         # === CONTROLES ADICIONALES ===
         
         # Control de capas expandido
@@ -426,7 +464,10 @@ def create_unified_map():
         m.get_root().html.add_child(folium.Element(toggle_script))
         
         # Guardar mapa
-        output_path = paths['maps'] / 'mapa_unificado_cdmx.html'
+        if scope is not None and len(alcaldias):
+            minx, miny, maxx, maxy = alcaldias.total_bounds
+            m.fit_bounds([[miny, minx], [maxy, maxx]])
+        output_path = scoped_path(paths['maps'] / f'mapa_unificado_{get_city().clave}.html', scope)
         m.save(str(output_path))
         
         logger.info(f"✅ Mapa unificado guardado: {output_path}")
@@ -445,22 +486,22 @@ def create_unified_map():
         traceback.print_exc()
         return False
 
-def main():
-    """Función principal"""
+def main(alcaldias=None, oxxos=None, districts=None, scope=None):
+    """Función principal; acepta los GeoDataFrames en memoria (pipeline.py)"""
     logger = setup_logging('polioxxo.unified_map')
     
     logger.info("🗺️ INICIANDO CREACIÓN DE MAPA UNIFICADO")
     logger.info("=" * 50)
     
     try:
-        if not create_unified_map():
+        if not create_unified_map(alcaldias, oxxos, districts, oxxos, scope):
             logger.error("Error en la creación del mapa unificado")
             return False
         
         paths = get_project_paths()
         logger.info("=" * 50)
         logger.info("🎉 MAPA UNIFICADO COMPLETADO")
-        logger.info(f"📁 Mapa guardado en: {paths['maps']}/mapa_unificado_cdmx.html")
+        logger.info(f"📁 Mapa guardado en: {scoped_path(paths['maps'] / f'mapa_unificado_{get_city().clave}.html', scope)}")
         logger.info("🚀 Abre el archivo HTML para ver el mapa interactivo!")
         
         return True
@@ -470,5 +511,7 @@ def main():
         return False
 
 if __name__ == "__main__":
+    from scripts.profiling import consume_profile_args
+    consume_profile_args(run='maps')
     success = main()
     sys.exit(0 if success else 1)
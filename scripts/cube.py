@@ -0,0 +1,542 @@
+#!/usr/bin/env python3
+"""
+Cubo de agregados materializado - Polioxxo
+
+Este módulo:
+1. Agrega los Oxxos una sola vez por corrida sobre las dimensiones
+   alcaldía, distrito, sección, marca y celda de la malla (cuboide base:
+   una fila por combinación presente, con sus conteos)
+2. Agrega dimensiones derivadas de los atributos de las regiones: el
+   partido que ganó la alcaldía y el del distrito
+3. Materializa como arreglos densos todos los agregados de una y dos
+   dimensiones (p. ej. Oxxos por partido, por alcaldía y distrito), de modo
+   que un corte o un rollup es una lectura por índice y no un groupby sobre
+   los puntos
+4. Persiste el cubo en data/processed/cube/ (.npy con mapeo a memoria y un
+   manifest.json) y lo lee sin pandas, para el servicio de consultas
+
+En cada arreglo denso la última posición de cada eje acumula los puntos sin
+valor en esa dimensión (código -1), así que `arreglo[-1]` son los no
+asignados y la suma del eje completo es el total.
+
+Uso:
+    python scripts/cube.py [dimension [dimension2]] [--medida num_oxxos]
+"""
+
+import sys
+import os
+
+# Agregar ruta del proyecto al path de Python
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import argparse
+import itertools
+import json
+import shutil
+from pathlib import Path
+
+import numpy as np
+
+from scripts.utils import setup_logging, get_project_paths
+from scripts.publish import replace_directory, resolve_pointer
+from scripts.profiling import profiled
+from config import settings
+
+CUBE_FORMAT_VERSION = 1
+MANIFEST_NAME = 'manifest.json'
+
+# (dimensión, columna de los puntos, catálogo de regiones o None)
+POINT_DIMENSIONS = [
+    ('alcaldia', 'alcaldia_id', 'alcaldia'),
+    ('distrito', 'distrito_id', 'distrito'),
+    ('seccion', 'seccion', None),
+    ('marca', 'brand', None),
+]
+CELL_DIMENSION = 'celda'
+
+# Dimensión derivada -> (dimensión de región, atributo de la región)
+DERIVED_DIMENSIONS = {
+    'partido': ('alcaldia', 'partido_ganador'),
+    'partido_distrito': ('distrito', 'diputado_ganador'),
+}
+
+# Atributos de región que guarda el cubo (partido ganador, votos, ...)
+REGION_ATTRIBUTES = {
+    'alcaldia': ['alcaldia', 'partido_ganador', 'votos_totales'],
+    'distrito': ['distrito', 'diputado_ganador', 'votos_distrito', 'participacion'],
+}
+
+# Medida -> columna de los puntos que debe estar presente (None = cada punto)
+MEASURES = {
+    'num_oxxos': None,
+    'num_direcciones': 'direccion',
+}
+
+
+def default_cube_dir():
+    return get_project_paths()['data_processed'] / 'cube'
+
+
+def _values(points, column):
+    values = points[column]
+    return values.to_numpy() if hasattr(values, 'to_numpy') else np.asarray(values)
+
+
+def _present(values):
+    import pandas as pd
+    present = pd.notna(values)
+    if values.dtype == object:
+        present &= np.array([not (isinstance(v, str) and not v.strip()) for v in values], dtype=bool)
+    return present
+
+
+def _factorize(values):
+    """Códigos int32 (-1 sin valor) y etiquetas ordenadas"""
+    import pandas as pd
+    codes, uniques = pd.factorize(pd.Series(values).where(_present(values)), sort=True)
+    return codes.astype(np.int32), [str(u) for u in uniques]
+
+
+def _region_codes(points, column, level):
+    """Ids de catálogo desde la columna de ids o, si falta, desde los nombres"""
+    from scripts.catalog import get_catalog
+    catalog = get_catalog(level)
+    if column in points:
+        codes = np.asarray(_values(points, column), dtype=np.float64)
+        return np.where(np.isnan(codes), -1, codes).astype(np.int32), catalog
+    if level in points:
+        return catalog.ids(_values(points, level), register=True), catalog
+    return None, catalog
+
+
+class AggregateCube:
+    """
+    Cuboide base (combinaciones presentes y sus medidas) más los agregados
+    densos de una y dos dimensiones. Se construye con `from_points`, se
+    completa con `set_regions` y se consulta con `rollup`, `value` y
+    `series`.
+    """
+
+    def __init__(self, dims, labels, codes, measures, regions=None, cell=None, directory=None):
+        self.dims = list(dims)
+        self.labels = {dim: list(labels[dim]) for dim in self.dims}
+        self.codes = codes                    # (filas, dimensiones) int32
+        self.measures = measures              # medida -> (filas,) int64
+        self.regions = regions or {}          # dimensión -> {atributo: lista por miembro}
+        self.cell = cell                      # {'tamano_m', 'crs'} de la malla
+        self.directory = directory
+        self._dense = {}
+        self._index = {}
+
+    # --- Construcción ---
+
+    @classmethod
+    def from_points(cls, points, cell_size=None):
+        """Una sola agregación de los puntos (PointStore o GeoDataFrame)"""
+        columns, labels = [], {}
+        for dim, column, level in POINT_DIMENSIONS:
+            if level is not None:
+                codes, catalog = _region_codes(points, column, level)
+                if codes is None:
+                    continue
+                labels[dim] = list(catalog.labels)
+            elif column in points:
+                codes, labels[dim] = _factorize(_values(points, column))
+            else:
+                continue
+            columns.append((dim, codes))
+
+        cell = None
+        cell_size = settings.CUBE_CELL_M if cell_size is None else cell_size
+        if cell_size and len(points):
+            from scripts.boundaries import projected_crs
+            from scripts.spatial_stats import projected_coordinates
+            xy = np.floor(projected_coordinates(points) / cell_size)
+            valid = np.isfinite(xy).all(axis=1)
+            pairs, inverse = np.unique(xy[valid].astype(np.int64), axis=0, return_inverse=True)
+            codes = np.full(len(xy), -1, dtype=np.int32)
+            codes[valid] = inverse.reshape(-1)
+            columns.append((CELL_DIMENSION, codes))
+            labels[CELL_DIMENSION] = [f'{ix}_{iy}' for ix, iy in pairs]
+            cell = {'tamano_m': float(cell_size), 'crs': str(projected_crs())}
+
+        dims = [dim for dim, _ in columns]
+        if columns:
+            matrix = np.column_stack([codes for _, codes in columns])
+            base, inverse = np.unique(matrix, axis=0, return_inverse=True)
+            inverse = inverse.reshape(-1)
+        else:
+            base, inverse = np.zeros((min(len(points), 1), 0), dtype=np.int32), np.zeros(len(points), dtype=np.int64)
+        measures = {}
+        for measure, column in MEASURES.items():
+            if column is None:
+                weights = None
+            elif column in points:
+                weights = _present(_values(points, column)).astype(np.float64)
+            else:
+                continue
+            measures[measure] = np.bincount(inverse, weights, minlength=len(base)).astype(np.int64)
+        return cls(dims, labels, base.astype(np.int32), measures, cell=cell)
+
+    def set_regions(self, dim, frame, attributes=None):
+        """
+        Atributos por miembro de una dimensión de región (p. ej. el partido
+        ganador de cada alcaldía) desde una tabla con columna `<dim>_id`.
+        Habilita las dimensiones derivadas y los conteos de unidades.
+        """
+        from scripts.catalog import get_catalog
+        if dim not in self.dims or frame is None:
+            return self
+        attributes = REGION_ATTRIBUTES.get(dim, []) if attributes is None else attributes
+        catalog = get_catalog(dim)
+        if f'{dim}_id' in frame.columns:
+            ids = frame[f'{dim}_id'].fillna(-1).to_numpy().astype(np.int64)
+        elif dim in frame.columns:
+            ids = catalog.ids(frame[dim], register=True).astype(np.int64)
+        else:
+            return self
+        # El catálogo solo agrega ids al final: los códigos del cubo no cambian
+        self.labels[dim] = list(catalog.labels)
+        size = len(self.labels[dim])
+        valid = (ids >= 0) & (ids < size)
+        table = {'presente': [False] * size}
+        for region_id in ids[valid]:
+            table['presente'][int(region_id)] = True
+        for attribute in attributes:
+            if attribute not in frame.columns:
+                continue
+            values = [None] * size
+            for region_id, value in zip(ids[valid], frame[attribute].to_numpy()[valid]):
+                values[int(region_id)] = value.item() if hasattr(value, 'item') else value
+            table[attribute] = values
+        if 'geometry' in frame.columns and getattr(frame, 'crs', None) is not None:
+            from scripts.boundaries import projected_crs
+            areas = [None] * size
+            for region_id, area in zip(ids[valid], frame.to_crs(projected_crs()).area.to_numpy()[valid] / 1e6):
+                areas[int(region_id)] = float(area)
+            table['area_km2'] = areas
+        self.regions[dim] = table
+        self._dense.clear()
+        self._index.clear()
+        return self
+
+    # --- Dimensiones ---
+
+    @property
+    def dimensions(self):
+        derived = [dim for dim, (region, attribute) in DERIVED_DIMENSIONS.items()
+                   if attribute in self.regions.get(region, {})]
+        return self.dims + derived
+
+    def members(self, dim):
+        """Etiquetas de los miembros de una dimensión (sin el de 'sin valor')"""
+        if dim in self.labels:
+            return self.labels[dim]
+        region, attribute = DERIVED_DIMENSIONS[dim]
+        values = self.regions[region][attribute]
+        # Orden de primera aparición en la tabla de regiones
+        return list(dict.fromkeys(str(v) for v in values if v is not None))
+
+    def code(self, dim, member):
+        """Código de un miembro (etiqueta o código); -1 si no existe"""
+        from scripts.catalog import normalize_name
+        if isinstance(member, (int, np.integer)):
+            return int(member)
+        index = self._index.get(dim)
+        if index is None:
+            labels = self.members(dim)
+            # Etiqueta exacta primero ('OXXO' y 'Oxxo' son marcas distintas)
+            index = self._index[dim] = (
+                {label: i for i, label in enumerate(labels)},
+                {normalize_name(label): i for i, label in reversed(list(enumerate(labels)))},
+            )
+        exact, normalized = index
+        return exact.get(str(member), normalized.get(normalize_name(member), -1))
+
+    def _derived_map(self, dim):
+        """Código derivado por miembro de la región; la última posición es 'sin valor'"""
+        region, attribute = DERIVED_DIMENSIONS[dim]
+        lookup = {label: i for i, label in enumerate(self.members(dim))}
+        values = self.regions[region][attribute]
+        mapping = [lookup[str(v)] if v is not None else -1 for v in values]
+        mapping += [-1] * (len(self.labels[region]) - len(mapping))
+        return np.array(mapping + [-1], dtype=np.int32)
+
+    def _base_codes(self, dim):
+        if dim in self.dims:
+            return self.codes[:, self.dims.index(dim)]
+        region, _ = DERIVED_DIMENSIONS[dim]
+        return self._derived_map(dim)[self._base_codes(region)]
+
+    # --- Consultas ---
+
+    def _canonical(self, dims):
+        order = self.dimensions
+        unknown = [dim for dim in dims if dim not in order]
+        if unknown:
+            raise KeyError(f"Dimensión desconocida: {', '.join(unknown)}")
+        return tuple(sorted(dims, key=order.index))
+
+    def _slot_codes(self, dim):
+        """Códigos del cuboide base con 'sin valor' (-1) en la última posición"""
+        codes = self._base_codes(dim)
+        return np.where(codes < 0, len(self.members(dim)), codes)
+
+    def _compute(self, dims, measure):
+        shape = tuple(len(self.members(dim)) + 1 for dim in dims)
+        values = self.measures[measure]
+        if not dims:
+            return np.array(values.sum(), dtype=np.int64)
+        # mode='raise': un código fuera del catálogo es un error, no otra celda
+        flat = np.ravel_multi_index(tuple(self._slot_codes(dim) for dim in dims), shape)
+        return np.bincount(flat, values, minlength=int(np.prod(shape))).astype(np.int64).reshape(shape)
+
+    def rollup(self, *dims, measure='num_oxxos'):
+        """
+        Arreglo denso de `measure` por las dimensiones pedidas (en ese
+        orden). Los agregados materializados se leen directamente; los demás
+        se calculan sobre el cuboide base, nunca sobre los puntos.
+        """
+        if measure not in self.measures:
+            raise KeyError(f"Medida desconocida: {measure}")
+        key = self._canonical(dims)
+        array = self._dense.get((key, measure))
+        if array is None:
+            array = self._dense[(key, measure)] = self._compute(key, measure)
+        return np.transpose(array, [key.index(dim) for dim in dims]) if dims else array
+
+    def value(self, measure='num_oxxos', **coords):
+        """Valor de una celda del cubo, p. ej. value(partido='PAN', marca='Oxxo')"""
+        dims = tuple(coords)
+        index = tuple(self.code(dim, member) for dim, member in coords.items())
+        if any(i < 0 for i in index):
+            return 0
+        return int(self.rollup(*dims, measure=measure)[index])
+
+    def slice(self, dim, measure='num_oxxos', **coords):
+        """{miembro: valor} de `dim` con las demás dimensiones fijas en `coords`"""
+        index = tuple(self.code(d, member) for d, member in coords.items())
+        if any(i < 0 for i in index):
+            return {}
+        values = self.rollup(dim, *coords, measure=measure)[(slice(None),) + index]
+        return {label: int(v) for label, v in zip(self.members(dim), values[:-1]) if v}
+
+    def series(self, dim, measure='num_oxxos', nonzero=False):
+        """Series de pandas indexada por las etiquetas de `dim`"""
+        import pandas as pd
+        values = self.rollup(dim, measure=measure)[:-1]
+        result = pd.Series(values, index=pd.Index(self.members(dim), name=dim), name=measure)
+        return result[result > 0] if nonzero else result
+
+    def units(self, dim, member=None):
+        """
+        Regiones por miembro de una dimensión derivada (p. ej. alcaldías que
+        ganó cada partido), cuenten o no con Oxxos
+        """
+        region, _ = DERIVED_DIMENSIONS[dim]
+        mapping = self._derived_map(dim)[:-1]
+        present = np.zeros(len(mapping), dtype=bool)
+        present[:len(self.regions[region]['presente'])] = self.regions[region]['presente']
+        counts = np.bincount(mapping[present & (mapping >= 0)], minlength=len(self.members(dim)))
+        if member is None:
+            return counts
+        code = self.code(dim, member)
+        return int(counts[code]) if code >= 0 else 0
+
+    def party_table(self, dim, nonempty=False):
+        """
+        Tabla por partido: unidades (regiones que ganó), Oxxos y promedio por
+        región. Con `nonempty` solo cuentan las regiones con algún Oxxo.
+        """
+        import pandas as pd
+        region, _ = DERIVED_DIMENSIONS[dim]
+        if nonempty:
+            counts = self.rollup(region)[:-1]
+            mapping = self._derived_map(dim)[:-1]
+            keep = (counts > 0) & (mapping >= 0)
+            units = np.bincount(mapping[keep], minlength=len(self.members(dim)))
+            totals = np.bincount(mapping[keep], counts[keep], minlength=len(self.members(dim))).astype(np.int64)
+        else:
+            units = self.units(dim)
+            totals = self.rollup(dim)[:-1]
+        table = pd.DataFrame({'partido': self.members(dim), 'unidades': units, 'total_oxxos': totals})
+        table = table[table['unidades'] > 0].reset_index(drop=True)
+        table['promedio_oxxos'] = table['total_oxxos'] / table['unidades']
+        return table
+
+    def region_metrics(self, dim):
+        """Oxxos, porcentaje del total y Oxxos por km² por región"""
+        import pandas as pd
+        counts = self.rollup(dim)[:-1]
+        total = int(self.rollup(dim).sum())
+        table = pd.DataFrame({dim: self.members(dim), 'num_oxxos': counts})
+        table['pct_oxxos'] = table['num_oxxos'] / total * 100 if total else 0.0
+        areas = self.regions.get(dim, {}).get('area_km2')
+        if areas is not None:
+            area = pd.Series(areas + [None] * (len(counts) - len(areas)), dtype='float64')
+            table['oxxos_por_km2'] = table['num_oxxos'] / area
+        return table
+
+    # --- Persistencia ---
+
+    def materialize(self, max_cells=None):
+        """Calcula los agregados de una y dos dimensiones que caben en `max_cells`"""
+        max_cells = settings.CUBE_MAX_DENSE_CELLS if max_cells is None else max_cells
+        dims = self.dimensions
+        for size in (0, 1, 2):
+            for key in itertools.combinations(dims, size):
+                cells = int(np.prod([len(self.members(dim)) + 1 for dim in key]))
+                if cells <= max_cells:
+                    for measure in self.measures:
+                        self.rollup(*key, measure=measure)
+        return self
+
+    def save(self, directory=None):
+        """Escribe el cubo de forma atómica (directorio temporal publicado con publish.replace_directory)"""
+        directory = Path(directory or default_cube_dir())
+        self.materialize()
+        tmp_dir = directory.with_name(f'{directory.name}.tmp-{os.getpid()}')
+        if tmp_dir.exists():
+            shutil.rmtree(tmp_dir)
+        tmp_dir.mkdir(parents=True)
+        try:
+            np.save(tmp_dir / 'base_codes.npy', self.codes)
+            for measure, values in self.measures.items():
+                np.save(tmp_dir / f'base_{measure}.npy', values)
+            rollups = []
+            for (key, measure), array in self._dense.items():
+                name = f"rollup_{'__'.join(key) or 'total'}_{measure}"
+                np.save(tmp_dir / f'{name}.npy', array)
+                rollups.append({'dims': list(key), 'measure': measure, 'file': name})
+            manifest = {
+                'format_version': CUBE_FORMAT_VERSION,
+                'dims': self.dims,
+                'labels': self.labels,
+                'measures': list(self.measures),
+                'regions': self.regions,
+                'cell': self.cell,
+                'rollups': rollups,
+            }
+            with open(tmp_dir / MANIFEST_NAME, 'w', encoding='utf-8') as f:
+                json.dump(manifest, f, ensure_ascii=False, default=str)
+            replace_directory(tmp_dir, directory)
+        finally:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+        return directory
+
+    @classmethod
+    def load(cls, directory=None):
+        """Abre un cubo guardado; los arreglos se mapean a memoria (sin pandas)"""
+        # La versión se resuelve una vez: todos los arreglos salen de la misma
+        pointer = directory or default_cube_dir()
+        directory = resolve_pointer(pointer)
+        if directory is None:
+            raise FileNotFoundError(f"Cubo no encontrado: {pointer}")
+        with open(directory / MANIFEST_NAME, encoding='utf-8') as f:
+            manifest = json.load(f)
+        if manifest.get('format_version') != CUBE_FORMAT_VERSION:
+            raise ValueError(f"Versión de cubo no soportada: {manifest.get('format_version')}")
+        codes = np.load(directory / 'base_codes.npy', mmap_mode='r')
+        measures = {m: np.load(directory / f'base_{m}.npy', mmap_mode='r') for m in manifest['measures']}
+        cube = cls(manifest['dims'], manifest['labels'], codes, measures,
+                   manifest['regions'], manifest['cell'], directory)
+        for rollup in manifest['rollups']:
+            cube._dense[(tuple(rollup['dims']), rollup['measure'])] = np.load(
+                directory / f"{rollup['file']}.npy", mmap_mode='r')
+        return cube
+
+
+# --- Cubo de la corrida ---
+
+_CURRENT = {'cube': None}
+
+
+@profiled('cube.construir')
+def build_cube(points, alcaldias=None, districts=None):
+    """Cubo de los puntos con los atributos de alcaldías y distritos"""
+    cube = AggregateCube.from_points(points)
+    cube.set_regions('alcaldia', alcaldias)
+    cube.set_regions('distrito', districts)
+    return cube
+
+
+def set_current_cube(cube):
+    """Cubo construido en esta corrida; las etapas siguientes lo reutilizan"""
+    _CURRENT['cube'] = cube
+    return cube
+
+
+def cube_for(points, alcaldias=None, districts=None, scope=None):
+    """
+    Cubo de la corrida en curso o, si no hay (etapa ejecutada sola), no
+    tiene las regiones recibidas o el análisis está acotado a `scope`, uno
+    construido con los datos recibidos
+    """
+    current = _CURRENT['cube']
+    regions = (('alcaldia', alcaldias), ('distrito', districts))
+    if scope is None and current is not None and all(
+            frame is None or dim in current.regions for dim, frame in regions):
+        return current
+    return build_cube(points, alcaldias, districts)
+
+
+def write_cube(cube, directory=None):
+    """Tarea de escritura (pipeline.BackgroundWriter / InlineWriter)"""
+    try:
+        path = cube.save(directory)
+        setup_logging('polioxxo.cube').info(f"🧊 Cubo de agregados guardado: {path}")
+        return True
+    except Exception as e:
+        setup_logging('polioxxo.cube').error(f"Error guardando el cubo: {e}")
+        return False
+
+
+def open_cube(directory=None):
+    """Abre el cubo guardado; retorna None si no existe o está corrupto"""
+    try:
+        return AggregateCube.load(directory)
+    except FileNotFoundError:
+        return None
+    except Exception as e:
+        setup_logging('polioxxo.cube').error(f"Error abriendo el cubo: {e}")
+        return None
+
+
+def main(argv=None):
+    from scripts.publish import published_dir
+
+    parser = argparse.ArgumentParser(description='Consultar el cubo de agregados publicado')
+    parser.add_argument('dimensiones', nargs='*', help='Una o dos dimensiones (sin dimensiones: resumen)')
+    parser.add_argument('--medida', default='num_oxxos', choices=list(MEASURES))
+    args = parser.parse_args(argv)
+
+    cube = open_cube(published_dir() / 'cube')
+    if cube is None:
+        print("No hay cubo publicado; ejecuta el pipeline", file=sys.stderr)
+        return False
+    try:
+        if not args.dimensiones:
+            print(f"Total: {int(cube.rollup(measure=args.medida))} ({args.medida})")
+            for dim in cube.dimensions:
+                print(f"  {dim}: {len(cube.members(dim))} miembros")
+            return True
+        array = cube.rollup(*args.dimensiones[:2], measure=args.medida)
+    except KeyError as e:
+        print(e.args[0], file=sys.stderr)
+        return False
+    if array.ndim == 1:
+        for label, value in zip(cube.members(args.dimensiones[0]), array[:-1]):
+            if value:
+                print(f"{label:<30}{int(value):>8,}")
+    else:
+        first, second = args.dimensiones[:2]
+        for i, label in enumerate(cube.members(first)):
+            row = {cube.members(second)[j]: int(v) for j, v in enumerate(array[i, :-1]) if v}
+            if row:
+                print(f"{label}: " + ', '.join(f"{k} {v:,}" for k, v in row.items()))
+    return True
+
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
@@ -0,0 +1,278 @@
+#!/usr/bin/env python3
+"""
+Generación de gráficas con detección de cambios - Polioxxo
+
+Este módulo:
+1. Define cada gráfica como función pura de una tabla agregada pequeña
+2. Calcula un hash de la tabla y de la especificación de la gráfica y lo
+   guarda junto al PNG (archivo .json lateral)
+3. Omite las gráficas cuyo hash no cambió y renderiza el resto en un pool
+   de procesos con el backend Agg
+"""
+
+import sys
+import os
+
+# Agregar ruta del proyecto al path de Python
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import hashlib
+import json
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from scripts.utils import setup_logging
+from scripts.profiling import get_profiler, stage
+from scripts.log_config import pool_logging_kwargs
+
+# Cambiar al modificar el código de cualquier gráfica para invalidar PNGs
+CHARTS_VERSION = 1
+
+DEFAULT_DPI = 300
+
+PARTY_COLORS = {'MORENA': '#8B4513', 'PAN': '#0080FF', 'PRI': '#FF0000'}
+DEFAULT_COLOR = '#808080'
+
+
+def _color(party):
+    return PARTY_COLORS.get(party, DEFAULT_COLOR)
+
+
+def _setup_style():
+    import matplotlib.pyplot as plt
+    import seaborn as sns
+    plt.style.use('default')
+    sns.set_palette("husl")
+
+
+# --- Gráficas: cada una recibe (tabla, opciones) y retorna una figura ---
+
+def chart_distribucion_oxxos(table, options):
+    """Barras por alcaldía coloreadas por partido + histograma"""
+    import matplotlib.pyplot as plt
+    fig, (ax1, ax2) = plt.subplots(1, 2, figsize=(15, 6))
+
+    datos_sorted = table.sort_values('num_oxxos', ascending=True)
+    bars = ax1.barh(datos_sorted['alcaldia'], datos_sorted['num_oxxos'])
+    ax1.set_xlabel('Número de Oxxos')
+    ax1.set_title('Distribución de Oxxos por Alcaldía')
+    ax1.tick_params(axis='y', labelsize=8)
+    for bar, partido in zip(bars, datos_sorted['partido_ganador']):
+        bar.set_color(_color(partido))
+
+    ax2.hist(table['num_oxxos'], bins=8, edgecolor='black', alpha=0.7)
+    ax2.set_xlabel('Número de Oxxos')
+    ax2.set_ylabel('Frecuencia')
+    ax2.set_title('Histograma de Distribución')
+    ax2.axvline(table['num_oxxos'].mean(), color='red', linestyle='--', label=f'Media: {table["num_oxxos"].mean():.1f}')
+    ax2.legend()
+    return fig
+
+
+def chart_analisis_partidos(table, options):
+    """Total de Oxxos y número de alcaldías por partido"""
+    import matplotlib.pyplot as plt
+    fig, (ax1, ax2) = plt.subplots(1, 2, figsize=(12, 5))
+
+    partido_stats = table.groupby('partido_ganador')['num_oxxos'].sum().sort_values(ascending=False)
+    ax1.bar(partido_stats.index, partido_stats.values, color=[_color(p) for p in partido_stats.index])
+    ax1.set_ylabel('Total de Oxxos')
+    ax1.set_title('Total de Oxxos por Partido')
+
+    alcaldias_por_partido = table['partido_ganador'].value_counts()
+    ax2.pie(alcaldias_por_partido.values, labels=alcaldias_por_partido.index, autopct='%1.1f%%',
+            colors=[_color(p) for p in alcaldias_por_partido.index])
+    ax2.set_title('Distribución de Alcaldías por Partido')
+    return fig
+
+
+def chart_correlacion_votos_oxxos(table, options):
+    """Dispersión votos vs Oxxos por partido con línea de tendencia"""
+    import matplotlib.pyplot as plt
+    fig = plt.figure(figsize=(10, 6))
+
+    for partido in table['partido_ganador'].unique():
+        subset = table[table['partido_ganador'] == partido]
+        plt.scatter(subset['votos_totales'], subset['num_oxxos'],
+                    label=partido, alpha=0.7, s=60, color=_color(partido))
+
+    plt.xlabel('Votos Totales')
+    plt.ylabel('Número de Oxxos')
+    plt.title('Relación entre Votos Totales y Número de Oxxos')
+    plt.legend()
+
+    # Sin variación en votos (p. ej. ciudad sin datos electorales) no hay tendencia
+    if table['votos_totales'].nunique() > 1:
+        z = np.polyfit(table['votos_totales'], table['num_oxxos'], 1)
+        p = np.poly1d(z)
+        r = np.corrcoef(table['votos_totales'], table['num_oxxos'])[0, 1]
+        plt.plot(table['votos_totales'], p(table['votos_totales']),
+                 "r--", alpha=0.8, label=f'Tendencia (R² = {r ** 2:.3f})')
+    return fig
+
+
+def chart_analisis_distritos(table, options):
+    """Top distritos con más Oxxos y comparación con alcaldías"""
+    import matplotlib.pyplot as plt
+    fig, (ax1, ax2) = plt.subplots(1, 2, figsize=(16, 8))
+
+    top_districts = table[table['nivel'] == 'distrito']
+    ax1.barh(range(len(top_districts)), top_districts['num_oxxos'].to_numpy())
+    ax1.set_yticks(range(len(top_districts)))
+    ax1.set_yticklabels(top_districts['region'], fontsize=8)
+    ax1.set_xlabel('Número de Oxxos')
+    ax1.set_title('Top 10 Distritos con más Oxxos')
+
+    alcaldia_counts = table[table['nivel'] == 'alcaldia']
+    x = np.arange(len(alcaldia_counts))
+    width = 0.35
+    ax2.bar(x - width / 2, alcaldia_counts['num_oxxos'].to_numpy(), width, label='Por Alcaldía', alpha=0.8)
+    ax2.set_xlabel('Divisiones Territoriales')
+    ax2.set_ylabel('Número de Oxxos')
+    ax2.set_title('Comparación: Alcaldías vs Distritos')
+    ax2.set_xticks(x)
+    ax2.set_xticklabels(alcaldia_counts['region'], rotation=45, ha='right', fontsize=8)
+    ax2.legend()
+    return fig
+
+
+def chart_partidos_distritos(table, options):
+    """Oxxos por partido ganador de su distrito (pastel y barras)"""
+    import matplotlib.pyplot as plt
+    fig, (ax1, ax2) = plt.subplots(1, 2, figsize=(14, 6))
+
+    ordered = table.sort_values('num_oxxos', ascending=False)
+    ax1.pie(ordered['num_oxxos'], labels=ordered['partido'], autopct='%1.1f%%',
+            colors=[_color(p) for p in ordered['partido']], startangle=90)
+    ax1.set_title('Oxxos por Partido Ganador\n(Distritos Electorales)')
+
+    by_name = table.sort_values('partido')
+    ax2.bar(by_name['partido'], by_name['num_oxxos'], color=[_color(p) for p in by_name['partido']])
+    ax2.set_ylabel('Total de Oxxos')
+    ax2.set_title('Total de Oxxos por Partido\n(Distritos Electorales)')
+    ax2.tick_params(axis='x', rotation=45)
+    return fig
+
+
+CHARTS = {
+    'distribucion_oxxos': chart_distribucion_oxxos,
+    'analisis_partidos': chart_analisis_partidos,
+    'correlacion_votos_oxxos': chart_correlacion_votos_oxxos,
+    'analisis_distritos': chart_analisis_distritos,
+    'partidos_distritos': chart_partidos_distritos,
+}
+
+
+# --- Detección de cambios ---
+
+def _plain_table(table):
+    """Copia sin categorías ni geometría, para hashear y enviar al pool"""
+    table = pd.DataFrame(table).reset_index(drop=True)
+    if 'geometry' in table.columns:
+        table = table.drop(columns='geometry')
+    for column in table.columns:
+        if isinstance(table[column].dtype, pd.CategoricalDtype):
+            table[column] = table[column].astype(str)
+    return table
+
+
+def figure_hash(chart, table, options):
+    """Hash de la tabla agregada y de la especificación de la gráfica"""
+    digest = hashlib.sha256()
+    digest.update(json.dumps({'chart': chart, 'options': options, 'version': CHARTS_VERSION},
+                             sort_keys=True, default=str).encode())
+    digest.update(json.dumps([f'{c}:{t}' for c, t in table.dtypes.items()]).encode())
+    digest.update(pd.util.hash_pandas_object(table, index=False).to_numpy().tobytes())
+    return digest.hexdigest()
+
+
+def sidecar_path(output):
+    output = Path(output)
+    return output.with_name(output.name + '.json')
+
+
+def is_current(output, digest):
+    """True si el PNG existe y su archivo lateral tiene el mismo hash"""
+    output = Path(output)
+    sidecar = sidecar_path(output)
+    if not output.exists() or not sidecar.exists():
+        return False
+    try:
+        with open(sidecar, encoding='utf-8') as f:
+            return json.load(f).get('hash') == digest
+    except (OSError, ValueError):
+        return False
+
+
+def figure_job(chart, table, output, **options):
+    """Especificación de una gráfica: nombre, tabla agregada, salida y opciones"""
+    options.setdefault('dpi', DEFAULT_DPI)
+    table = _plain_table(table)
+    return {
+        'chart': chart,
+        'table': table,
+        'output': str(output),
+        'options': options,
+        'hash': figure_hash(chart, table, options),
+    }
+
+
+def _render_job(job):
+    """Renderiza una gráfica en el proceso actual (backend Agg)"""
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+
+    start = time.perf_counter()
+    _setup_style()
+    fig = CHARTS[job['chart']](job['table'], job['options'])
+    fig.tight_layout()
+
+    output = Path(job['output'])
+    tmp = output.with_name(f'.{output.stem}.tmp-{os.getpid()}{output.suffix}')
+    fig.savefig(tmp, dpi=job['options']['dpi'], bbox_inches='tight')
+    plt.close(fig)
+    os.replace(tmp, output)
+
+    # El archivo lateral se escribe después del PNG: si el proceso muere a
+    # medias, la gráfica se vuelve a generar
+    with open(sidecar_path(output), 'w', encoding='utf-8') as f:
+        json.dump({'hash': job['hash'], 'chart': job['chart'], 'version': CHARTS_VERSION}, f)
+    return job['output'], time.perf_counter() - start
+
+
+def render_figures(jobs, workers=None, force=False):
+    """
+    Renderiza las gráficas cuyo hash cambió; retorna (generadas, omitidas)
+    """
+    logger = setup_logging('polioxxo.figures')
+    pending = [job for job in jobs if force or not is_current(job['output'], job['hash'])]
+    skipped = len(jobs) - len(pending)
+    if skipped:
+        logger.info(f"♻️ {skipped} gráficas sin cambios, se omiten")
+    if not pending:
+        return 0, skipped
+
+    for job in pending:
+        Path(job['output']).parent.mkdir(parents=True, exist_ok=True)
+
+    workers = workers if workers is not None else min(len(pending), os.cpu_count() or 1)
+    if workers > 1 and len(pending) > 1:
+        with ProcessPoolExecutor(max_workers=workers, **pool_logging_kwargs()) as pool:
+            results = list(pool.map(_render_job, pending))
+        # Renderizadas en otros procesos: solo se registra su tiempo de reloj
+        for job, (_, seconds) in zip(pending, results):
+            get_profiler().record(f"chart.{job['chart']}", seconds)
+    else:
+        results = []
+        for job in pending:
+            with stage(f"chart.{job['chart']}"):
+                results.append(_render_job(job))
+
+    for output, seconds in results:
+        logger.info(f"🖼️ {Path(output).name} ({seconds:.1f}s)")
+    return len(results), skipped
@@ -0,0 +1,207 @@
+#!/usr/bin/env python3
+"""
+Control de calidad de geometrías - Polioxxo
+
+Este módulo:
+1. Calcula una sola vez, con llamadas vectorizadas de shapely 2, las
+   banderas de geometría nula, vacía, inválida, fuera de límites y con
+   vértices repetidos
+2. Repara con make_valid (conserva todas las partes de los multipolígonos,
+   a diferencia de buffer(0)) y elimina vértices repetidos
+3. Escribe las filas irrecuperables a un archivo de cuarentena
+4. Guarda las banderas en caché por hash de la entrada, para no volver a
+   validar límites que no cambiaron
+"""
+
+import sys
+import os
+
+# Agregar ruta del proyecto al path de Python
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import hashlib
+
+import numpy as np
+import pandas as pd
+import shapely
+
+from scripts.utils import setup_logging, get_project_paths
+from scripts.cache_manager import cache_hit, cache_stored
+from scripts.profiling import profiled
+from config.cities import get_city
+
+QA_FORMAT = 1
+
+FLAG_COLUMNS = ['nula', 'vacia', 'invalida', 'fuera_limites', 'vertices_repetidos']
+
+
+def default_qa_dir():
+    return get_project_paths()['data_processed'] / 'qa'
+
+
+def geometry_hash(geoms, bounds=None):
+    """Hash de las geometrías (WKB) y de los límites usados"""
+    digest = hashlib.sha1()
+    for wkb in shapely.to_wkb(geoms):
+        digest.update(wkb if wkb is not None else b'\0')
+    digest.update(repr((bounds, QA_FORMAT)).encode())
+    return digest.hexdigest()[:16]
+
+
+def repeated_vertex_counts(geoms):
+    """Número de vértices consecutivos repetidos por geometría"""
+    coords, index = shapely.get_coordinates(geoms, return_index=True)
+    if not len(coords):
+        return np.zeros(len(geoms), dtype=np.int64)
+    repeated = (coords[1:] == coords[:-1]).all(axis=1) & (index[1:] == index[:-1])
+    return np.bincount(index[1:][repeated], minlength=len(geoms))
+
+
+def check_geometries(geoms, bounds=None):
+    """
+    Banderas de calidad (DataFrame booleano, una fila por geometría).
+
+    Cada predicado se evalúa una sola vez sobre el arreglo completo.
+    """
+    geoms = np.asarray(geoms, dtype=object)
+    missing = shapely.is_missing(geoms)
+    empty = ~missing & shapely.is_empty(geoms)
+    present = ~missing & ~empty
+
+    invalid = np.zeros(len(geoms), dtype=bool)
+    invalid[present] = ~shapely.is_valid(geoms[present])
+
+    outside = np.zeros(len(geoms), dtype=bool)
+    if bounds is not None:
+        box = shapely.box(*bounds)
+        outside[present] = ~shapely.intersects(box, geoms[present])
+
+    return pd.DataFrame({
+        'nula': missing,
+        'vacia': empty,
+        'invalida': invalid,
+        'fuera_limites': outside,
+        'vertices_repetidos': repeated_vertex_counts(geoms) > 0,
+    })
+
+
+def _polygonal_parts(geoms):
+    """De colecciones mixtas (salida de make_valid) conserva solo polígonos"""
+    parts, index = shapely.get_parts(geoms, return_index=True)
+    keep = np.isin(shapely.get_type_id(parts), (3, 6))
+    result = np.full(len(geoms), None, dtype=object)
+    if keep.any():
+        merged = pd.Series(parts[keep]).groupby(index[keep]).agg(
+            lambda s: shapely.union_all(s.to_numpy()))
+        result[merged.index.to_numpy()] = merged.to_numpy()
+    return result
+
+
+def repair_geometries(geoms, flags):
+    """
+    Repara las filas marcadas: make_valid para inválidas y
+    remove_repeated_points para vértices repetidos. Retorna un arreglo nuevo.
+    """
+    geoms = np.asarray(geoms, dtype=object).copy()
+
+    dup = flags['vertices_repetidos'].to_numpy() & ~flags['nula'].to_numpy()
+    if dup.any():
+        geoms[dup] = shapely.remove_repeated_points(geoms[dup])
+
+    invalid = flags['invalida'].to_numpy()
+    if invalid.any():
+        polygonal = np.isin(shapely.get_type_id(geoms[invalid]), (3, 6))
+        repaired = shapely.make_valid(geoms[invalid])
+        # make_valid puede regresar colecciones con líneas o puntos sueltos
+        mixed = polygonal & (shapely.get_type_id(repaired) == 7)
+        if mixed.any():
+            repaired[mixed] = _polygonal_parts(repaired[mixed])
+        geoms[invalid] = repaired
+    return geoms
+
+
+def _load_flags(path):
+    with np.load(path) as data:
+        return pd.DataFrame({c: data[c] for c in FLAG_COLUMNS})
+
+
+def _save_flags(path, flags):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(f'.{path.stem}.tmp-{os.getpid()}.npz')
+    np.savez_compressed(tmp, **{c: flags[c].to_numpy() for c in FLAG_COLUMNS})
+    os.replace(tmp, path)
+
+
+@profiled('validate')
+def geometry_qa(gdf, layer, bounds='auto', qa_dir=None, use_cache=True):
+    """
+    Etapa de QA de una capa: banderas (con caché), reparación y cuarentena.
+
+    Retorna el GeoDataFrame con las filas utilizables y las geometrías
+    reparadas. Las filas irrecuperables (nulas, vacías, fuera de límites o
+    inválidas tras la reparación) se escriben en qa/cuarentena_<capa>.csv.
+    """
+    logger = setup_logging('polioxxo.geometry_qa')
+    qa_dir = qa_dir or default_qa_dir()
+
+    if bounds == 'auto':
+        # Ventana de la ciudad activa (EPSG:4326) para detectar coordenadas erróneas
+        bounds = get_city().limites_qa if gdf.crs is not None and gdf.crs.to_epsg() == 4326 else None
+
+    geoms = np.asarray(gdf.geometry.values, dtype=object)
+    key = geometry_hash(geoms, bounds)
+    cache_path = qa_dir / f'banderas_{layer}_{key}.npz'
+
+    if use_cache and cache_path.exists():
+        flags = _load_flags(cache_path)
+        logger.info(f"♻️ Banderas de QA de '{layer}' desde caché (sin revalidar)")
+        cache_hit(cache_path, 'geometry_qa')
+    else:
+        flags = check_geometries(geoms, bounds)
+        try:
+            _save_flags(cache_path, flags)
+            cache_stored(cache_path, 'geometry_qa')
+        except Exception as e:
+            logger.warning(f"No se pudo guardar la caché de QA: {e}")
+
+    quarantine_path = qa_dir / f'cuarentena_{layer}.csv'
+    counts = {c: int(flags[c].sum()) for c in FLAG_COLUMNS}
+    if not any(counts.values()):
+        quarantine_path.unlink(missing_ok=True)
+        logger.info(f"✅ Geometrías de '{layer}' válidas: {len(gdf)}/{len(gdf)}")
+        return gdf
+
+    logger.info(f"🔎 QA de '{layer}': " + ", ".join(f"{c}={n}" for c, n in counts.items() if n))
+
+    repaired = repair_geometries(geoms, flags)
+    needs_repair = (flags['invalida'] | flags['vertices_repetidos']).to_numpy()
+
+    unrecoverable = (flags['nula'] | flags['vacia'] | flags['fuera_limites']).to_numpy(copy=True)
+    if needs_repair.any():
+        fixed = repaired[needs_repair]
+        broken = shapely.is_missing(fixed) | shapely.is_empty(fixed)
+        broken[~broken] = ~shapely.is_valid(fixed[~broken])
+        unrecoverable[np.flatnonzero(needs_repair)[broken]] = True
+
+    result = gdf.copy()
+    result[result.geometry.name] = repaired
+    repaired_ok = int((needs_repair & ~unrecoverable).sum())
+    if repaired_ok:
+        logger.info(f"🔧 {repaired_ok} geometrías reparadas con make_valid")
+
+    if unrecoverable.any():
+        quarantine = pd.DataFrame(gdf.drop(columns=gdf.geometry.name)[unrecoverable])
+        quarantine.insert(0, 'motivo', [
+            ','.join(c for c in FLAG_COLUMNS if row[c]) or 'irreparable'
+            for row in flags[unrecoverable].to_dict('records')
+        ])
+        quarantine.insert(0, 'fila', np.flatnonzero(unrecoverable))
+        quarantine['wkt'] = shapely.to_wkt(geoms[unrecoverable])
+        qa_dir.mkdir(parents=True, exist_ok=True)
+        quarantine.to_csv(quarantine_path, index=False)
+        logger.warning(f"🚧 {int(unrecoverable.sum())} filas de '{layer}' en cuarentena: {quarantine_path}")
+        result = result[~unrecoverable]
+    else:
+        quarantine_path.unlink(missing_ok=True)
+
+    return result
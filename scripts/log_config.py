@@ -0,0 +1,213 @@
+#!/usr/bin/env python3
+"""
+Configuración de logging por proceso - Polioxxo
+
+Este módulo:
+1. Configura el logging una sola vez por proceso: los loggers solo encolan
+   (QueueHandler) y un hilo QueueListener escribe en consola y en
+   logs/polioxxo.log, de modo que el cálculo nunca espera al disco
+2. Escribe el archivo como registros JSON, uno por línea (tiempo, nivel,
+   logger, mensaje, proceso, hilo y los campos de `extra`)
+3. Limita los mensajes por sitio de llamada: un mismo logger.info dentro de
+   un ciclo (una línea por alcaldía o distrito) emite como máximo
+   LOG_RATE_LIMIT registros por ventana; los suprimidos se cuentan
+4. Reenvía al proceso padre los registros de los trabajadores de
+   ProcessPoolExecutor (pool_logging_kwargs), que así no abren el archivo
+
+utils.setup_logging() llama a configure_logging(); el resto del código no
+necesita importar este módulo.
+"""
+
+import atexit
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import threading
+import time
+from pathlib import Path
+
+TEXT_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+
+# Atributos propios de LogRecord; el resto viene de `extra` y va al JSON
+_RECORD_FIELDS = set(vars(logging.makeLogRecord({}))) | {'message', 'asctime', 'taskName'}
+
+_STATE = {'pid': None, 'listener': None, 'handlers': [], 'worker_queue': None, 'worker_listener': None}
+_STATE_LOCK = threading.Lock()
+
+
+class JsonFormatter(logging.Formatter):
+    """Un objeto JSON por registro"""
+
+    def format(self, record):
+        data = {
+            'ts': time.strftime('%Y-%m-%dT%H:%M:%S', time.localtime(record.created)) + f'.{int(record.msecs):03d}',
+            'nivel': record.levelname,
+            'logger': record.name,
+            'mensaje': record.getMessage(),
+            'proceso': record.processName,
+            'pid': record.process,
+            'hilo': record.threadName,
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_FIELDS and not key.startswith('_'):
+                data[key] = value if isinstance(value, (str, int, float, bool, type(None))) else str(value)
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            data['excepcion'] = record.exc_text
+        return json.dumps(data, ensure_ascii=False)
+
+
+class CallSiteRateLimit(logging.Filter):
+    """
+    Deja pasar como máximo `limit` registros por sitio de llamada (archivo y
+    línea) en cada ventana de `window` segundos. WARNING y superiores, y los
+    registros con extra={'sin_limite': True}, siempre pasan. El primer
+    registro de una ventana nueva lleva en `suprimidos` cuántos se
+    descartaron en la anterior.
+    """
+
+    def __init__(self, limit, window):
+        super().__init__()
+        self.limit = limit
+        self.window = window
+        self.suppressed_total = 0
+        self._sites = {}
+        self._lock = threading.Lock()
+
+    def filter(self, record):
+        if not self.limit or record.levelno >= logging.WARNING or getattr(record, 'sin_limite', False):
+            return True
+        key = (record.pathname, record.lineno)
+        now = record.created
+        with self._lock:
+            site = self._sites.get(key)
+            if site is None or now - site[0] >= self.window:
+                suppressed = site[2] if site is not None else 0
+                self._sites[key] = [now, 1, 0]
+                if suppressed:
+                    record.suprimidos = suppressed
+                return True
+            if site[1] < self.limit:
+                site[1] += 1
+                return True
+            site[2] += 1
+            self.suppressed_total += 1
+            return False
+
+
+def _settings():
+    from config import settings
+    return settings
+
+
+def _output_handlers():
+    settings = _settings()
+    logs_dir = Path(__file__).parent.parent / 'logs'
+    logs_dir.mkdir(exist_ok=True)
+
+    console = logging.StreamHandler()
+    console.setFormatter(logging.Formatter(TEXT_FORMAT))
+    file_handler = logging.FileHandler(logs_dir / 'polioxxo.log', encoding='utf-8')
+    file_handler.setFormatter(JsonFormatter() if settings.LOG_FILE_FORMAT == 'json' else logging.Formatter(TEXT_FORMAT))
+    return [console, file_handler]
+
+
+def _install(root, handler, level):
+    settings = _settings()
+    handler.addFilter(CallSiteRateLimit(settings.LOG_RATE_LIMIT, settings.LOG_RATE_WINDOW_S))
+    for old in list(root.handlers):
+        root.removeHandler(old)
+    root.addHandler(handler)
+    root.setLevel(level)
+
+
+def configure_logging(level=logging.INFO):
+    """
+    Configura el logging de este proceso si aún no lo está (también en un
+    hijo creado con fork, que hereda la configuración del padre sin su hilo)
+    """
+    pid = os.getpid()
+    if _STATE['pid'] == pid:
+        return
+    with _STATE_LOCK:
+        if _STATE['pid'] == pid:
+            return
+        handlers = _output_handlers()
+        log_queue = queue.SimpleQueue()
+        listener = logging.handlers.QueueListener(log_queue, *handlers, respect_handler_level=True)
+        _install(logging.getLogger(), logging.handlers.QueueHandler(log_queue), level)
+        listener.start()
+        _STATE.update(pid=pid, listener=listener, handlers=handlers, worker_queue=None, worker_listener=None)
+        atexit.register(shutdown_logging, pid)
+
+
+def shutdown_logging(pid=None):
+    """
+    Vacía las colas y deja los manejadores de salida conectados directamente,
+    para que los mensajes de otros atexit (p. ej. el perfil) no se pierdan
+    """
+    if pid is not None and pid != os.getpid():
+        return
+    with _STATE_LOCK:
+        listeners = [_STATE['worker_listener'], _STATE['listener']]
+        if _STATE['listener'] is None:
+            return
+        _STATE.update(listener=None, worker_listener=None)
+    for listener in listeners:
+        if listener is not None:
+            listener.stop()
+    root = logging.getLogger()
+    limit = next((f for h in root.handlers for f in h.filters if isinstance(f, CallSiteRateLimit)), None)
+    for old in list(root.handlers):
+        root.removeHandler(old)
+    for handler in _STATE['handlers']:
+        root.addHandler(handler)
+    if limit is not None and limit.suppressed_total:
+        logging.getLogger('polioxxo').info(
+            f"🔇 {limit.suppressed_total} mensajes repetidos suprimidos por el límite por sitio de llamada")
+
+
+def _init_worker(worker_queue, level):
+    """Inicializador de trabajadores: todo registro va a la cola del padre"""
+    _install(logging.getLogger(), logging.handlers.QueueHandler(worker_queue), level)
+    # Un pool anidado dentro del trabajador reenvía a la misma cola
+    _STATE.update(pid=os.getpid(), listener=None, handlers=[], worker_queue=worker_queue, worker_listener=None)
+
+
+def pool_logging_kwargs():
+    """
+    initializer/initargs para ProcessPoolExecutor: los trabajadores envían
+    sus registros a una cola que el padre escribe con sus propios manejadores.
+    La cola se crea en contexto spawn, que se puede pasar a trabajadores de
+    cualquier contexto (fork, spawn, forkserver).
+    """
+    import multiprocessing
+
+    configure_logging()
+    with _STATE_LOCK:
+        if _STATE['worker_queue'] is None:
+            worker_queue = multiprocessing.get_context('spawn').Queue()
+            listener = logging.handlers.QueueListener(worker_queue, *_STATE['handlers'], respect_handler_level=True)
+            listener.start()
+            _STATE.update(worker_queue=worker_queue, worker_listener=listener)
+        return {'initializer': _init_worker, 'initargs': (_STATE['worker_queue'], logging.getLogger().level)}
+
+
+def log_sample(logger, lines, limit=None, total=None):
+    """
+    Registra a lo más `limit` líneas de un listado por elemento y una línea
+    con cuántas se omitieron (el listado completo queda en los reportes)
+    """
+    limit = _settings().LOG_ITEM_LIMIT if limit is None else limit
+    shown = 0
+    for line in lines:
+        if limit and shown >= limit:
+            break
+        logger.info(line)
+        shown += 1
+    total = shown if total is None else total
+    if total > shown:
+        logger.info(f"  ... y {total - shown} más")
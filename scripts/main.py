@@ -0,0 +1,270 @@
+#!/usr/bin/env python3
+"""
+Interfaz de línea de comandos - Polioxxo
+
+Este módulo:
+1. Define el comando `polioxxo` con subcomandos para cada etapa del pipeline
+2. Importa las dependencias pesadas (geopandas, matplotlib, folium) solo
+   dentro del subcomando que las usa, para que `--help`, `cache` y `query`
+   arranquen en milisegundos
+
+Uso:
+    polioxxo run                      # pipeline completo en memoria
+    polioxxo --ciudad gdl run         # otra ciudad (config/cities.py)
+    polioxxo cities gdl mty pue       # varias ciudades en paralelo
+    polioxxo nationwide               # todo el país por bloques, retomable
+    polioxxo download | process | districts | analyze | maps
+    polioxxo maps --region CUAUHTEMOC   # o --bbox=minx,miny,maxx,maxy
+    polioxxo query alcaldias CUAUHTEMOC
+    polioxxo serve --port 8765
+    polioxxo cache stats|prune|verify
+    polioxxo profile compare          # perfil por etapa de las dos últimas corridas
+    polioxxo --profile=assign run     # cProfile y pilas de las etapas elegidas
+    polioxxo metrics                  # métricas de la última corrida (Prometheus)
+    polioxxo publish list|activate <id>   # versiones publicadas de las salidas
+    polioxxo cube partido marca       # rollups del cubo de agregados publicado
+"""
+
+import sys
+import os
+
+# Agregar ruta del proyecto al path de Python
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import argparse
+
+
+def cmd_download(args):
+    from scripts import download_data
+    if not hasattr(download_data, 'main'):
+        from scripts.utils import setup_logging
+        setup_logging('polioxxo.cli').error(
+            "La descarga no está implementada en download_data.py; coloca los GeoJSON en data/raw/")
+        return False
+    return download_data.main()
+
+
+def cmd_process(args):
+    from scripts.process_data import main
+    return main()
+
+
+def cmd_districts(args):
+    from scripts.analyze_districts import main
+    return main()
+
+
+def cmd_analyze(args):
+    from scripts.analyze import main
+    from scripts.scope import scope_from_args
+    success = main(scope_from_args(args))
+    if success and args.cobertura:
+        from scripts.coverage import main as coverage_main
+        success = coverage_main(resolution=args.resolucion)
+    if success and args.areas_servicio:
+        from scripts.service_areas import main as service_areas_main
+        success = service_areas_main()
+    return success
+
+
+def cmd_maps(args):
+    builders = {
+        'alcaldias': 'scripts.create_map',
+        'distritos': 'scripts.create_district_map',
+        'unificado': 'scripts.create_unified_map',
+    }
+    import importlib
+    from scripts.scope import scope_from_args
+    scope = scope_from_args(args)
+    selected = builders if args.tipo == 'todos' else {args.tipo: builders[args.tipo]}
+    success = True
+    for module_name in selected.values():
+        success &= bool(importlib.import_module(module_name).main(scope=scope))
+    return success
+
+
+def cmd_run(args):
+    from scripts.pipeline import run_pipeline
+    return run_pipeline(persist=not args.sin_persistir, maps=not args.sin_mapas)
+
+
+def cmd_cities(args):
+    from scripts.multi_city import main
+    argv = list(args.ciudades)
+    if args.mapas:
+        argv.append('--mapas')
+    if args.workers:
+        argv += ['--workers', str(args.workers)]
+    return main(argv)
+
+
+def cmd_nationwide(args):
+    from scripts.nationwide import run_nationwide
+    return run_nationwide(args.memoria_mb, args.desde_cero, args.bloque_grados) is not None
+
+
+def cmd_query(args):
+    import json
+    from scripts.query_service import lookup, oxxos_in, MetricsSource
+
+    if args.oxxos:
+        result = oxxos_in(args.nombre, args.limite)
+    else:
+        result = lookup(MetricsSource().get(), args.nivel, args.nombre)
+    if result is None:
+        print(f"No encontrado: {args.nivel} {args.nombre or ''}".strip(), file=sys.stderr)
+        return False
+    print(json.dumps(result, ensure_ascii=False, indent=2))
+    return True
+
+
+def cmd_serve(args):
+    from scripts.query_service import serve
+    return serve(args.host, args.port)
+
+
+def cmd_cache(args):
+    from scripts.cache_manager import main
+    argv = [args.accion]
+    if args.budget_mb is not None:
+        argv += ['--budget-mb', str(args.budget_mb)]
+    if args.dry_run:
+        argv.append('--dry-run')
+    return main(argv)
+
+
+def cmd_profile(args):
+    from scripts.profiling import main
+    argv = [args.accion]
+    if args.accion == 'compare':
+        argv += [ref for ref in (args.anterior, args.actual) if ref]
+        if args.umbral is not None:
+            argv += ['--umbral', str(args.umbral)]
+        if args.check:
+            argv.append('--check')
+    return main(argv)
+
+
+def cmd_metrics(args):
+    from scripts.metrics_exporter import main
+    return main(['show'] + (['--check'] if args.check else []))
+
+
+def cmd_publish(args):
+    from scripts.publish import main
+    return main([args.accion] + ([args.version] if args.version else []))
+
+
+def cmd_cube(args):
+    from scripts.cube import main
+    return main(args.dimensiones + ['--medida', args.medida])
+
+
+def build_parser():
+    from scripts.scope import add_scope_arguments
+    from scripts.profiling import add_profile_arguments
+    from config.cities import CITIES, DEFAULT_CITY
+
+    parser = argparse.ArgumentParser(
+        prog='polioxxo',
+        description='Análisis geoespacial de Oxxos por alcaldías y distritos electorales')
+    parser.add_argument('--ciudad', choices=list(CITIES),
+                        help=f'Ciudad activa (por omisión POLIOXXO_CITY o {DEFAULT_CITY})')
+    add_profile_arguments(parser)
+    sub = parser.add_subparsers(dest='command', metavar='<comando>')
+
+    sub.add_parser('download', help='Descargar datos crudos').set_defaults(func=cmd_download)
+    sub.add_parser('process', help='Procesar datos y asignar alcaldías').set_defaults(func=cmd_process)
+    sub.add_parser('districts', help='Análisis por distritos electorales').set_defaults(func=cmd_districts)
+
+    analyze = sub.add_parser('analyze', help='Análisis estadístico y gráficas')
+    analyze.add_argument('--cobertura', action='store_true', help='Incluir superficie de cobertura')
+    analyze.add_argument('--resolucion', type=float, metavar='M',
+                         help='Celda de la cobertura en metros (por omisión POLIOXXO_COVERAGE_RESOLUTION_M)')
+    analyze.add_argument('--areas-servicio', action='store_true', help='Incluir áreas de servicio (Voronoi)')
+    add_scope_arguments(analyze)
+    analyze.set_defaults(func=cmd_analyze)
+
+    maps = sub.add_parser('maps', help='Generar mapas interactivos')
+    maps.add_argument('--tipo', choices=['alcaldias', 'distritos', 'unificado', 'todos'], default='todos')
+    add_scope_arguments(maps)
+    maps.set_defaults(func=cmd_maps)
+
+    run = sub.add_parser('run', help='Pipeline completo en memoria (process, districts, analyze, maps)')
+    run.add_argument('--sin-persistir', action='store_true', help='No escribir GPKG ni almacén procesado')
+    run.add_argument('--sin-mapas', action='store_true', help='Omitir los mapas interactivos')
+    run.set_defaults(func=cmd_run)
+
+    cities = sub.add_parser('cities', help='Pipeline de varias ciudades en procesos paralelos')
+    cities.add_argument('ciudades', nargs='*', metavar='ciudad', help='Claves de ciudad (por omisión todas)')
+    cities.add_argument('--mapas', action='store_true', help='Generar también los mapas')
+    cities.add_argument('--workers', type=int, help='Trabajadores simultáneos')
+    cities.set_defaults(func=cmd_cities)
+
+    nationwide = sub.add_parser('nationwide', help='Corrida nacional por bloques con puntos de control')
+    nationwide.add_argument('--desde-cero', action='store_true', help='Descartar puntos de control previos')
+    nationwide.add_argument('--memoria-mb', type=int, help='Memoria estimada máxima por bloque')
+    nationwide.add_argument('--bloque-grados', type=float, help='Tamaño de la malla inicial (grados)')
+    nationwide.set_defaults(func=cmd_nationwide)
+
+    query = sub.add_parser('query', help='Consultar métricas (alcaldias, distritos, partidos)')
+    query.add_argument('nivel', choices=['alcaldias', 'distritos', 'partidos'])
+    query.add_argument('nombre', nargs='?', help='Nombre de la región o partido')
+    query.add_argument('--oxxos', action='store_true', help='Listar Oxxos de la alcaldía')
+    query.add_argument('--limite', type=int, default=20)
+    query.set_defaults(func=cmd_query)
+
+    serve = sub.add_parser('serve', help='Servicio HTTP de consultas (JSON)')
+    serve.add_argument('--host', default='127.0.0.1')
+    serve.add_argument('--port', type=int, default=8765)
+    serve.set_defaults(func=cmd_serve)
+
+    cache = sub.add_parser('cache', help='Administrar la caché de artefactos')
+    cache.add_argument('accion', choices=['stats', 'prune', 'verify'])
+    cache.add_argument('--budget-mb', type=float)
+    cache.add_argument('--dry-run', action='store_true')
+    cache.set_defaults(func=cmd_cache)
+
+    profile = sub.add_parser('profile', help='Perfiles por etapa (listar, comparar corridas)')
+    profile.add_argument('accion', choices=['list', 'compare'])
+    profile.add_argument('anterior', nargs='?', help='run-id o ruta (por omisión la penúltima corrida)')
+    profile.add_argument('actual', nargs='?', help='run-id o ruta (por omisión la última corrida)')
+    profile.add_argument('--umbral', type=float, help='Porcentaje de crecimiento que cuenta como regresión')
+    profile.add_argument('--check', action='store_true', help='Fallar si hay regresiones')
+    profile.set_defaults(func=cmd_profile)
+
+    metrics = sub.add_parser('metrics', help='Mostrar o validar las métricas exportadas (.prom)')
+    metrics.add_argument('--check', action='store_true', help='Solo validar el formato')
+    metrics.set_defaults(func=cmd_metrics)
+
+    publish = sub.add_parser('publish', help='Versiones publicadas de las salidas (listar, publicar, activar)')
+    publish.add_argument('accion', choices=['list', 'publish', 'activate'], nargs='?', default='list')
+    publish.add_argument('version', nargs='?', help='Versión a activar')
+    publish.set_defaults(func=cmd_publish)
+
+    cube = sub.add_parser('cube', help='Rollups y cortes del cubo de agregados publicado')
+    cube.add_argument('dimensiones', nargs='*', help='Una o dos dimensiones (sin dimensiones: resumen)')
+    cube.add_argument('--medida', default='num_oxxos', help='num_oxxos o num_direcciones')
+    cube.set_defaults(func=cmd_cube)
+    return parser
+
+
+def main(argv=None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if args.command is None:
+        parser.print_help()
+        return 0
+    if args.ciudad:
+        from config.cities import set_active_city
+        set_active_city(args.ciudad)
+    from scripts.profiling import start_run, finish_run, profile_from_args
+    profile_from_args(args)
+    start_run(args.command)
+    success = bool(args.func(args))
+    finish_run(success)
+    return 0 if success else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,369 @@
+#!/usr/bin/env python3
+"""
+Documento único de métricas - Polioxxo
+
+Este módulo:
+1. Calcula una sola vez las métricas por alcaldía, partido y distrito
+2. Las guarda en un documento tipado (data/processed/metricas.json) que
+   cada etapa completa con su sección
+3. Genera todos los reportes de texto a partir de ese documento, sin
+   volver a recorrer los datos
+"""
+
+import sys
+import os
+
+# Agregar ruta del proyecto al path de Python
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import json
+import time
+from dataclasses import dataclass, field, asdict, fields
+from pathlib import Path
+
+from scripts.utils import setup_logging, get_project_paths
+from config.cities import get_city
+
+METRICS_VERSION = 1
+METRICS_FILE = 'metricas.json'
+
+
+@dataclass
+class MetricsDocument:
+    """
+    Métricas del proyecto; cada lista de dicts es una tabla (una fila por
+    región o partido) lista para JSON o DataFrame
+    """
+    version: int = METRICS_VERSION
+    actualizado: dict = field(default_factory=dict)      # sección -> fecha
+    general: dict = field(default_factory=dict)
+    alcaldias: list = field(default_factory=list)
+    partidos_alcaldia: list = field(default_factory=list)
+    descriptivas_alcaldia: dict = field(default_factory=dict)
+    correlacion_votos_oxxos: float = None
+    distritos: list = field(default_factory=list)
+    partidos_distrito: list = field(default_factory=list)
+    alcaldias_distritos: list = field(default_factory=list)
+    significancia: dict = field(default_factory=dict)    # nivel -> {correlacion, densidades}
+    patrones: dict = field(default_factory=dict)         # nivel -> filas
+
+    def update(self, section, **values):
+        """Reemplaza campos del documento y registra la fecha de la sección"""
+        for name, value in values.items():
+            setattr(self, name, value)
+        self.actualizado[section] = time.strftime('%Y-%m-%dT%H:%M:%S')
+        return self
+
+    def table(self, name):
+        """Campo tabular como DataFrame"""
+        import pandas as pd
+        return pd.DataFrame(getattr(self, name))
+
+    def to_dict(self):
+        return asdict(self)
+
+    @classmethod
+    def from_dict(cls, data):
+        known = {f.name for f in fields(cls)}
+        return cls(**{k: v for k, v in data.items() if k in known})
+
+
+def _records(frame):
+    """Filas JSON-serializables (tipos numpy -> Python)"""
+    import pandas as pd
+    return json.loads(pd.DataFrame(frame).to_json(orient='records', force_ascii=False))
+
+
+def _party_table(frame, party_column, count_column, unit_name, total_units, total_oxxos):
+    """Agregado por partido con un solo groupby"""
+    grouped = frame.groupby(party_column, sort=False, observed=True).agg(
+        unidades=(count_column, 'size'),
+        total_oxxos=(count_column, 'sum'),
+        promedio_oxxos=(count_column, 'mean'),
+    ).reset_index().rename(columns={party_column: 'partido'})
+    grouped['pct_unidades'] = grouped['unidades'] / total_units * 100 if total_units else 0.0
+    grouped['pct_oxxos'] = grouped['total_oxxos'] / total_oxxos * 100 if total_oxxos else 0.0
+    grouped['unidad'] = unit_name
+    return grouped
+
+
+# --- Cálculo de secciones ---
+
+def alcaldia_metrics(datos_combinados, total_oxxos, oxxos_asignados=None):
+    """
+    Sección de alcaldías: general, tabla por alcaldía, partidos,
+    descriptivas y correlación votos vs Oxxos
+    """
+    import numpy as np
+    import pandas as pd
+    datos = pd.DataFrame(datos_combinados[['alcaldia', 'num_oxxos', 'partido_ganador', 'votos_totales']]).copy()
+    datos['alcaldia'] = datos['alcaldia'].astype(str)
+    num = datos['num_oxxos']
+    q25, q50, q75 = num.quantile([0.25, 0.5, 0.75])
+    correlation = np.corrcoef(datos['votos_totales'], num)[0, 1] if len(datos) > 1 else np.nan
+
+    return {
+        'general': {
+            'total_alcaldias': int(len(datos)),
+            'total_oxxos': int(total_oxxos),
+            'oxxos_asignados': int(oxxos_asignados if oxxos_asignados is not None else total_oxxos),
+        },
+        'alcaldias': _records(datos.sort_values('num_oxxos', ascending=False)),
+        'partidos_alcaldia': _records(_party_table(datos, 'partido_ganador', 'num_oxxos', 'alcaldia',
+                                                   len(datos), int(total_oxxos))),
+        'descriptivas_alcaldia': {
+            'media': float(num.mean()), 'mediana': float(q50), 'desviacion': float(num.std()),
+            'minimo': int(num.min()), 'maximo': int(num.max()), 'q25': float(q25), 'q75': float(q75),
+        },
+        'correlacion_votos_oxxos': None if np.isnan(correlation) else float(correlation),
+    }
+
+
+def district_metrics(stats_completas, stats_alcaldias):
+    """Sección de distritos: tabla por distrito, partidos y comparación con alcaldías"""
+    import pandas as pd
+    distritos = pd.DataFrame(stats_completas[['distrito', 'alcaldia', 'diputado_ganador', 'num_oxxos_distrito',
+                                              'votos_distrito', 'participacion']]).copy()
+    for column in ('distrito', 'alcaldia'):
+        distritos[column] = distritos[column].astype(str)
+    partidos = _party_table(distritos, 'diputado_ganador', 'num_oxxos_distrito', 'distrito',
+                            len(distritos), int(distritos['num_oxxos_distrito'].sum()))
+    participacion = distritos.groupby('diputado_ganador', sort=False)['participacion'].mean()
+    partidos['participacion_promedio'] = partidos['partido'].map(participacion)
+
+    comparacion = pd.DataFrame(stats_alcaldias[['alcaldia', 'num_distritos', 'num_oxxos_total']]).copy()
+    comparacion['alcaldia'] = comparacion['alcaldia'].astype(str)
+    return {
+        'distritos': _records(distritos.sort_values('num_oxxos_distrito', ascending=False)),
+        'partidos_distrito': _records(partidos),
+        'alcaldias_distritos': _records(comparacion),
+    }
+
+
+def significance_section(correlation=None, densities=None):
+    """Resultado del motor de remuestreo en forma serializable"""
+    return {
+        'correlacion': correlation,
+        'densidades': _records(densities) if densities is not None else [],
+    }
+
+
+# --- Persistencia ---
+
+def metrics_path():
+    return get_project_paths()['data_processed'] / METRICS_FILE
+
+
+def load_metrics(path=None):
+    """Documento de métricas guardado, o uno vacío si no existe"""
+    path = Path(path or metrics_path())
+    if not path.exists():
+        return MetricsDocument()
+    try:
+        with open(path, encoding='utf-8') as f:
+            data = json.load(f)
+        if data.get('version') != METRICS_VERSION:
+            return MetricsDocument()
+        return MetricsDocument.from_dict(data)
+    except (OSError, ValueError) as e:
+        setup_logging('polioxxo.metrics').warning(f"Métricas ilegibles ({e}), se regeneran")
+        return MetricsDocument()
+
+
+def save_metrics(document, path=None):
+    """Escribe el documento de forma atómica"""
+    path = Path(path or metrics_path())
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(f'.{path.name}.tmp-{os.getpid()}')
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(document.to_dict(), f, ensure_ascii=False, indent=2)
+    os.replace(tmp, path)
+    return path
+
+
+def update_metrics(section, **values):
+    """Carga, actualiza una sección y guarda; retorna el documento"""
+    document = load_metrics().update(section, **values)
+    save_metrics(document)
+    setup_logging('polioxxo.metrics').info(f"📐 Métricas actualizadas: {section}")
+    return document
+
+
+# --- Reportes de texto ---
+
+def render_processing_report(doc):
+    """Reporte de process_data.py"""
+    general = doc.general
+    alcaldias = doc.table('alcaldias')
+    partidos = doc.table('partidos_alcaldia').sort_values('unidades', ascending=False)
+    desc = doc.descriptivas_alcaldia
+    columnas = ['alcaldia', 'num_oxxos', 'partido_ganador']
+    partidos_txt = "\n".join(f"{row['partido']:<12}{row['unidades']:>4}" for _, row in partidos.iterrows())
+    return f"""
+=== REPORTE DE PROCESAMIENTO DE DATOS ===
+
+DATOS GENERALES:
+- Total de alcaldías: {general['total_alcaldias']}
+- Total de Oxxos: {general['total_oxxos']}
+- Oxxos asignados a alcaldías: {general['oxxos_asignados']}
+- Oxxos sin asignar: {general['total_oxxos'] - general['oxxos_asignados']}
+
+DISTRIBUCIÓN POR PARTIDO:
+{partidos_txt}
+
+ESTADÍSTICAS DE OXXOS POR ALCALDÍA:
+- Media: {desc['media']:.1f}
+- Mediana: {desc['mediana']:.1f}
+- Mínimo: {desc['minimo']:.0f}
+- Máximo: {desc['maximo']:.0f}
+
+ALCALDÍAS CON MÁS OXXOS:
+{alcaldias.nlargest(5, 'num_oxxos')[columnas].to_string(index=False)}
+
+ALCALDÍAS CON MENOS OXXOS:
+{alcaldias.nsmallest(5, 'num_oxxos')[columnas].to_string(index=False)}
+"""
+
+
+def _significance_text(doc, level, unit):
+    import pandas as pd
+    from scripts.resampling import significance_report
+    section = doc.significancia.get(level)
+    if not section:
+        return ""
+    densities = None
+    if section['densidades']:
+        # JSON guarda NaN como null (p. ej. "vs resto" con un solo partido)
+        densities = pd.DataFrame(section['densidades'])
+        numeric = densities.columns.drop('grupo')
+        densities[numeric] = densities[numeric].astype(float)
+    return significance_report(section['correlacion'], densities, unit=unit)
+
+
+def render_detailed_report(doc):
+    """Reporte detallado de analyze.py"""
+    import pandas as pd
+    from scripts.spatial_stats import format_pattern_report
+
+    general = doc.general
+    alcaldias = doc.table('alcaldias')
+    desc = doc.descriptivas_alcaldia
+    mayor, menor = alcaldias.loc[alcaldias['num_oxxos'].idxmax()], alcaldias.loc[alcaldias['num_oxxos'].idxmin()]
+
+    report = f"""
+=== REPORTE DETALLADO DE ANÁLISIS ===
+Análisis de Oxxos en {get_city().nombre} por Alcaldías y Partidos Políticos
+
+RESUMEN EJECUTIVO:
+- Total de Oxxos analizados: {general['total_oxxos']:,}
+- Total de alcaldías: {general['total_alcaldias']}
+- Promedio de Oxxos por alcaldía: {desc['media']:.1f}
+- Alcaldía con más Oxxos: {mayor['alcaldia']} ({mayor['num_oxxos']} Oxxos)
+- Alcaldía con menos Oxxos: {menor['alcaldia']} ({menor['num_oxxos']} Oxxos)
+
+DISTRIBUCIÓN POR PARTIDO:
+"""
+    for row in doc.partidos_alcaldia:
+        report += f"""
+{row['partido']}:
+  - Alcaldías controladas: {row['unidades']} ({row['pct_unidades']:.1f}%)
+  - Total de Oxxos: {row['total_oxxos']:,} ({row['pct_oxxos']:.1f}%)
+  - Promedio de Oxxos por alcaldía: {row['promedio_oxxos']:.1f}
+"""
+
+    report += "\n\nRANKING DE ALCALDÍAS (por número de Oxxos):\n"
+    for i, row in enumerate(doc.alcaldias, 1):
+        report += f"{i:2d}. {row['alcaldia']}: {row['num_oxxos']} Oxxos ({row['partido_ganador']})\n"
+
+    partidos = doc.table('partidos_alcaldia').sort_values('unidades', ascending=False)
+    correlacion = doc.correlacion_votos_oxxos
+    report += f"""
+
+ESTADÍSTICAS DESCRIPTIVAS:
+- Media: {desc['media']:.2f}
+- Mediana: {desc['mediana']:.2f}
+- Desviación estándar: {desc['desviacion']:.2f}
+- Mínimo: {desc['minimo']}
+- Máximo: {desc['maximo']}
+- Rango intercuartílico: {desc['q75'] - desc['q25']:.2f}
+
+CONCLUSIONES:
+1. Hay una distribución desigual de Oxxos entre alcaldías
+2. {partidos.iloc[0]['partido']} controla la mayoría de alcaldías ({partidos.iloc[0]['unidades']} de {general['total_alcaldias']})
+3. La correlación entre votos y número de Oxxos es: {correlacion if correlacion is not None else float('nan'):.3f}
+"""
+
+    if doc.significancia.get('alcaldia'):
+        report += "\nSIGNIFICANCIA ESTADÍSTICA (bootstrap + permutaciones, * = p < 0.05):\n"
+        report += _significance_text(doc, 'alcaldia', 'alcaldía')
+
+    if doc.patrones:
+        report += "\nPATRÓN ESPACIAL DE PUNTOS (R de Clark–Evans < 1 = agrupado; L(r) - r > 0 = agrupado a escala r):\n"
+    titles = {'alcaldia': 'Por alcaldía', 'distrito': 'Por distrito electoral'}
+    for level, rows in doc.patrones.items():
+        report += format_pattern_report(pd.DataFrame(rows), level, titles.get(level, level))
+    return report
+
+
+def render_district_report(doc):
+    """Reporte de analyze_districts.py"""
+    distritos = doc.table('distritos')
+    partidos = doc.table('partidos_distrito').sort_values('unidades', ascending=False)
+    mayor = distritos.loc[distritos['num_oxxos_distrito'].idxmax()]
+
+    report = f"""
+=== REPORTE DETALLADO: ANÁLISIS POR DISTRITOS ELECTORALES ===
+Análisis de Oxxos en {get_city().nombre} por Distritos Electorales vs Alcaldías
+
+RESUMEN EJECUTIVO:
+- Total de distritos analizados: {len(distritos)}
+- Total de alcaldías con distritos: {len(doc.alcaldias_distritos)}
+- Promedio de Oxxos por distrito: {distritos['num_oxxos_distrito'].mean():.1f}
+- Distrito con más Oxxos: {mayor['distrito']} ({mayor['num_oxxos_distrito']} Oxxos)
+
+ANÁLISIS POR PARTIDO (DISTRITOS):
+"""
+    for row in doc.partidos_distrito:
+        report += f"""
+{row['partido']}:
+  - Distritos controlados: {row['unidades']} ({row['pct_unidades']:.1f}%)
+  - Total de Oxxos: {row['total_oxxos']:,}
+  - Promedio de Oxxos por distrito: {row['promedio_oxxos']:.1f}
+  - Participación promedio: {row['participacion_promedio']:.1f}%
+"""
+
+    report += "\n\nRANKING DE DISTRITOS (por número de Oxxos):\n"
+    for i, row in enumerate(doc.distritos, 1):
+        report += f"{i:2d}. {row['distrito']}: {row['num_oxxos_distrito']} Oxxos ({row['diputado_ganador']}) - {row['alcaldia']}\n"
+
+    report += "\n\nCOMPARACIÓN ALCALDÍAS vs DISTRITOS:\n"
+    for row in doc.alcaldias_distritos:
+        report += f"- {row['alcaldia']}: {row['num_distritos']} distritos, {row['num_oxxos_total']} Oxxos totales\n"
+
+    report += f"""
+
+CONCLUSIONES DISTRITOS ELECTORALES:
+1. Distribución más granular que alcaldías permite mejor análisis político
+2. {partidos.iloc[0]['partido']} domina en {partidos.iloc[0]['unidades']} de {len(distritos)} distritos
+3. Correlación entre densidad de Oxxos y participación electoral
+4. Algunas alcaldías tienen múltiples distritos con diferentes orientaciones políticas
+"""
+
+    if doc.significancia.get('distrito') or doc.significancia.get('malla'):
+        report += "\nSIGNIFICANCIA ESTADÍSTICA (bootstrap + permutaciones, * = p < 0.05):\n"
+        report += _significance_text(doc, 'distrito', 'distrito')
+        if doc.significancia.get('malla'):
+            report += _significance_text(doc, 'malla', 'celda de 1 km')
+            report += "  (las celdas vecinas están autocorrelacionadas; valores p optimistas)\n"
+    return report
+
+
+def write_report(content, path):
+    """Guarda un reporte de texto (de forma atómica)"""
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(f'.{path.name}.tmp-{os.getpid()}')
+    with open(tmp, 'w', encoding='utf-8') as f:
+        f.write(content)
+    os.replace(tmp, path)
+    return path
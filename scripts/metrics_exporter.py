@@ -0,0 +1,279 @@
+#!/usr/bin/env python3
+"""
+Exportador de métricas en archivo de texto (Prometheus) - Polioxxo
+
+Este módulo:
+1. Al terminar cada corrida escribe un archivo .prom en el formato de
+   exposición de Prometheus, compatible con el textfile collector de
+   node_exporter: duración, CPU y filas por etapa, conteos de asignación por
+   método (join / proximidad / forzado: ESTRATEGIAS 1, 2 y 3), aciertos de
+   caché, tamaño de las salidas y marcas de tiempo de la última corrida y del
+   último éxito
+2. Escribe cada archivo completo en un temporal y lo renombra, de modo que
+   el recolector nunca lee un archivo a medias
+3. Lee y valida los archivos escritos (una "recolección" local), sin
+   depender de ningún servicio externo
+
+Un archivo por corrida y ciudad: <METRICS_TEXTFILE_DIR>/polioxxo_<corrida>_<ciudad>.prom,
+donde <corrida> es el nombre de start_run() (el subcomando: run, process, ...)
+
+Uso:
+    python scripts/metrics_exporter.py show [--check]
+"""
+
+import sys
+import os
+
+# Agregar ruta del proyecto al path de Python
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import argparse
+import math
+import re
+import time
+from pathlib import Path
+
+from scripts.utils import setup_logging, get_project_paths
+from config import settings
+
+PREFIX = 'polioxxo'
+
+# (directorio de get_project_paths, patrón) de las salidas cuyo tamaño se exporta
+OUTPUT_PATTERNS = [
+    ('data_processed', '*.gpkg'),
+    ('data_processed', '*.json'),
+    ('reports', '*.txt'),
+    ('reports', '*.png'),
+    ('reports', '*.csv'),
+    ('maps', '*.html'),
+]
+
+_METRIC_NAME = re.compile(r'^[a-zA-Z_:][a-zA-Z0-9_:]*$')
+_SAMPLE = re.compile(r'^([a-zA-Z_:][a-zA-Z0-9_:]*)(\{(.*)\})?\s+(\S+)(\s+\d+)?$')
+_LABEL = re.compile(r'([a-zA-Z_][a-zA-Z0-9_]*)="((?:[^"\\]|\\.)*)"')
+
+
+def textfile_dir():
+    path = Path(settings.METRICS_TEXTFILE_DIR)
+    return path if path.is_absolute() else get_project_paths()['base'] / path
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _unescape(value):
+    return re.sub(r'\\(.)', lambda m: '\n' if m.group(1) == 'n' else m.group(1), value)
+
+
+def _format_value(value):
+    value = float(value)
+    if math.isnan(value):
+        return 'NaN'
+    if math.isinf(value):
+        return '+Inf' if value > 0 else '-Inf'
+    return repr(int(value)) if value.is_integer() and abs(value) < 1e15 else repr(value)
+
+
+class TextfileWriter:
+    """Familias de métricas (gauges) con HELP/TYPE y sus muestras"""
+
+    def __init__(self, base_labels=None):
+        self.base_labels = dict(base_labels or {})
+        self.families = {}
+
+    def gauge(self, name, help_text, value, **labels):
+        if value is None:
+            return
+        name = f'{PREFIX}_{name}'
+        family = self.families.setdefault(name, {'help': help_text, 'samples': []})
+        family['samples'].append(({**self.base_labels, **labels}, value))
+
+    def render(self):
+        lines = []
+        for name, family in self.families.items():
+            lines.append(f"# HELP {name} {family['help']}")
+            lines.append(f"# TYPE {name} gauge")
+            for labels, value in family['samples']:
+                label_text = ','.join(f'{k}="{_escape(v)}"' for k, v in labels.items())
+                lines.append(f"{name}{{{label_text}}} {_format_value(value)}")
+        return '\n'.join(lines) + '\n'
+
+    def write(self, path):
+        """Escritura atómica: temporal oculto en el mismo directorio y rename"""
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_name(f'.{path.name}.tmp-{os.getpid()}')
+        with open(tmp, 'w', encoding='utf-8') as f:
+            f.write(self.render())
+        os.replace(tmp, path)
+        return path
+
+
+def parse_textfile(path):
+    """
+    Recolección local: {(métrica, ((etiqueta, valor), ...)): valor}. Lanza
+    ValueError si una línea no respeta el formato de exposición.
+    """
+    samples, typed = {}, set()
+    with open(path, encoding='utf-8') as f:
+        for number, line in enumerate(f, 1):
+            line = line.rstrip('\n')
+            if not line.strip():
+                continue
+            if line.startswith('#'):
+                parts = line.split(None, 3)
+                if len(parts) >= 3 and parts[1] in ('HELP', 'TYPE'):
+                    if not _METRIC_NAME.match(parts[2]):
+                        raise ValueError(f"{path}:{number}: nombre de métrica inválido {parts[2]!r}")
+                    if parts[1] == 'TYPE':
+                        typed.add(parts[2])
+                continue
+            match = _SAMPLE.match(line)
+            if match is None:
+                raise ValueError(f"{path}:{number}: línea inválida {line!r}")
+            name, _, label_text, value = match.group(1, 2, 3, 4)
+            if name not in typed:
+                raise ValueError(f"{path}:{number}: {name} sin # TYPE previo")
+            labels = tuple((k, _unescape(v)) for k, v in _LABEL.findall(label_text or ''))
+            key = (name, labels)
+            if key in samples:
+                raise ValueError(f"{path}:{number}: serie duplicada {name}{dict(labels)}")
+            samples[key] = float(value)
+    return samples
+
+
+def _last_success(path):
+    """Marca del último éxito guardada en el archivo anterior de la corrida"""
+    if not path.exists():
+        return None
+    try:
+        for (name, _), value in parse_textfile(path).items():
+            if name == f'{PREFIX}_run_last_success_timestamp_seconds':
+                return value
+    except (OSError, ValueError):
+        pass
+    return None
+
+
+def _cache_index_stats():
+    try:
+        from scripts.cache_manager import get_cache_manager
+        manager = get_cache_manager()
+        return manager.stats() if manager.index_path.exists() else []
+    except Exception:
+        return []
+
+
+def build_run_metrics(run, profile, success=None, previous_success=None, city=None):
+    """TextfileWriter con las métricas de una corrida (perfil de scripts/profiling.py)"""
+    from config.cities import active_city_key
+
+    now = time.time()
+    writer = TextfileWriter({'corrida': run, 'ciudad': city or active_city_key()})
+    profile = profile or {}
+
+    # Resultado y marcas de tiempo
+    if success is not None:
+        writer.gauge('run_success', '1 si la última corrida terminó bien, 0 si falló', int(bool(success)))
+    writer.gauge('run_timestamp_seconds', 'Fin de la última corrida (epoch)', now)
+    last_success = now if success else previous_success
+    writer.gauge('run_last_success_timestamp_seconds', 'Fin de la última corrida exitosa (epoch)', last_success)
+
+    total = profile.get('total', {})
+    writer.gauge('run_duration_seconds', 'Duración de la corrida', total.get('wall_s'))
+    writer.gauge('run_cpu_seconds', 'Tiempo de CPU del proceso durante la corrida', total.get('cpu_s'))
+    if total.get('rss_pico_mb') is not None:
+        writer.gauge('run_peak_rss_bytes', 'Pico de memoria residente del proceso', total['rss_pico_mb'] * 1024 * 1024)
+
+    # Etapas
+    for stage, entry in profile.get('etapas', {}).items():
+        writer.gauge('stage_duration_seconds', 'Tiempo de reloj por etapa', entry['wall_s'], etapa=stage)
+        writer.gauge('stage_cpu_seconds', 'Tiempo de CPU del proceso por etapa', entry['cpu_s'], etapa=stage)
+        writer.gauge('stage_calls', 'Llamadas a la etapa en la corrida', entry['llamadas'], etapa=stage)
+        writer.gauge('stage_rows', 'Filas procesadas por la etapa', entry.get('filas'), etapa=stage)
+        writer.gauge('stage_rows_per_second', 'Filas por segundo de la etapa', entry.get('filas_por_s'), etapa=stage)
+        writer.gauge('stage_peak_rss_growth_bytes', 'Crecimiento del pico de memoria durante la etapa',
+                     entry['rss_pico_delta_mb'] * 1024 * 1024, etapa=stage)
+
+    # Contadores: asignación por método y aciertos de caché de la corrida
+    for group, values in profile.get('contadores', {}).items():
+        kind, _, name = group.partition('.')
+        if kind == 'asignacion':
+            for method, value in values.items():
+                writer.gauge('assignment_points', 'Puntos asignados por capa y método (join, proximidad, forzado)',
+                             value, capa=name, metodo=method)
+        elif kind == 'cache':
+            hits, misses = values.get('aciertos', 0), values.get('fallos', 0)
+            writer.gauge('cache_hits', 'Aciertos de caché en la corrida', hits, cache=name)
+            writer.gauge('cache_misses', 'Fallos de caché (artefactos recalculados) en la corrida', misses, cache=name)
+            if hits + misses:
+                writer.gauge('cache_hit_ratio', 'Aciertos / (aciertos + fallos) en la corrida',
+                             hits / (hits + misses), cache=name)
+
+    for row in _cache_index_stats():
+        writer.gauge('cache_index_bytes', 'Bytes de artefactos en el índice de caché',
+                     row['mb'] * 1024 * 1024, cache=row['etapa'])
+        writer.gauge('cache_index_artifacts', 'Artefactos en el índice de caché', row['artefactos'], cache=row['etapa'])
+
+    # Salidas
+    paths = get_project_paths(city)
+    for key, pattern in OUTPUT_PATTERNS:
+        for path in sorted(paths[key].glob(pattern)):
+            stat = path.stat()
+            name = str(path.relative_to(paths['base']))
+            writer.gauge('output_bytes', 'Tamaño de cada archivo de salida', stat.st_size, archivo=name)
+            writer.gauge('output_mtime_seconds', 'Última modificación de cada archivo de salida (epoch)',
+                         stat.st_mtime, archivo=name)
+    return writer
+
+
+def run_textfile_path(run, city=None):
+    from config.cities import active_city_key
+    stem = re.sub(r'[^a-zA-Z0-9_]+', '_', f'{PREFIX}_{run}_{city or active_city_key()}')
+    return textfile_dir() / f'{stem}.prom'
+
+
+def export_run_metrics(run, profile, success=None):
+    """Escribe el archivo .prom de la corrida; la exportación nunca detiene el pipeline"""
+    logger = setup_logging('polioxxo.metrics_exporter')
+    try:
+        path = run_textfile_path(run)
+        writer = build_run_metrics(run, profile, success, _last_success(path))
+        writer.write(path)
+        logger.info(f"📈 Métricas exportadas: {path}")
+        return path
+    except Exception as e:
+        logger.warning(f"No se pudieron exportar las métricas: {e}")
+        return None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Métricas en formato de texto de Prometheus')
+    parser.add_argument('accion', choices=['show'], nargs='?', default='show')
+    parser.add_argument('--check', action='store_true', help='Solo validar el formato de los archivos')
+    args = parser.parse_args(argv)
+
+    files = sorted(textfile_dir().glob('*.prom'))
+    if not files:
+        print(f"Sin archivos .prom en {textfile_dir()}", file=sys.stderr)
+        return False
+    ok = True
+    for path in files:
+        try:
+            samples = parse_textfile(path)
+        except ValueError as e:
+            print(f"❌ {e}", file=sys.stderr)
+            ok = False
+            continue
+        print(f"✅ {path.name}: {len(samples)} series")
+        if not args.check:
+            for (name, labels), value in samples.items():
+                shown = ','.join(f'{k}={v}' for k, v in labels if k not in ('corrida', 'ciudad'))
+                print(f"  {name}{{{shown}}} {_format_value(value)}")
+    return ok
+
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
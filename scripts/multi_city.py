@@ -0,0 +1,207 @@
+#!/usr/bin/env python3
+"""
+Ejecución multi-ciudad - Polioxxo
+
+Este módulo:
+1. Ejecuta el pipeline completo de cada ciudad (config/cities.py) en su
+   propio proceso trabajador, con su partición de datos y salidas
+2. Acota la memoria: cada trabajador atiende una sola ciudad y termina
+   (maxtasksperchild=1), corre con un límite de memoria y el número de
+   trabajadores simultáneos sale de los CPUs y del presupuesto total
+3. Combina las métricas de todas las ciudades en una tabla
+   (reports/metricas_ciudades.csv)
+
+Uso:
+    python scripts/multi_city.py [gdl mty pue ...] [--mapas] [--workers N]
+"""
+
+import sys
+import os
+
+# Agregar ruta del proyecto al path de Python
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import argparse
+import csv
+import multiprocessing
+import time
+
+from scripts.utils import setup_logging, get_project_paths
+from scripts.log_config import pool_logging_kwargs
+from config import settings
+from config.cities import CITIES, DEFAULT_CITY, get_city, set_active_city
+
+SUMMARY_COLUMNS = [
+    'ciudad', 'nombre', 'ok', 'total_oxxos', 'oxxos_asignados', 'regiones', 'area_km2',
+    'oxxos_por_km2', 'media_por_region', 'max_por_region', 'partido_mas_oxxos',
+    'segundos', 'memoria_pico_mb', 'error',
+]
+
+
+def plan_workers(num_cities, workers=None, worker_memory_mb=None, budget_mb=None):
+    """Trabajadores simultáneos: CPUs (o `workers`) acotados por el presupuesto de memoria"""
+    workers = workers or settings.MULTI_CITY_WORKERS or os.cpu_count() or 1
+    worker_memory_mb = settings.MULTI_CITY_WORKER_MEMORY_MB if worker_memory_mb is None else worker_memory_mb
+    budget_mb = settings.MULTI_CITY_MEMORY_BUDGET_MB if budget_mb is None else budget_mb
+    if budget_mb and worker_memory_mb:
+        workers = min(workers, max(1, budget_mb // worker_memory_mb))
+    return max(1, min(workers, num_cities))
+
+
+def _limit_worker(memory_mb):
+    """Límite de memoria del proceso y un hilo por biblioteca numérica"""
+    for var in ('OMP_NUM_THREADS', 'OPENBLAS_NUM_THREADS', 'MKL_NUM_THREADS'):
+        os.environ.setdefault(var, '1')
+    if memory_mb:
+        try:
+            import resource
+            limit = memory_mb * 1024 * 1024
+            resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+        except (ImportError, ValueError, OSError):
+            pass
+
+
+def _peak_memory_mb():
+    try:
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    except ImportError:
+        return None
+
+
+def city_summary(city):
+    """Fila de la tabla combinada desde el documento de métricas de la ciudad"""
+    import geopandas as gpd
+    from scripts.metrics import load_metrics
+
+    doc = load_metrics()
+    general = doc.general
+    area_km2 = 0.0
+    datos_path = get_project_paths()['data_processed'] / 'datos_combinados.gpkg'
+    if datos_path.exists():
+        area_km2 = float(gpd.read_file(datos_path, columns=[]).to_crs(city.crs).area.sum() / 1e6)
+    partidos = sorted(doc.partidos_alcaldia, key=lambda row: row['total_oxxos'], reverse=True)
+    total = general.get('total_oxxos', 0)
+    return {
+        'total_oxxos': total,
+        'oxxos_asignados': general.get('oxxos_asignados', 0),
+        'regiones': general.get('total_alcaldias', 0),
+        'area_km2': round(area_km2, 1),
+        'oxxos_por_km2': round(total / area_km2, 3) if area_km2 else None,
+        'media_por_region': round(doc.descriptivas_alcaldia.get('media', 0.0), 1),
+        'max_por_region': doc.descriptivas_alcaldia.get('maximo'),
+        'partido_mas_oxxos': partidos[0]['partido'] if partidos else None,
+    }
+
+
+def run_city(key, maps=False, memory_mb=None):
+    """
+    Tarea de un trabajador: activa la ciudad, corre el pipeline en memoria y
+    regresa su fila de resumen. Los módulos de las etapas se importan aquí,
+    después de activar la ciudad.
+    """
+    from scripts.profiling import start_run
+
+    start = time.perf_counter()
+    set_active_city(key)
+    start_run(f'ciudad_{key}')
+    _limit_worker(settings.MULTI_CITY_WORKER_MEMORY_MB if memory_mb is None else memory_mb)
+    city = get_city()
+    row = {'ciudad': key, 'nombre': city.nombre, 'ok': False, 'error': None}
+    logger = setup_logging('polioxxo.multi_city')
+
+    try:
+        paths = get_project_paths()
+        missing = [name for name in (city.limites, city.oxxos) if not (paths['data_raw'] / name).exists()]
+        if missing:
+            row['error'] = f"faltan {', '.join(missing)} en {paths['data_raw']}"
+        else:
+            from scripts.pipeline import run_pipeline
+            row['ok'] = run_pipeline(persist=True, maps=maps)
+            if row['ok']:
+                row.update(city_summary(city))
+            else:
+                row['error'] = 'pipeline fallido (ver log)'
+    except MemoryError:
+        row['error'] = 'sin memoria (límite del trabajador)'
+    except Exception as e:
+        row['error'] = str(e)
+
+    row['segundos'] = round(time.perf_counter() - start, 1)
+    row['memoria_pico_mb'] = _peak_memory_mb()
+    status = '✅' if row['ok'] else f"❌ {row['error']}"
+    logger.info(f"🏙️ {city.nombre}: {status} ({row['segundos']}s)")
+    return row
+
+
+def write_city_table(rows, path=None):
+    """Tabla combinada de métricas por ciudad (CSV)"""
+    path = path or get_project_paths(DEFAULT_CITY)['reports'] / 'metricas_ciudades.csv'
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.DictWriter(f, fieldnames=SUMMARY_COLUMNS, extrasaction='ignore')
+        writer.writeheader()
+        for row in sorted(rows, key=lambda r: r['ciudad']):
+            writer.writerow(row)
+    return path
+
+
+def run_cities(keys=None, maps=False, workers=None):
+    """
+    Ejecuta las ciudades en trabajadores independientes (un proceso nuevo por
+    ciudad) y escribe la tabla combinada. Retorna las filas de resumen.
+    """
+    logger = setup_logging('polioxxo.multi_city')
+    keys = list(keys or CITIES)
+    for key in keys:
+        get_city(key)
+    workers = plan_workers(len(keys), workers)
+    logger.info(f"🏙️ {len(keys)} ciudades con {workers} trabajadores")
+
+    rows = []
+    context = multiprocessing.get_context('spawn')
+    # Pool en lugar de ProcessPoolExecutor: max_tasks_per_child solo existe
+    # desde Python 3.11. Los trabajadores reenvían sus registros a este
+    # proceso (un solo archivo de log)
+    with context.Pool(processes=workers, maxtasksperchild=1, **pool_logging_kwargs()) as pool:
+        results = {key: pool.apply_async(run_city, (key, maps)) for key in keys}
+        for key, result in results.items():
+            try:
+                rows.append(result.get())
+            except Exception as e:
+                # La tarea falló fuera de run_city (p. ej. al importar o enviar el resultado)
+                rows.append({'ciudad': key, 'nombre': CITIES[key].nombre, 'ok': False,
+                             'error': f"trabajador terminado: {e}"})
+                logger.error(f"❌ {key}: trabajador terminado: {e}")
+
+    path = write_city_table(rows)
+    logger.info(f"📊 Tabla combinada: {path}")
+    for row in sorted(rows, key=lambda r: r['ciudad']):
+        if row['ok']:
+            logger.info(f"  {row['nombre']:<14}{row['total_oxxos']:>8,} Oxxos {row['regiones']:>4} regiones "
+                        f"{row['oxxos_por_km2'] or 0:>8.2f} /km²")
+        else:
+            logger.info(f"  {row['nombre']:<14} sin resultados: {row['error']}")
+    return rows
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Pipeline de varias ciudades en paralelo')
+    parser.add_argument('ciudades', nargs='*', metavar='ciudad',
+                        help=f"Ciudades a procesar (por omisión todas: {', '.join(CITIES)})")
+    parser.add_argument('--mapas', action='store_true', help='Generar también los mapas')
+    parser.add_argument('--workers', type=int, help='Trabajadores simultáneos')
+    args = parser.parse_args(argv)
+    unknown = [key for key in args.ciudades if key not in CITIES]
+    if unknown:
+        parser.error(f"ciudades desconocidas: {', '.join(unknown)}")
+
+    rows = run_cities(args.ciudades or None, args.mapas, args.workers)
+    return all(row['ok'] for row in rows)
+
+
+if __name__ == "__main__":
+    from scripts.profiling import consume_profile_args
+    consume_profile_args(run='cities')
+    success = main()
+    sys.exit(0 if success else 1)
@@ -0,0 +1,451 @@
+#!/usr/bin/env python3
+"""
+Corrida nacional por bloques - Polioxxo
+
+Este módulo:
+1. Divide el país en bloques espaciales (una malla que se subdivide en
+   cuadrantes hasta que cada bloque cabe en NATIONWIDE_CHUNK_MEMORY_MB), de
+   modo que la memoria pico la fija la configuración y no el tamaño del país
+2. Procesa un bloque a la vez: lee solo sus Oxxos y los límites de su
+   alrededor con el filtro de caja del índice espacial, asigna cada Oxxo a
+   todas las capas (municipio, sección, ...) y guarda en disco un punto de
+   control con las asignaciones y los conteos parciales del bloque
+3. Al reiniciar retoma desde el último punto de control: los bloques ya
+   guardados no se vuelven a calcular mientras las entradas y la
+   configuración no cambien
+4. Combina los conteos parciales de todos los bloques en las tablas finales
+   leyendo un bloque a la vez
+
+Entradas en data/raw/nacional (config/settings.py: NATIONWIDE_OXXOS,
+NATIONWIDE_LAYERS). Salidas en data/processed/nacional y reports/nacional.
+
+Uso:
+    python scripts/nationwide.py [--desde-cero] [--memoria-mb 256]
+"""
+
+import sys
+import os
+
+# Agregar ruta del proyecto al path de Python
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import argparse
+import csv
+import gc
+import json
+import math
+import shutil
+import time
+from pathlib import Path
+
+import numpy as np
+
+from scripts.utils import setup_logging, get_project_paths
+from scripts.profiling import count, stage
+from config import settings
+
+PARTITION = 'nacional'
+PLAN_VERSION = 1
+UNASSIGNED = ''
+
+# Bytes mínimos estimados por Oxxo en memoria (geometría, fid y proyección)
+MIN_POINT_BYTES = 512
+
+
+def nationwide_paths():
+    """Rutas de la partición nacional"""
+    paths = get_project_paths(PARTITION)
+    paths['checkpoints'] = paths['data_processed'] / 'bloques'
+    return paths
+
+
+def _fingerprint(path):
+    stat = Path(path).stat()
+    return {'archivo': Path(path).name, 'bytes': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+
+
+def _atomic_json(data, path):
+    tmp = path.with_name(f'.{path.name}.tmp-{os.getpid()}')
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False, indent=2)
+    os.replace(tmp, path)
+
+
+class NationwideInputs:
+    """
+    Archivos de entrada de la corrida nacional y su costo estimado en
+    memoria por registro
+    """
+
+    def __init__(self, raw_dir, oxxos=None, layers=None):
+        import pyogrio
+
+        self.raw_dir = Path(raw_dir)
+        self.oxxos = self.raw_dir / (oxxos or settings.NATIONWIDE_OXXOS)
+        if not self.oxxos.exists():
+            raise FileNotFoundError(f"No existe {self.oxxos}")
+        self.layers = {}
+        for name, (filename, key, parent, buffer) in (layers or settings.NATIONWIDE_LAYERS).items():
+            path = self.raw_dir / filename
+            if path.exists():
+                self.layers[name] = (path, key, parent if parent in self.layers else None, buffer)
+        if not self.layers:
+            raise FileNotFoundError(f"Sin capas de límites en {self.raw_dir}")
+
+        self.crs = pyogrio.read_info(self.oxxos)['crs']
+        self.point_bytes = max(MIN_POINT_BYTES, self._bytes_per_feature(self.oxxos))
+        self.layer_bytes = {name: self._bytes_per_feature(path) for name, (path, *_) in self.layers.items()}
+
+    @staticmethod
+    def _bytes_per_feature(path):
+        import pyogrio
+        features = pyogrio.read_info(path, force_feature_count=True)['features'] or 1
+        return settings.NATIONWIDE_MEMORY_FACTOR * Path(path).stat().st_size / features
+
+    def fingerprint(self):
+        return {
+            'oxxos': _fingerprint(self.oxxos),
+            'capas': {name: dict(_fingerprint(path), clave=key, padre=parent, buffer=buffer)
+                      for name, (path, key, parent, buffer) in self.layers.items()},
+        }
+
+    def bounds(self, path):
+        """Cajas (N, 4) de los registros de un archivo en el CRS de los Oxxos"""
+        import pyogrio
+        _, bounds = pyogrio.read_bounds(path)
+        bounds = np.asarray(bounds, dtype=np.float64).T
+        layer_crs = pyogrio.read_info(path)['crs']
+        if len(bounds) and layer_crs and self.crs and layer_crs != self.crs:
+            from pyproj import Transformer
+            transformer = Transformer.from_crs(layer_crs, self.crs, always_xy=True)
+            minx, miny = transformer.transform(bounds[:, 0], bounds[:, 1])
+            maxx, maxy = transformer.transform(bounds[:, 2], bounds[:, 3])
+            bounds = np.column_stack([minx, miny, maxx, maxy])
+        return bounds
+
+
+def _count_in(bounds, tile, margin=0.0):
+    """Registros cuya caja toca el bloque (con margen)"""
+    minx, miny, maxx, maxy = tile
+    return int(np.count_nonzero(
+        (bounds[:, 0] <= maxx + margin) & (bounds[:, 2] >= minx - margin) &
+        (bounds[:, 1] <= maxy + margin) & (bounds[:, 3] >= miny - margin)
+    ))
+
+
+def _owned(x, y, tile):
+    """Máscara de los puntos que pertenecen al bloque: [minx, maxx) x [miny, maxy)"""
+    minx, miny, maxx, maxy = tile
+    return (x >= minx) & (x < maxx) & (y >= miny) & (y < maxy)
+
+
+def plan_tiles(inputs, memory_mb=None, tile_deg=None, min_tile_deg=None, margin=None):
+    """
+    Bloques (minx, miny, maxx, maxy) que cubren todos los Oxxos, cada uno con
+    costo estimado dentro del presupuesto de memoria. Solo se leen las cajas
+    de los registros (32 bytes cada una), no las geometrías.
+    """
+    logger = setup_logging('polioxxo.nationwide')
+    budget = (memory_mb or settings.NATIONWIDE_CHUNK_MEMORY_MB) * 1024 * 1024
+    tile_deg = tile_deg or settings.NATIONWIDE_TILE_DEG
+    min_tile_deg = min_tile_deg or settings.NATIONWIDE_MIN_TILE_DEG
+    margin = settings.NATIONWIDE_MARGIN_DEG if margin is None else margin
+
+    points = inputs.bounds(inputs.oxxos)
+    if not len(points):
+        return []
+    x, y = points[:, 0], points[:, 1]
+    layer_bounds = {name: inputs.bounds(path) for name, (path, *_) in inputs.layers.items()}
+
+    def cost(tile):
+        total = np.count_nonzero(_owned(x, y, tile)) * inputs.point_bytes
+        for name, bounds in layer_bounds.items():
+            total += _count_in(bounds, tile, margin) * inputs.layer_bytes[name]
+        return total
+
+    # Malla inicial alineada a múltiplos de tile_deg; el último borde se
+    # extiende para incluir el punto máximo en el intervalo semiabierto
+    x0 = math.floor(x.min() / tile_deg) * tile_deg
+    y0 = math.floor(y.min() / tile_deg) * tile_deg
+    nx = max(1, math.floor((x.max() - x0) / tile_deg) + 1)
+    ny = max(1, math.floor((y.max() - y0) / tile_deg) + 1)
+    pending = [(x0 + i * tile_deg, y0 + j * tile_deg, x0 + (i + 1) * tile_deg, y0 + (j + 1) * tile_deg)
+               for j in range(ny) for i in range(nx)]
+
+    tiles, oversized = [], 0
+    while pending:
+        tile = pending.pop()
+        if not np.any(_owned(x, y, tile)):
+            continue
+        if cost(tile) <= budget:
+            tiles.append(tile)
+            continue
+        minx, miny, maxx, maxy = tile
+        if (maxx - minx) / 2 < min_tile_deg:
+            tiles.append(tile)
+            oversized += 1
+            continue
+        midx, midy = (minx + maxx) / 2, (miny + maxy) / 2
+        pending += [(minx, miny, midx, midy), (midx, miny, maxx, midy),
+                    (minx, midy, midx, maxy), (midx, midy, maxx, maxy)]
+
+    tiles.sort(key=lambda t: (t[1], t[0]))
+    if oversized:
+        logger.warning(f"⚠️ {oversized} bloques exceden {budget / 1024 / 1024:.0f} MB "
+                       f"con el tamaño mínimo de {min_tile_deg}°")
+    return tiles
+
+
+class CheckpointStore:
+    """
+    Puntos de control de la corrida nacional: un plan (bloques, huella de
+    las entradas y configuración) y un .npz por bloque terminado. Cada
+    archivo se escribe completo en un temporal y se renombra, así que tras
+    una caída solo existen bloques íntegros.
+    """
+
+    def __init__(self, directory):
+        self.directory = Path(directory)
+        self.plan_path = self.directory / 'plan.json'
+
+    def load_plan(self):
+        if not self.plan_path.exists():
+            return None
+        with open(self.plan_path, encoding='utf-8') as f:
+            return json.load(f)
+
+    def save_plan(self, plan):
+        self.directory.mkdir(parents=True, exist_ok=True)
+        _atomic_json(plan, self.plan_path)
+
+    def reset(self):
+        if self.directory.exists():
+            shutil.rmtree(self.directory)
+
+    def chunk_path(self, tile_id):
+        return self.directory / f'bloque_{tile_id:05d}.npz'
+
+    def done(self, tile_id):
+        return self.chunk_path(tile_id).exists()
+
+    def save_chunk(self, tile_id, arrays):
+        path = self.chunk_path(tile_id)
+        tmp = path.with_name(f'.{path.name}.tmp-{os.getpid()}')
+        with open(tmp, 'wb') as f:
+            np.savez(f, **arrays)
+        os.replace(tmp, path)
+
+    def load_chunk(self, tile_id):
+        with np.load(self.chunk_path(tile_id), allow_pickle=False) as data:
+            return {name: data[name] for name in data.files}
+
+
+def _read_bbox(path, tile, crs, margin=0.0, columns=None):
+    """Lee un archivo con el filtro de caja (índice espacial del GPKG)"""
+    import geopandas as gpd
+    from shapely.geometry import box
+
+    minx, miny, maxx, maxy = tile
+    mask = gpd.GeoSeries([box(minx - margin, miny - margin, maxx + margin, maxy + margin)], crs=crs)
+    return gpd.read_file(path, bbox=mask, columns=columns, fid_as_index=True)
+
+
+def process_tile(inputs, tile, margin=None):
+    """
+    Asigna los Oxxos de un bloque a todas las capas. Retorna los arreglos
+    del punto de control: asignaciones (fid, lon, lat, clave por capa) y
+    conteos parciales por capa.
+    """
+    from scripts.boundaries import BoundaryRegistry, METHOD_NAMES
+
+    margin = settings.NATIONWIDE_MARGIN_DEG if margin is None else margin
+    points = _read_bbox(inputs.oxxos, tile, inputs.crs, columns=[])
+    x, y = points.geometry.x.to_numpy(), points.geometry.y.to_numpy()
+    owned = _owned(x, y, tile)
+    points, x, y = points[owned], x[owned], y[owned]
+
+    arrays = {'fid': points.index.to_numpy(dtype=np.int64), 'lon': x, 'lat': y}
+    registry = BoundaryRegistry()
+    for name, (path, key, parent, buffer) in inputs.layers.items():
+        regions = _read_bbox(path, tile, inputs.crs, margin)
+        parent_key = inputs.layers[parent][1] if parent else None
+        if parent and parent_key not in regions.columns:
+            parent = parent_key = None
+        registry.add_layer(name, regions, key, buffer=buffer, parent=parent, parent_key=parent_key)
+
+    located = registry.locate(registry.project_points(points)) if len(points) else {}
+    for name, layer in registry.layers.items():
+        if name in located and len(layer):
+            indices, method = located[name]
+            keys = layer.keys[indices].astype(str)
+            method_counts = np.bincount(method, minlength=len(METHOD_NAMES) + 1)
+        else:
+            keys = np.full(len(points), UNASSIGNED)
+            method_counts = np.zeros(len(METHOD_NAMES) + 1, dtype=np.int64)
+        count(f'asignacion.{name}', {METHOD_NAMES[m]: int(method_counts[m]) for m in METHOD_NAMES})
+        region_keys, counts = np.unique(keys, return_counts=True)
+        arrays[f'{name}__clave'] = keys
+        arrays[f'{name}__regiones'] = region_keys
+        arrays[f'{name}__conteos'] = counts
+        arrays[f'{name}__metodos'] = method_counts
+    return arrays
+
+
+def run_chunks(inputs, store, tiles):
+    """Procesa los bloques pendientes; regresa (procesados, retomados)"""
+    logger = setup_logging('polioxxo.nationwide')
+    processed = resumed = 0
+    for tile_id, tile in enumerate(tiles):
+        if store.done(tile_id):
+            resumed += 1
+            continue
+        start = time.perf_counter()
+        with stage('nationwide.bloque') as info:
+            arrays = process_tile(inputs, tile)
+            store.save_chunk(tile_id, arrays)
+            info['filas'] = len(arrays['fid'])
+        processed += 1
+        logger.info(f"🧩 Bloque {tile_id + 1}/{len(tiles)} "
+                    f"[{tile[0]:.2f}, {tile[1]:.2f}, {tile[2]:.2f}, {tile[3]:.2f}]: "
+                    f"{len(arrays['fid'])} Oxxos ({time.perf_counter() - start:.1f}s)")
+        del arrays
+        gc.collect()
+    return processed, resumed
+
+
+def merge_chunks(inputs, store, tiles, paths):
+    """
+    Combina los puntos de control un bloque a la vez: suma los conteos
+    parciales por capa y escribe las asignaciones en un CSV por flujo.
+    Retorna el resumen de la corrida.
+    """
+    from scripts.boundaries import METHOD_NAMES
+
+    layers = list(inputs.layers)
+    totals = {name: {} for name in layers}
+    methods = {name: np.zeros(len(METHOD_NAMES) + 1, dtype=np.int64) for name in layers}
+    total_oxxos = 0
+
+    paths['data_processed'].mkdir(parents=True, exist_ok=True)
+    paths['reports'].mkdir(parents=True, exist_ok=True)
+    assignments_path = paths['data_processed'] / 'asignaciones_nacional.csv'
+    tmp = assignments_path.with_name(f'.{assignments_path.name}.tmp-{os.getpid()}')
+    with open(tmp, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(['fid', 'lon', 'lat'] + layers)
+        for tile_id in range(len(tiles)):
+            chunk = store.load_chunk(tile_id)
+            total_oxxos += len(chunk['fid'])
+            writer.writerows(zip(chunk['fid'].tolist(), chunk['lon'].tolist(), chunk['lat'].tolist(),
+                                 *(chunk[f'{name}__clave'].tolist() for name in layers)))
+            for name in layers:
+                counts = totals[name]
+                for key, count in zip(chunk[f'{name}__regiones'].tolist(), chunk[f'{name}__conteos'].tolist()):
+                    counts[key] = counts.get(key, 0) + count
+                methods[name] += chunk[f'{name}__metodos']
+    os.replace(tmp, assignments_path)
+
+    tables = {}
+    for name in layers:
+        path = paths['reports'] / f'conteos_{name}.csv'
+        with open(path, 'w', newline='', encoding='utf-8') as f:
+            writer = csv.writer(f)
+            writer.writerow([name, 'num_oxxos'])
+            for key, count in sorted(totals[name].items(), key=lambda item: (-item[1], item[0])):
+                writer.writerow([key or 'SIN_ASIGNAR', count])
+        tables[name] = str(path.relative_to(paths['base']))
+
+    return {
+        'total_oxxos': total_oxxos,
+        'bloques': len(tiles),
+        'capas': {
+            name: {
+                'regiones_con_oxxos': sum(1 for key in totals[name] if key != UNASSIGNED),
+                'sin_asignar': totals[name].get(UNASSIGNED, 0),
+                'metodos': {METHOD_NAMES[m]: int(methods[name][m]) for m in METHOD_NAMES},
+                'tabla': tables[name],
+            }
+            for name in layers
+        },
+        'asignaciones': str(assignments_path.relative_to(paths['base'])),
+    }
+
+
+def run_nationwide(memory_mb=None, fresh=False, tile_deg=None):
+    """
+    Corrida nacional completa: planea los bloques (o retoma el plan
+    guardado), procesa los pendientes y combina los parciales.
+    """
+    from scripts.multi_city import _peak_memory_mb
+
+    logger = setup_logging('polioxxo.nationwide')
+    logger.info("🇲🇽 CORRIDA NACIONAL POR BLOQUES")
+    logger.info("=" * 50)
+    start = time.perf_counter()
+
+    try:
+        paths = nationwide_paths()
+        inputs = NationwideInputs(paths['data_raw'])
+        store = CheckpointStore(paths['checkpoints'])
+        config = {
+            'version': PLAN_VERSION,
+            'memoria_mb': memory_mb or settings.NATIONWIDE_CHUNK_MEMORY_MB,
+            'bloque_grados': tile_deg or settings.NATIONWIDE_TILE_DEG,
+            'bloque_min_grados': settings.NATIONWIDE_MIN_TILE_DEG,
+            'margen_grados': settings.NATIONWIDE_MARGIN_DEG,
+        }
+        fingerprint = inputs.fingerprint()
+
+        plan = None if fresh else store.load_plan()
+        if plan is not None and (plan['entradas'] != fingerprint or plan['config'] != config):
+            logger.warning("⚠️ Las entradas o la configuración cambiaron: se descartan los puntos de control")
+            plan = None
+        if plan is None:
+            store.reset()
+            with stage('nationwide.plan'):
+                tiles = plan_tiles(inputs, config['memoria_mb'], config['bloque_grados'])
+            plan = {'entradas': fingerprint, 'config': config, 'bloques': [list(t) for t in tiles]}
+            store.save_plan(plan)
+            logger.info(f"Plan: {len(tiles)} bloques de ≤ {config['memoria_mb']} MB estimados")
+        tiles = [tuple(t) for t in plan['bloques']]
+
+        processed, resumed = run_chunks(inputs, store, tiles)
+        if resumed:
+            logger.info(f"♻️ {resumed} bloques retomados de puntos de control")
+
+        with stage('nationwide.combinar'):
+            summary = merge_chunks(inputs, store, tiles, paths)
+        summary.update({
+            'bloques_procesados': processed,
+            'bloques_retomados': resumed,
+            'segundos': round(time.perf_counter() - start, 1),
+            'memoria_pico_mb': _peak_memory_mb(),
+            'config': config,
+        })
+        _atomic_json(summary, paths['reports'] / 'resumen_nacional.json')
+
+        logger.info(f"✅ {summary['total_oxxos']:,} Oxxos en {len(tiles)} bloques "
+                    f"({summary['segundos']}s, pico {summary['memoria_pico_mb'] or 0:.0f} MB)")
+        for name, layer in summary['capas'].items():
+            logger.info(f"  {name}: {layer['regiones_con_oxxos']} regiones con Oxxos -> {layer['tabla']}")
+        return summary
+
+    except Exception as e:
+        logger.error(f"Error en la corrida nacional: {e}")
+        return None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Corrida nacional por bloques con puntos de control')
+    parser.add_argument('--desde-cero', action='store_true', help='Descartar puntos de control previos')
+    parser.add_argument('--memoria-mb', type=int, help='Memoria estimada máxima por bloque')
+    parser.add_argument('--bloque-grados', type=float, help='Tamaño de la malla inicial (grados)')
+    args = parser.parse_args(argv)
+    return run_nationwide(args.memoria_mb, args.desde_cero, args.bloque_grados) is not None
+
+
+if __name__ == "__main__":
+    from scripts.profiling import consume_profile_args
+    consume_profile_args(run='nationwide')
+    success = main()
+    sys.exit(0 if success else 1)
@@ -0,0 +1,186 @@
+#!/usr/bin/env python3
+"""
+Pipeline completo en un solo proceso - Polioxxo
+
+Este módulo:
+1. Encadena las etapas (procesamiento, distritos, análisis, mapas) pasando
+   los objetos en memoria: los GeoJSON crudos se leen una sola vez y ningún
+   GPKG se vuelve a leer entre etapas
+2. Persiste los resultados como efecto secundario en un hilo escritor en
+   segundo plano, de modo que cada archivo se serializa una sola vez y la
+   escritura se traslapa con el cálculo de las etapas siguientes
+3. Al terminar, publica las salidas como una versión nueva
+   (scripts/publish.py): los lectores pasan de la versión anterior a la
+   nueva de una sola vez
+
+Las etapas siguen funcionando por separado (python scripts/<etapa>.py),
+leyendo los archivos que escribió la etapa anterior.
+"""
+
+import sys
+import os
+
+# Agregar ruta del proyecto al path de Python
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import queue
+import threading
+import time
+
+from scripts.utils import setup_logging, get_project_paths
+from scripts.profiling import start_run, finish_run, stage
+
+
+class InlineWriter:
+    """
+    Escritor síncrono: ejecuta cada tarea al enviarla y regresa su resultado.
+    Es el escritor por omisión cuando una etapa se ejecuta sola.
+    """
+
+    def submit(self, description, func, *args, **kwargs):
+        with stage(f"save.{description}"):
+            return func(*args, **kwargs)
+
+    def close(self):
+        return True
+
+
+class NullWriter:
+    """Escritor que descarta las tareas (pipeline sin persistencia)"""
+
+    def submit(self, description, func, *args, **kwargs):
+        return True
+
+    def close(self):
+        return True
+
+
+class BackgroundWriter:
+    """
+    Hilo escritor: las tareas se ejecutan en orden de envío mientras el hilo
+    principal continúa. `close()` espera a que terminen y regresa False si
+    alguna falló (excepción o resultado False).
+
+    Quien envía una tarea no debe modificar después los objetos que le pasó;
+    para GeoDataFrames basta con enviar `frame.copy(deep=False)`.
+    """
+
+    _STOP = object()
+
+    def __init__(self, name='polioxxo-writer'):
+        self.logger = setup_logging('polioxxo.pipeline')
+        self.failures = []
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name=name, daemon=True)
+        self._thread.start()
+
+    def submit(self, description, func, *args, **kwargs):
+        self._queue.put((description, func, args, kwargs))
+        return True
+
+    def _run(self):
+        while True:
+            task = self._queue.get()
+            if task is self._STOP:
+                return
+            description, func, args, kwargs = task
+            start = time.perf_counter()
+            try:
+                with stage(f"save.{description}"):
+                    result = func(*args, **kwargs)
+                if result is False:
+                    self.failures.append(description)
+                    self.logger.error(f"❌ Escritura fallida: {description}")
+                else:
+                    self.logger.info(f"💾 {description} ({time.perf_counter() - start:.1f}s, en segundo plano)")
+            except Exception as e:
+                self.failures.append(description)
+                self.logger.error(f"❌ Error escribiendo {description}: {e}")
+
+    def close(self):
+        self._queue.put(self._STOP)
+        self._thread.join()
+        return not self.failures
+
+
+def _run_stages(writer, maps):
+    from scripts.process_data import process
+    from scripts.analyze_districts import run_district_analysis
+    from scripts.analyze import run_analysis
+    from scripts.catalog import ensure_region_keys
+
+    processed = process(writer)
+    if processed is None:
+        return False
+
+    alcaldias, districts = processed['alcaldias'], processed['districts']
+    # Una sola conversión del almacén columnar para las etapas que usan GeoDataFrame
+    oxxos = processed['oxxos'].to_geodataframe()
+    ensure_region_keys(oxxos, 'alcaldia')
+    if 'distrito' in oxxos.columns:
+        ensure_region_keys(oxxos, 'distrito')
+
+    # process() ya escribió distritos y almacén con la misma asignación;
+    # las ciudades sin distritos (config/cities.py) solo tienen alcaldías
+    if districts is None:
+        setup_logging('polioxxo.pipeline').info("Sin distritos electorales: se omiten sus etapas")
+    elif not run_district_analysis(oxxos, districts, writer, persist_shared=False):
+        return False
+    if not run_analysis(alcaldias, oxxos, districts):
+        return False
+
+    if maps:
+        from scripts import create_map, create_district_map, create_unified_map
+        get_project_paths()['maps'].mkdir(parents=True, exist_ok=True)
+        if create_map.main(alcaldias, oxxos) is None:
+            return False
+        if districts is not None:
+            if not create_district_map.main(alcaldias, oxxos, districts):
+                return False
+            if not create_unified_map.main(alcaldias, oxxos, districts):
+                return False
+    return True
+
+
+def run_pipeline(persist=True, maps=True):
+    """
+    Ejecuta todas las etapas en memoria. Con `persist`, los GPKG, el
+    almacén procesado y el snapshot se escriben en segundo plano.
+    """
+    logger = setup_logging('polioxxo.pipeline')
+    start_run('pipeline')
+    logger.info("🚀 PIPELINE COMPLETO EN MEMORIA")
+    logger.info("=" * 50)
+    start = time.perf_counter()
+
+    writer = BackgroundWriter() if persist else NullWriter()
+    success = False
+    try:
+        success = _run_stages(writer, maps)
+    except Exception as e:
+        logger.error(f"Error en el pipeline: {e}")
+    finally:
+        logger.info("Esperando escrituras en segundo plano...")
+        written = writer.close()
+
+    if not written:
+        logger.error("⚠️ Algunas escrituras fallaron; revisa el log")
+    if persist and success and written:
+        # Las escrituras terminaron: las salidas se activan juntas como una versión
+        from scripts.publish import publish_outputs
+        publish_outputs()
+    if success and written:
+        logger.info(f"🎉 PIPELINE COMPLETADO en {time.perf_counter() - start:.1f}s")
+    finish_run(success and written)
+    return success and written
+
+
+def main():
+    return run_pipeline()
+
+
+if __name__ == "__main__":
+    from scripts.profiling import consume_profile_args
+    consume_profile_args(run='run')
+    success = main()
+    sys.exit(0 if success else 1)
@@ -0,0 +1,218 @@
+#!/usr/bin/env python3
+"""
+Almacén columnar compacto de puntos (Oxxos) - Polioxxo
+
+Este módulo reemplaza el GeoDataFrame de objetos shapely Point dentro del
+pipeline por:
+1. Arrays contiguos float64 de coordenadas x/y (float32 para despliegue)
+2. Columnas de atributos como pandas Categorical
+3. Una tabla dispersa para etiquetas poco pobladas (teléfono, horario, ...)
+
+La conversión a GeoDataFrame solo ocurre al leer o escribir archivos.
+"""
+
+import sys
+import os
+
+# Agregar ruta del proyecto al path de Python
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+import pandas as pd
+
+# Fracción mínima de valores no vacíos para guardar una columna densa
+DENSE_THRESHOLD = 0.5
+
+
+def _is_text(series):
+    return pd.api.types.is_object_dtype(series) or pd.api.types.is_string_dtype(series)
+
+
+def _present_mask(series):
+    """Valores no nulos y, en columnas de texto, no vacíos"""
+    present = series.notna().to_numpy().copy()
+    if _is_text(series):
+        present &= (series.astype(str).str.len() > 0).to_numpy()
+    return present
+
+
+class PointStore:
+    """
+    Puntos en arrays columnares con atributos categóricos y etiquetas dispersas
+    """
+
+    def __init__(self, x, y, crs='EPSG:4326', attributes=None, sparse=None, index=None):
+        self.x = np.ascontiguousarray(x, dtype=np.float64)
+        self.y = np.ascontiguousarray(y, dtype=np.float64)
+        if self.x.shape != self.y.shape:
+            raise ValueError("x e y deben tener la misma longitud")
+        self.crs = crs
+        # nombre -> Categorical o array numérico de longitud n
+        self.attributes = dict(attributes or {})
+        # nombre -> (filas int32, valores) solo para las filas con dato
+        self.sparse = dict(sparse or {})
+        self.index = pd.RangeIndex(len(self.x)) if index is None else pd.Index(index)
+
+    def __len__(self):
+        return len(self.x)
+
+    def __repr__(self):
+        return (f"PointStore({len(self)} puntos, {len(self.attributes)} atributos, "
+                f"{len(self.sparse)} dispersos, {self.bytes_per_point():.1f} B/punto)")
+
+    # --- Conversión en las fronteras de E/S ---
+
+    @classmethod
+    def from_geodataframe(cls, gdf, dense_threshold=DENSE_THRESHOLD):
+        """
+        Construye el almacén desde un GeoDataFrame de puntos
+        """
+        import shapely
+
+        geoms = np.asarray(gdf.geometry.values, dtype=object)
+        x = shapely.get_x(geoms)
+        y = shapely.get_y(geoms)
+
+        attributes, sparse = {}, {}
+        n = len(gdf)
+        for column in gdf.columns:
+            if column == gdf.geometry.name:
+                continue
+            series = gdf[column]
+            present = _present_mask(series)
+            if n and present.mean() < dense_threshold:
+                rows = np.flatnonzero(present).astype(np.int32)
+                values = series.to_numpy()[rows]
+                if _is_text(series):
+                    values = pd.Categorical(values)
+                sparse[column] = (rows, values)
+            elif _is_text(series) or isinstance(series.dtype, pd.CategoricalDtype):
+                attributes[column] = pd.Categorical(series)
+            else:
+                attributes[column] = series.to_numpy()
+
+        return cls(x, y, crs=gdf.crs, attributes=attributes, sparse=sparse, index=gdf.index)
+
+    def to_geodataframe(self, crs=None):
+        """
+        GeoDataFrame con todas las columnas (para escribir a disco o mapas)
+        """
+        import geopandas as gpd
+
+        frame = self.to_frame()
+        geometry = gpd.points_from_xy(self.x, self.y, crs=self.crs)
+        gdf = gpd.GeoDataFrame(frame, geometry=geometry, crs=self.crs)
+        if crs is not None and gdf.crs != crs:
+            gdf = gdf.to_crs(crs)
+        return gdf
+
+    def to_frame(self, columns=None):
+        """
+        DataFrame de atributos (sin geometría); las columnas dispersas se
+        expanden con '' o NaN en las filas sin dato
+        """
+        columns = columns or list(self.columns)
+        data = {}
+        for column in columns:
+            data[column] = self[column]
+        return pd.DataFrame(data, index=self.index)
+
+    # --- Acceso a columnas ---
+
+    @property
+    def columns(self):
+        return list(self.attributes) + list(self.sparse)
+
+    def __contains__(self, column):
+        return column in self.attributes or column in self.sparse
+
+    def __getitem__(self, column):
+        if column in self.attributes:
+            return pd.Series(self.attributes[column], index=self.index, name=column)
+        if column in self.sparse:
+            rows, values = self.sparse[column]
+            if isinstance(values, pd.Categorical) or values.dtype == object:
+                full = np.full(len(self), '', dtype=object)
+            else:
+                full = np.full(len(self), np.nan)
+            full[rows] = np.asarray(values)
+            return pd.Series(full, index=self.index, name=column)
+        raise KeyError(column)
+
+    def get(self, column, default=None):
+        return self[column] if column in self else default
+
+    def __setitem__(self, column, values):
+        values = pd.Series(values).to_numpy() if not isinstance(values, pd.Categorical) else values
+        if len(values) != len(self):
+            raise ValueError(f"La columna '{column}' no tiene {len(self)} valores")
+        self.sparse.pop(column, None)
+        if not isinstance(values, pd.Categorical) and values.dtype == object:
+            values = pd.Categorical(values)
+        self.attributes[column] = values
+
+    # --- Geometría ---
+
+    def coords(self, dtype=np.float64):
+        """Matriz (n, 2) de coordenadas; float32 basta para despliegue"""
+        return np.column_stack([self.x.astype(dtype, copy=False), self.y.astype(dtype, copy=False)])
+
+    def points(self):
+        """Array de shapely Points (temporal, para consultas al índice)"""
+        import shapely
+        return shapely.points(self.x, self.y)
+
+    def projected_xy(self, crs):
+        """Coordenadas transformadas a otro CRS sin crear objetos Point"""
+        if crs is None or self.crs is None or str(self.crs) == str(crs):
+            return self.x, self.y
+        from pyproj import Transformer
+        transformer = Transformer.from_crs(self.crs, crs, always_xy=True)
+        return transformer.transform(self.x, self.y)
+
+    # --- Selección ---
+
+    def copy(self):
+        """Copia superficial: comparte arrays, no los diccionarios de columnas"""
+        return PointStore(self.x, self.y, self.crs, dict(self.attributes), dict(self.sparse), self.index)
+
+    def take(self, indices):
+        """Nuevo almacén con las filas indicadas (posiciones o máscara)"""
+        indices = np.asarray(indices)
+        if indices.dtype == bool:
+            indices = np.flatnonzero(indices)
+        attributes = {name: values[indices] for name, values in self.attributes.items()}
+
+        sparse = {}
+        if len(self.sparse):
+            position = np.full(len(self), -1, dtype=np.int64)
+            position[indices] = np.arange(len(indices))
+            for name, (rows, values) in self.sparse.items():
+                new_rows = position[rows]
+                keep = new_rows >= 0
+                order = np.argsort(new_rows[keep], kind='stable')
+                sparse[name] = (new_rows[keep][order].astype(np.int32), values[np.flatnonzero(keep)[order]])
+
+        return PointStore(self.x[indices], self.y[indices], self.crs, attributes, sparse,
+                          self.index[indices])
+
+    # --- Memoria ---
+
+    def memory_usage(self):
+        """Bytes ocupados por coordenadas, atributos y tabla dispersa"""
+        total = self.x.nbytes + self.y.nbytes
+        for values in self.attributes.values():
+            if isinstance(values, pd.Categorical):
+                total += values.codes.nbytes + values.categories.memory_usage(deep=True)
+            else:
+                total += values.nbytes
+        for rows, values in self.sparse.values():
+            total += rows.nbytes
+            if isinstance(values, pd.Categorical):
+                total += values.codes.nbytes + values.categories.memory_usage(deep=True)
+            else:
+                total += pd.Series(values).memory_usage(deep=True, index=False)
+        return total
+
+    def bytes_per_point(self):
+        return self.memory_usage() / max(len(self), 1)
@@ -11,7 +11,6 @@ Este script:
 
 import sys
 import os
-from pathlib import Path
 
 # Agregar ruta del proyecto al path de Python
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -19,17 +18,29 @@ sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 import geopandas as gpd
 import pandas as pd
 import numpy as np
-from shapely.geometry import Point
-import logging
 
 from scripts.utils import (
-    setup_logging, get_project_paths, validate_geometry, 
-    ensure_same_crs, save_geodataframe, load_geodataframe
+    setup_logging, get_project_paths, 
+    save_geodataframe, load_geodataframe
 )
+from scripts.boundaries import BoundaryRegistry
+from scripts.catalog import get_catalog, add_region_keys
+from scripts.point_store import PointStore
+from scripts.processed_store import write_processed_store
+from scripts.cube import AggregateCube, set_current_cube, write_cube
+from scripts.snapshots import record_snapshot
+from scripts.geometry_qa import geometry_qa
+from scripts.pipeline import InlineWriter
+from scripts.profiling import profiled
+from scripts.log_config import log_sample
+from scripts.publish import publish_outputs
+from scripts.metrics import alcaldia_metrics, update_metrics, render_processing_report, write_report
+from config.cities import get_city
 
+@profiled('load.alcaldias')
 def load_alcaldias_data():
     """
-    Carga y valida los datos de alcaldías
+    Carga y valida los datos de alcaldías (o municipios de la ciudad activa)
     """
     logger = setup_logging('polioxxo.process')
     paths = get_project_paths()
@@ -37,7 +48,7 @@ def load_alcaldias_data():
     
     try:
         # Cargar GeoJSON de alcaldías
-        alcaldias_path = paths['data_raw'] / 'alcaldias_cdmx.geojson'
+        alcaldias_path = paths['data_raw'] / get_city().limites
         if not alcaldias_path.exists():
             logger.error(f"Archivo no encontrado: {alcaldias_path}")
             return None
@@ -50,19 +61,27 @@ def load_alcaldias_data():
             return None
         
         # Validar geometrías
-        alcaldias = validate_geometry(alcaldias)
+        alcaldias = geometry_qa(alcaldias, 'alcaldias')
+        if len(alcaldias) == 0:
+            logger.error("Todas las geometrías de alcaldías quedaron en cuarentena (¿CRS o límites de la ciudad incorrectos?)")
+            return None
         
         # Limpiar nombres de alcaldías
         if 'nomgeo' in alcaldias.columns:
             alcaldias['alcaldia'] = alcaldias['nomgeo'].str.upper().str.strip()
         elif 'nombre' in alcaldias.columns:
             alcaldias['alcaldia'] = alcaldias['nombre'].str.upper().str.strip()
+        elif 'municipio' in alcaldias.columns:
+            alcaldias['alcaldia'] = alcaldias['municipio'].str.upper().str.strip()
         elif 'alcaldia' in alcaldias.columns:
             alcaldias['alcaldia'] = alcaldias['alcaldia'].str.upper().str.strip()
         else:
             logger.error("No se encontró columna de nombre de alcaldía")
             return None
         
+        # Ids enteros estables y columna categórica para todos los joins
+        add_region_keys(alcaldias, 'alcaldia', register=True)
+        
         logger.info(f"Cargadas {len(alcaldias)} alcaldías")
         return alcaldias
         
@@ -70,6 +89,7 @@ def load_alcaldias_data():
         logger.error(f"Error cargando alcaldías: {e}")
         return None
 
+@profiled('load.oxxos')
 def load_oxxos_data():
     """
     Carga y valida los datos de Oxxos
@@ -80,7 +100,7 @@ def load_oxxos_data():
     
     try:
         # Cargar GeoJSON de Oxxos
-        oxxos_path = paths['data_raw'] / 'oxxos_cdmx.geojson'
+        oxxos_path = paths['data_raw'] / get_city().oxxos
         if not oxxos_path.exists():
             logger.error(f"Archivo no encontrado: {oxxos_path}")
             return None
@@ -93,7 +113,10 @@ def load_oxxos_data():
             return None
         
         # Validar geometrías
-        oxxos = validate_geometry(oxxos)
+        oxxos = geometry_qa(oxxos, 'oxxos')
+        if len(oxxos) == 0:
+            logger.error("Todas las geometrías de Oxxos quedaron en cuarentena (¿CRS o límites de la ciudad incorrectos?)")
+            return None
         
         # Limpiar datos de forma segura
         # Manejo seguro de la columna 'name'
@@ -119,20 +142,55 @@ def load_oxxos_data():
         else:
             oxxos['direccion'] = ''
         
-        # Asegurar que las geometrías sean válidas
-        oxxos = oxxos[oxxos.geometry.is_valid]
-        
-        logger.info(f"Cargados {len(oxxos)} Oxxos")
-        return oxxos
+        # Dentro del pipeline los Oxxos viajan como almacén columnar compacto
+        store = PointStore.from_geodataframe(oxxos)
+        logger.info(f"Cargados {len(store)} Oxxos ({store.bytes_per_point():.1f} bytes por Oxxo)")
+        return store
         
     except Exception as e:
         logger.error(f"Error cargando Oxxos: {e}")
         return None
 
+def load_city_electoral_data(city):
+    """
+    Carga el CSV electoral de una ciudad (región, partido_ganador,
+    votos_totales, porcentaje); sin archivo, las regiones quedan "Sin datos"
+    """
+    logger = setup_logging('polioxxo.process')
+    columns = ['alcaldia', 'partido_ganador', 'votos_totales', 'porcentaje']
+    
+    try:
+        path = get_project_paths()['data_raw'] / city.elecciones
+        if not path.exists():
+            logger.warning(f"Sin datos electorales para {city.nombre} ({path.name})")
+            elecciones = pd.DataFrame({c: pd.Series(dtype='float64' if c in ('votos_totales', 'porcentaje') else 'object')
+                                       for c in columns})
+        else:
+            elecciones = pd.read_csv(path).rename(columns={'municipio': 'alcaldia'})
+            elecciones['porcentaje'] = elecciones['porcentaje'].fillna(0.0)
+        
+        add_region_keys(elecciones, 'alcaldia')
+        desconocidas = elecciones.loc[elecciones['alcaldia_id'] < 0, 'alcaldia'].size
+        if desconocidas:
+            logger.warning(f"{desconocidas} regiones electorales no están en el catálogo")
+        
+        logger.info(f"Cargados datos electorales para {len(elecciones)} regiones de {city.nombre}")
+        return elecciones[columns + ['alcaldia_id']]
+        
+    except Exception as e:
+        logger.error(f"Error cargando datos electorales: {e}")
+        return None
+
+@profiled('load.elecciones')
 def load_electoral_data():
     """
-    Carga datos electorales sintéticos para las alcaldías de CDMX
+    Carga datos electorales sintéticos para las alcaldías de CDMX; las demás
+    ciudades leen su CSV (config/cities.py)
     """
+    city = get_city()
+    if city.elecciones is not None:
+        return load_city_electoral_data(city)
+    
     logger = setup_logging('polioxxo.process')
     logger.info("Generando datos electorales sintéticos...")
     
@@ -172,6 +230,12 @@ def load_electoral_data():
         # Asegurar que no hay valores nulos
         elecciones['porcentaje'] = elecciones['porcentaje'].fillna(0.0)
         
+        # Mismo id entero que las geometrías, sin depender de acentos
+        add_region_keys(elecciones, 'alcaldia')
+        desconocidas = elecciones.loc[elecciones['alcaldia_id'] < 0, 'alcaldia'].size
+        if desconocidas:
+            logger.warning(f"{desconocidas} alcaldías electorales no están en el catálogo")
+        
         logger.info(f"Generados datos electorales para {len(elecciones)} alcaldías")
         return elecciones
         
@@ -179,107 +243,88 @@ def load_electoral_data():
         logger.error(f"Error generando datos electorales: {e}")
         return None
 
-def assign_oxxos_to_alcaldias(oxxos, alcaldias):
+def prepare_alcaldias_layer(alcaldias):
+    """
+    Asegura la columna 'alcaldia' en las geometrías de alcaldías
     """
-    Asigna cada Oxxo a su alcaldía correspondiente - VERSION SIMPLIFICADA Y ROBUSTA
+    alcaldias = alcaldias.copy()
+    if 'alcaldia_id' in alcaldias.columns:
+        return alcaldias
+    if 'nomgeo' in alcaldias.columns:
+        alcaldias['alcaldia'] = alcaldias['nomgeo'].str.upper().str.strip()
+    elif 'alcaldia' in alcaldias.columns:
+        alcaldias['alcaldia'] = alcaldias['alcaldia'].str.upper().str.strip()
+    else:
+        # Las regiones de la ciudad activa en orden de id
+        nombres_reales = list(get_city().regiones)
+        alcaldias['alcaldia'] = nombres_reales[:len(alcaldias)]
+    return add_region_keys(alcaldias, 'alcaldia', register=True)
+
+# Capas finas opcionales (se registran solo si el archivo existe en data/raw).
+# Cada una se asigna dentro de su alcaldía ya resuelta (poda jerárquica).
+# '{ciudad}' se sustituye por la clave de la ciudad activa.
+OPTIONAL_LAYERS = [
+    {'name': 'seccion', 'file': 'secciones_{ciudad}.geojson', 'key': 'seccion',
+     'parent': 'alcaldia', 'parent_key': 'alcaldia', 'buffer': 0},
+    {'name': 'colonia', 'file': 'colonias_{ciudad}.geojson', 'key': 'colonia',
+     'parent': 'alcaldia', 'parent_key': 'alcaldia', 'buffer': 0},
+]
+
+def load_optional_layers():
+    """
+    Carga las capas finas opcionales disponibles en data/raw
+    """
+    logger = setup_logging('polioxxo.process')
+    paths = get_project_paths()
+    
+    layers = []
+    for spec in OPTIONAL_LAYERS:
+        layer_path = paths['data_raw'] / spec['file'].format(ciudad=get_city().clave)
+        if not layer_path.exists():
+            continue
+        gdf = load_geodataframe(layer_path)
+        if gdf is None or spec['key'] not in gdf.columns:
+            logger.warning(f"Capa {spec['name']} ignorada: falta la columna '{spec['key']}'")
+            continue
+        if spec['parent_key'] in gdf.columns:
+            # Mismas etiquetas que la capa padre, sin importar acentos
+            gdf[spec['parent_key']] = get_catalog(spec['parent']).categorical(gdf[spec['parent_key']])
+        layers.append((spec, gdf))
+    return layers
+
+def build_boundary_registry(alcaldias, districts=None, extra_layers=None):
+    """
+    Registra todas las capas de límites disponibles para asignación única
+    """
+    registry = BoundaryRegistry()
+    registry.add_layer(
+        'alcaldia', prepare_alcaldias_layer(alcaldias), key='alcaldia',
+        attributes=['alcaldia_id'], buffer=1000
+    )
+    if districts is not None:
+        registry.add_layer(
+            'distrito', districts, key='distrito',
+            attributes=['distrito_id', 'diputado_ganador'], buffer=500
+        )
+    for spec, gdf in extra_layers or []:
+        parent = spec['parent'] if spec['parent_key'] in gdf.columns else None
+        registry.add_layer(
+            spec['name'], gdf, key=spec['key'], buffer=spec['buffer'],
+            parent=parent, parent_key=spec['parent_key'] if parent else None
+        )
+    return registry
+
+@profiled('assign')
+def assign_oxxos_to_layers(oxxos, registry):
+    """
+    Asigna cada Oxxo a todas las capas del registro en una sola pasada
     """
     logger = setup_logging()
-    logger.info("Asignando Oxxos a alcaldías...")
+    logger.info(f"Asignando Oxxos a capas: {list(registry.layers)}...")
     
     try:
-        logger.info(f"ENTRADA: {len(oxxos)} Oxxos, {len(alcaldias)} alcaldías")
-        
-        # Convertir a sistema proyectado para México para cálculos precisos
-        target_crs = "EPSG:6372"  # Mexico ITRF2008 / UTM zone 14N
-        try:
-            oxxos_proj = oxxos.to_crs(target_crs)
-            alcaldias_proj = alcaldias.to_crs(target_crs)
-            logger.info(f"CRS proyectado: {target_crs}")
-        except:
-            # Fallback a Web Mercator
-            target_crs = "EPSG:3857"
-            oxxos_proj = oxxos.to_crs(target_crs)
-            alcaldias_proj = alcaldias.to_crs(target_crs)
-            logger.info(f"CRS proyectado (fallback): {target_crs}")
-        
-        # Crear copia de trabajo de Oxxos (mantener CRS original para resultado)
-        oxxos_resultado = oxxos.copy()
-        
-        # Preparar alcaldías - usar buffer de 1km en metros
-        alcaldias_expandidas = alcaldias_proj.copy()
-        alcaldias_expandidas['geometry'] = alcaldias_expandidas.geometry.buffer(1000)  # 1km buffer en metros
-        
-        # Asegurar que tenemos nombres de alcaldías
-        if 'nomgeo' in alcaldias_expandidas.columns:
-            alcaldias_expandidas['alcaldia'] = alcaldias_expandidas['nomgeo'].str.upper().str.strip()
-        elif 'alcaldia' in alcaldias_expandidas.columns:
-            alcaldias_expandidas['alcaldia'] = alcaldias_expandidas['alcaldia'].str.upper().str.strip()
-        else:
-            # Las 16 alcaldías reales de CDMX
-            nombres_reales = [
-                "AZCAPOTZALCO", "COYOACÁN", "CUAJIMALPA DE MORELOS", "GUSTAVO A. MADERO",
-                "IZTACALCO", "IZTAPALAPA", "LA MAGDALENA CONTRERAS", "MILPA ALTA",
-                "ÁLVARO OBREGÓN", "TLÁHUAC", "TLALPAN", "XOCHIMILCO",
-                "BENITO JUÁREZ", "CUAUHTÉMOC", "MIGUEL HIDALGO", "VENUSTIANO CARRANZA"
-            ]
-            alcaldias_expandidas['alcaldia'] = nombres_reales[:len(alcaldias_expandidas)]
-        
-        logger.info(f"Alcaldías preparadas: {list(alcaldias_expandidas['alcaldia'].unique())}")
-        
-        # Inicializar columnas de resultado
-        oxxos_resultado['alcaldia'] = None
-        if 'nomgeo' not in oxxos_resultado.columns:
-            oxxos_resultado['nomgeo'] = None
-        
-        # ESTRATEGIA 1: Spatial join directo
-        try:
-            resultado_join = gpd.sjoin(
-                oxxos_proj,  # Usar datos proyectados
-                alcaldias_expandidas[['alcaldia', 'geometry']],
-                how='left',
-                predicate='intersects'
-            )
-            
-            # Copiar resultados válidos al resultado original (mantener CRS original)
-            mask_asignados = ~pd.isna(resultado_join['alcaldia'])
-            # Mapear índices de vuelta al DataFrame original
-            for idx in resultado_join.index[mask_asignados]:
-                if idx in oxxos_resultado.index:
-                    oxxos_resultado.loc[idx, 'alcaldia'] = resultado_join.loc[idx, 'alcaldia']
-            
-            asignados_join = mask_asignados.sum()
-            logger.info(f"SPATIAL JOIN: {asignados_join} Oxxos asignados")
-            
-        except Exception as e:
-            logger.warning(f"Spatial join falló: {e}")
-            asignados_join = 0
-        
-        # ESTRATEGIA 2: Para los restantes, asignar por proximidad (usando coordenadas proyectadas)
-        sin_asignar = pd.isna(oxxos_resultado['alcaldia'])
-        if sin_asignar.sum() > 0:
-            logger.info(f"PROXIMIDAD: Asignando {sin_asignar.sum()} Oxxos restantes...")
-            
-            # Crear centroides de alcaldías en sistema proyectado
-            centroides = alcaldias_proj.copy()
-            centroides['geometry'] = centroides.geometry.centroid
-            
-            for idx in oxxos_resultado.index[sin_asignar]:
-                try:
-                    punto_oxxo_proj = oxxos_proj.loc[idx, 'geometry']  # Usar coordenadas proyectadas
-                    if punto_oxxo_proj is not None:
-                        distancias = centroides.geometry.distance(punto_oxxo_proj)
-                        idx_cercano = distancias.idxmin()
-                        oxxos_resultado.loc[idx, 'alcaldia'] = centroides.loc[idx_cercano, 'alcaldia']
-                except Exception as e:
-                    # Asignar a la primera alcaldía como último recurso
-                    oxxos_resultado.loc[idx, 'alcaldia'] = alcaldias_expandidas['alcaldia'].iloc[0]
-        
-        # ESTRATEGIA 3: Garantizar que NO quede ningún Oxxo sin asignar
-        sin_asignar_final = pd.isna(oxxos_resultado['alcaldia'])
-        if sin_asignar_final.sum() > 0:
-            logger.warning(f"FORZANDO asignación de {sin_asignar_final.sum()} Oxxos restantes...")
-            primera_alcaldia = alcaldias_expandidas['alcaldia'].iloc[0]
-            oxxos_resultado.loc[sin_asignar_final, 'alcaldia'] = primera_alcaldia
+        logger.info(f"ENTRADA: {len(oxxos)} Oxxos")
+        oxxos_resultado = registry.assign(oxxos)
         
         # VERIFICACIÓN FINAL
         oxxos_sin_asignar = pd.isna(oxxos_resultado['alcaldia']).sum()
@@ -294,8 +339,8 @@ def assign_oxxos_to_alcaldias(oxxos, alcaldias):
         if oxxos_con_asignacion > 0:
             distribucion = oxxos_resultado['alcaldia'].value_counts()
             logger.info("=== DISTRIBUCIÓN POR ALCALDÍA ===")
-            for alcaldia, count in distribucion.items():
-                logger.info(f"{alcaldia}: {count} Oxxos")
+            log_sample(logger, (f"{alcaldia}: {count} Oxxos" for alcaldia, count in distribucion.items()),
+                       total=len(distribucion))
         
         if oxxos_sin_asignar > 0:
             logger.error(f"ERROR: {oxxos_sin_asignar} Oxxos sin asignar")
@@ -309,30 +354,45 @@ def assign_oxxos_to_alcaldias(oxxos, alcaldias):
         import traceback
         traceback.print_exc()
         return None
-        logger.error(f"Error en spatial join: {e}")
-        import traceback
-        logger.error(f"Traceback: {traceback.format_exc()}")
+
+def assign_oxxos_to_alcaldias(oxxos, alcaldias):
+    """
+    Asigna cada Oxxo a su alcaldía correspondiente
+    """
+    logger = setup_logging()
+    logger.info("Asignando Oxxos a alcaldías...")
+    
+    try:
+        registry = build_boundary_registry(alcaldias)
+    except Exception as e:
+        logger.error(f"Error preparando alcaldías: {e}")
         return None
+    
+    return assign_oxxos_to_layers(oxxos, registry)
 
-def calculate_statistics(oxxos_con_alcaldia):
+@profiled('stats')
+def calculate_statistics(oxxos_con_alcaldia, cube=None):
     """
-    Calcula estadísticas agregadas por alcaldía
+    Calcula estadísticas agregadas por alcaldía (lecturas del cubo de
+    agregados; sin cubo, se construye uno con los Oxxos)
     """
     logger = setup_logging()
     logger.info("Calculando estadísticas por alcaldía...")
     
     try:
-        # Filtrar Oxxos con alcaldía asignada
-        oxxos_validos = oxxos_con_alcaldia.dropna(subset=['alcaldia'])
+        if cube is None:
+            cube = AggregateCube.from_points(oxxos_con_alcaldia)
         
-        # Contar Oxxos por alcaldía
-        conteo_oxxos = oxxos_validos.groupby('alcaldia').size().reset_index(name='num_oxxos')
+        # Alcaldías con algún Oxxo asignado (la última posición son los no asignados)
+        por_alcaldia = cube.rollup('alcaldia')[:-1]
+        ids = np.flatnonzero(por_alcaldia)
+        conteo_oxxos = pd.DataFrame({'alcaldia_id': ids, 'num_oxxos': por_alcaldia[ids]})
         
         # También podemos agregar información adicional si está disponible
-        if 'direccion' in oxxos_validos.columns:
-            direcciones_count = oxxos_validos.groupby('alcaldia')['direccion'].apply(lambda x: x.notna().sum()).reset_index()
-            direcciones_count.columns = ['alcaldia', 'num_direcciones']
-            conteo_oxxos = conteo_oxxos.merge(direcciones_count, on='alcaldia', how='left')
+        if 'num_direcciones' in cube.measures:
+            conteo_oxxos['num_direcciones'] = cube.rollup('alcaldia', measure='num_direcciones')[ids]
+        
+        conteo_oxxos['alcaldia'] = get_catalog('alcaldia').categorical(conteo_oxxos['alcaldia_id'])
         
         logger.info(f"Calculadas estadísticas para {len(conteo_oxxos)} alcaldías")
         logger.info(f"Estadísticas: {conteo_oxxos[['alcaldia', 'num_oxxos']].to_string(index=False)}")
@@ -343,6 +403,7 @@ def calculate_statistics(oxxos_con_alcaldia):
         logger.error(f"Error calculando estadísticas: {e}")
         return None
 
+@profiled('combine')
 def combine_all_data(alcaldias, elecciones, estadisticas_oxxos):
     """
     Combina todos los datos en un GeoDataFrame final
@@ -354,21 +415,23 @@ def combine_all_data(alcaldias, elecciones, estadisticas_oxxos):
         # Comenzar con alcaldías (geometrías)
         datos_combinados = alcaldias.copy()
         
-        # Asegurar que tenemos la columna 'alcaldia'
+        # Asegurar que tenemos la columna 'alcaldia' y su id entero
         if 'nomgeo' in datos_combinados.columns and 'alcaldia' not in datos_combinados.columns:
             datos_combinados['alcaldia'] = datos_combinados['nomgeo']
+        if 'alcaldia_id' not in datos_combinados.columns:
+            add_region_keys(datos_combinados, 'alcaldia', register=True)
         
-        # Agregar datos electorales
+        # Agregar datos electorales (join por id entero)
         datos_combinados = datos_combinados.merge(
-            elecciones, 
-            on='alcaldia', 
+            elecciones.drop(columns=['alcaldia']), 
+            on='alcaldia_id', 
             how='left'
         )
         
         # Agregar estadísticas de Oxxos
         datos_combinados = datos_combinados.merge(
-            estadisticas_oxxos,
-            on='alcaldia',
+            estadisticas_oxxos.drop(columns=['alcaldia']),
+            on='alcaldia_id',
             how='left'
         )
         
@@ -388,68 +451,29 @@ def combine_all_data(alcaldias, elecciones, estadisticas_oxxos):
         logger.error(f"Error combinando datos: {e}")
         return None
 
+@profiled('report.procesamiento', rows=None)
 def create_summary_report(datos_combinados, oxxos_con_alcaldia):
     """
-    Crea un reporte resumen de los datos procesados
+    Actualiza la sección de alcaldías del documento de métricas y genera
+    el reporte resumen a partir de él
     """
     logger = setup_logging()
     logger.info("Creando reporte resumen...")
     
     try:
-        total_alcaldias = len(datos_combinados)
-        total_oxxos = len(oxxos_con_alcaldia)
-        oxxos_asignados = oxxos_con_alcaldia['alcaldia'].notna().sum()
-        
-        # Debug: mostrar datos combinados
-        logger.info("DEBUG - Columnas en datos_combinados:")
-        logger.info(f"  {list(datos_combinados.columns)}")
-        logger.info("DEBUG - Muestra de datos_combinados:")
-        logger.info(f"\n{datos_combinados[['alcaldia', 'partido_ganador', 'num_oxxos', 'votos_totales']].head().to_string()}")
-        
-        # Estadísticas por partido
-        partidos = datos_combinados['partido_ganador'].value_counts()
-        
-        # Estadísticas de Oxxos - verificar que num_oxxos existe
-        if 'num_oxxos' in datos_combinados.columns:
-            stats_oxxos = datos_combinados['num_oxxos'].describe()
-        else:
+        if 'num_oxxos' not in datos_combinados.columns:
             logger.warning("Columna 'num_oxxos' no encontrada en datos_combinados")
-            stats_oxxos = pd.Series([0, 0, 0, 0, 0, 0, 0, 0], 
-                                   index=['count', 'mean', 'std', 'min', '25%', '50%', '75%', 'max'])
+            datos_combinados = datos_combinados.assign(num_oxxos=0)
         
-        # Crear reporte
-        reporte = f"""
-=== REPORTE DE PROCESAMIENTO DE DATOS ===
-
-DATOS GENERALES:
-- Total de alcaldías: {total_alcaldias}
-- Total de Oxxos: {total_oxxos}
-- Oxxos asignados a alcaldías: {oxxos_asignados}
-- Oxxos sin asignar: {total_oxxos - oxxos_asignados}
-
-DISTRIBUCIÓN POR PARTIDO:
-{partidos.to_string()}
-
-ESTADÍSTICAS DE OXXOS POR ALCALDÍA:
-- Media: {stats_oxxos['mean']:.1f}
-- Mediana: {stats_oxxos['50%']:.1f}
-- Mínimo: {stats_oxxos['min']:.0f}
-- Máximo: {stats_oxxos['max']:.0f}
-
-ALCALDÍAS CON MÁS OXXOS:
-{datos_combinados.nlargest(5, 'num_oxxos')[['alcaldia', 'num_oxxos', 'partido_ganador']].to_string(index=False)}
-
-ALCALDÍAS CON MENOS OXXOS:
-{datos_combinados.nsmallest(5, 'num_oxxos')[['alcaldia', 'num_oxxos', 'partido_ganador']].to_string(index=False)}
-"""
+        oxxos_asignados = int(oxxos_con_alcaldia['alcaldia'].notna().sum())
+        documento = update_metrics(
+            'alcaldias', **alcaldia_metrics(datos_combinados, len(oxxos_con_alcaldia), oxxos_asignados)
+        )
+        reporte = render_processing_report(documento)
         
         # Guardar reporte
         paths = get_project_paths()
-        reporte_path = paths['data_processed'] / 'reporte_procesamiento.txt'
-        reporte_path.parent.mkdir(parents=True, exist_ok=True)
-        
-        with open(reporte_path, 'w', encoding='utf-8') as f:
-            f.write(reporte)
+        reporte_path = write_report(reporte, paths['data_processed'] / 'reporte_procesamiento.txt')
         
         logger.info(f"Reporte guardado en: {reporte_path}")
         print(reporte)
@@ -460,8 +484,56 @@ ALCALDÍAS CON MENOS OXXOS:
         logger.error(f"Error creando reporte: {e}")
         return False
 
-def main():
-    """Función principal"""
+def save_processed_data(datos_combinados, oxxos_con_alcaldia, districts, writer):
+    """
+    Envía al escritor los GPKG procesados, el almacén con mapeo a memoria y
+    el snapshot del historial. Con InlineWriter se escriben en el momento y
+    regresa False al primer error.
+    """
+    logger = setup_logging('polioxxo.process')
+    paths = get_project_paths()
+    
+    # Copias: las etapas siguientes pueden agregar columnas a sus frames
+    datos_combinados = datos_combinados.copy(deep=False)
+    oxxos_con_alcaldia = oxxos_con_alcaldia.copy()
+    
+    # Guardar alcaldías con toda la información
+    datos_path = paths['data_processed'] / 'datos_combinados.gpkg'
+    if not writer.submit(datos_path.name, save_geodataframe, datos_combinados, datos_path, 'GPKG'):
+        logger.error("Error guardando datos combinados")
+        return False
+    
+    # Guardar Oxxos con alcaldías asignadas
+    oxxos_path = paths['data_processed'] / 'oxxos_con_alcaldia.gpkg'
+    if not writer.submit(oxxos_path.name, lambda: save_geodataframe(
+            oxxos_con_alcaldia.to_geodataframe(), oxxos_path, 'GPKG')):
+        logger.error("Error guardando Oxxos procesados")
+        return False
+    
+    # Guardar geometrías de distritos para los scripts de distritos y mapas
+    if districts is not None:
+        districts = districts.copy(deep=False)
+        districts_path = paths['data_processed'] / 'distritos_electorales.gpkg'
+        if not writer.submit(districts_path.name, save_geodataframe, districts, districts_path, 'GPKG'):
+            logger.error("Error guardando geometrías de distritos")
+            return False
+    
+    # Almacén con mapeo a memoria para lectores rápidos (dashboard, análisis)
+    writer.submit('almacén procesado', write_processed_store, oxxos_con_alcaldia,
+                  {'alcaldia': datos_combinados, 'distrito': districts})
+    
+    # Historial: snapshot de esta corrida y cambios contra la anterior
+    writer.submit('snapshot del historial', record_snapshot, oxxos_con_alcaldia)
+    return True
+
+def process(writer=None):
+    """
+    Ejecuta el procesamiento y regresa los resultados en memoria:
+    {'alcaldias': datos_combinados, 'oxxos': PointStore, 'districts': distritos,
+    'cube': AggregateCube} o None si falla. La persistencia se delega a
+    `writer` (síncrona por omisión).
+    """
+    writer = writer or InlineWriter()
     logger = setup_logging('polioxxo.process')
     paths = get_project_paths()
     
@@ -476,33 +548,49 @@ def main():
     alcaldias = load_alcaldias_data()
     if alcaldias is None:
         logger.error("No se pudieron cargar las alcaldías")
-        return False
+        return None
     
     oxxos = load_oxxos_data()
     if oxxos is None:
         logger.error("No se pudieron cargar los Oxxos")
-        return False
+        return None
     
     elecciones = load_electoral_data()
     if elecciones is None:
         logger.error("No se pudieron cargar los datos electorales")
-        return False
+        return None
+    
+    # 2. Asignar Oxxos a todas las capas (alcaldías y distritos) en una pasada
+    logger.info("Paso 2: Asignando Oxxos a alcaldías y distritos...")
     
-    # 2. Asignar Oxxos a alcaldías
-    logger.info("Paso 2: Asignando Oxxos a alcaldías...")
+    districts = None
+    if get_city().distritos_sinteticos:
+        from scripts.analyze_districts import create_synthetic_districts
+        districts = create_synthetic_districts()
+    if districts is None:
+        logger.warning("Sin distritos electorales, se asignarán solo alcaldías")
+    
+    try:
+        registry = build_boundary_registry(alcaldias, districts, load_optional_layers())
+    except Exception as e:
+        logger.error(f"Error registrando capas de límites: {e}")
+        return None
     
-    oxxos_con_alcaldia = assign_oxxos_to_alcaldias(oxxos, alcaldias)
+    oxxos_con_alcaldia = assign_oxxos_to_layers(oxxos, registry)
     if oxxos_con_alcaldia is None:
         logger.error("Error en la asignación espacial")
-        return False
+        return None
     
     # 3. Calcular estadísticas
     logger.info("Paso 3: Calculando estadísticas...")
     
-    estadisticas_oxxos = calculate_statistics(oxxos_con_alcaldia)
+    # Una sola agregación de los puntos: las estadísticas, los análisis y
+    # las leyendas de los mapas leen del cubo
+    cube = AggregateCube.from_points(oxxos_con_alcaldia)
+    estadisticas_oxxos = calculate_statistics(oxxos_con_alcaldia, cube)
     if estadisticas_oxxos is None:
         logger.error("Error calculando estadísticas")
-        return False
+        return None
     
     # 4. Combinar todos los datos
     logger.info("Paso 4: Combinando datos...")
@@ -510,22 +598,16 @@ def main():
     datos_combinados = combine_all_data(alcaldias, elecciones, estadisticas_oxxos)
     if datos_combinados is None:
         logger.error("Error combinando datos")
-        return False
+        return None
+    cube.set_regions('alcaldia', datos_combinados)
+    cube.set_regions('distrito', districts)
+    set_current_cube(cube)
     
     # 5. Guardar datos procesados
     logger.info("Paso 5: Guardando datos procesados...")
-    
-    # Guardar alcaldías con toda la información
-    datos_path = paths['data_processed'] / 'datos_combinados.gpkg'
-    if not save_geodataframe(datos_combinados, datos_path, 'GPKG'):
-        logger.error("Error guardando datos combinados")
-        return False
-    
-    # Guardar Oxxos con alcaldías asignadas
-    oxxos_path = paths['data_processed'] / 'oxxos_con_alcaldia.gpkg'
-    if not save_geodataframe(oxxos_con_alcaldia, oxxos_path, 'GPKG'):
-        logger.error("Error guardando Oxxos procesados")
-        return False
+    if not save_processed_data(datos_combinados, oxxos_con_alcaldia, districts, writer):
+        return None
+    writer.submit('cubo de agregados', write_cube, cube)
     
     # 6. Crear reporte resumen
     logger.info("Paso 6: Creando reporte...")
@@ -534,8 +616,18 @@ def main():
     logger.info("=== Procesamiento completado exitosamente ===")
     logger.info("Ejecuta 'python scripts/create_map.py' para generar el mapa")
     
+    return {'alcaldias': datos_combinados, 'oxxos': oxxos_con_alcaldia, 'districts': districts, 'cube': cube}
+
+def main():
+    """Función principal"""
+    if process() is None:
+        return False
+    publish_outputs()
     return True
 
+
 if __name__ == "__main__":
+    from scripts.profiling import consume_profile_args
+    consume_profile_args(run='process')
     success = main()
     sys.exit(0 if success else 1)
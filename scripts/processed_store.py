@@ -0,0 +1,280 @@
+#!/usr/bin/env python3
+"""
+Almacén procesado con mapeo a memoria - Polioxxo
+
+Formato en disco (data/processed/store/, apuntador a la versión vigente
+en data/processed/.store-versiones/, publish.replace_directory):
+- manifest.json: columnas, categorías, capas de límites y CRS
+- x.npy, y.npy: coordenadas float64 de los Oxxos
+- col_<n>.npy: códigos enteros (o valores numéricos) por atributo
+- sparse_<n>_rows.npy / sparse_<n>_codes.npy: etiquetas poco pobladas
+- boundaries_<capa>.wkb + boundaries_<capa>_offsets.npy: geometrías en WKB
+
+Los lectores abren los .npy con mmap_mode='r': el arranque es O(1) y varios
+procesos comparten las mismas páginas físicas del sistema operativo.
+"""
+
+import sys
+import os
+
+# Agregar ruta del proyecto al path de Python
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import json
+import re
+import shutil
+import time
+from pathlib import Path
+
+import numpy as np
+
+from scripts.utils import setup_logging, get_project_paths
+from scripts.publish import replace_directory, resolve_pointer
+
+STORE_FORMAT_VERSION = 1
+MANIFEST_NAME = 'manifest.json'
+
+
+def default_store_dir():
+    """Directorio del almacén procesado del proyecto"""
+    return get_project_paths()['data_processed'] / 'store'
+
+
+def _safe_name(name):
+    return re.sub(r'[^0-9A-Za-z_]+', '_', name)
+
+
+def _smallest_int(n_categories):
+    """Entero más pequeño que admite los códigos de categoría (incluye -1)"""
+    for dtype in (np.int8, np.int16, np.int32):
+        if n_categories < np.iinfo(dtype).max:
+            return dtype
+    return np.int64
+
+
+def _write_categorical(directory, base, values):
+    import pandas as pd
+    categorical = pd.Categorical(values)
+    codes = categorical.codes.astype(_smallest_int(len(categorical.categories)))
+    np.save(directory / f'{base}.npy', codes)
+    return [str(c) for c in categorical.categories]
+
+
+def _write_boundaries(directory, name, gdf, crs):
+    """Escribe un GeoDataFrame de límites como blob WKB + offsets + atributos"""
+    import pandas as pd
+    import shapely
+
+    if crs is not None and gdf.crs is not None and gdf.crs != crs:
+        gdf = gdf.to_crs(crs)
+    wkb = shapely.to_wkb(np.asarray(gdf.geometry.values, dtype=object))
+    sizes = np.fromiter((len(b) for b in wkb), dtype=np.int64, count=len(wkb))
+    offsets = np.concatenate([[0], np.cumsum(sizes)])
+
+    base = f'boundaries_{_safe_name(name)}'
+    with open(directory / f'{base}.wkb', 'wb') as f:
+        for blob in wkb:
+            f.write(blob)
+    np.save(directory / f'{base}_offsets.npy', offsets)
+
+    attributes = pd.DataFrame(gdf.drop(columns=gdf.geometry.name))
+    for column in attributes.columns:
+        if isinstance(attributes[column].dtype, pd.CategoricalDtype):
+            attributes[column] = attributes[column].astype(object)
+    attributes.to_json(directory / f'{base}_attrs.json', orient='split', index=False, force_ascii=False)
+    return {'file': base, 'count': int(len(gdf))}
+
+
+def write_processed_store(store, boundaries=None, directory=None, keep_boundaries=True):
+    """
+    Escribe el almacén procesado de forma atómica (directorio temporal que
+    se publica con publish.replace_directory).
+
+    `store` es un PointStore; `boundaries` un dict nombre -> GeoDataFrame.
+    Con `keep_boundaries`, las capas existentes que no se pasen se conservan,
+    de modo que process_data.py y analyze_districts.py pueden aportar cada
+    uno sus capas.
+    """
+    import pandas as pd
+
+    logger = setup_logging('polioxxo.store')
+    directory = Path(directory or default_store_dir())
+    tmp_dir = directory.with_name(f'{directory.name}.tmp-{os.getpid()}')
+
+    try:
+        if tmp_dir.exists():
+            shutil.rmtree(tmp_dir)
+        tmp_dir.mkdir(parents=True)
+
+        crs = store.crs.to_string() if hasattr(store.crs, 'to_string') else store.crs
+        np.save(tmp_dir / 'x.npy', store.x)
+        np.save(tmp_dir / 'y.npy', store.y)
+
+        columns = {}
+        for name, values in store.attributes.items():
+            base = f'col_{_safe_name(name)}'
+            if isinstance(values, pd.Categorical) or np.asarray(values).dtype == object:
+                categories = _write_categorical(tmp_dir, base, values)
+                columns[name] = {'kind': 'categorical', 'file': base, 'categories': categories}
+            else:
+                np.save(tmp_dir / f'{base}.npy', np.ascontiguousarray(values))
+                columns[name] = {'kind': 'numeric', 'file': base}
+
+        for name, (rows, values) in store.sparse.items():
+            base = f'sparse_{_safe_name(name)}'
+            np.save(tmp_dir / f'{base}_rows.npy', rows.astype(np.int32))
+            if isinstance(values, pd.Categorical) or np.asarray(values).dtype == object:
+                categories = _write_categorical(tmp_dir, f'{base}_codes', values)
+                columns[name] = {'kind': 'sparse', 'file': base, 'categories': categories}
+            else:
+                np.save(tmp_dir / f'{base}_codes.npy', np.asarray(values))
+                columns[name] = {'kind': 'sparse', 'file': base, 'categories': None}
+
+        layers = {}
+        for name, gdf in (boundaries or {}).items():
+            if gdf is not None:
+                layers[name] = _write_boundaries(tmp_dir, name, gdf, store.crs)
+
+        # Conservar capas de límites ya publicadas por otro script
+        current = resolve_pointer(directory)
+        if keep_boundaries and current is not None and (current / MANIFEST_NAME).exists():
+            with open(current / MANIFEST_NAME, encoding='utf-8') as f:
+                old_layers = json.load(f).get('boundaries', {})
+            for name, info in old_layers.items():
+                if name in layers:
+                    continue
+                for suffix in ('.wkb', '_offsets.npy', '_attrs.json'):
+                    src = current / f"{info['file']}{suffix}"
+                    if src.exists():
+                        shutil.copy2(src, tmp_dir / src.name)
+                layers[name] = info
+
+        manifest = {
+            'format_version': STORE_FORMAT_VERSION,
+            'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'crs': crs,
+            'n_points': int(len(store)),
+            'columns': columns,
+            'boundaries': layers,
+        }
+        with open(tmp_dir / MANIFEST_NAME, 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, ensure_ascii=False, indent=2)
+
+        # Un solo os.replace: los lectores ven la versión anterior o la nueva
+        replace_directory(tmp_dir, directory)
+
+        logger.info(f"Almacén procesado escrito: {directory} ({len(store)} puntos, capas: {list(layers)})")
+        return True
+
+    except Exception as e:
+        logger.error(f"Error escribiendo almacén procesado: {e}")
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        return False
+
+
+class ProcessedStore:
+    """
+    Lector del almacén procesado; todos los arrays se abren con mmap
+    """
+
+    def __init__(self, directory=None):
+        # La versión se resuelve una vez: todos los archivos salen de la misma
+        pointer = directory or default_store_dir()
+        self.directory = resolve_pointer(pointer)
+        if self.directory is None:
+            raise FileNotFoundError(f"Almacén procesado no encontrado: {pointer}")
+        with open(self.directory / MANIFEST_NAME, encoding='utf-8') as f:
+            self.manifest = json.load(f)
+        if self.manifest.get('format_version') != STORE_FORMAT_VERSION:
+            raise ValueError(f"Versión de almacén no soportada: {self.manifest.get('format_version')}")
+        self.crs = self.manifest['crs']
+        self.x = self._load('x')
+        self.y = self._load('y')
+        self._geometry_cache = {}
+
+    def __len__(self):
+        return self.manifest['n_points']
+
+    def _load(self, base):
+        return np.load(self.directory / f'{base}.npy', mmap_mode='r')
+
+    @property
+    def columns(self):
+        return list(self.manifest['columns'])
+
+    @property
+    def layers(self):
+        return list(self.manifest['boundaries'])
+
+    def codes(self, name):
+        """Códigos enteros (mmap) de una columna categórica densa"""
+        return self._load(self.manifest['columns'][name]['file'])
+
+    def column(self, name):
+        """Columna como Categorical/array (las dispersas se expanden)"""
+        import pandas as pd
+        info = self.manifest['columns'][name]
+        if info['kind'] == 'numeric':
+            return self._load(info['file'])
+        if info['kind'] == 'categorical':
+            return pd.Categorical.from_codes(self._load(info['file']), categories=info['categories'])
+        rows = self._load(f"{info['file']}_rows")
+        values = self._load(f"{info['file']}_codes")
+        if info['categories'] is not None:
+            values = pd.Categorical.from_codes(values, categories=info['categories'])
+        full = np.full(len(self), '' if info['categories'] is not None else np.nan, dtype=object)
+        full[rows] = np.asarray(values)
+        return full
+
+    def to_point_store(self, columns=None):
+        """PointStore respaldado por los arrays mapeados a memoria"""
+        import pandas as pd
+        from scripts.point_store import PointStore
+
+        attributes, sparse = {}, {}
+        for name in columns or self.columns:
+            info = self.manifest['columns'][name]
+            if info['kind'] == 'sparse':
+                rows = self._load(f"{info['file']}_rows")
+                values = self._load(f"{info['file']}_codes")
+                if info['categories'] is not None:
+                    values = pd.Categorical.from_codes(values, categories=info['categories'])
+                sparse[name] = (rows, values)
+            else:
+                attributes[name] = self.column(name)
+        return PointStore(self.x, self.y, self.crs, attributes, sparse)
+
+    def boundaries(self, name):
+        """GeoDataFrame de una capa de límites decodificada desde WKB"""
+        import geopandas as gpd
+        import pandas as pd
+        import shapely
+
+        cached = self._geometry_cache.get(name)
+        if cached is not None:
+            return cached
+
+        info = self.manifest['boundaries'][name]
+        base = self.directory / info['file']
+        offsets = np.load(f'{base}_offsets.npy', mmap_mode='r')
+        blob = np.memmap(f'{base}.wkb', dtype=np.uint8, mode='r') if offsets[-1] else np.zeros(0, np.uint8)
+        wkb = [bytes(blob[offsets[i]:offsets[i + 1]]) for i in range(len(offsets) - 1)]
+        attributes = pd.read_json(f'{base}_attrs.json', orient='split', dtype=False)
+        gdf = gpd.GeoDataFrame(attributes, geometry=shapely.from_wkb(wkb), crs=self.crs)
+        self._geometry_cache[name] = gdf
+        return gdf
+
+
+def open_processed_store(directory=None):
+    """
+    Abre el almacén procesado; retorna None si no existe o está corrupto
+    """
+    logger = setup_logging('polioxxo.store')
+    try:
+        return ProcessedStore(directory)
+    except FileNotFoundError:
+        logger.info("No existe almacén procesado; ejecuta process_data.py")
+        return None
+    except Exception as e:
+        logger.error(f"Error abriendo almacén procesado: {e}")
+        return None
@@ -0,0 +1,627 @@
+#!/usr/bin/env python3
+"""
+Perfil de ejecución por etapa - Polioxxo
+
+Este módulo:
+1. Mide cada etapa del pipeline (carga, validación, asignación,
+   estadísticas, combinación, guardado, cada mapa y cada gráfica): tiempo
+   de reloj y de CPU, incremento del pico de memoria (RSS), filas y filas
+   por segundo y, opcionalmente, los sitios que más memoria asignaron
+   (tracemalloc)
+2. Escribe un run_profile.json por corrida en logs/profiles/<run-id>/
+3. Compara dos corridas etapa por etapa para detectar regresiones de
+   tiempo y de memoria
+4. Con --profile, corre las etapas elegidas bajo cProfile (o solo con el
+   muestreador de pilas) y deja junto al perfil un .pstats y un .collapsed
+   (pilas colapsadas para flamegraph.pl o speedscope) por etapa, con un
+   resumen de las funciones más costosas en el log
+
+Cada proceso tiene un perfil activo que se crea con la primera etapa medida
+y se guarda al terminar; la CLI, el pipeline y cada script lo nombran con
+start_run() (el subcomando: process, maps, ...). Sin nombre, el perfil se
+llama 'script'; nunca se deriva de sys.argv.
+
+Uso:
+    python scripts/profiling.py list
+    python scripts/profiling.py compare [anterior] [actual] [--check]
+    polioxxo --profile=assign,map.* run
+    python scripts/process_data.py --profile --profile-modo muestreo
+"""
+
+import sys
+import os
+
+# Agregar ruta del proyecto al path de Python
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import argparse
+import atexit
+import fnmatch
+import functools
+import json
+import re
+import shutil
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from pathlib import Path
+
+from scripts.utils import setup_logging, get_project_paths
+from config import settings
+
+PROFILE_VERSION = 1
+PROFILE_FILE = 'run_profile.json'
+
+# Crecimiento mínimo del pico de memoria de una etapa para contar como regresión
+MIN_RSS_REGRESSION_MB = 10
+
+PROFILE_MODES = ('cprofile', 'muestreo')
+
+
+def profiles_dir():
+    return get_project_paths()['logs'] / 'profiles'
+
+
+def _peak_rss_mb():
+    """Pico de memoria residente del proceso (MB)"""
+    try:
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    except ImportError:
+        return 0.0
+
+
+def _rss_mb():
+    """Memoria residente actual del proceso (MB, solo Linux)"""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / 1024 / 1024
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def _count_rows(value):
+    """Filas de un resultado de etapa (DataFrame, PointStore, tupla...)"""
+    if isinstance(value, tuple) and value:
+        value = value[0]
+    if value is None or isinstance(value, (bool, dict, str)):
+        return None
+    try:
+        return len(value)
+    except TypeError:
+        return None
+
+
+def _selected(name):
+    """¿La etapa coincide con algún patrón de PROFILE_STAGES?"""
+    patterns = [p.strip() for p in settings.PROFILE_STAGES.split(',') if p.strip()]
+    return any(fnmatch.fnmatchcase(name, pattern) for pattern in patterns)
+
+
+def _frame_label(code):
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})".replace(';', ',')
+
+
+class StackSampler:
+    """
+    Hilo que cada `interval` segundos toma la pila de otro hilo y cuenta
+    las pilas colapsadas (raíz;...;hoja) en `counts`
+    """
+
+    def __init__(self, thread_id, counts, interval=None):
+        self.thread_id = thread_id
+        self.counts = counts
+        self.interval = (settings.PROFILE_SAMPLE_INTERVAL_MS if interval is None else interval) / 1000
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='polioxxo-sampler', daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                stack.append(_frame_label(frame.f_code))
+                frame = frame.f_back
+            if stack:
+                self.counts[';'.join(reversed(stack))] += 1
+
+
+class StageProfiler:
+    """
+    Perfil de una corrida. Las llamadas repetidas a una etapa se acumulan
+    en su registro; las etapas pueden anidarse y medirse desde varios hilos
+    (el escritor en segundo plano). El tiempo de CPU es el del proceso.
+    """
+
+    def __init__(self, name='polioxxo', tracemalloc_top=None):
+        self.name = name
+        self.run_id = f"{time.strftime('%Y%m%d-%H%M%S')}_{name}_{os.getpid()}"
+        self.started = time.strftime('%Y-%m-%dT%H:%M:%S')
+        self.tracemalloc_top = settings.PROFILE_TRACEMALLOC_TOP if tracemalloc_top is None else tracemalloc_top
+        self.stages = {}
+        self.saved_path = None
+        self._order = []
+        self.counters = {}       # grupo -> {clave: total} (métodos de asignación, caché, ...)
+        self._profiles = {}      # etapa -> cProfile.Profile (acumula todas sus llamadas)
+        self._samples = {}       # etapa -> Counter de pilas colapsadas
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._wall0 = time.perf_counter()
+        self._cpu0 = time.process_time()
+        self._rss0 = _peak_rss_mb()
+        if self.tracemalloc_top:
+            import tracemalloc
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+
+    @property
+    def directory(self):
+        return profiles_dir() / self.run_id
+
+    def _stack(self):
+        stack = getattr(self._local, 'stack', None)
+        if stack is None:
+            stack = self._local.stack = []
+        return stack
+
+    @contextmanager
+    def stage(self, name, rows=None):
+        """
+        Mide un bloque. El objeto que se entrega permite fijar las filas al
+        conocerlas: `with profiler.stage('assign') as s: ...; s['filas'] = n`
+        """
+        info = {'filas': rows}
+        stack = self._stack()
+        stack.append(name)
+        snapshot = None
+        if self.tracemalloc_top:
+            import tracemalloc
+            snapshot = tracemalloc.take_snapshot()
+        hook = self._start_hook(name)
+        wall, cpu, peak = time.perf_counter(), time.process_time(), _peak_rss_mb()
+        try:
+            yield info
+        finally:
+            if hook is not None:
+                self._stop_hook(hook)
+            wall = time.perf_counter() - wall
+            cpu = time.process_time() - cpu
+            peak = _peak_rss_mb() - peak
+            stack.pop()
+            allocations = self._allocations(snapshot) if snapshot is not None else None
+            self.record(name, wall, cpu, peak, info['filas'], allocations, parent=stack[-1] if stack else None)
+
+    def _start_hook(self, name):
+        """
+        Perfilado bajo demanda de la etapa: cProfile (según PROFILE_MODE) y el
+        muestreador de pilas. Solo la etapa más externa de cada hilo, porque
+        las anidadas ya quedan dentro de su perfil.
+        """
+        if getattr(self._local, 'hook', None) is not None or not _selected(name):
+            return None
+        import cProfile
+
+        with self._lock:
+            counts = self._samples.setdefault(name, Counter())
+            profile = self._profiles.get(name) if settings.PROFILE_MODE == 'cprofile' else None
+            if profile is None and settings.PROFILE_MODE == 'cprofile':
+                profile = self._profiles[name] = cProfile.Profile()
+        if profile is not None:
+            try:
+                profile.enable()
+            except ValueError:
+                # Otro perfilador ya está activo en el proceso: solo muestreo
+                profile = None
+        sampler = StackSampler(threading.get_ident(), counts).start()
+        self._local.hook = (profile, sampler)
+        return self._local.hook
+
+    def _stop_hook(self, hook):
+        profile, sampler = hook
+        if profile is not None:
+            profile.disable()
+        sampler.stop()
+        self._local.hook = None
+
+    def _dump_stage_profiles(self, directory):
+        """Escribe .pstats y .collapsed por etapa perfilada y resume en el log"""
+        logger = setup_logging('polioxxo.profiling')
+        files = {}
+        for name in self._order:
+            profile, counts = self._profiles.get(name), self._samples.get(name)
+            if profile is None and not counts:
+                continue
+            stem = re.sub(r'[^\w.-]+', '_', name)
+            entry = files[name] = {}
+            if profile is not None:
+                path = directory / f'{stem}.pstats'
+                profile.dump_stats(path)
+                entry['pstats'] = path.name
+            if counts:
+                path = directory / f'{stem}.collapsed'
+                with open(path, 'w', encoding='utf-8') as f:
+                    for stack, count in counts.most_common():
+                        f.write(f"{stack} {count}\n")
+                entry['pilas'] = path.name
+                entry['muestras'] = sum(counts.values())
+            logger.info(f"🔬 [{name}] funciones más costosas:")
+            for line in top_functions(profile, counts):
+                logger.info(f"    {line}", extra={'sin_limite': True})
+        return files
+
+    def _allocations(self, before):
+        import tracemalloc
+        after = tracemalloc.take_snapshot().filter_traces([
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, __file__),
+        ])
+        diffs = [d for d in after.compare_to(before, 'lineno') if d.size_diff > 0]
+        return [
+            {'sitio': f"{d.traceback[0].filename}:{d.traceback[0].lineno}",
+             'kb': round(d.size_diff / 1024, 1), 'bloques': d.count_diff}
+            for d in diffs[:self.tracemalloc_top]
+        ]
+
+    def record(self, name, wall, cpu=None, peak_delta=None, rows=None, allocations=None, parent=None):
+        """Acumula una llamada de una etapa (también para tiempos medidos en otro proceso)"""
+        with self._lock:
+            entry = self.stages.get(name)
+            if entry is None:
+                entry = self.stages[name] = {
+                    'llamadas': 0, 'wall_s': 0.0, 'cpu_s': 0.0, 'rss_pico_delta_mb': 0.0,
+                    'filas': None, 'filas_por_s': None, 'padre': parent,
+                }
+                self._order.append(name)
+            entry['llamadas'] += 1
+            entry['wall_s'] += wall
+            entry['cpu_s'] += cpu or 0.0
+            entry['rss_pico_delta_mb'] += peak_delta or 0.0
+            if rows is not None:
+                entry['filas'] = (entry['filas'] or 0) + int(rows)
+                entry['filas_por_s'] = round(entry['filas'] / entry['wall_s'], 1) if entry['wall_s'] else None
+            if allocations:
+                merged = {a['sitio']: a for a in entry.get('asignaciones_top', [])}
+                for a in allocations:
+                    previous = merged.get(a['sitio'])
+                    merged[a['sitio']] = a if previous is None else {
+                        'sitio': a['sitio'], 'kb': round(previous['kb'] + a['kb'], 1),
+                        'bloques': previous['bloques'] + a['bloques'],
+                    }
+                entry['asignaciones_top'] = sorted(merged.values(), key=lambda a: -a['kb'])[:self.tracemalloc_top]
+
+    def count(self, group, values):
+        """Suma conteos de la corrida, p. ej. count('cache.coverage', {'aciertos': 1})"""
+        with self._lock:
+            totals = self.counters.setdefault(group, {})
+            for key, value in values.items():
+                totals[key] = totals.get(key, 0) + value
+
+    def to_dict(self):
+        with self._lock:
+            stages = {}
+            for name in self._order:
+                entry = dict(self.stages[name])
+                for key in ('wall_s', 'cpu_s', 'rss_pico_delta_mb'):
+                    entry[key] = round(entry[key], 4 if key != 'rss_pico_delta_mb' else 1)
+                stages[name] = entry
+            counters = {group: dict(values) for group, values in self.counters.items()}
+        return {
+            'version': PROFILE_VERSION,
+            'run_id': self.run_id,
+            'nombre': self.name,
+            'inicio': self.started,
+            'argv': sys.argv,
+            'total': {
+                'wall_s': round(time.perf_counter() - self._wall0, 4),
+                'cpu_s': round(time.process_time() - self._cpu0, 4),
+                'rss_pico_mb': round(_peak_rss_mb(), 1),
+                'rss_pico_delta_mb': round(_peak_rss_mb() - self._rss0, 1),
+                'rss_final_mb': round(_rss_mb() or 0.0, 1),
+            },
+            'etapas': stages,
+            'contadores': counters,
+        }
+
+    def save(self):
+        """Escribe logs/profiles/<run-id>/run_profile.json; regresa la ruta"""
+        directory = self.directory
+        directory.mkdir(parents=True, exist_ok=True)
+        data = self.to_dict()
+        for name, files in self._dump_stage_profiles(directory).items():
+            data['etapas'][name]['perfil'] = files
+        path = directory / PROFILE_FILE
+        tmp = path.with_name(f'.{path.name}.tmp-{os.getpid()}')
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False, indent=2)
+        os.replace(tmp, path)
+        self.saved_path = path
+        prune_profiles()
+        return path
+
+
+def top_functions(profile=None, counts=None, limit=None):
+    """
+    Líneas de resumen: con cProfile, las funciones de mayor tiempo acumulado;
+    con solo muestras, las de más muestras propias (hoja de la pila)
+    """
+    import pstats
+
+    limit = settings.PROFILE_TOP_FUNCTIONS if limit is None else limit
+    lines = []
+    if profile is not None:
+        stats = pstats.Stats(profile).sort_stats('cumulative')
+        for func in stats.fcn_list[:limit]:
+            _, calls, own, cumulative, _ = stats.stats[func]
+            filename, line, function = func
+            where = f"{os.path.basename(filename)}:{line}" if line else filename
+            lines.append(f"{cumulative:8.3f}s acum {own:8.3f}s propio {calls:>9,} llamadas  {function} ({where})")
+    elif counts:
+        total = sum(counts.values())
+        leaves = Counter()
+        for stack, count in counts.items():
+            leaves[stack.rsplit(';', 1)[-1]] += count
+        for frame, count in leaves.most_common(limit):
+            lines.append(f"{count / total * 100:5.1f}% de {total} muestras  {frame}")
+    return lines
+
+
+# Nombre del perfil implícito (etapas llamadas sin start_run); el nombre de
+# la corrida nunca sale de sys.argv, que con `python -c` o pytest no dice nada
+IMPLICIT_RUN = 'script'
+
+_ACTIVE = None
+_ACTIVE_NAMED = False
+_ACTIVE_LOCK = threading.Lock()
+
+
+def start_run(name):
+    """
+    Nombra el perfil de esta corrida. Si quien llama ya inició uno (la CLI
+    antes del pipeline), se conserva ese; el perfil implícito de la primera
+    etapa solo se reemplaza mientras no haya medido nada.
+    """
+    global _ACTIVE, _ACTIVE_NAMED
+    with _ACTIVE_LOCK:
+        if _ACTIVE is None or (not _ACTIVE_NAMED and not _ACTIVE.stages and not _ACTIVE.counters):
+            _ACTIVE, _ACTIVE_NAMED = StageProfiler(name), True
+        return _ACTIVE
+
+
+def get_profiler():
+    """Perfil activo del proceso; la primera llamada lo crea"""
+    global _ACTIVE
+    if _ACTIVE is None:
+        with _ACTIVE_LOCK:
+            if _ACTIVE is None:
+                _ACTIVE = StageProfiler(IMPLICIT_RUN)
+    return _ACTIVE
+
+
+def finish_run(success=None):
+    """
+    Guarda el perfil activo (si midió algo), exporta las métricas de la
+    corrida (scripts/metrics_exporter.py) y cierra el perfil; regresa la
+    ruta del perfil. `success` es None cuando no se conoce el resultado
+    (salida de un script sin pasar por la CLI).
+    """
+    global _ACTIVE, _ACTIVE_NAMED
+    with _ACTIVE_LOCK:
+        profiler, _ACTIVE, _ACTIVE_NAMED = _ACTIVE, None, False
+    if profiler is None:
+        return None
+    logger = setup_logging('polioxxo.profiling')
+
+    path = None
+    if profiler.stages and settings.PROFILE_ENABLED:
+        try:
+            path = profiler.save()
+            logger.info(f"⏱️ Perfil de la corrida: {path}")
+        except OSError as e:
+            logger.warning(f"No se pudo guardar el perfil: {e}")
+
+    if settings.METRICS_EXPORT and (profiler.stages or profiler.counters):
+        from scripts.metrics_exporter import export_run_metrics
+        export_run_metrics(profiler.name, profiler.to_dict(), success)
+    return path
+
+
+atexit.register(finish_run)
+
+
+def count(group, values):
+    """Suma conteos al perfil activo (se exportan aunque el perfil esté desactivado)"""
+    get_profiler().count(group, values)
+
+
+@contextmanager
+def stage(name, rows=None):
+    """Mide un bloque en el perfil activo (sin perfilado, no mide nada)"""
+    if not settings.PROFILE_ENABLED:
+        yield {'filas': rows}
+        return
+    with get_profiler().stage(name, rows) as info:
+        yield info
+
+
+def profiled(name, rows=_count_rows):
+    """Decorador: mide cada llamada de la función como la etapa `name`"""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with stage(name) as info:
+                result = func(*args, **kwargs)
+                info['filas'] = rows(result) if rows else None
+                return result
+        return wrapper
+    return decorator
+
+
+def enable_stage_profiling(stages='*', mode=None):
+    """
+    Perfila bajo demanda las etapas que coinciden con `stages` (patrones
+    separados por coma). Se hereda a los subprocesos por el entorno.
+    """
+    mode = mode or settings.PROFILE_MODE
+    if mode not in PROFILE_MODES:
+        raise ValueError(f"Modo de perfilado desconocido: {mode} (opciones: {', '.join(PROFILE_MODES)})")
+    settings.PROFILE_ENABLED = True
+    settings.PROFILE_STAGES = stages
+    settings.PROFILE_MODE = mode
+    os.environ.update({'POLIOXXO_PROFILE': '1', 'POLIOXXO_PROFILE_STAGES': stages, 'POLIOXXO_PROFILE_MODE': mode})
+
+
+def add_profile_arguments(parser):
+    """Agrega --profile y --profile-modo a un parser de argparse"""
+    parser.add_argument('--profile', nargs='?', const='*', metavar='ETAPAS',
+                        help='Perfilar etapas (patrones separados por coma, p. ej. assign,map.*; sin valor: todas)')
+    parser.add_argument('--profile-modo', choices=PROFILE_MODES,
+                        help='cprofile (determinista) o muestreo (menor costo)')
+    return parser
+
+
+def profile_from_args(args):
+    """Activa el perfilado si los argumentos traen --profile"""
+    if getattr(args, 'profile', None):
+        enable_stage_profiling(args.profile, getattr(args, 'profile_modo', None))
+
+
+def consume_profile_args(argv=None, run=None):
+    """
+    Para el `main()` de cada script: quita --profile y --profile-modo de
+    sys.argv (antes de su propio argparse), activa el perfilado y nombra la
+    corrida `run` (el subcomando equivalente de la CLI)
+    """
+    argv = sys.argv if argv is None else argv
+    args, rest = add_profile_arguments(argparse.ArgumentParser(add_help=False)).parse_known_args(argv[1:])
+    argv[1:] = rest
+    profile_from_args(args)
+    if run:
+        start_run(run)
+    return args
+
+
+def prune_profiles(keep=None):
+    """Conserva solo los perfiles de las `keep` corridas más recientes"""
+    keep = settings.PROFILE_KEEP_RUNS if keep is None else keep
+    if keep <= 0:
+        return
+    runs = list_runs()
+    for directory in runs[:-keep]:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+def list_runs():
+    """Directorios de corridas con perfil, de la más antigua a la más reciente"""
+    base = profiles_dir()
+    if not base.exists():
+        return []
+    runs = [d for d in base.iterdir() if (d / PROFILE_FILE).exists()]
+    return sorted(runs, key=lambda d: (d / PROFILE_FILE).stat().st_mtime)
+
+
+def load_profile(ref):
+    """Perfil por run-id, directorio o ruta a run_profile.json"""
+    path = Path(ref)
+    if not path.exists():
+        path = profiles_dir() / ref
+    if path.is_dir():
+        path = path / PROFILE_FILE
+    if not path.exists():
+        raise FileNotFoundError(f"Perfil no encontrado: {ref}")
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def compare_profiles(before, after, threshold_pct=None, min_seconds=None):
+    """
+    Filas (etapa, antes, después) por etapa y la lista de regresiones:
+    etapas cuyo tiempo de reloj o pico de memoria crecieron más de
+    `threshold_pct` y además más de `min_seconds` o MIN_RSS_REGRESSION_MB
+    (el ruido de las etapas cortas no cuenta)
+    """
+    threshold_pct = settings.PROFILE_REGRESSION_PCT if threshold_pct is None else threshold_pct
+    min_seconds = settings.PROFILE_MIN_SECONDS if min_seconds is None else min_seconds
+    stages_a, stages_b = before['etapas'], after['etapas']
+    names = list(stages_b) + [name for name in stages_a if name not in stages_b]
+
+    rows, regressions = [], []
+    for name in names:
+        a, b = stages_a.get(name), stages_b.get(name)
+        rows.append((name, a, b))
+        if a is None or b is None:
+            continue
+        for metric, floor in (('wall_s', min_seconds), ('rss_pico_delta_mb', MIN_RSS_REGRESSION_MB)):
+            if b[metric] - a[metric] >= floor and b[metric] > a[metric] * (1 + threshold_pct / 100):
+                regressions.append((name, metric, a[metric], b[metric]))
+    rows.append(('TOTAL', before['total'], after['total']))
+    return rows, regressions
+
+
+def _pct(a, b):
+    if not a:
+        return '' if not b else '   nuevo'
+    return f"{(b - a) / a * 100:+7.0f}%"
+
+
+def print_comparison(before, after, rows, regressions):
+    print(f"antes:   {before['run_id']}")
+    print(f"después: {after['run_id']}")
+    print(f"{'etapa':<32}{'wall antes':>11}{'después':>10}{'Δ':>9}{'cpu después':>13}"
+          f"{'ΔRSS MB':>9}{'filas':>9}")
+    for name, a, b in rows:
+        if b is None:
+            print(f"{name:<32}{a['wall_s']:>11.3f}{'—':>10}")
+            continue
+        wall_a = a['wall_s'] if a else 0.0
+        print(f"{name:<32}{wall_a:>11.3f}{b['wall_s']:>10.3f}{_pct(wall_a, b['wall_s']):>9}"
+              f"{b['cpu_s']:>13.3f}{b['rss_pico_delta_mb']:>9.1f}{b.get('filas') or '':>9}")
+    for name, metric, a, b in regressions:
+        print(f"⚠️ {name}: {metric} {a:g} -> {b:g}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Perfiles de ejecución por etapa')
+    sub = parser.add_subparsers(dest='accion', required=True)
+    sub.add_parser('list', help='Listar corridas con perfil')
+    compare = sub.add_parser('compare', help='Comparar dos corridas (por omisión las dos últimas)')
+    compare.add_argument('anterior', nargs='?')
+    compare.add_argument('actual', nargs='?')
+    compare.add_argument('--umbral', type=float, help='Porcentaje de crecimiento que cuenta como regresión')
+    compare.add_argument('--check', action='store_true', help='Fallar si hay regresiones')
+    args = parser.parse_args(argv)
+
+    if args.accion == 'list':
+        for directory in list_runs():
+            profile = load_profile(directory)
+            print(f"{profile['run_id']:<48}{profile['total']['wall_s']:>9.1f}s"
+                  f"{profile['total']['rss_pico_mb']:>9.0f} MB")
+        return True
+
+    runs = list_runs()
+    if args.anterior and args.actual:
+        refs = [args.anterior, args.actual]
+    elif args.anterior:
+        refs = [args.anterior, runs[-1] if runs else None]
+    else:
+        refs = runs[-2:] if len(runs) >= 2 else [None, None]
+    if None in refs:
+        print("Se necesitan dos perfiles para comparar", file=sys.stderr)
+        return False
+    before, after = load_profile(refs[0]), load_profile(refs[1])
+    rows, regressions = compare_profiles(before, after, args.umbral)
+    print_comparison(before, after, rows, regressions)
+    return not (args.check and regressions)
+
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
@@ -0,0 +1,361 @@
+#!/usr/bin/env python3
+"""
+Publicación versionada de salidas procesadas - Polioxxo
+
+Este módulo:
+1. Publica las salidas de data/processed (GPKG, métricas, almacén) como una
+   versión inmutable en data/processed/versiones/<id>/. Los archivos se
+   enlazan (hard link) en lugar de copiarse: cada escritor reemplaza su
+   archivo con os.replace, así que el inodo publicado nunca cambia después
+2. Activa la versión cambiando de forma atómica el apuntador
+   data/processed/current (enlace simbólico; en sistemas sin enlaces
+   simbólicos, un archivo con el id de la versión)
+3. Conserva las últimas PUBLISH_KEEP_VERSIONS versiones y permite volver a
+   activar cualquiera de ellas
+4. Publica con el mismo esquema (versión inmutable, apuntador cambiado con
+   un solo os.replace, misma retención) los directorios que se reescriben
+   completos, como el almacén procesado y el cubo (replace_directory)
+5. Da a los lectores (servicio de consultas, constructores de mapas) la
+   versión activa y un recurso que se recarga solo cuando cambia la
+   versión, sin locks: una actualización nunca bloquea ni corrompe una
+   lectura en curso
+
+Uso:
+    python scripts/publish.py [list | publish | activate <id>]
+"""
+
+import sys
+import os
+
+# Agregar ruta del proyecto al path de Python
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import argparse
+import json
+import shutil
+import time
+from pathlib import Path
+
+from scripts.utils import setup_logging, get_project_paths
+from config import settings
+
+VERSIONS_DIR = 'versiones'
+POINTER_NAME = 'current'
+MANIFEST_NAME = 'version.json'
+
+
+def _processed_dir(processed_dir=None):
+    return Path(processed_dir or get_project_paths()['data_processed'])
+
+
+def versions_dir(processed_dir=None):
+    return _processed_dir(processed_dir) / VERSIONS_DIR
+
+
+# --- Lectores ---
+
+def resolve_pointer(pointer):
+    """
+    Directorio al que apunta `pointer`: enlace simbólico, archivo con la ruta
+    relativa (sistemas sin enlaces simbólicos) o directorio real de una
+    corrida anterior. None si no apunta a un directorio.
+    """
+    pointer = Path(pointer)
+    if pointer.is_dir():
+        return pointer.resolve()
+    if pointer.is_file() and pointer.stat().st_size < 4096:
+        # Un apuntador es una sola ruta relativa; cualquier otro archivo no lo es
+        try:
+            relative = pointer.read_text(encoding='utf-8').strip()
+            if relative and '\n' not in relative and (pointer.parent / relative).is_dir():
+                return (pointer.parent / relative).resolve()
+        except (OSError, ValueError):
+            return None
+    return None
+
+
+def current_version(processed_dir=None):
+    """Id de la versión activa, o None si nunca se ha publicado"""
+    target = resolve_pointer(_processed_dir(processed_dir) / POINTER_NAME)
+    return target.name if target is not None else None
+
+
+def published_dir(processed_dir=None):
+    """
+    Directorio de la versión activa; sin versiones publicadas, el directorio
+    de trabajo (comportamiento anterior)
+    """
+    processed_dir = _processed_dir(processed_dir)
+    version = current_version(processed_dir)
+    if version is not None:
+        path = processed_dir / VERSIONS_DIR / version
+        if path.is_dir():
+            return path
+    return processed_dir
+
+
+class PublishedResource:
+    """
+    Un archivo publicado cargado en memoria con `loader(path)`; se vuelve a
+    cargar cuando cambia la versión activa (o, sin versiones, el archivo).
+
+    Sin locks: el estado es una sola tupla que se reemplaza completa, así
+    que cada lector ve la versión anterior o la nueva, nunca una mezcla. Dos
+    hilos que detectan el cambio a la vez pueden cargarlo ambos; es inocuo.
+    """
+
+    def __init__(self, name, loader, processed_dir=None, default=None):
+        self.name = name
+        self.loader = loader
+        self.processed_dir = processed_dir
+        self.default = default
+        self._state = (None, default)
+
+    def _key(self):
+        path = published_dir(self.processed_dir) / self.name
+        try:
+            return path, (str(path), os.stat(path).st_mtime_ns)
+        except FileNotFoundError:
+            return path, None
+
+    @property
+    def version(self):
+        return current_version(self.processed_dir)
+
+    def get(self):
+        path, key = self._key()
+        state = self._state
+        if key is None:
+            return self.default
+        if key != state[0]:
+            state = (key, self.loader(path))
+            self._state = state
+        return state[1]
+
+
+# --- Versiones y apuntadores ---
+
+def new_version_id(root=None):
+    """
+    Id de versión: fecha, milisegundos y pid. Con `root`, se agrega un
+    sufijo .<n> si ya existe (dos escrituras en el mismo milisegundo)
+    """
+    now = time.time()
+    version = f"{time.strftime('%Y%m%d-%H%M%S', time.localtime(now))}-{int(now * 1000) % 1000:03d}_{os.getpid()}"
+    if root is None:
+        return version
+    candidate, suffix = version, 0
+    while (Path(root) / candidate).exists():
+        suffix += 1
+        candidate = f'{version}.{suffix}'
+    return candidate
+
+
+def point_to(pointer, target):
+    """
+    Cambia `pointer` a `target` con un solo os.replace (enlace simbólico
+    relativo; sin enlaces simbólicos, un archivo con la ruta relativa)
+    """
+    pointer = Path(pointer)
+    relative = os.path.relpath(target, pointer.parent)
+    tmp = pointer.with_name(f'.{pointer.name}.tmp-{os.getpid()}')
+    if tmp.is_symlink() or tmp.exists():
+        tmp.unlink()
+    try:
+        os.symlink(relative, tmp, target_is_directory=True)
+    except (OSError, NotImplementedError):
+        tmp.write_text(relative, encoding='utf-8')
+
+    legacy = None
+    if pointer.is_dir() and not pointer.is_symlink():
+        # Directorio real de una corrida anterior: se retira una sola vez
+        legacy = pointer.with_name(f'.{pointer.name}.old-{os.getpid()}')
+        os.replace(pointer, legacy)
+    os.replace(tmp, pointer)
+    if legacy is not None:
+        shutil.rmtree(legacy, ignore_errors=True)
+
+
+def prune_version_dir(root, current=None, keep=None, grace_s=None):
+    """
+    Borra las versiones más antiguas de `root`. Se conservan las `keep` más
+    recientes, la activa y las que dejaron de ser la más reciente hace menos
+    de `grace_s` segundos (un lector puede haberlas resuelto todavía).
+    """
+    keep = settings.PUBLISH_KEEP_VERSIONS if keep is None else keep
+    grace_s = settings.PUBLISH_GRACE_S if grace_s is None else grace_s
+    root = Path(root)
+    if not root.exists():
+        return []
+    versions = sorted(path.name for path in root.iterdir() if path.is_dir() and not path.name.startswith('.'))
+    now = time.time()
+    removed = []
+    for version, successor in zip(versions[:max(0, len(versions) - keep)], versions[1:]):
+        if version == current or now - (root / successor).stat().st_mtime < grace_s:
+            continue
+        shutil.rmtree(root / version, ignore_errors=True)
+        removed.append(version)
+    return removed
+
+
+def replace_directory(staging, pointer, keep=None, grace_s=None):
+    """
+    Publica el directorio completo `staging` detrás de `pointer` (almacén,
+    cubo): se mueve a .<nombre>-versiones/<id> y `pointer` cambia a esa
+    versión con un solo os.replace, así que un lector siempre encuentra una
+    versión completa. La retención es la de las versiones publicadas.
+    """
+    pointer = Path(pointer)
+    root = pointer.with_name(f'.{pointer.name}-versiones')
+    root.mkdir(parents=True, exist_ok=True)
+    version = new_version_id(root)
+    os.replace(staging, root / version)
+    point_to(pointer, root / version)
+    prune_version_dir(root, version, keep, grace_s)
+    return pointer
+
+
+# --- Publicación ---
+
+def _link_or_copy(src, dst):
+    try:
+        os.link(src, dst)
+    except OSError:
+        shutil.copy2(src, dst)
+
+
+def _stage_output(src, dst):
+    """Enlaza un archivo o un directorio (almacén, cubo) en la versión; retorna bytes"""
+    directory = resolve_pointer(src)
+    if directory is not None:
+        size = 0
+        for root, _, files in os.walk(directory):
+            target = dst / Path(root).relative_to(directory)
+            target.mkdir(parents=True, exist_ok=True)
+            for name in files:
+                _link_or_copy(Path(root) / name, target / name)
+                size += (target / name).stat().st_size
+        return size
+    _link_or_copy(src, dst)
+    return dst.stat().st_size
+
+
+def list_versions(processed_dir=None):
+    """Versiones publicadas, de la más antigua a la más reciente"""
+    root = versions_dir(processed_dir)
+    if not root.exists():
+        return []
+    return sorted(path.name for path in root.iterdir() if path.is_dir() and not path.name.startswith('.'))
+
+
+def version_manifest(version, processed_dir=None):
+    path = versions_dir(processed_dir) / version / MANIFEST_NAME
+    try:
+        with open(path, encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def prune_versions(processed_dir=None, keep=None, grace_s=None):
+    """Borra las versiones publicadas más antiguas; la activa nunca se borra"""
+    return prune_version_dir(versions_dir(processed_dir), current_version(processed_dir), keep, grace_s)
+
+
+def publish(processed_dir=None, outputs=None):
+    """
+    Publica las salidas presentes como una versión nueva y la activa.
+    Retorna el id de la versión, o None si no había nada que publicar.
+    """
+    from config.cities import active_city_key
+
+    logger = setup_logging('polioxxo.publish')
+    processed_dir = _processed_dir(processed_dir)
+    outputs = settings.PUBLISHED_OUTPUTS if outputs is None else outputs
+    present = [name for name in outputs if (processed_dir / name).exists()]
+    if not present:
+        logger.warning("No hay salidas procesadas que publicar")
+        return None
+
+    root = versions_dir(processed_dir)
+    version = new_version_id(root)
+    staging = root / f'.{version}.tmp'
+    try:
+        staging.mkdir(parents=True)
+        files = {name: _stage_output(processed_dir / name, staging / name) for name in present}
+        manifest = {
+            'version': version,
+            'fecha': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'ciudad': active_city_key(),
+            'archivos': files,
+        }
+        with open(staging / MANIFEST_NAME, 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, ensure_ascii=False, indent=2)
+        # La versión aparece completa (rename del directorio) antes de activarse
+        os.replace(staging, root / version)
+        point_to(processed_dir / POINTER_NAME, root / version)
+    finally:
+        shutil.rmtree(staging, ignore_errors=True)
+
+    removed = prune_versions(processed_dir)
+    logger.info(f"📦 Versión publicada: {version} ({len(present)} salidas"
+                + (f", {len(removed)} versiones antiguas borradas)" if removed else ")"))
+    return version
+
+
+def publish_outputs(processed_dir=None):
+    """Publicación al final de una etapa; un fallo nunca detiene la etapa"""
+    if not settings.PUBLISH_ENABLED:
+        return None
+    try:
+        return publish(processed_dir)
+    except Exception as e:
+        setup_logging('polioxxo.publish').warning(f"No se pudo publicar la versión: {e}")
+        return None
+
+
+def activate(version, processed_dir=None):
+    """Vuelve a activar una versión retenida (p. ej. para revertir)"""
+    processed_dir = _processed_dir(processed_dir)
+    if version not in list_versions(processed_dir):
+        raise KeyError(f"Versión desconocida: {version}")
+    point_to(processed_dir / POINTER_NAME, versions_dir(processed_dir) / version)
+    setup_logging('polioxxo.publish').info(f"📦 Versión activa: {version}")
+    return version
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Versiones publicadas de las salidas procesadas')
+    parser.add_argument('accion', choices=['list', 'publish', 'activate'], nargs='?', default='list')
+    parser.add_argument('version', nargs='?', help='Versión a activar')
+    args = parser.parse_args(argv)
+
+    if args.accion == 'publish':
+        return publish() is not None
+    if args.accion == 'activate':
+        if not args.version:
+            parser.error("activate requiere una versión")
+        try:
+            activate(args.version)
+        except KeyError as e:
+            print(e.args[0], file=sys.stderr)
+            return False
+        return True
+
+    current = current_version()
+    versions = list_versions()
+    if not versions:
+        print(f"Sin versiones publicadas en {versions_dir()}")
+        return True
+    for version in versions:
+        manifest = version_manifest(version)
+        size_mb = sum(manifest.get('archivos', {}).values()) / (1024 * 1024)
+        marker = '*' if version == current else ' '
+        print(f"{marker} {version}  {manifest.get('fecha', '?')}  "
+              f"{len(manifest.get('archivos', {}))} salidas  {size_mb:.1f} MB")
+    return True
+
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
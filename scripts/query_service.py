@@ -0,0 +1,222 @@
+#!/usr/bin/env python3
+"""
+Servicio de consultas - Polioxxo
+
+Este módulo:
+1. Responde consultas sobre el documento de métricas (alcaldías, distritos,
+   partidos) sin importar pandas ni geopandas
+2. Sirve las mismas consultas por HTTP (JSON) con la biblioteca estándar;
+   el documento y el almacén se leen de la versión publicada
+   (scripts/publish.py) y se vuelven a abrir solo cuando cambia la versión
+3. Consulta los Oxxos de una alcaldía en el almacén procesado (mmap)
+4. Corta el cubo de agregados (scripts/cube.py) por cualquier dimensión con
+   las demás fijas, sin recorrer los puntos
+
+Rutas:
+    /salud, /metricas, /metricas/<seccion>, /alcaldias[/<nombre>],
+    /distritos[/<distrito>], /partidos, /oxxos?alcaldia=<nombre>&limite=<n>,
+    /cubo[/<dimension>]?<dimension>=<miembro>&medida=<medida>
+"""
+
+import sys
+import os
+
+# Agregar ruta del proyecto al path de Python
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import json
+from pathlib import Path
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs, unquote
+
+from scripts.utils import setup_logging
+from scripts.catalog import normalize_name
+from scripts.metrics import METRICS_FILE
+from scripts.publish import PublishedResource, published_dir
+
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = 8765
+DEFAULT_LIMIT = 100
+
+# nivel -> (sección del documento, columna llave)
+LEVELS = {
+    'alcaldias': ('alcaldias', 'alcaldia'),
+    'distritos': ('distritos', 'distrito'),
+    'partidos': ('partidos_alcaldia', 'partido'),
+}
+
+
+def _load_json(path):
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+
+class MetricsSource:
+    """
+    Documento de métricas de la versión publicada, en memoria; se recarga
+    cuando se publica otra versión (o, sin versiones, si cambia el archivo)
+    """
+
+    def __init__(self, path=None):
+        if path is None:
+            self._resource = PublishedResource(METRICS_FILE, _load_json, default={})
+        else:
+            path = Path(path)
+            self._resource = PublishedResource(path.name, _load_json, path.parent, default={})
+
+    def get(self):
+        return self._resource.get()
+
+
+def lookup(doc, level, key=None):
+    """
+    Filas de un nivel (alcaldias, distritos, partidos); con `key`, solo la
+    fila cuyo nombre normalizado coincide (None si no existe)
+    """
+    if level not in LEVELS:
+        raise KeyError(f"Nivel desconocido: {level}")
+    section, column = LEVELS[level]
+    rows = doc.get(section) or []
+    if key is None:
+        return rows
+    target = normalize_name(key)
+    for row in rows:
+        if normalize_name(row.get(column)) == target:
+            return row
+    return None
+
+
+def _names(store, rows):
+    """Nombres de las filas pedidas leyendo los códigos directamente (sin pandas)"""
+    import numpy as np
+    info = store.manifest['columns'].get('name')
+    if info is None or info['categories'] is None:
+        return ['OXXO'] * len(rows)
+    categories = info['categories']
+    if info['kind'] == 'categorical':
+        codes = store.codes('name')[rows]
+        return [categories[c] if c >= 0 else 'OXXO' for c in codes]
+    present = np.load(store.directory / f"{info['file']}_rows.npy", mmap_mode='r')
+    codes = np.load(store.directory / f"{info['file']}_codes.npy", mmap_mode='r')
+    position = np.searchsorted(present, rows)
+    found = (position < len(present)) & (present[np.minimum(position, len(present) - 1)] == rows)
+    return [categories[codes[p]] if f and codes[p] >= 0 else 'OXXO' for p, f in zip(position, found)]
+
+
+def oxxos_in(alcaldia, limit=DEFAULT_LIMIT, store=None):
+    """Conteo y primeros `limit` Oxxos de una alcaldía desde el almacén procesado"""
+    import numpy as np
+    from scripts.processed_store import open_processed_store
+
+    store = store or open_processed_store(published_dir() / 'store')
+    if store is None or 'alcaldia' not in store.columns:
+        return None
+    categories = store.manifest['columns']['alcaldia']['categories']
+    target = normalize_name(alcaldia)
+    matches = [i for i, name in enumerate(categories) if normalize_name(name) == target]
+    if not matches:
+        return None
+    rows = np.flatnonzero(store.codes('alcaldia') == matches[0])
+    sample = rows[:limit]
+    names = _names(store, sample)
+    return {
+        'alcaldia': categories[matches[0]],
+        'num_oxxos': int(len(rows)),
+        'oxxos': [{'x': float(store.x[i]), 'y': float(store.y[i]), 'name': name}
+                  for i, name in zip(sample, names)],
+        'crs': store.crs,
+    }
+
+
+def cube_query(cube, dim=None, measure='num_oxxos', **coords):
+    """
+    Sin `dim`: resumen del cubo (dimensiones, medidas y total). Con `dim`:
+    {miembro: valor} con las dimensiones de `coords` fijas
+    """
+    if dim is None:
+        return {
+            'dimensiones': {d: len(cube.members(d)) for d in cube.dimensions},
+            'medidas': list(cube.measures),
+            'total': int(cube.rollup(measure=measure)),
+        }
+    return {'dimension': dim, 'medida': measure, 'filtros': coords,
+            'valores': cube.slice(dim, measure, **coords)}
+
+
+class QueryHandler(BaseHTTPRequestHandler):
+    source = None
+    store = None
+    cube = None
+
+    def _send(self, status, payload):
+        body = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        parts = [unquote(p) for p in url.path.strip('/').split('/') if p]
+        query = parse_qs(url.query)
+        try:
+            if not parts or parts[0] == 'salud':
+                return self._send(200, {'ok': True})
+            doc = self.source.get()
+            if parts[0] == 'metricas':
+                if len(parts) == 1:
+                    return self._send(200, doc)
+                if parts[1] not in doc:
+                    return self._send(404, {'error': f"Sección no encontrada: {parts[1]}"})
+                return self._send(200, doc[parts[1]])
+            if parts[0] in LEVELS:
+                result = lookup(doc, parts[0], parts[1] if len(parts) > 1 else None)
+                if result is None:
+                    return self._send(404, {'error': f"No encontrado: {'/'.join(parts)}"})
+                return self._send(200, result)
+            if parts[0] == 'oxxos' and 'alcaldia' in query:
+                store = self.store.get()
+                if store is None:
+                    return self._send(404, {'error': "Almacén procesado no encontrado"})
+                limit = int(query.get('limite', [DEFAULT_LIMIT])[0])
+                result = oxxos_in(query['alcaldia'][0], limit, store)
+                if result is None:
+                    return self._send(404, {'error': f"Alcaldía no encontrada: {query['alcaldia'][0]}"})
+                return self._send(200, result)
+            if parts[0] == 'cubo':
+                cube = self.cube.get() if self.cube is not None else None
+                if cube is None:
+                    return self._send(404, {'error': "Cubo de agregados no encontrado"})
+                coords = {k: v[0] for k, v in query.items() if k != 'medida'}
+                measure = query.get('medida', ['num_oxxos'])[0]
+                try:
+                    result = cube_query(cube, parts[1] if len(parts) > 1 else None, measure, **coords)
+                except KeyError as e:
+                    return self._send(404, {'error': e.args[0]})
+                return self._send(200, result)
+            return self._send(404, {'error': f"Ruta desconocida: {url.path}"})
+        except Exception as e:
+            return self._send(500, {'error': str(e)})
+
+    def log_message(self, format, *args):
+        setup_logging('polioxxo.serve').debug(format % args)
+
+
+def serve(host=DEFAULT_HOST, port=DEFAULT_PORT):
+    """Inicia el servicio HTTP de consultas (bloquea hasta Ctrl+C)"""
+    logger = setup_logging('polioxxo.serve')
+    from scripts.processed_store import open_processed_store
+    from scripts.cube import open_cube
+    QueryHandler.source = MetricsSource()
+    QueryHandler.store = PublishedResource('store', open_processed_store)
+    QueryHandler.cube = PublishedResource('cube', open_cube)
+    server = ThreadingHTTPServer((host, port), QueryHandler)
+    logger.info(f"🌐 Servicio de consultas en http://{host}:{server.server_address[1]}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        logger.info("Servicio detenido")
+    finally:
+        server.server_close()
+    return True
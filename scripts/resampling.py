@@ -0,0 +1,298 @@
+#!/usr/bin/env python3
+"""
+Motor de remuestreo (bootstrap y permutaciones) - Polioxxo
+
+Este módulo:
+1. Genera miles de réplicas como matrices de índices de NumPy (una fila
+   por réplica), sin un ciclo de Python por réplica
+2. Reparte las réplicas en bloques entre un pool de procesos, cada bloque
+   con su propia semilla derivada (SeedSequence)
+3. Produce intervalos de confianza y valores p para la correlación votos
+   vs Oxxos y para la densidad de Oxxos por partido, a nivel alcaldía,
+   distrito o malla
+"""
+
+import sys
+import os
+
+# Agregar ruta del proyecto al path de Python
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from scripts.utils import setup_logging
+
+DEFAULT_REPLICATES = 10000
+DEFAULT_CHUNK = 500
+DEFAULT_SEED = 20240602
+DEFAULT_CONFIDENCE = 0.95
+
+# Por debajo de este número de celdas (réplicas x unidades) no conviene
+# pagar el arranque del pool de procesos
+PARALLEL_MIN_CELLS = 20_000_000
+
+
+# --- Estadísticos vectorizados: una fila por réplica ---
+#
+# Una réplica bootstrap equivale a una fila de pesos (cuántas veces se tomó
+# cada unidad) y una permutación a una fila de índices; los estadísticos se
+# reducen a productos matriz-vector (BLAS) sobre esas matrices.
+
+def bootstrap_weights(rng, n, rows):
+    """Matriz (réplicas, n) de frecuencias de remuestreo con reemplazo"""
+    index = rng.integers(0, n, size=(rows, n), dtype=np.int64)
+    index += n * np.arange(rows)[:, np.newaxis]
+    return np.bincount(index.ravel(), minlength=rows * n).reshape(rows, n).astype(float)
+
+
+def permutation_indices(rng, n, rows):
+    """Matriz (réplicas, n) con una permutación de 0..n-1 por fila"""
+    return rng.permuted(np.broadcast_to(np.arange(n, dtype=np.int32), (rows, n)), axis=1)
+
+
+def weighted_pearson(weights, x, y):
+    """Correlación de Pearson por fila de pesos (réplicas, n)"""
+    x = x - x.mean()
+    y = y - y.mean()
+    total = weights.sum(axis=1)
+    moments = weights @ np.column_stack([x, y, x * x, y * y, x * y])
+    sx, sy, sxx, syy, sxy = moments.T
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return (total * sxy - sx * sy) / np.sqrt((total * sxx - sx * sx) * (total * syy - sy * sy))
+
+
+def permuted_pearson(index, x, y):
+    """Correlación de x con y permutada; media y varianza no cambian"""
+    x = x - x.mean()
+    y = y - y.mean()
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return (y[index] @ x) / np.sqrt((x @ x) * (y @ y))
+
+
+def group_totals(weights, counts, exposure, onehot):
+    """Sumas ponderadas de conteos y exposición por grupo (réplicas, grupos)"""
+    return weights @ (counts[:, np.newaxis] * onehot), weights @ (exposure[:, np.newaxis] * onehot)
+
+
+def density_contrast(group_counts, group_exposure, total_counts, total_exposure):
+    """Densidad de cada grupo menos la densidad del resto de unidades"""
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return (group_counts / group_exposure
+                - (total_counts - group_counts) / (total_exposure - group_exposure))
+
+
+# --- Réplicas por bloques ---
+
+def _replicate_chunk(task):
+    """
+    Calcula un bloque de réplicas (función de nivel módulo para el pool).
+
+    task = (tipo, estadístico, datos, filas, semilla)
+    """
+    kind, statistic, data, rows, seed = task
+    rng = np.random.default_rng(seed)
+    n = len(next(iter(data.values())))
+
+    if statistic == 'correlation':
+        if kind == 'bootstrap':
+            return weighted_pearson(bootstrap_weights(rng, n, rows), data['x'], data['y'])
+        return permuted_pearson(permutation_indices(rng, n, rows), data['x'], data['y'])
+
+    onehot = np.eye(int(data['groups'].max()) + 1)[data['groups']]
+    if kind == 'bootstrap':
+        group_counts, group_exposure = group_totals(
+            bootstrap_weights(rng, n, rows), data['counts'], data['exposure'], onehot)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return group_counts / group_exposure
+
+    # Permutación de etiquetas de grupo: equivale a permutar los valores
+    # contra las etiquetas fijas
+    index = permutation_indices(rng, n, rows)
+    group_counts = data['counts'][index] @ onehot
+    group_exposure = data['exposure'][index] @ onehot
+    return density_contrast(group_counts, group_exposure, data['counts'].sum(), data['exposure'].sum())
+
+
+class ResamplingEngine:
+    """
+    Bootstrap y permutaciones en bloques, opcionalmente en varios procesos
+    """
+
+    def __init__(self, n_replicates=DEFAULT_REPLICATES, chunk_size=DEFAULT_CHUNK,
+                 workers=None, seed=DEFAULT_SEED, confidence=DEFAULT_CONFIDENCE):
+        self.n_replicates = n_replicates
+        self.chunk_size = chunk_size
+        self.workers = workers if workers is not None else (os.cpu_count() or 1)
+        self.seed = seed
+        self.confidence = confidence
+
+    def replicates(self, kind, statistic, data):
+        """
+        Matriz de estadísticos (réplicas, ...) para `kind` en
+        {'bootstrap', 'permutation'}
+        """
+        sizes = [self.chunk_size] * (self.n_replicates // self.chunk_size)
+        if self.n_replicates % self.chunk_size:
+            sizes.append(self.n_replicates % self.chunk_size)
+        # Semillas independientes por bloque: el resultado no depende de workers
+        seeds = np.random.SeedSequence([self.seed, zlib.crc32(f'{kind}:{statistic}'.encode())]).spawn(len(sizes))
+        tasks = [(kind, statistic, data, rows, seed) for rows, seed in zip(sizes, seeds)]
+
+        n = len(next(iter(data.values())))
+        if self.workers > 1 and len(tasks) > 1 and self.n_replicates * n >= PARALLEL_MIN_CELLS:
+            with ProcessPoolExecutor(max_workers=min(self.workers, len(tasks))) as pool:
+                results = list(pool.map(_replicate_chunk, tasks))
+        else:
+            results = [_replicate_chunk(task) for task in tasks]
+        return np.concatenate(results)
+
+    def _interval(self, values):
+        alpha = (1 - self.confidence) / 2
+        return np.nanquantile(values, [alpha, 1 - alpha], axis=0)
+
+    @staticmethod
+    def _p_value(observed, null):
+        """Valor p bilateral con corrección +1"""
+        valid = ~np.isnan(null)
+        extreme = (np.abs(null) >= np.abs(observed) - 1e-12) & valid
+        return (1 + extreme.sum(axis=0)) / (1 + valid.sum(axis=0))
+
+    def correlation(self, x, y):
+        """
+        Correlación de Pearson con IC bootstrap y valor p por permutación
+        """
+        data = {'x': np.asarray(x, dtype=float), 'y': np.asarray(y, dtype=float)}
+        observed = float(weighted_pearson(np.ones((1, len(data['x']))), data['x'], data['y'])[0])
+        low, high = self._interval(self.replicates('bootstrap', 'correlation', data))
+        null = self.replicates('permutation', 'correlation', data)
+        return {
+            'r': observed,
+            'ic_inf': float(low),
+            'ic_sup': float(high),
+            'p_valor': float(self._p_value(observed, null)),
+            'n': len(data['x']),
+            'replicas': self.n_replicates,
+        }
+
+    def group_density(self, counts, exposure, groups):
+        """
+        Densidad por grupo (p. ej. Oxxos/km² por partido) con IC bootstrap y
+        valor p por permutación del contraste grupo vs resto
+        """
+        codes, labels = pd.factorize(pd.Series(groups), sort=True)
+        data = {
+            'counts': np.asarray(counts, dtype=float),
+            'exposure': np.asarray(exposure, dtype=float),
+            'groups': codes.astype(np.int32),
+        }
+        n_groups = len(labels)
+        onehot = np.eye(n_groups)[data['groups']]
+        group_counts, group_exposure = group_totals(
+            np.ones((1, len(data['counts']))), data['counts'], data['exposure'], onehot)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            observed = (group_counts / group_exposure)[0]
+        contrast = density_contrast(group_counts, group_exposure,
+                                    data['counts'].sum(), data['exposure'].sum())[0]
+        low, high = self._interval(self.replicates('bootstrap', 'density', data))
+        null = self.replicates('permutation', 'density', data)
+
+        return pd.DataFrame({
+            'grupo': [str(label) for label in labels],
+            'unidades': np.bincount(data['groups'], minlength=n_groups),
+            'densidad': observed,
+            'ic_inf': low,
+            'ic_sup': high,
+            'diferencia_vs_resto': contrast,
+            'p_valor': self._p_value(contrast, null),
+        })
+
+
+def grid_party_units(points, districts, party_column='diputado_ganador', resolution=1000):
+    """
+    Unidades de malla: conteo de Oxxos por celda y partido del distrito que
+    contiene la celda. Las celdas adyacentes están autocorrelacionadas, así
+    que los valores p a este nivel son optimistas.
+    """
+    from scripts.boundaries import projected_crs
+    from scripts.coverage import rasterize_regions
+    from scripts.spatial_stats import projected_coordinates
+
+    crs = projected_crs()
+    districts_proj = districts.to_crs(crs)
+    xmin, ymin, xmax, ymax = districts_proj.total_bounds
+    width = int(np.ceil((xmax - xmin) / resolution))
+    height = int(np.ceil((ymax - ymin) / resolution))
+    y1 = ymin + height * resolution
+
+    labels = rasterize_regions(np.asarray(districts_proj.geometry.values, dtype=object),
+                               xmin, y1, resolution, (height, width))
+    coords = projected_coordinates(points, crs)
+    cols = np.floor((coords[:, 0] - xmin) / resolution).astype(np.int64)
+    rows = np.floor((y1 - coords[:, 1]) / resolution).astype(np.int64)
+    valid = (cols >= 0) & (cols < width) & (rows >= 0) & (rows < height)
+    counts = np.bincount(rows[valid] * width + cols[valid], minlength=height * width)
+
+    flat_labels = labels.ravel()
+    inside = flat_labels >= 0
+    parties = districts_proj[party_column].astype(str).to_numpy()
+    return pd.DataFrame({
+        'num_oxxos': counts[inside],
+        'area_km2': np.full(inside.sum(), resolution ** 2 / 1e6),
+        'partido': parties[flat_labels[inside]],
+    })
+
+
+def significance_report(correlation=None, densities=None, unit='alcaldía', exposure_unit='km²'):
+    """Sección de texto con IC y valores p para los reportes"""
+    lines = []
+    if correlation is not None:
+        lines.append(f"- Correlación votos vs Oxxos (por {unit}): r = {correlation['r']:.3f} "
+                     f"[IC {correlation['ic_inf']:.3f}, {correlation['ic_sup']:.3f}], "
+                     f"p = {correlation['p_valor']:.4f} ({correlation['replicas']:,} réplicas, n = {correlation['n']})")
+    if densities is not None and len(densities):
+        lines.append(f"- Densidad de Oxxos por partido (por {unit}, Oxxos/{exposure_unit}):")
+        for _, row in densities.iterrows():
+            marca = ' *' if row['p_valor'] < 0.05 else ''
+            lines.append(f"    {row['grupo']}: {row['densidad']:.2f} [IC {row['ic_inf']:.2f}, {row['ic_sup']:.2f}], "
+                         f"vs resto {row['diferencia_vs_resto']:+.2f}, p = {row['p_valor']:.4f}{marca}")
+    return "\n".join(lines) + "\n"
+
+
+def log_significance(logger, title, correlation=None, densities=None):
+    """Registra en el log un resumen de significancia"""
+    logger.info(f"\n=== {title} ===")
+    if correlation is not None:
+        logger.info(f"r = {correlation['r']:.3f} [{correlation['ic_inf']:.3f}, {correlation['ic_sup']:.3f}], "
+                    f"p = {correlation['p_valor']:.4f}")
+    if densities is not None:
+        for _, row in densities.iterrows():
+            logger.info(f"{row['grupo']}: {row['densidad']:.2f} (p = {row['p_valor']:.4f})")
+
+
+def benchmark(n_units=5000, n_replicates=DEFAULT_REPLICATES):
+    """Tiempo de bootstrap + permutación sobre datos sintéticos"""
+    import time
+    logger = setup_logging('polioxxo.resampling')
+    rng = np.random.default_rng(0)
+    votes = rng.gamma(2.0, 500.0, n_units)
+    stores = rng.poisson(votes / 500)
+    parties = rng.choice(['MORENA', 'PAN', 'PRI'], n_units, p=[0.6, 0.3, 0.1])
+    engine = ResamplingEngine(n_replicates)
+
+    start = time.perf_counter()
+    engine.correlation(votes, stores)
+    corr_time = time.perf_counter() - start
+    start = time.perf_counter()
+    engine.group_density(stores, np.ones(n_units), parties)
+    density_time = time.perf_counter() - start
+    logger.info(f"{n_replicates:,} réplicas x {n_units:,} unidades: correlación {corr_time:.2f}s, "
+                f"densidad por partido {density_time:.2f}s")
+    return corr_time, density_time
+
+
+if __name__ == "__main__":
+    benchmark()
@@ -0,0 +1,197 @@
+#!/usr/bin/env python3
+"""
+Alcance espacial de una corrida - Polioxxo
+
+Este módulo:
+1. Define el alcance de una corrida por caja envolvente (--bbox) o por
+   región (--region: una alcaldía o un distrito electoral)
+2. Lee los GPKG con el filtro empujado al índice espacial R-tree del
+   GeoPackage: solo se leen las geometrías que tocan la caja, y después se
+   conservan las que pertenecen a la región
+3. Da nombre propio a las salidas de una corrida acotada para no
+   sobrescribir las de la ciudad completa
+
+Uso:
+    polioxxo maps --region CUAUHTEMOC
+    polioxxo analyze --bbox=-99.17,19.41,-99.12,19.45   # con "=" por el signo negativo
+"""
+
+import sys
+import os
+
+# Agregar ruta del proyecto al path de Python
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import re
+from pathlib import Path
+
+from scripts.utils import setup_logging, get_project_paths
+from scripts.catalog import normalize_name
+
+SCOPE_CRS = 'EPSG:4326'
+
+# nivel -> GPKG procesado donde se busca el nombre de la región
+REGION_SOURCES = {
+    'alcaldia': 'datos_combinados.gpkg',
+    'distrito': 'distritos_electorales.gpkg',
+}
+
+
+def parse_bbox(text):
+    """'minx,miny,maxx,maxy' (lon/lat) -> tupla de floats"""
+    values = [float(v) for v in text.replace(' ', '').split(',')]
+    if len(values) != 4 or values[0] >= values[2] or values[1] >= values[3]:
+        raise ValueError(f"Caja inválida: {text} (se espera minx,miny,maxx,maxy)")
+    return tuple(values)
+
+
+class SpatialScope:
+    """
+    Caja y/o región que acota una corrida. La región se resuelve contra los
+    GPKG procesados la primera vez que se usa.
+    """
+
+    def __init__(self, bbox=None, region=None):
+        self.bbox = tuple(bbox) if bbox is not None else None
+        self.region = region
+        self.level = None
+        self.name = None
+        self.geometry = None
+        self._resolved = region is None
+
+    def __repr__(self):
+        return f"SpatialScope(bbox={self.bbox}, region={self.region!r})"
+
+    @property
+    def suffix(self):
+        """Sufijo para los nombres de archivo de la corrida acotada"""
+        if self.region is not None:
+            return '_' + re.sub(r'[^a-z0-9]+', '_', normalize_name(self.region).lower()).strip('_')
+        if self.bbox is not None:
+            return '_bbox_' + '_'.join(f"{v:.3f}" for v in self.bbox).replace('-', 'm').replace('.', 'p')
+        return ''
+
+    @property
+    def label(self):
+        if self.region is not None:
+            return self.name or self.region
+        return 'caja ' + ', '.join(f"{v:.4f}" for v in self.bbox)
+
+    def output_path(self, path):
+        """Ruta de salida con el sufijo de la corrida acotada"""
+        path = Path(path)
+        return path.with_name(f"{path.stem}{self.suffix}{path.suffix}")
+
+    def resolve(self, processed_dir=None):
+        """
+        Busca la región en alcaldías y distritos y fija su geometría y su caja
+        (intersección con --bbox si se dieron ambas). Lanza KeyError si no existe.
+        """
+        if self._resolved:
+            return self
+        import geopandas as gpd
+        from shapely.geometry import box
+
+        processed_dir = Path(processed_dir or get_project_paths()['data_processed'])
+        target = normalize_name(self.region)
+        for level, filename in REGION_SOURCES.items():
+            path = processed_dir / filename
+            if not path.exists():
+                continue
+            layer = gpd.read_file(path, columns=[level]).to_crs(SCOPE_CRS)
+            match = layer[layer[level].map(normalize_name) == target]
+            if len(match):
+                self.level = level
+                self.name = match[level].iloc[0]
+                self.geometry = match.geometry.union_all()
+                bounds = tuple(self.geometry.bounds)
+                if self.bbox is not None:
+                    clipped = box(*self.bbox).intersection(box(*bounds))
+                    bounds = tuple(clipped.bounds) if not clipped.is_empty else self.bbox
+                self.bbox = bounds
+                self._resolved = True
+                return self
+        raise KeyError(f"Región no encontrada en alcaldías ni distritos: {self.region}")
+
+    def read(self, path, columns=None):
+        """
+        Lee un GPKG con el filtro de caja empujado al índice espacial y
+        conserva solo los registros de la región
+        """
+        import geopandas as gpd
+        from shapely.geometry import box
+
+        self.resolve()
+        if columns is not None and self.level is not None and self.level not in columns:
+            columns = list(columns) + [self.level]
+        # Como GeoSeries, geopandas reproyecta la caja al CRS de la capa
+        mask = gpd.GeoSeries([box(*self.bbox)], crs=SCOPE_CRS) if self.bbox is not None else None
+        return self.filter(gpd.read_file(path, bbox=mask, columns=columns))
+
+    def filter(self, gdf):
+        """Conserva los registros de la región: por nombre si la capa tiene la
+        columna del nivel, si no por geometría (sin contar bordes compartidos).
+        Con solo --bbox recorta a la caja: en una capa proyectada el filtro
+        del índice usa la envolvente de la caja reproyectada, que es mayor."""
+        if gdf.empty or (self.geometry is None and self.bbox is None):
+            return gdf
+        if self.geometry is None:
+            from shapely.geometry import box
+            return gdf[gdf.intersects(self._to_crs(box(*self.bbox), gdf.crs))]
+        if self.level in gdf.columns:
+            names = [v for v in gdf[self.level].dropna().unique() if normalize_name(v) == normalize_name(self.name)]
+            return gdf[gdf[self.level].isin(names)]
+        geometry = self._to_crs(self.geometry, gdf.crs)
+        return gdf[gdf.intersects(geometry) & ~gdf.touches(geometry)]
+
+    @staticmethod
+    def _to_crs(geometry, crs):
+        """Geometría en lon/lat llevada al CRS de una capa"""
+        if crs is None or crs == SCOPE_CRS:
+            return geometry
+        import geopandas as gpd
+        return gpd.GeoSeries([geometry], crs=SCOPE_CRS).to_crs(crs).iloc[0]
+
+    def window(self, regions):
+        """
+        Polígonos de observación para estadística espacial: con solo --bbox
+        los puntos se leyeron dentro de la caja, así que las regiones se
+        recortan a ella; con --region ya son regiones completas
+        """
+        if self.region is not None or self.bbox is None:
+            return regions
+        from shapely.geometry import box
+        import geopandas as gpd
+        clip_box = gpd.GeoSeries([box(*self.bbox)], crs=SCOPE_CRS).to_crs(regions.crs)
+        return regions.clip(clip_box)
+
+
+def read_layer(path, scope=None, columns=None):
+    """gpd.read_file con el alcance de la corrida (sin alcance lee todo)"""
+    if scope is None:
+        import geopandas as gpd
+        return gpd.read_file(path, columns=columns)
+    return scope.read(path, columns=columns)
+
+
+def scoped_path(path, scope=None):
+    """Ruta de salida de la corrida (sin alcance, la ruta original)"""
+    return Path(path) if scope is None else scope.output_path(path)
+
+
+def add_scope_arguments(parser):
+    """Agrega --bbox y --region a un parser de argparse"""
+    parser.add_argument('--bbox', type=parse_bbox, metavar='MINX,MINY,MAXX,MAXY',
+                        help='Limitar a una caja (lon/lat)')
+    parser.add_argument('--region', help='Limitar a una alcaldía o distrito (p. ej. CUAUHTEMOC, DISTRITO_05)')
+    return parser
+
+
+def scope_from_args(args):
+    """SpatialScope de los argumentos, o None para la ciudad completa"""
+    bbox, region = getattr(args, 'bbox', None), getattr(args, 'region', None)
+    if bbox is None and region is None:
+        return None
+    scope = SpatialScope(bbox, region)
+    setup_logging('polioxxo.scope').info(f"📍 Corrida acotada a {scope.label}")
+    return scope
@@ -0,0 +1,272 @@
+#!/usr/bin/env python3
+"""
+Áreas de servicio (Voronoi) por Oxxo - Polioxxo
+
+Este módulo:
+1. Calcula el diagrama de Voronoi de todos los Oxxos proyectados con una
+   sola llamada a shapely.voronoi_polygons
+2. Recorta las celdas a la unión de alcaldías con una intersección
+   indexada (solo las celdas del borde se intersectan)
+3. Agrega el área de cada celda, la alcaldía dueña (mayor traslape) y el
+   distrito del Oxxo
+4. Guarda el resultado en caché según el hash del conjunto de puntos
+"""
+
+import sys
+import os
+
+# Agregar ruta del proyecto al path de Python
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import hashlib
+import json
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import geopandas as gpd
+import shapely
+
+from scripts.utils import setup_logging, get_project_paths, save_geodataframe
+from scripts.cache_manager import cache_hit, cache_stored
+from scripts.boundaries import projected_crs, BoundaryRegistry
+from scripts.spatial_stats import projected_coordinates
+from scripts.publish import publish_outputs
+
+SERVICE_AREAS_FORMAT = 1
+
+
+def default_cache_dir():
+    return get_project_paths()['data_processed'] / 'service_areas'
+
+
+def point_set_hash(coords, *layers):
+    """Hash del conjunto de puntos (y de los límites usados para recortar)"""
+    digest = hashlib.sha1()
+    digest.update(np.ascontiguousarray(coords, dtype=np.float64).tobytes())
+    for gdf in layers:
+        if gdf is None:
+            continue
+        for wkb in shapely.to_wkb(np.asarray(gdf.geometry.values, dtype=object)):
+            digest.update(wkb)
+    digest.update(str(SERVICE_AREAS_FORMAT).encode())
+    return digest.hexdigest()[:16]
+
+
+def voronoi_cells(coords, extent):
+    """
+    Celda de Voronoi de cada punto en el orden de `coords`.
+
+    Los puntos repetidos comparten celda: el diagrama se calcula sobre los
+    puntos únicos y se expande con el índice inverso.
+    """
+    unique, inverse = np.unique(coords, axis=0, return_inverse=True)
+    inverse = inverse.ravel()
+    collection = shapely.voronoi_polygons(shapely.multipoints(unique), extend_to=extent, ordered=True)
+    cells = shapely.get_parts(collection)
+    if len(cells) != len(unique):
+        # GEOS antiguo o puntos degenerados: emparejar celdas por índice espacial
+        tree = shapely.STRtree(cells)
+        p_idx, c_idx = tree.query(shapely.points(unique), predicate='intersects')
+        first = np.unique(p_idx, return_index=True)[1]
+        ordered = np.full(len(unique), None, dtype=object)
+        ordered[p_idx[first]] = cells[c_idx[first]]
+        cells = ordered
+    return cells[inverse], inverse
+
+
+def clip_cells(cells, regions):
+    """
+    Recorta las celdas a la unión de `regions`.
+
+    Retorna (geometrías recortadas, índice de la región con mayor traslape).
+    Las celdas contenidas por completo en una región no se intersectan; las
+    del borde se intersectan solo con las regiones que toca el índice, y
+    sus pedazos se unen con un dissolve.
+    """
+    n = len(cells)
+    clipped = np.full(n, None, dtype=object)
+    owner = np.full(n, -1, dtype=np.int64)
+
+    regions = np.asarray(regions, dtype=object)
+    shapely.prepare(regions)
+    tree = shapely.STRtree(regions)
+    c_idx, r_idx = tree.query(cells, predicate='intersects')
+    if not len(c_idx):
+        return clipped, owner
+
+    inside = shapely.contains_properly(regions[r_idx], cells[c_idx])
+    clipped[c_idx[inside]] = cells[c_idx[inside]]
+    owner[c_idx[inside]] = r_idx[inside]
+
+    # Celdas de borde: solo las que no quedaron completas en una región
+    border = ~np.isin(c_idx, c_idx[inside])
+    c_idx, r_idx = c_idx[border], r_idx[border]
+    if not len(c_idx):
+        return clipped, owner
+
+    pieces = shapely.intersection(cells[c_idx], regions[r_idx])
+    areas = shapely.area(pieces)
+    keep = areas > 0
+    c_idx, r_idx, pieces, areas = c_idx[keep], r_idx[keep], pieces[keep], areas[keep]
+
+    # Dueña: región con el pedazo más grande de cada celda
+    order = np.lexsort((-areas, c_idx))
+    first = order[np.r_[True, c_idx[order][1:] != c_idx[order][:-1]]]
+    owner[c_idx[first]] = r_idx[first]
+
+    counts = np.bincount(c_idx, minlength=n)
+    single = counts[c_idx] == 1
+    clipped[c_idx[single]] = pieces[single]
+    if (~single).any():
+        merged = gpd.GeoDataFrame({'celda': c_idx[~single]}, geometry=pieces[~single]).dissolve('celda')
+        clipped[merged.index.to_numpy()] = merged.geometry.values
+    return clipped, owner
+
+
+def _write_cache(path, frame):
+    wkb = shapely.to_wkb(np.asarray(frame.geometry.values, dtype=object))
+    # Las celdas fuera de la ciudad (None) se guardan con longitud 0
+    sizes = np.fromiter((len(b) if b is not None else 0 for b in wkb), dtype=np.int64, count=len(wkb))
+    blob = np.frombuffer(b''.join(b for b in wkb if b is not None), dtype=np.uint8)
+    columns = [c for c in frame.columns if c != frame.geometry.name]
+    np.savez_compressed(
+        path,
+        wkb=blob,
+        offsets=np.concatenate([[0], np.cumsum(sizes)]),
+        meta=np.array(json.dumps({'crs': str(frame.crs), 'columns': columns}, ensure_ascii=False)),
+        **{f'col_{i}': frame[c].to_numpy(dtype=str if pd.api.types.is_string_dtype(frame[c]) else None)
+           for i, c in enumerate(columns)},
+    )
+
+
+def _read_cache(path):
+    with np.load(path) as data:
+        meta = json.loads(str(data['meta']))
+        blob = data['wkb'].tobytes()
+        offsets = data['offsets']
+        values = {c: data[f'col_{i}'] for i, c in enumerate(meta['columns'])}
+    geometry = shapely.from_wkb([blob[offsets[i]:offsets[i + 1]] or None for i in range(len(offsets) - 1)])
+    return gpd.GeoDataFrame(values, geometry=geometry, crs=meta['crs'])
+
+
+def compute_service_areas(points, alcaldias, districts=None, crs=None,
+                          cache_dir=None, use_cache=True):
+    """
+    Área de servicio de cada Oxxo (una fila por Oxxo, en el orden de `points`).
+
+    Columnas: area_km2, alcaldia (mayor traslape con la celda), distrito
+    (del Oxxo, si se pasan distritos) y celda_compartida (Oxxos con las
+    mismas coordenadas). La geometría queda en el CRS proyectado.
+    """
+    logger = setup_logging('polioxxo.service_areas')
+
+    crs = crs or projected_crs()
+    coords = projected_coordinates(points, crs)
+    alcaldias_proj = alcaldias.to_crs(crs)
+    districts_proj = districts.to_crs(crs) if districts is not None else None
+
+    cache_dir = Path(cache_dir or default_cache_dir())
+    key = point_set_hash(coords, alcaldias_proj, districts_proj)
+    cache_path = cache_dir / f'areas_{key}.npz'
+    if use_cache and cache_path.exists():
+        logger.info(f"♻️ Áreas de servicio desde caché: {cache_path.name}")
+        cache_hit(cache_path, 'service_areas')
+        return _read_cache(cache_path)
+
+    regions = np.asarray(alcaldias_proj.geometry.values, dtype=object)
+    extent = shapely.envelope(shapely.union_all(regions)).buffer(1000)
+
+    logger.info(f"Calculando Voronoi de {len(coords)} Oxxos...")
+    cells, inverse = voronoi_cells(coords, extent)
+    clipped, owner = clip_cells(cells, regions)
+
+    names = alcaldias_proj['alcaldia'].astype(str).to_numpy()
+    areas = pd.DataFrame({
+        'area_km2': shapely.area(clipped) / 1e6,
+        'alcaldia': np.where(owner >= 0, names[np.maximum(owner, 0)], ''),
+        'celda_compartida': np.bincount(inverse)[inverse] > 1,
+    })
+
+    if districts_proj is not None:
+        registry = BoundaryRegistry(crs)
+        registry.add_layer('distrito', districts_proj, 'distrito')
+        indices, _ = registry.layers['distrito'].locate(shapely.points(coords))
+        areas['distrito'] = registry.layers['distrito'].keys[indices].astype(str)
+
+    result = gpd.GeoDataFrame(areas, geometry=clipped, crs=crs)
+    fuera = int(shapely.is_missing(clipped).sum())
+    logger.info(f"✅ {len(result)} áreas de servicio ({fuera} fuera de la ciudad, "
+                f"{int(result['celda_compartida'].sum())} en celdas compartidas)")
+
+    try:
+        cache_dir.mkdir(parents=True, exist_ok=True)
+        _write_cache(cache_path, result)
+        cache_stored(cache_path, 'service_areas')
+        logger.info(f"💾 Áreas de servicio guardadas en caché: {cache_path}")
+    except Exception as e:
+        logger.warning(f"No se pudo guardar la caché de áreas de servicio: {e}")
+    return result
+
+
+def summarize_service_areas(areas, level='alcaldia'):
+    """Resumen de tamaño de área de servicio por región"""
+    valid = areas[areas['area_km2'] > 0]
+    return valid.groupby(level)['area_km2'].agg(
+        num_oxxos='size', area_media_km2='mean', area_mediana_km2='median', area_max_km2='max'
+    ).reset_index()
+
+
+def main():
+    """Etapa de áreas de servicio sobre los datos procesados"""
+    from scripts.catalog import ensure_region_keys
+
+    logger = setup_logging('polioxxo.service_areas')
+    paths = get_project_paths()
+
+    logger.info("🧭 CALCULANDO ÁREAS DE SERVICIO (VORONOI)")
+    logger.info("=" * 50)
+
+    try:
+        alcaldias_path = paths['data_processed'] / 'datos_combinados.gpkg'
+        oxxos_path = paths['data_processed'] / 'oxxos_con_alcaldia.gpkg'
+        if not alcaldias_path.exists() or not oxxos_path.exists():
+            logger.error("Datos procesados no encontrados. Ejecuta process_data.py primero")
+            return False
+
+        alcaldias = gpd.read_file(alcaldias_path)
+        ensure_region_keys(alcaldias, 'alcaldia')
+        oxxos = gpd.read_file(oxxos_path)
+
+        districts = None
+        districts_path = paths['data_processed'] / 'distritos_electorales.gpkg'
+        if districts_path.exists():
+            districts = gpd.read_file(districts_path)
+
+        areas = compute_service_areas(oxxos, alcaldias, districts)
+
+        output = areas.copy()
+        if 'name' in oxxos.columns:
+            output.insert(0, 'name', oxxos['name'].to_numpy())
+        output = output[~shapely.is_missing(np.asarray(output.geometry.values, dtype=object))]
+        if not save_geodataframe(output, paths['data_processed'] / 'areas_servicio.gpkg'):
+            return False
+
+        summarize_service_areas(areas, 'alcaldia').to_csv(
+            paths['reports'] / 'areas_servicio_alcaldias.csv', index=False)
+        if 'distrito' in areas.columns:
+            summarize_service_areas(areas, 'distrito').to_csv(
+                paths['reports'] / 'areas_servicio_distritos.csv', index=False)
+
+        logger.info(f"📁 Áreas de servicio en: {paths['data_processed'] / 'areas_servicio.gpkg'}")
+        publish_outputs()
+        return True
+
+    except Exception as e:
+        logger.error(f"Error calculando áreas de servicio: {e}")
+        return False
+
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
@@ -0,0 +1,350 @@
+#!/usr/bin/env python3
+"""
+Historial de snapshots de Oxxos - Polioxxo
+
+Este módulo:
+1. Agrega cada corrida del pipeline como una partición compacta (un .npy
+   estructurado por snapshot) con llaves enteras de identidad, posición y
+   atributos
+2. Calcula aperturas, cierres y movimientos entre dos snapshots con joins
+   por hash sobre esas llaves (sin comparar geometrías)
+3. Mantiene una serie de tiempo de conteos por alcaldía en un CSV que solo
+   se extiende, para consultarla sin abrir las particiones
+
+Estructura en disco (data/processed/history/, por ciudad):
+- snapshots.json: lista de snapshots (id, fecha, archivo, conteo)
+- snapshot_<id>.npy: registros (id, pos, attr, lon, lat, alcaldia_id)
+- conteos.csv: snapshot, fecha, alcaldia_id, alcaldia, num_oxxos
+"""
+
+import sys
+import os
+
+# Agregar ruta del proyecto al path de Python
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import json
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from scripts.utils import setup_logging, get_project_paths
+from scripts.point_store import PointStore
+
+# Cuantización de la posición (grados); 1e-5° ≈ 1 m en CDMX
+POSITION_PRECISION = 1e-5
+
+# Columnas que identifican a una tienda cuando cambia de lugar
+ATTRIBUTE_COLUMNS = ['name', 'brand', 'addr:street', 'addr:housenumber']
+
+# Columnas que, si existen, dan un id estable de tienda
+ID_COLUMNS = ['osm_id', 'id', '@id']
+
+# Distancia máxima para considerar un cierre + apertura como movimiento
+MAX_MOVE_METERS = 2000
+
+SNAPSHOT_DTYPE = np.dtype([
+    ('id', '<u8'),
+    ('pos', '<u8'),
+    ('attr', '<u8'),
+    ('lon', '<f8'),
+    ('lat', '<f8'),
+    ('alcaldia_id', '<i2'),
+])
+
+
+def default_history_dir():
+    return get_project_paths()['data_processed'] / 'history'
+
+
+def position_keys(lon, lat, precision=POSITION_PRECISION):
+    """Llave uint64 exacta de la posición cuantizada (32 bits por eje)"""
+    qx = np.round(np.asarray(lon) / precision).astype(np.int64) & 0xFFFFFFFF
+    qy = np.round(np.asarray(lat) / precision).astype(np.int64) & 0xFFFFFFFF
+    return ((qx << 32) | qy).astype(np.uint64)
+
+
+def _column(points, name):
+    if isinstance(points, PointStore):
+        return points[name] if name in points else None
+    return points[name] if name in points.columns else None
+
+
+def attribute_keys(points, columns=ATTRIBUTE_COLUMNS):
+    """
+    Hash uint64 de los atributos descriptivos; 0 cuando no hay dirección
+    (la llave no distingue entre dos Oxxos genéricos)
+    """
+    present = [c for c in columns if _column(points, c) is not None]
+    if not present:
+        return np.zeros(len(points), dtype=np.uint64)
+    frame = pd.DataFrame({c: _column(points, c).fillna('').astype(str).to_numpy() for c in present})
+    keys = pd.util.hash_pandas_object(frame, index=False).to_numpy()
+    address = [c for c in present if c.startswith('addr:')]
+    if address:
+        has_address = (frame[address] != '').any(axis=1).to_numpy()
+        keys = np.where(has_address, keys, np.uint64(0))
+    return keys.astype(np.uint64)
+
+
+def identity_keys(points, pos):
+    """
+    Llave de identidad: id de OSM si existe; si no, la posición más el
+    número de aparición (dos Oxxos en el mismo punto no colisionan)
+    """
+    for name in ID_COLUMNS:
+        values = _column(points, name)
+        if values is not None and values.notna().all():
+            return pd.util.hash_array(values.astype(str).to_numpy()).astype(np.uint64)
+    rank = pd.Series(pos).groupby(pos).cumcount().to_numpy().astype(np.uint64)
+    return pos ^ (rank * np.uint64(0x9E3779B97F4A7C15))
+
+
+def snapshot_records(points):
+    """Registros compactos de un PointStore o GeoDataFrame en WGS84"""
+    if isinstance(points, PointStore):
+        lon, lat = points.projected_xy('EPSG:4326')
+    else:
+        geoseries = points.geometry.to_crs('EPSG:4326') if points.crs is not None else points.geometry
+        lon, lat = geoseries.x.to_numpy(), geoseries.y.to_numpy()
+
+    records = np.empty(len(points), dtype=SNAPSHOT_DTYPE)
+    records['lon'] = lon
+    records['lat'] = lat
+    records['pos'] = position_keys(lon, lat)
+    records['attr'] = attribute_keys(points)
+    records['id'] = identity_keys(points, records['pos'])
+    region = _column(points, 'alcaldia_id')
+    records['alcaldia_id'] = region.to_numpy() if region is not None else -1
+    return records
+
+
+def _haversine(lon1, lat1, lon2, lat2):
+    lon1, lat1, lon2, lat2 = map(np.radians, (lon1, lat1, lon2, lat2))
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * 6371000 * np.arcsin(np.sqrt(a))
+
+
+def diff_records(old, new, max_move=MAX_MOVE_METERS):
+    """
+    Aperturas, cierres y movimientos entre dos arreglos de registros.
+
+    Las llaves se cruzan con índices hash de pandas: primero por identidad;
+    después los cierres y aperturas restantes se emparejan por la llave de
+    atributos (única en ambos lados) para detectar movimientos.
+    """
+    old_index = pd.Index(old['id'])
+    in_old = old_index.get_indexer(new['id']) >= 0
+    in_new = pd.Index(new['id']).get_indexer(old['id']) >= 0
+    openings = new[~in_old]
+    closures = old[~in_new]
+
+    # Movimientos con id estable: misma identidad, otra posición
+    matched = old_index.get_indexer(new['id'])
+    same = matched >= 0
+    moved_by_id = same.copy()
+    moved_by_id[same] = old['pos'][matched[same]] != new['pos'][same]
+    moves_from = [old[matched[moved_by_id]]]
+    moves_to = [new[moved_by_id]]
+
+    # Movimientos por atributos entre cierres y aperturas
+    def unique_attr(records):
+        attr = pd.Series(records['attr'])
+        return (attr != 0) & ~attr.duplicated(keep=False)
+
+    closure_ok = unique_attr(closures).to_numpy()
+    opening_ok = unique_attr(openings).to_numpy()
+    closure_attr = pd.Index(closures['attr'][closure_ok])
+    pair = closure_attr.get_indexer(openings['attr'])
+    pair[~opening_ok] = -1
+    candidates = np.flatnonzero(pair >= 0)
+    if len(candidates):
+        src = closures[closure_ok][pair[candidates]]
+        dst = openings[candidates]
+        near = _haversine(src['lon'], src['lat'], dst['lon'], dst['lat']) <= max_move
+        moves_from.append(src[near])
+        moves_to.append(dst[near])
+        moved_closures = pd.Index(src['id'][near])
+        closures = closures[moved_closures.get_indexer(closures['id']) < 0]
+        openings = np.delete(openings, candidates[near])
+
+    src = np.concatenate(moves_from)
+    dst = np.concatenate(moves_to)
+    moves = pd.DataFrame({
+        'lon_anterior': src['lon'], 'lat_anterior': src['lat'],
+        'lon': dst['lon'], 'lat': dst['lat'],
+        'alcaldia_id_anterior': src['alcaldia_id'], 'alcaldia_id': dst['alcaldia_id'],
+        'distancia_m': _haversine(src['lon'], src['lat'], dst['lon'], dst['lat']),
+    })
+    columns = ['lon', 'lat', 'alcaldia_id']
+    return {
+        'aperturas': pd.DataFrame({c: openings[c] for c in columns}),
+        'cierres': pd.DataFrame({c: closures[c] for c in columns}),
+        'movimientos': moves,
+    }
+
+
+class SnapshotStore:
+    """
+    Historial de snapshots en particiones .npy que se abren con mmap
+    """
+
+    def __init__(self, directory=None):
+        self.directory = Path(directory or default_history_dir())
+        self.manifest_path = self.directory / 'snapshots.json'
+        self.counts_path = self.directory / 'conteos.csv'
+
+    def snapshots(self):
+        """Lista de snapshots (dicts id, fecha, archivo, num_oxxos), del más antiguo al más reciente"""
+        if not self.manifest_path.exists():
+            return []
+        with open(self.manifest_path, encoding='utf-8') as f:
+            return json.load(f)
+
+    def _write_manifest(self, entries):
+        tmp = self.manifest_path.with_name(f'.{self.manifest_path.name}.tmp-{os.getpid()}')
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(entries, f, ensure_ascii=False, indent=2)
+        os.replace(tmp, self.manifest_path)
+
+    def _entry(self, snapshot_id):
+        entries = self.snapshots()
+        if snapshot_id in (None, 'ultimo'):
+            return entries[-1] if entries else None
+        if snapshot_id == 'anterior':
+            return entries[-2] if len(entries) > 1 else None
+        for entry in entries:
+            if entry['id'] == snapshot_id:
+                return entry
+        raise KeyError(f"Snapshot no encontrado: {snapshot_id}")
+
+    def load(self, snapshot_id=None):
+        """Registros de un snapshot (mmap, solo lectura)"""
+        entry = self._entry(snapshot_id)
+        if entry is None:
+            return None
+        return np.load(self.directory / entry['archivo'], mmap_mode='r')
+
+    def append(self, points, taken_at=None):
+        """
+        Agrega un snapshot. Si el contenido es idéntico al último, el nuevo
+        registro del manifiesto reutiliza la partición existente.
+        """
+        self.directory.mkdir(parents=True, exist_ok=True)
+        now = time.time()
+        taken_at = taken_at or time.strftime('%Y-%m-%dT%H:%M:%S', time.localtime(now))
+        # Milisegundos y pid: dos corridas en el mismo segundo no chocan
+        snapshot_id = f"{taken_at.replace('-', '').replace(':', '')}-{int(now * 1000) % 1000:03d}_{os.getpid()}"
+
+        records = snapshot_records(points)
+        records = records[np.argsort(records['id'], kind='stable')]
+        entries = self.snapshots()
+        if entries and entries[-1]['id'] == snapshot_id:
+            raise ValueError(f"Ya existe un snapshot con id {snapshot_id}")
+
+        filename = f'snapshot_{snapshot_id}.npy'
+        previous = self.load() if entries else None
+        # Registros completos: un cambio de nombre o de alcaldía también es un snapshot nuevo
+        if previous is not None and previous.dtype == records.dtype and np.array_equal(previous, records):
+            filename = entries[-1]['archivo']
+        else:
+            tmp = self.directory / f'.{filename}.tmp-{os.getpid()}.npy'
+            np.save(tmp, records)
+            os.replace(tmp, self.directory / filename)
+
+        entries.append({'id': snapshot_id, 'fecha': taken_at, 'archivo': filename, 'num_oxxos': int(len(records))})
+        self._write_manifest(entries)
+        self._append_counts(snapshot_id, taken_at, records['alcaldia_id'])
+        return snapshot_id
+
+    def _append_counts(self, snapshot_id, taken_at, region_ids):
+        from scripts.catalog import get_catalog
+        ids, counts = np.unique(region_ids, return_counts=True)
+        catalog = get_catalog('alcaldia')
+        names = [catalog.label(i) if 0 <= i < len(catalog) else '' for i in ids]
+        rows = pd.DataFrame({
+            'snapshot': snapshot_id, 'fecha': taken_at,
+            'alcaldia_id': ids, 'alcaldia': names, 'num_oxxos': counts,
+        })
+        rows.to_csv(self.counts_path, mode='a', header=not self.counts_path.exists(), index=False)
+
+    def diff(self, old_id='anterior', new_id='ultimo', max_move=MAX_MOVE_METERS):
+        """Aperturas, cierres y movimientos entre dos snapshots (solo abre esos dos)"""
+        old, new = self.load(old_id), self.load(new_id)
+        if old is None or new is None:
+            return None
+        return diff_records(old, new, max_move)
+
+    def iter_changes(self, start=None, end=None):
+        """
+        Resumen de cambios entre snapshots consecutivos; solo mantiene dos
+        particiones abiertas a la vez
+        """
+        entries = [e for e in self.snapshots()
+                   if (start is None or e['fecha'] >= start) and (end is None or e['fecha'] <= end)]
+        previous = None
+        for entry in entries:
+            current = np.load(self.directory / entry['archivo'], mmap_mode='r')
+            if previous is not None:
+                if previous[0]['archivo'] == entry['archivo']:
+                    changes = {'aperturas': 0, 'cierres': 0, 'movimientos': 0}
+                else:
+                    changes = {k: len(v) for k, v in diff_records(previous[1], current).items()}
+                yield {'desde': previous[0]['id'], 'hasta': entry['id'], **changes}
+            previous = (entry, current)
+
+    def counts(self, pivot=True):
+        """Serie de tiempo de Oxxos por alcaldía (sin abrir particiones)"""
+        if not self.counts_path.exists():
+            return pd.DataFrame()
+        counts = pd.read_csv(self.counts_path, dtype={'snapshot': str})
+        if not pivot:
+            return counts
+        return counts.pivot_table(index='fecha', columns='alcaldia', values='num_oxxos',
+                                  aggfunc='sum', fill_value=0)
+
+
+def record_snapshot(points, directory=None):
+    """
+    Agrega un snapshot y registra en el log los cambios contra el anterior
+    """
+    logger = setup_logging('polioxxo.snapshots')
+    try:
+        store = SnapshotStore(directory)
+        snapshot_id = store.append(points)
+        changes = store.diff()
+        if changes is None:
+            logger.info(f"📸 Snapshot {snapshot_id} guardado (primero del historial)")
+        else:
+            logger.info(f"📸 Snapshot {snapshot_id}: +{len(changes['aperturas'])} aperturas, "
+                        f"-{len(changes['cierres'])} cierres, {len(changes['movimientos'])} movimientos")
+        return snapshot_id
+    except Exception as e:
+        logger.error(f"Error guardando snapshot: {e}")
+        return False
+
+
+def main():
+    """Muestra el historial y los cambios del último snapshot"""
+    logger = setup_logging('polioxxo.snapshots')
+    store = SnapshotStore()
+    entries = store.snapshots()
+    if not entries:
+        logger.info("No hay snapshots. Ejecuta process_data.py")
+        return True
+
+    logger.info(f"📚 {len(entries)} snapshots ({entries[0]['fecha']} a {entries[-1]['fecha']})")
+    for change in store.iter_changes():
+        logger.info(f"  {change['desde']} -> {change['hasta']}: +{change['aperturas']} "
+                    f"-{change['cierres']} ~{change['movimientos']}")
+    counts = store.counts()
+    if len(counts):
+        logger.info(f"\n{counts.tail(5).T.to_string()}")
+    return True
+
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
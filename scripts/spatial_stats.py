@@ -0,0 +1,242 @@
+#!/usr/bin/env python3
+"""
+Estadística de patrones de puntos de Oxxos - Polioxxo
+
+Este módulo construye un KD-tree una sola vez sobre las coordenadas
+proyectadas de los Oxxos y calcula:
+1. Índice de vecino más cercano de Clark–Evans (R y estadístico z)
+2. Distribución de distancias al vecino más cercano
+3. Funciones K y L de Ripley con corrección de borde, por alcaldía y por
+   distrito
+
+Las consultas por radio se hacen en lote (count_neighbors con un arreglo
+de radios), de modo que la curva K completa es tratable con 1M de puntos.
+"""
+
+import sys
+import os
+
+# Agregar ruta del proyecto al path de Python
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+import pandas as pd
+import shapely
+from scipy.spatial import cKDTree
+
+from scripts.utils import setup_logging
+from scripts.boundaries import projected_crs
+from scripts.point_store import PointStore
+
+# Radios por defecto para K/L de Ripley (metros)
+DEFAULT_RADII = np.array([100, 250, 500, 750, 1000, 1500, 2000, 3000], dtype=float)
+
+# Radios reportados en el texto del reporte
+REPORT_RADII = (250, 500, 1000)
+
+
+def projected_coordinates(points, crs=None):
+    """
+    Matriz (n, 2) de coordenadas proyectadas desde PointStore o GeoDataFrame
+    """
+    crs = crs or projected_crs()
+    if isinstance(points, PointStore):
+        x, y = points.projected_xy(crs)
+        return np.column_stack([x, y])
+    geoseries = points.geometry
+    if geoseries.crs is not None and geoseries.crs != crs:
+        geoseries = geoseries.to_crs(crs)
+    geoms = np.asarray(geoseries.values, dtype=object)
+    return np.column_stack([shapely.get_x(geoms), shapely.get_y(geoms)])
+
+
+class PointPattern:
+    """
+    Patrón de puntos en una ventana de estudio con su KD-tree
+    """
+
+    def __init__(self, coords, window=None, tree=None):
+        self.coords = np.asarray(coords, dtype=float)
+        self.n = len(self.coords)
+        if window is None:
+            window = shapely.convex_hull(shapely.multipoints(self.coords)) if self.n >= 3 else None
+        self.window = window
+        self.area = float(window.area) if window is not None else 0.0
+        self.tree = tree if tree is not None else cKDTree(self.coords)
+        self._nn = None
+
+    @property
+    def intensity(self):
+        return self.n / self.area if self.area > 0 else np.nan
+
+    def nearest_neighbor_distances(self):
+        """Distancia de cada punto a su vecino más cercano (metros)"""
+        if self._nn is None:
+            if self.n < 2:
+                self._nn = np.full(self.n, np.nan)
+            else:
+                dist, _ = self.tree.query(self.coords, k=2)
+                self._nn = dist[:, 1]
+        return self._nn
+
+    def nearest_neighbor_summary(self, quantiles=(0.1, 0.25, 0.5, 0.75, 0.9)):
+        """Media y cuantiles de la distribución de distancias NN"""
+        nn = self.nearest_neighbor_distances()
+        summary = {'nn_media_m': float(np.nanmean(nn)) if self.n >= 2 else np.nan}
+        for q in quantiles:
+            summary[f'nn_p{int(q * 100)}_m'] = float(np.nanquantile(nn, q)) if self.n >= 2 else np.nan
+        return summary
+
+    def clark_evans(self):
+        """
+        Índice R de Clark–Evans y su estadístico z (sin corrección de borde).
+
+        R < 1 indica agrupamiento, R ≈ 1 aleatoriedad y R > 1 regularidad.
+        """
+        if self.n < 2 or self.area <= 0:
+            return np.nan, np.nan
+        observed = np.mean(self.nearest_neighbor_distances())
+        expected = 0.5 / np.sqrt(self.intensity)
+        std_error = 0.26136 / np.sqrt(self.n * self.intensity)
+        return observed / expected, (observed - expected) / std_error
+
+    def ripley_k(self, radii=DEFAULT_RADII):
+        """
+        K(r) de Ripley con corrección de borde (reduced sample).
+
+        Solo cuentan como centros los puntos a distancia >= r del borde de la
+        ventana. Los centros se agrupan en bandas según esa distancia y cada
+        banda hace una sola consulta dual-tree con todos los radios que le
+        corresponden.
+        """
+        radii = np.sort(np.asarray(radii, dtype=float))
+        k_values = np.full(len(radii), np.nan)
+        if self.n < 2 or self.window is None or self.area <= 0:
+            return radii, k_values
+
+        x, y = self.coords[:, 0], self.coords[:, 1]
+        inside = shapely.contains_xy(self.window, x, y)
+        border_distance = np.where(
+            inside, shapely.distance(self.window.boundary, shapely.points(self.coords)), -1.0
+        )
+
+        # Banda b: centros elegibles para radii[0..b]
+        band = np.searchsorted(radii, border_distance, side='right') - 1
+        pair_counts = np.zeros(len(radii))
+        eligible = np.zeros(len(radii))
+        for b in np.unique(band[band >= 0]):
+            centers = self.coords[band == b]
+            counts = cKDTree(centers).count_neighbors(self.tree, radii[:b + 1], cumulative=True)
+            pair_counts[:b + 1] += counts - len(centers)  # sin el par consigo mismo
+            eligible[:b + 1] += len(centers)
+
+        valid = eligible > 0
+        k_values[valid] = pair_counts[valid] / (eligible[valid] * self.intensity)
+        return radii, k_values
+
+    def ripley_l(self, radii=DEFAULT_RADII):
+        """L(r) = sqrt(K(r)/π); bajo aleatoriedad L(r) ≈ r"""
+        radii, k_values = self.ripley_k(radii)
+        return radii, np.sqrt(k_values / np.pi)
+
+
+def pattern_statistics(pattern, radii=DEFAULT_RADII):
+    """
+    Resumen de un patrón (una fila) y su curva K/L (varias filas)
+    """
+    ce_r, ce_z = pattern.clark_evans()
+    row = {
+        'num_oxxos': pattern.n,
+        'area_km2': pattern.area / 1e6,
+        'densidad_km2': pattern.intensity * 1e6 if pattern.area > 0 else np.nan,
+        'clark_evans_r': ce_r,
+        'clark_evans_z': ce_z,
+    }
+    row.update(pattern.nearest_neighbor_summary())
+
+    radii, k_values = pattern.ripley_k(radii)
+    l_values = np.sqrt(k_values / np.pi)
+    for r, l in zip(radii, l_values):
+        if r in REPORT_RADII:
+            row[f'L_menos_r_{int(r)}m'] = l - r
+    curve = pd.DataFrame({'radio_m': radii, 'K': k_values, 'L': l_values, 'L_menos_r': l_values - radii})
+    return row, curve
+
+
+def compute_point_pattern_stats(points, regions, key, radii=DEFAULT_RADII, crs=None):
+    """
+    Estadísticas de patrón por región (alcaldía o distrito) y para toda la ciudad.
+
+    `points` debe tener la columna `key` asignada; `regions` es el
+    GeoDataFrame de polígonos con la misma columna. Solo los puntos dentro
+    de la ventana de su región forman el patrón (los asignados por
+    proximidad se cuentan en `fuera_ventana`). Retorna (resumen por región,
+    curvas K/L en formato largo).
+    """
+    logger = setup_logging('polioxxo.spatial_stats')
+
+    crs = crs or projected_crs()
+    coords = projected_coordinates(points, crs)
+    keys = np.asarray(points[key])
+    regions_proj = regions.to_crs(crs) if regions.crs is not None and regions.crs != crs else regions
+    windows = dict(zip(regions_proj[key], regions_proj.geometry.values))
+
+    rows, curves = [], []
+
+    # Ciudad completa: un único KD-tree sobre todos los puntos
+    city_window = shapely.union_all(np.asarray(regions_proj.geometry.values, dtype=object))
+    inside = shapely.contains_xy(city_window, coords[:, 0], coords[:, 1])
+    city = PointPattern(coords[inside], city_window)
+    row, curve = pattern_statistics(city, radii)
+    rows.append({key: 'TOTAL', **row, 'fuera_ventana': int((~inside).sum())})
+    curves.append(curve.assign(**{key: 'TOTAL'}))
+
+    codes, uniques = pd.factorize(keys)
+    order = np.argsort(codes, kind='stable')
+    bounds = np.searchsorted(codes[order], np.arange(len(uniques) + 1))
+    for code, region in enumerate(uniques):
+        members = order[bounds[code]:bounds[code + 1]]
+        window = windows.get(region)
+        if window is None:
+            continue
+        inside = shapely.contains_xy(window, coords[members, 0], coords[members, 1])
+        if inside.sum() < 2:
+            continue
+        pattern = PointPattern(coords[members[inside]], window)
+        row, curve = pattern_statistics(pattern, radii)
+        rows.append({key: region, **row, 'fuera_ventana': int((~inside).sum())})
+        curves.append(curve.assign(**{key: region}))
+
+    summary = pd.DataFrame(rows)
+    curves = pd.concat(curves, ignore_index=True) if curves else pd.DataFrame()
+    logger.info(f"Patrón espacial por {key}: {len(summary) - 1} regiones, "
+                f"Clark–Evans ciudad R={summary.iloc[0]['clark_evans_r']:.3f}")
+    return summary, curves
+
+
+def format_pattern_report(summary, key, title):
+    """
+    Sección de texto para los reportes a partir del resumen por región
+    """
+    lines = [f"\n{title}:"]
+    total = summary[summary[key] == 'TOTAL']
+    if len(total):
+        t = total.iloc[0]
+        interpretacion = ('agrupado' if t['clark_evans_r'] < 1 else 'regular')
+        lines.append(f"- Clark–Evans R (ciudad): {t['clark_evans_r']:.3f} (z = {t['clark_evans_z']:.1f}, patrón {interpretacion})")
+        lines.append(f"- Oxxos dentro de la ventana: {int(t['num_oxxos']):,} ({int(t['fuera_ventana']):,} fuera)")
+        lines.append(f"- Distancia media al Oxxo más cercano: {t['nn_media_m']:.0f} m "
+                     f"(mediana {t['nn_p50_m']:.0f} m, p90 {t['nn_p90_m']:.0f} m)")
+        for r in REPORT_RADII:
+            column = f'L_menos_r_{r}m'
+            if column in t and pd.notna(t[column]):
+                lines.append(f"- L({r} m) - {r}: {t[column]:+.0f} m")
+
+    lines.append("")
+    lines.append(f"{'Región':<28}{'Oxxos':>7}{'R CE':>8}{'NN med (m)':>12}{'L-r 500m':>10}")
+    regiones = summary[summary[key] != 'TOTAL'].sort_values('clark_evans_r')
+    for _, row in regiones.iterrows():
+        l500 = row.get('L_menos_r_500m', np.nan)
+        lines.append(f"{str(row[key])[:27]:<28}{int(row['num_oxxos']):>7}{row['clark_evans_r']:>8.3f}"
+                     f"{row['nn_p50_m']:>12.0f}{l500:>10.0f}")
+    return "\n".join(lines) + "\n"
@@ -4,29 +4,19 @@ Utilidades comunes para el proyecto polioxxo
 """
 
 import logging
-import geopandas as gpd
-import pandas as pd
+import os
 from pathlib import Path
 
 def setup_logging(name='polioxxo', level=logging.INFO):
     """
-    Configura logging consistente para todos los scripts
+    Configura logging consistente para todos los scripts. La configuración
+    (cola, archivo JSON y límite por sitio de llamada, ver
+    scripts/log_config.py) se hace una sola vez por proceso; las llamadas
+    siguientes solo regresan el logger.
     """
-    # Asegurar que existe el directorio de logs
-    base_dir = Path(__file__).parent.parent
-    logs_dir = base_dir / 'logs'
-    logs_dir.mkdir(exist_ok=True)
-    
-    log_file = logs_dir / 'polioxxo.log'
-    
-    logging.basicConfig(
-        level=level,
-        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-        handlers=[
-            logging.StreamHandler(),
-            logging.FileHandler(log_file, encoding='utf-8')
-        ]
-    )
+    from scripts.log_config import configure_logging
+
+    configure_logging(level)
     return logging.getLogger(name)
 
 def ensure_same_crs(gdf1, gdf2, target_crs='EPSG:4326'):
@@ -39,28 +29,6 @@ def ensure_same_crs(gdf1, gdf2, target_crs='EPSG:4326'):
         gdf2 = gdf2.to_crs(target_crs)
     return gdf1, gdf2
 
-def validate_geometry(gdf):
-    """
-    Valida y repara geometrías en un GeoDataFrame
-    """
-    logger = logging.getLogger('polioxxo.utils')
-    
-    # Contar geometrías válidas
-    valid_geoms = gdf.geometry.is_valid.sum()
-    total_geoms = len(gdf)
-    
-    logger.info(f"Geometrías válidas: {valid_geoms}/{total_geoms}")
-    
-    if valid_geoms < total_geoms:
-        logger.info("Reparando geometrías inválidas...")
-        gdf.loc[~gdf.geometry.is_valid, 'geometry'] = gdf.loc[~gdf.geometry.is_valid, 'geometry'].buffer(0)
-        
-        # Verificar reparación
-        valid_after = gdf.geometry.is_valid.sum()
-        logger.info(f"Geometrías válidas después de reparación: {valid_after}/{total_geoms}")
-    
-    return gdf
-
 def create_project_structure():
     """
     Crea la estructura de directorios del proyecto
@@ -81,44 +49,58 @@ def create_project_structure():
     
     return base_dir
 
-def get_project_paths():
+def get_project_paths(city=None):
     """
-    Retorna diccionario con paths importantes del proyecto
+    Retorna diccionario con paths importantes del proyecto. Las ciudades
+    distintas de la predeterminada (config/cities.py) usan su propia
+    partición: data/raw/<clave>, data/processed/<clave>, maps/<clave>, ...
     """
+    from config.cities import DEFAULT_CITY, active_city_key
     base_dir = Path(__file__).parent.parent
+    city = city or active_city_key()
+    partition = () if city == DEFAULT_CITY else (city,)
     
     return {
         'base': base_dir,
-        'data_raw': base_dir / "data" / "raw",
-        'data_processed': base_dir / "data" / "processed",
+        'data_raw': base_dir.joinpath("data", "raw", *partition),
+        'data_processed': base_dir.joinpath("data", "processed", *partition),
         'data_external': base_dir / "data" / "external",
-        'maps': base_dir / "maps",
-        'reports': base_dir / "reports",
+        'maps': base_dir.joinpath("maps", *partition),
+        'reports': base_dir.joinpath("reports", *partition),
         'scripts': base_dir / "scripts",
         'logs': base_dir / "logs"
     }
 
 def save_geodataframe(gdf, filepath, driver='GPKG'):
     """
-    Guarda un GeoDataFrame con manejo de errores
+    Guarda un GeoDataFrame con manejo de errores. Se escribe en un temporal
+    del mismo directorio y se renombra: un lector nunca ve un GPKG a medias
+    y las versiones publicadas (scripts/publish.py) conservan su inodo.
     """
     logger = logging.getLogger('polioxxo.utils')
     
+    filepath = Path(filepath)
+    tmp = filepath.with_name(f'.{filepath.stem}.tmp-{os.getpid()}{filepath.suffix}')
     try:
-        filepath = Path(filepath)
         filepath.parent.mkdir(parents=True, exist_ok=True)
         
-        gdf.to_file(filepath, driver=driver)
+        # La capa conserva el nombre del archivo final, no el del temporal
+        layer = {'layer': filepath.stem} if driver == 'GPKG' else {}
+        gdf.to_file(tmp, driver=driver, **layer)
+        os.replace(tmp, filepath)
         logger.info(f"Archivo guardado: {filepath}")
         return True
         
     except Exception as e:
         logger.error(f"Error guardando {filepath}: {e}")
+        if tmp.exists():
+            tmp.unlink()
         return False
 
-def load_geodataframe(filepath):
+def load_geodataframe(filepath, scope=None, columns=None):
     """
-    Carga un GeoDataFrame con manejo de errores
+    Carga un GeoDataFrame con manejo de errores; con `scope`
+    (scripts/scope.py) solo lee los registros de la caja o región
     """
     logger = logging.getLogger('polioxxo.utils')
     
@@ -127,7 +109,8 @@ def load_geodataframe(filepath):
         if not filepath.exists():
             raise FileNotFoundError(f"Archivo no encontrado: {filepath}")
         
-        gdf = gpd.read_file(filepath)
+        from scripts.scope import read_layer
+        gdf = read_layer(filepath, scope, columns)
         logger.info(f"Archivo cargado: {filepath} ({len(gdf)} registros)")
         return gdf
         
@@ -171,42 +154,3 @@ def create_electoral_districts():
     
     logger.info(f"Creados {len(districts_data)} distritos electorales")
     return districts_data
-
-def create_summary_report(data_dict, output_path):
-    """
-    Crea un reporte resumen del proyecto
-    """
-    logger = logging.getLogger('polioxxo.utils')
-    
-    try:
-        report_lines = [
-            "=" * 60,
-            "REPORTE RESUMEN - POLIOXXO",
-            "Análisis de Oxxos en CDMX por Alcaldías y Distritos Electorales",
-            "=" * 60,
-            ""
-        ]
-        
-        for section, data in data_dict.items():
-            report_lines.append(f"{section}:")
-            if isinstance(data, dict):
-                for key, value in data.items():
-                    report_lines.append(f"  - {key}: {value}")
-            else:
-                report_lines.append(f"  {data}")
-            report_lines.append("")
-        
-        report_content = "\n".join(report_lines)
-        
-        output_path = Path(output_path)
-        output_path.parent.mkdir(parents=True, exist_ok=True)
-        
-        with open(output_path, 'w', encoding='utf-8') as f:
-            f.write(report_content)
-        
-        logger.info(f"Reporte creado: {output_path}")
-        return True
-        
-    except Exception as e:
-        logger.error(f"Error creando reporte: {e}")
-        return False
@@ -0,0 +1,78 @@
+"""
+Configuración común de las pruebas - Polioxxo
+"""
+
+import sys
+import os
+
+# Agregar ruta del proyecto al path de Python
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Sin perfil ni métricas de corrida: las pruebas no escriben en logs/
+os.environ.setdefault('POLIOXXO_PROFILE', '0')
+os.environ.setdefault('POLIOXXO_METRICS_EXPORT', '0')
+
+import pytest
+
+RAW_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data', 'raw')
+
+
+@pytest.fixture(scope='session')
+def sample_alcaldias():
+    """Alcaldías de los datos de muestra (data/raw) con sus claves enteras"""
+    import geopandas as gpd
+    from scripts.process_data import prepare_alcaldias_layer
+    path = os.path.join(RAW_DIR, 'alcaldias_cdmx.geojson')
+    if not os.path.exists(path):
+        pytest.skip("Sin datos de muestra de alcaldías")
+    return prepare_alcaldias_layer(gpd.read_file(path))
+
+
+@pytest.fixture(scope='session')
+def sample_oxxos():
+    """Oxxos de los datos de muestra (solo puntos válidos)"""
+    import geopandas as gpd
+    path = os.path.join(RAW_DIR, 'oxxos_cdmx.geojson')
+    if not os.path.exists(path):
+        pytest.skip("Sin datos de muestra de Oxxos")
+    oxxos = gpd.read_file(path)
+    oxxos = oxxos[oxxos.geometry.notna() & (oxxos.geometry.geom_type == 'Point')]
+    return oxxos.reset_index(drop=True)
+
+
+@pytest.fixture(scope='session')
+def sample_districts():
+    """Distritos electorales sintéticos de CDMX"""
+    from scripts.analyze_districts import create_synthetic_districts
+    return create_synthetic_districts()
+
+
+@pytest.fixture(scope='session')
+def assigned(sample_alcaldias, sample_oxxos, sample_districts):
+    """Oxxos de muestra asignados a alcaldías y distritos en una pasada"""
+    from scripts.process_data import build_boundary_registry
+    registry = build_boundary_registry(sample_alcaldias, sample_districts)
+    return registry.assign(sample_oxxos)
+
+
+@pytest.fixture
+def project_paths(tmp_path, monkeypatch):
+    """
+    get_project_paths() bajo un directorio temporal en todos los módulos de
+    scripts/ (también los que se importen durante la prueba)
+    """
+    import scripts.utils as utils
+    import scripts.cache_manager as cache_manager
+
+    real = utils.get_project_paths
+
+    def temporary(city=None):
+        paths = real(city)
+        return {name: path if name == 'scripts' else tmp_path / path.relative_to(paths['base'])
+                for name, path in paths.items()}
+
+    for name, module in list(sys.modules.items()):
+        if name.startswith('scripts') and getattr(module, 'get_project_paths', None) is real:
+            monkeypatch.setattr(module, 'get_project_paths', temporary)
+    monkeypatch.setattr(cache_manager, '_managers', {})
+    return temporary()
@@ -0,0 +1,128 @@
+"""
+Asignación de Oxxos a alcaldías y distritos (scripts/boundaries.py)
+
+La asignación en una sola pasada debe coincidir con el camino anterior de
+dos pasadas (una por capa): join espacial; para los puntos que no caen en
+ningún polígono, el polígono más cercano dentro del buffer de la capa; y
+para los que quedan más lejos, el centroide más cercano.
+"""
+
+import geopandas as gpd
+import pytest
+
+from scripts.boundaries import projected_crs
+
+LAYERS = [
+    # (capa, fixture, columna clave, buffer en metros)
+    ('alcaldia', 'sample_alcaldias', 'alcaldia', 1000),
+    ('distrito', 'sample_districts', 'distrito', 500),
+]
+
+
+def two_pass_assignment(points, polygons, key, buffer):
+    """
+    Camino de referencia para una capa: join 'within' contra los polígonos,
+    luego el polígono más cercano a menos de `buffer` metros y al final el
+    centroide más cercano. Regresa por punto el conjunto de claves
+    aceptables (varias si los polígonos se traslapan o hay empate).
+    """
+    points = points[['geometry']].to_crs(projected_crs())
+    polygons = polygons[[key, 'geometry']].to_crs(projected_crs())
+
+    accepted = [set() for _ in range(len(points))]
+    inside = gpd.sjoin(points, polygons, how='inner', predicate='within')
+    for i, value in zip(inside.index, inside[key]):
+        accepted[i].add(value)
+
+    rest = points.loc[[i for i, keys in enumerate(accepted) if not keys]]
+    near = gpd.sjoin_nearest(rest, polygons, how='inner', max_distance=buffer)
+    for i, value in zip(near.index, near[key]):
+        accepted[i].add(value)
+
+    rest = points.loc[[i for i, keys in enumerate(accepted) if not keys]]
+    centroids = polygons.set_geometry(polygons.geometry.centroid)
+    nearest = gpd.sjoin_nearest(rest, centroids, how='inner')
+    for i, value in zip(nearest.index, nearest[key]):
+        accepted[i].add(value)
+    return accepted
+
+
+@pytest.mark.parametrize('layer, fixture, key, buffer', LAYERS)
+def test_single_pass_matches_two_pass(request, assigned, sample_oxxos, layer, fixture, key, buffer):
+    polygons = request.getfixturevalue(fixture)
+    expected = two_pass_assignment(sample_oxxos, polygons, key, buffer)
+
+    assert all(expected)
+    mismatches = [i for i, keys in enumerate(expected) if assigned[layer].iloc[i] not in keys]
+    assert not mismatches, f"{len(mismatches)} puntos con otra {layer}: {mismatches[:10]}"
+
+
+def test_every_point_assigned(assigned, sample_oxxos):
+    assert len(assigned) == len(sample_oxxos)
+    for layer in ('alcaldia', 'distrito'):
+        assert assigned[layer].notna().all()
+    assert (assigned['alcaldia_id'] >= 0).all()
+
+
+def test_keys_match_names(assigned):
+    from scripts.catalog import get_catalog
+    catalog = get_catalog('alcaldia')
+    labels = [catalog.label(i) for i in assigned['alcaldia_id']]
+    assert labels == list(assigned['alcaldia'])
+
+
+def grid_layers():
+    """Tres municipios y 32 secciones sintéticas; el municipio M2 no tiene secciones"""
+    from shapely.geometry import box
+
+    municipios = gpd.GeoDataFrame({'mun': ['M0', 'M1', 'M2']},
+                                  geometry=[box(-99.2 + i * 0.1, 19.3, -99.1 + i * 0.1, 19.4) for i in range(3)],
+                                  crs='EPSG:4326')
+    cells, parents, keys = [], [], []
+    for i in range(8):
+        for j in range(4):
+            x, y = -99.2 + i * 0.025, 19.3 + j * 0.025
+            cells.append(box(x, y, x + 0.025, y + 0.025))
+            parents.append('M0' if i < 4 else 'M1')
+            keys.append(f'S{i}{j}')
+    secciones = gpd.GeoDataFrame({'sec': keys, 'mun': parents}, geometry=cells, crs='EPSG:4326')
+    return municipios, secciones
+
+
+def test_hierarchical_pruning_matches_flat_search():
+    import numpy as np
+    from shapely.geometry import Point
+    from scripts.boundaries import BoundaryRegistry
+
+    municipios, secciones = grid_layers()
+    rng = np.random.default_rng(0)
+    points = gpd.GeoDataFrame(geometry=[Point(x, y) for x, y in zip(rng.uniform(-99.21, -98.89, 600),
+                                                                   rng.uniform(19.29, 19.41, 600))],
+                              crs='EPSG:4326')
+
+    pruned = BoundaryRegistry()
+    pruned.add_layer('municipio', municipios, 'mun', buffer=100)
+    pruned.add_layer('seccion', secciones, 'sec', parent='municipio', parent_key='mun')
+    flat = BoundaryRegistry()
+    flat.add_layer('municipio', municipios, 'mun', buffer=100)
+    flat.add_layer('seccion', secciones, 'sec')
+
+    result, reference = pruned.assign(points), flat.assign(points)
+    assert result['seccion'].tolist() == reference['seccion'].tolist()
+    assert pruned.last_stats['seccion']['forzado'] == 0
+    # Cada padre indexó solo a sus hijos; los puntos de M2 buscan en toda la capa
+    children = pruned.layers['seccion']._children
+    assert {parent: len(members) for parent, (members, _, _) in children.items()} == {'M0': 16, 'M1': 16, 'M2': 0}
+    assert (result.loc[result['municipio'] == 'M2', 'seccion'].str[1] == '7').all()
+
+
+def test_parent_must_be_registered_first():
+    from scripts.boundaries import BoundaryRegistry
+
+    municipios, secciones = grid_layers()
+    registry = BoundaryRegistry()
+    with pytest.raises(KeyError):
+        registry.add_layer('seccion', secciones, 'sec', parent='municipio', parent_key='mun')
+    registry.add_layer('municipio', municipios, 'mun')
+    with pytest.raises(KeyError):
+        registry.add_layer('seccion', secciones, 'sec', parent='municipio', parent_key='clave_mun')
@@ -0,0 +1,87 @@
+"""
+Índice de caché (scripts/cache_manager.py): desalojo LRU bajo presupuesto,
+residencia mínima y verificación
+"""
+
+from types import SimpleNamespace
+
+import pytest
+
+import scripts.cache_manager as cache_module
+from config import settings
+from scripts.cache_manager import CacheManager, cache_hit, cache_stored
+
+KB = 1024
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Reloj manual para los accesos del índice"""
+    now = SimpleNamespace(t=1_000_000.0)
+    monkeypatch.setattr(cache_module, 'time', SimpleNamespace(time=lambda: now.t))
+    return now
+
+
+def artifact(directory, name, size=10 * KB):
+    directory.mkdir(parents=True, exist_ok=True)
+    path = directory / name
+    path.write_bytes(b'x' * size)
+    return path
+
+
+def test_lru_eviction_under_budget(project_paths, clock):
+    cache_dir = project_paths['data_processed'] / 'cache'
+    manager = CacheManager(budget_mb=25 * KB / (1024 * 1024), min_residency=0)
+    paths = []
+    for name in ('a.npz', 'b.npz'):
+        paths.append(artifact(cache_dir, name))
+        manager.register(paths[-1], 'prueba')
+        clock.t += 10
+
+    # Un acierto vuelve a 'a' el más reciente: 'b' es el que sale
+    manager.touch(paths[0])
+    clock.t += 10
+    paths.append(artifact(cache_dir, 'c.npz'))
+    manager.register(paths[-1], 'prueba')
+
+    assert [p.exists() for p in paths] == [True, False, True]
+    assert [row['path'] for row in manager.artifacts()] == ['data/processed/cache/a.npz', 'data/processed/cache/c.npz']
+    assert manager.total_size() == 20 * KB
+    assert manager.artifacts()[0]['hits'] == 1
+
+
+def test_min_residency_protects_hot_artifacts(project_paths, clock):
+    cache_dir = project_paths['data_processed'] / 'cache'
+    manager = CacheManager(budget_mb=15 * KB / (1024 * 1024), min_residency=3600)
+    old = artifact(cache_dir, 'viejo.npz')
+    manager.register(old, 'prueba')
+    clock.t += 7200
+    hot = [artifact(cache_dir, f'{n}.npz') for n in range(2)]
+    for path in hot:
+        manager.register(path, 'prueba')
+
+    # Solo el antiguo puede salir; los recientes exceden el presupuesto pero se quedan
+    assert not old.exists() and all(p.exists() for p in hot)
+    assert manager.total_size() == 20 * KB
+    assert manager.prune(dry_run=True) == []
+    clock.t += 7200
+    assert manager.prune() == ['data/processed/cache/0.npz']
+
+
+def test_verify_and_hooks(project_paths, clock, monkeypatch):
+    monkeypatch.setattr(settings, 'CACHE_BUDGET_MB', 1)
+    cache_dir = project_paths['data_processed'] / 'coverage'
+    kept, damaged, gone = (artifact(cache_dir, f'superficie_{n}.npz') for n in ('ok', 'danado', 'borrado'))
+    for path in (kept, damaged, gone):
+        cache_stored(path, 'prueba')
+    cache_hit(kept, 'prueba')
+    damaged.write_bytes(b'y' * 10 * KB)
+    gone.unlink()
+    adopted = artifact(cache_dir, 'superficie_huerfano.npz')
+
+    manager = cache_module.get_cache_manager()
+    result = manager.verify()
+    assert result['ok'] == 1
+    assert result['corruptos'] == ['data/processed/coverage/superficie_danado.npz'] and not damaged.exists()
+    assert result['faltantes'] == ['data/processed/coverage/superficie_borrado.npz']
+    assert result['adoptados'] == ['data/processed/coverage/superficie_huerfano.npz'] and adopted.exists()
@@ -0,0 +1,58 @@
+"""
+Catálogo de regiones (scripts/catalog.py): normalización e ids estables
+"""
+
+import numpy as np
+import pandas as pd
+
+from config.cities import CITIES
+from scripts.catalog import RegionCatalog, add_region_keys, ensure_region_keys, get_catalog, normalize_name
+
+
+def test_normalize_name():
+    assert normalize_name('Álvaro  Obregón') == 'ALVARO OBREGON'
+    assert normalize_name('gustavo a. madero') == 'GUSTAVO A MADERO'
+    assert normalize_name(' Cuauhtémoc\n') == 'CUAUHTEMOC'
+    # Alias de las distintas fuentes
+    assert normalize_name('Cuajimalpa') == 'CUAJIMALPA DE MORELOS'
+    assert normalize_name('Magdalena Contreras') == 'LA MAGDALENA CONTRERAS'
+    assert normalize_name('GAM') == 'GUSTAVO A MADERO'
+    assert normalize_name(None) == ''
+
+
+def test_alcaldia_ids_follow_city_order(monkeypatch):
+    monkeypatch.setenv('POLIOXXO_CITY', 'cdmx')
+    catalog = get_catalog('alcaldia')
+    assert len(catalog) == 16
+    for region_id, name in enumerate(CITIES['cdmx'].regiones):
+        assert catalog.id_of(name) == region_id
+    assert catalog.id_of('Cuajimalpa') == catalog.id_of('CUAJIMALPA DE MORELOS') == 2
+    assert catalog.id_of('Atlantis') == -1
+
+
+def test_register_and_vectorized_ids():
+    catalog = RegionCatalog('prueba', ['Norte', 'Sur'])
+    assert catalog.register('norte') == 0
+    assert catalog.register('Centro') == 2
+    assert catalog.label(2) == 'Centro'
+
+    names = pd.Series(['Sur', 'NORTE', None, 'Este', 'sur'])
+    assert catalog.ids(names).tolist() == [1, 0, -1, -1, 1]
+    assert catalog.ids(names, register=True).tolist() == [1, 0, -1, 3, 1]
+    assert catalog.ids(names).dtype == np.int32
+
+
+def test_categorical_codes_are_ids(monkeypatch):
+    monkeypatch.setenv('POLIOXXO_CITY', 'cdmx')
+    frame = pd.DataFrame({'alcaldia': ['Coyoacán', 'COYOACAN', 'Tlalpan', 'Otra']})
+    add_region_keys(frame, 'alcaldia')
+    assert frame['alcaldia_id'].tolist() == [1, 1, 10, -1]
+    assert frame['alcaldia'].cat.codes.tolist() == [1, 1, 10, -1]
+    assert frame['alcaldia'].tolist()[:3] == ['COYOACÁN', 'COYOACÁN', 'TLALPAN']
+
+    # Tras leer de disco: el Categorical se reconstruye desde los ids
+    read = pd.DataFrame({'alcaldia': ['x', 'y'], 'alcaldia_id': [12.0, np.nan]})
+    ensure_region_keys(read, 'alcaldia')
+    assert read['alcaldia_id'].tolist() == [12, -1]
+    assert read['alcaldia'].tolist()[0] == 'BENITO JUÁREZ'
+    assert pd.isna(read['alcaldia'].tolist()[1])
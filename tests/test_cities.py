@@ -0,0 +1,45 @@
+"""
+Estado por ciudad (config/cities.py): catálogos y CRS de la ciudad activa
+"""
+
+from dataclasses import replace
+
+import geopandas as gpd
+from shapely.geometry import box
+
+from config.cities import CITIES
+from scripts.boundaries import BoundaryLayer, BoundaryRegistry, projected_crs
+from scripts.catalog import get_catalog
+
+
+def test_catalog_per_city(monkeypatch):
+    monkeypatch.setenv('POLIOXXO_CITY', 'cdmx')
+    cdmx = get_catalog('alcaldia')
+    distritos_cdmx = get_catalog('distrito')
+    assert len(distritos_cdmx) == 24
+
+    monkeypatch.setenv('POLIOXXO_CITY', 'gdl')
+    gdl = get_catalog('alcaldia')
+    assert gdl is not cdmx
+    assert gdl.labels == list(CITIES['gdl'].regiones)
+    assert gdl.id_of('Zapopan') == 1
+    assert cdmx.id_of('Zapopan') == -1
+    # Guadalajara no tiene distritos sintéticos: su catálogo empieza vacío
+    assert len(get_catalog('distrito')) == 0
+
+    monkeypatch.setenv('POLIOXXO_CITY', 'cdmx')
+    assert get_catalog('alcaldia') is cdmx
+    assert get_catalog('alcaldia', city='gdl') is gdl
+
+
+def test_projected_crs_follows_active_city(monkeypatch):
+    monkeypatch.setenv('POLIOXXO_CITY', 'cdmx')
+    assert projected_crs() == CITIES['cdmx'].crs
+    monkeypatch.setitem(CITIES, 'cdmx', replace(CITIES['cdmx'], crs='EPSG:32614'))
+    assert projected_crs() == 'EPSG:32614'
+    assert BoundaryRegistry().crs == 'EPSG:32614'
+
+    layer = BoundaryLayer('zona', gpd.GeoDataFrame({'zona': ['A']}, geometry=[box(-99.2, 19.3, -99.1, 19.4)],
+                                                   crs='EPSG:4326'), key='zona')
+    # Metros de UTM 14N, no grados
+    assert layer.geometries[0].bounds[0] > 400000
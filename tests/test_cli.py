@@ -0,0 +1,47 @@
+"""
+CLI `polioxxo` (scripts/main.py): la ayuda y el análisis de argumentos no
+importan las dependencias pesadas
+"""
+
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+HEAVY = ('geopandas', 'pandas', 'numpy', 'shapely', 'pyogrio', 'scipy', 'matplotlib', 'folium')
+
+
+def imported_after(statements):
+    """Módulos pesados cargados tras ejecutar `statements` en un intérprete nuevo"""
+    code = "\n".join([
+        "import sys",
+        "from scripts.main import main, build_parser",
+        statements,
+        f"print('PESADOS:' + ','.join(m for m in {HEAVY!r} if m in sys.modules))",
+    ])
+    result = subprocess.run([sys.executable, '-c', code], cwd=ROOT, capture_output=True, text=True, timeout=60)
+    assert result.returncode == 0, result.stderr
+    return result.stdout.rsplit('PESADOS:', 1)[1].strip()
+
+
+def test_help_is_lazy():
+    statements = "\n".join([
+        "for argv in (['--help'], ['run', '--help'], ['maps', '--help'], ['cache', '--help'], ['query', '--help']):",
+        "    try:",
+        "        main(argv)",
+        "    except SystemExit:",
+        "        pass",
+    ])
+    assert imported_after(statements) == ''
+
+
+def test_parsing_every_subcommand_is_lazy():
+    statements = "\n".join([
+        "parser = build_parser()",
+        "for argv in (['run'], ['analyze', '--cobertura', '--resolucion', '25'], ['maps', '--region', 'TLALPAN'],",
+        "             ['cache', 'prune', '--dry-run'], ['query', 'alcaldias', 'TLALPAN'], ['cities', 'gdl'],",
+        "             ['--profile=assign', 'nationwide'], ['publish', 'list']):",
+        "    assert callable(parser.parse_args(argv).func), argv",
+        "assert main([]) == 0",
+    ])
+    assert imported_after(statements) == ''
@@ -0,0 +1,84 @@
+"""
+Superficie de cobertura (scripts/coverage.py): resolución configurable
+"""
+
+import geopandas as gpd
+import numpy as np
+from shapely.geometry import Point, box
+
+from config import settings
+from scripts.coverage import compute_coverage_surface
+
+CRS = 'EPSG:6372'
+X0, Y0 = 2_800_000, 830_000
+
+
+def inputs():
+    points = gpd.GeoDataFrame(geometry=[Point(X0 + 500, Y0 + 500), Point(X0 + 1700, Y0 + 1200)], crs=CRS)
+    region = gpd.GeoDataFrame({'alcaldia': ['A']}, geometry=[box(X0, Y0, X0 + 2000, Y0 + 2000)], crs=CRS)
+    return points, {'alcaldia': region}
+
+
+def exact_distance(surface, points):
+    height, width = surface.shape
+    xs = surface.x0 + (np.arange(width) + 0.5) * surface.resolution
+    ys = surface.y1 - (np.arange(height) + 0.5) * surface.resolution
+    gx, gy = np.meshgrid(xs, ys)
+    coords = np.column_stack([points.geometry.x, points.geometry.y])
+    return np.min([np.hypot(gx - x, gy - y) for x, y in coords], axis=0)
+
+
+def test_resolution_from_settings(project_paths, monkeypatch):
+    points, levels = inputs()
+    monkeypatch.setattr(settings, 'COVERAGE_RESOLUTION_M', 25.0)
+    coarse = compute_coverage_surface(points, levels, crs=CRS)
+    fine = compute_coverage_surface(points, levels, resolution=10, crs=CRS)
+
+    assert coarse.resolution == 25.0 and fine.resolution == 10.0
+    assert fine.shape[0] > 2 * coarse.shape[0]
+    # Una superficie en caché por resolución
+    assert len(list((project_paths['data_processed'] / 'coverage').glob('superficie_*.npz'))) == 2
+
+
+def test_edt_within_one_cell_of_exact(project_paths):
+    points, levels = inputs()
+    for method in ('edt', 'kdtree'):
+        surface = compute_coverage_surface(points, levels, resolution=10, method=method, crs=CRS, use_cache=False)
+        inside = surface.labels['alcaldia'] >= 0
+        error = np.abs(surface.distance - exact_distance(surface, points))[inside]
+        # EDT mide entre centros de celda: a lo más media diagonal (más redondeo float32)
+        assert error.max() <= surface.resolution * np.sqrt(2) / 2 + 0.01
+
+
+def test_deserts_and_coverage_by_region(project_paths):
+    from scripts.coverage import coverage_by_region, find_deserts
+
+    # Dos alcaldías de 3 x 2 km y un solo Oxxo cerca de la esquina de A
+    points = gpd.GeoDataFrame(geometry=[Point(X0 + 500, Y0 + 1000)], crs=CRS)
+    region = gpd.GeoDataFrame({'alcaldia': ['A', 'B']},
+                              geometry=[box(X0, Y0, X0 + 3000, Y0 + 2000), box(X0 + 3000, Y0, X0 + 6000, Y0 + 2000)],
+                              crs=CRS)
+    surface = compute_coverage_surface(points, {'alcaldia': region}, resolution=20, crs=CRS, use_cache=False)
+
+    inside = surface.labels['alcaldia'] >= 0
+    exact = exact_distance(surface, points)
+    slack = surface.resolution * np.sqrt(2) / 2 + 0.01
+    # Todas las celdas lejanas: el desierto grande y las dos esquinas a la izquierda del círculo
+    everything, raster = find_deserts(surface, threshold=1000, min_area_km2=0)
+    assert len(everything) == 3
+    assert ((raster > 0) == ((surface.distance > 1000) & inside)).all()
+    cells = round(everything['area_km2'].sum() / 0.0004)
+    assert ((exact > 1000 + slack) & inside).sum() <= cells <= ((exact > 1000 - slack) & inside).sum()
+
+    deserts, _ = find_deserts(surface, threshold=1000, min_area_km2=0.5)
+    assert len(deserts) == 1
+    # Un solo componente que cruza la frontera; B aporta la mayor parte
+    assert deserts.iloc[0]['alcaldia'] == 'B'
+    assert deserts.iloc[0]['area_km2'] == everything['area_km2'].max()
+    assert deserts.iloc[0]['distancia_max_m'] > 5000
+    assert find_deserts(surface, threshold=1000, min_area_km2=50)[0].empty
+
+    table = coverage_by_region(surface, 'alcaldia', threshold=1000).set_index('alcaldia')
+    assert np.isclose(table.loc['B', 'pct_area_desierto'], 100)
+    assert 0 < table.loc['A', 'pct_area_desierto'] < 100
+    assert np.isclose(table['area_km2'].sum(), 12.0)
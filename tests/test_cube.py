@@ -0,0 +1,100 @@
+"""
+Cubo de agregados (scripts/cube.py): cortes y rollups contra groupby
+"""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from scripts.cube import AggregateCube, build_cube
+
+
+@pytest.fixture(scope='module')
+def alcaldias(sample_alcaldias):
+    """Alcaldías con un partido ganador sintético (alternado por id)"""
+    frame = sample_alcaldias.copy()
+    frame['partido_ganador'] = np.where(frame['alcaldia_id'] % 2 == 0, 'MORENA', 'PAN')
+    return frame
+
+
+@pytest.fixture(scope='module')
+def points(assigned, alcaldias):
+    partidos = dict(zip(alcaldias['alcaldia_id'], alcaldias['partido_ganador']))
+    return pd.DataFrame(assigned.drop(columns='geometry')).assign(
+        partido_ganador=assigned['alcaldia_id'].map(partidos))
+
+
+@pytest.fixture(scope='module')
+def cube(assigned, alcaldias, sample_districts):
+    return build_cube(assigned, alcaldias, sample_districts)
+
+
+def counts(frame, column):
+    return {str(k): int(v) for k, v in frame.groupby(column).size().items() if v}
+
+
+def test_series_matches_groupby(cube, points):
+    for dim, column in [('alcaldia', 'alcaldia'), ('distrito', 'distrito'), ('marca', 'brand'),
+                        ('partido', 'partido_ganador'), ('partido_distrito', 'diputado_ganador')]:
+        assert cube.slice(dim) == counts(points, column), dim
+
+
+def test_slice_matches_filtered_groupby(cube, points):
+    for alcaldia in points['alcaldia'].unique()[:5]:
+        subset = points[points['alcaldia'] == alcaldia]
+        assert cube.slice('marca', alcaldia=alcaldia) == counts(subset, 'brand')
+        assert cube.slice('distrito', alcaldia=alcaldia) == counts(subset, 'distrito')
+
+    subset = points[(points['partido_ganador'] == 'PAN') & (points['brand'] == 'Oxxo')]
+    assert cube.slice('alcaldia', partido='PAN', marca='Oxxo') == counts(subset, 'alcaldia')
+    assert cube.value(partido='PAN', marca='Oxxo') == len(subset)
+
+
+def test_rollup_matches_crosstab(cube, points):
+    table = cube.rollup('alcaldia', 'distrito')
+    expected = pd.crosstab(points['alcaldia_id'], points['distrito_id'])
+    for alcaldia_id, row in expected.iterrows():
+        for distrito_id, value in row.items():
+            assert table[alcaldia_id, distrito_id] == value
+    assert table.sum() == len(points)
+
+
+def test_measure_num_direcciones():
+    points = pd.DataFrame({
+        'alcaldia_id': [0, 0, 1, 1, 1, -1],
+        'brand': ['Oxxo', 'OXXO', 'Oxxo', 'Oxxo', '7-Eleven', 'Oxxo'],
+        'direccion': ['Madero 10', None, 'Hidalgo 2', '', 'Orizaba 5', 'Eje 1'],
+    })
+    cube = AggregateCube.from_points(points, cell_size=0)
+    present = points['direccion'].notna() & (points['direccion'] != '')
+    expected = points[present & (points['alcaldia_id'] >= 0)].groupby('alcaldia_id').size()
+    assert cube.rollup('alcaldia', measure='num_direcciones')[expected.index].tolist() == expected.tolist()
+    assert int(cube.rollup('alcaldia', measure='num_direcciones')[-1]) == 1
+    # 'OXXO' y 'Oxxo' son marcas distintas
+    assert cube.value(marca='OXXO') == 1
+    assert cube.value(marca='Oxxo') == 4
+
+
+def test_missing_slot_and_stale_codes():
+    codes = np.array([[0, 0], [1, -1], [-1, 1]], dtype=np.int32)
+    cube = AggregateCube(['marca', 'seccion'], {'marca': ['a', 'b'], 'seccion': ['x', 'y']},
+                         codes, {'num_oxxos': np.array([3, 4, 5])})
+    assert cube.rollup('marca').tolist() == [3, 4, 5]
+    assert cube.slice('seccion', marca='b') == {}
+    assert cube.rollup('marca', 'seccion')[1, -1] == 4
+
+    stale = AggregateCube(['marca'], {'marca': ['a']}, np.array([[0], [2]], dtype=np.int32),
+                          {'num_oxxos': np.array([1, 1])})
+    with pytest.raises(ValueError):
+        stale.rollup('marca')
+
+
+def test_save_and_load(cube, tmp_path):
+    directory = tmp_path / 'cube'
+    cube.save(directory)
+    cube.save(directory)
+    loaded = AggregateCube.load(directory)
+    assert directory.is_symlink()
+    for dim in ('alcaldia', 'marca', 'partido'):
+        assert loaded.slice(dim) == cube.slice(dim)
+    assert loaded.slice('marca', partido='MORENA') == cube.slice('marca', partido='MORENA')
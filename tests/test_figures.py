@@ -0,0 +1,54 @@
+"""
+Gráficas con detección de cambios (scripts/figures.py): solo se renderizan
+las gráficas cuya tabla o especificación cambió
+"""
+
+import pandas as pd
+
+from scripts.figures import figure_job, render_figures, sidecar_path
+
+
+def tables():
+    alcaldias = pd.DataFrame({
+        'alcaldia': ['A', 'B', 'C'],
+        'num_oxxos': [10, 25, 7],
+        'partido_ganador': pd.Categorical(['MORENA', 'PAN', 'MORENA']),
+        'votos_totales': [1000, 2500, 800],
+    })
+    partidos = pd.DataFrame({'partido': ['MORENA', 'PAN'], 'num_oxxos': [17, 25]})
+    return alcaldias, partidos
+
+
+def jobs(directory, alcaldias, partidos, dpi=40):
+    return [
+        figure_job('analisis_partidos', alcaldias, directory / 'partidos.png', dpi=dpi),
+        figure_job('correlacion_votos_oxxos', alcaldias, directory / 'correlacion.png', dpi=dpi),
+        figure_job('partidos_distritos', partidos, directory / 'distritos.png', dpi=dpi),
+    ]
+
+
+def test_hash_ignores_categorical_dtype():
+    alcaldias, _ = tables()
+    plain = alcaldias.assign(partido_ganador=alcaldias['partido_ganador'].astype(str))
+    assert figure_job('analisis_partidos', alcaldias, 'x.png')['hash'] == \
+        figure_job('analisis_partidos', plain, 'x.png')['hash']
+    assert figure_job('analisis_partidos', alcaldias, 'x.png')['hash'] != \
+        figure_job('analisis_partidos', alcaldias, 'x.png', dpi=72)['hash']
+
+
+def test_unchanged_charts_are_skipped(tmp_path):
+    alcaldias, partidos = tables()
+    directory = tmp_path / 'graficas'
+
+    assert render_figures(jobs(directory, alcaldias, partidos), workers=2) == (3, 0)
+    for name in ('partidos', 'correlacion', 'distritos'):
+        assert (directory / f'{name}.png').stat().st_size > 0
+        assert sidecar_path(directory / f'{name}.png').exists()
+    assert render_figures(jobs(directory, alcaldias, partidos), workers=2) == (0, 3)
+
+    # Solo cambia la tabla de distritos; un PNG sin archivo lateral se regenera
+    partidos.loc[0, 'num_oxxos'] = 18
+    sidecar_path(directory / 'correlacion.png').unlink()
+    assert render_figures(jobs(directory, alcaldias, partidos), workers=1) == (2, 1)
+    assert render_figures(jobs(directory, alcaldias, partidos), workers=1, force=True) == (3, 0)
+    assert not list(directory.glob('.*tmp*'))
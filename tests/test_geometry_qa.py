@@ -0,0 +1,78 @@
+"""
+Control de calidad de geometrías (scripts/geometry_qa.py): reparación y cuarentena
+"""
+
+import geopandas as gpd
+import pandas as pd
+import shapely
+from shapely.geometry import Point, Polygon, box
+
+from scripts.geometry_qa import check_geometries, geometry_qa
+
+BOUNDS = (-99.7, 18.8, -98.5, 20.0)
+
+# Moño: dos triángulos que se tocan en un vértice (inválido)
+BOWTIE = Polygon([(-99.2, 19.3), (-99.1, 19.4), (-99.1, 19.3), (-99.2, 19.4)])
+REPEATED = Polygon([(-99.0, 19.2), (-99.0, 19.2), (-98.9, 19.2), (-98.9, 19.3), (-99.0, 19.3)])
+
+
+def layer():
+    return gpd.GeoDataFrame(
+        {'nombre': ['moño', 'repetido', 'normal', 'nula', 'vacia', 'lejos']},
+        geometry=[BOWTIE, REPEATED, box(-99.3, 19.5, -99.2, 19.6), None, Polygon(),
+                  box(-103.4, 20.6, -103.3, 20.7)],
+        crs='EPSG:4326',
+    )
+
+
+def test_flags():
+    flags = check_geometries(layer().geometry.values, BOUNDS)
+    assert flags.loc[0, 'invalida'] and not flags.loc[0, 'vertices_repetidos']
+    assert flags.loc[1, 'vertices_repetidos'] and not flags.loc[1, 'invalida']
+    assert not flags.loc[2].any()
+    assert flags.loc[3, 'nula'] and flags.loc[4, 'vacia'] and flags.loc[5, 'fuera_limites']
+
+
+def test_repair_and_quarantine(project_paths, tmp_path):
+    result = geometry_qa(layer(), 'prueba', qa_dir=tmp_path)
+
+    assert result['nombre'].tolist() == ['moño', 'repetido', 'normal']
+    assert shapely.is_valid(result.geometry.values).all()
+    # make_valid conserva las dos mitades del moño (buffer(0) perdería una)
+    bowtie = result.geometry.iloc[0]
+    assert bowtie.geom_type == 'MultiPolygon' and len(bowtie.geoms) == 2
+    assert abs(bowtie.area - 2 * 0.0025) < 1e-9
+    assert len(result.geometry.iloc[1].exterior.coords) == 5
+
+    quarantine = pd.read_csv(tmp_path / 'cuarentena_prueba.csv')
+    assert quarantine['fila'].tolist() == [3, 4, 5]
+    assert quarantine['motivo'].tolist() == ['nula', 'vacia', 'fuera_limites']
+
+
+def test_flags_cached_by_content(project_paths, tmp_path):
+    geometry_qa(layer(), 'prueba', qa_dir=tmp_path)
+    cached = list(tmp_path.glob('banderas_prueba_*.npz'))
+    assert len(cached) == 1
+
+    again = geometry_qa(layer(), 'prueba', qa_dir=tmp_path)
+    assert list(tmp_path.glob('banderas_prueba_*.npz')) == cached
+    assert again['nombre'].tolist() == ['moño', 'repetido', 'normal']
+
+    # Sin errores la cuarentena anterior se elimina
+    clean = gpd.GeoDataFrame({'nombre': ['a']}, geometry=[Point(-99.1, 19.4)], crs='EPSG:4326')
+    assert len(geometry_qa(clean, 'prueba', qa_dir=tmp_path)) == 1
+    assert not (tmp_path / 'cuarentena_prueba.csv').exists()
+    assert len(list(tmp_path.glob('banderas_prueba_*.npz'))) == 2
+
+
+def test_loader_stops_when_everything_is_quarantined(project_paths):
+    from scripts.process_data import load_oxxos_data
+
+    # Coordenadas en metros etiquetadas como EPSG:4326: todo fuera de la ciudad
+    raw = project_paths['data_raw']
+    raw.mkdir(parents=True)
+    gpd.GeoDataFrame({'name': ['Oxxo', 'Oxxo']}, geometry=[Point(486000, 2148000), Point(487000, 2149000)],
+                     crs='EPSG:4326').to_file(raw / 'oxxos_cdmx.geojson', driver='GeoJSON')
+
+    assert load_oxxos_data() is None
+    assert (project_paths['data_processed'] / 'qa' / 'cuarentena_oxxos.csv').exists()
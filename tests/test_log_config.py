@@ -0,0 +1,83 @@
+"""
+Logging por proceso (scripts/log_config.py): registros JSON, límite por
+sitio de llamada y registros de trabajadores reenviados al padre
+"""
+
+import json
+import logging
+import os
+import sys
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+from scripts.log_config import CallSiteRateLimit, JsonFormatter, configure_logging, log_sample, pool_logging_kwargs
+
+LOG_FILE = Path(__file__).parent.parent / 'logs' / 'polioxxo.log'
+
+
+def record(message, level=logging.INFO, lineno=10, created=1000.0, **extra):
+    item = logging.LogRecord('polioxxo.prueba', level, 'scripts/prueba.py', lineno, message, None, None)
+    item.created = created
+    item.__dict__.update(extra)
+    return item
+
+
+def test_json_records_carry_extra_fields():
+    try:
+        1 / 0
+    except ZeroDivisionError:
+        item = record('Calculando %s', alcaldia='TLALPAN', filas=12, ruta=Path('a/b'))
+        item.args = ('cobertura',)
+        item.exc_info = sys.exc_info()
+    data = json.loads(JsonFormatter().format(item))
+    assert data['mensaje'] == 'Calculando cobertura' and data['nivel'] == 'INFO'
+    assert data['alcaldia'] == 'TLALPAN' and data['filas'] == 12 and data['ruta'] == 'a/b'
+    assert 'ZeroDivisionError' in data['excepcion']
+    assert 'args' not in data and 'lineno' not in data
+
+
+def test_rate_limit_per_call_site():
+    limit = CallSiteRateLimit(limit=3, window=60)
+    passed = [limit.filter(record(f'alcaldía {i}', created=1000.0 + i)) for i in range(10)]
+    assert passed == [True] * 3 + [False] * 7
+    # Otro sitio, advertencias y mensajes marcados no se limitan
+    assert limit.filter(record('otro', lineno=11))
+    assert limit.filter(record('aviso', level=logging.WARNING))
+    assert limit.filter(record('perfil', sin_limite=True))
+
+    # La ventana siguiente informa cuántos se suprimieron
+    first = record('alcaldía 11', created=1061.0)
+    assert limit.filter(first) and first.suprimidos == 7
+    assert limit.suppressed_total == 7
+
+
+def test_log_sample_limits_items(caplog):
+    logger = logging.getLogger('polioxxo.prueba.muestra')
+    with caplog.at_level(logging.INFO, logger='polioxxo.prueba.muestra'):
+        log_sample(logger, (f'distrito {i}' for i in range(30)), limit=5, total=30)
+    assert [r.getMessage() for r in caplog.records] == [f'distrito {i}' for i in range(5)] + ['  ... y 25 más']
+
+
+def _worker_log(token):
+    logging.getLogger('polioxxo.trabajador').info(token)
+    return os.getpid()
+
+
+def test_worker_records_reach_parent_log():
+    configure_logging()
+    token = f'trabajador-{uuid.uuid4().hex}'
+    with ProcessPoolExecutor(max_workers=1, **pool_logging_kwargs()) as pool:
+        worker_pid = pool.submit(_worker_log, token).result()
+
+    deadline = time.time() + 10
+    found = []
+    while not found and time.time() < deadline:
+        if LOG_FILE.exists():
+            with open(LOG_FILE, encoding='utf-8') as f:
+                found = [line for line in f if token in line]
+        if not found:
+            time.sleep(0.05)
+    assert len(found) == 1
+    assert json.loads(found[0])['pid'] == worker_pid != os.getpid()
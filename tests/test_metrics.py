@@ -0,0 +1,63 @@
+"""
+Documento de métricas (scripts/metrics.py): cálculo por sección, JSON y
+reportes de texto desde el mismo documento
+"""
+
+import json
+
+import numpy as np
+import pandas as pd
+
+from scripts.metrics import (
+    MetricsDocument, alcaldia_metrics, load_metrics, render_processing_report, save_metrics, update_metrics
+)
+
+
+def datos():
+    return pd.DataFrame({
+        'alcaldia': pd.Categorical(['A', 'B', 'C', 'D']),
+        'num_oxxos': np.array([10, 25, 7, 30], dtype=np.int64),
+        'partido_ganador': ['MORENA', 'PAN', 'MORENA', 'PRI'],
+        'votos_totales': np.array([1000, 2500, 800, 2900], dtype=np.int64),
+    })
+
+
+def test_alcaldia_section_matches_pandas():
+    frame = datos()
+    section = alcaldia_metrics(frame, total_oxxos=80, oxxos_asignados=72)
+
+    assert section['general'] == {'total_alcaldias': 4, 'total_oxxos': 80, 'oxxos_asignados': 72}
+    assert [row['alcaldia'] for row in section['alcaldias']] == ['D', 'B', 'A', 'C']
+    assert section['descriptivas_alcaldia']['mediana'] == frame['num_oxxos'].median()
+    assert section['descriptivas_alcaldia']['desviacion'] == frame['num_oxxos'].std()
+    assert np.isclose(section['correlacion_votos_oxxos'], np.corrcoef(frame['votos_totales'], frame['num_oxxos'])[0, 1])
+
+    partidos = pd.DataFrame(section['partidos_alcaldia']).set_index('partido')
+    assert partidos.loc['MORENA', ['unidades', 'total_oxxos', 'promedio_oxxos']].tolist() == [2, 17, 8.5]
+    assert partidos['pct_unidades'].sum() == 100
+    # Serializable tal cual (sin tipos numpy)
+    json.dumps(section)
+
+
+def test_json_roundtrip_and_report(project_paths):
+    document = update_metrics('alcaldias', **alcaldia_metrics(datos(), total_oxxos=80, oxxos_asignados=72))
+    assert 'alcaldias' in document.actualizado
+
+    loaded = load_metrics()
+    assert loaded == document
+    report = render_processing_report(loaded)
+    assert '- Total de Oxxos: 80' in report
+    assert '- Oxxos sin asignar: 8' in report
+    assert report == render_processing_report(document)
+
+    # Otra sección no toca la de alcaldías
+    update_metrics('distritos', distritos=[{'distrito': 'D1', 'num_oxxos_distrito': 3}])
+    assert load_metrics().alcaldias == document.alcaldias
+
+
+def test_unknown_version_or_broken_file_starts_empty(project_paths, tmp_path):
+    path = tmp_path / 'metricas.json'
+    save_metrics(MetricsDocument(version=0, general={'total_oxxos': 1}), path)
+    assert load_metrics(path) == MetricsDocument()
+    path.write_text('{roto', encoding='utf-8')
+    assert load_metrics(path) == MetricsDocument()
@@ -0,0 +1,86 @@
+"""
+Exportador Prometheus (scripts/metrics_exporter.py): formato de exposición,
+recolección local y marcas de la última corrida exitosa
+"""
+
+import math
+
+import pytest
+
+from scripts.metrics_exporter import (
+    PREFIX, TextfileWriter, export_run_metrics, parse_textfile, run_textfile_path
+)
+
+PROFILE = {
+    'total': {'wall_s': 12.5, 'cpu_s': 10.0, 'rss_pico_mb': 512.0},
+    'etapas': {
+        'assign': {'llamadas': 1, 'wall_s': 2.0, 'cpu_s': 1.9, 'rss_pico_delta_mb': 8.0, 'filas': 4000, 'filas_por_s': 2000.0},
+        'map.alcaldias': {'llamadas': 2, 'wall_s': 3.0, 'cpu_s': 2.5, 'rss_pico_delta_mb': 0.0, 'filas': None},
+    },
+    'contadores': {
+        'asignacion.alcaldia': {'join': 3990, 'proximidad': 10, 'forzado': 0},
+        'cache.coverage': {'aciertos': 3, 'fallos': 1},
+    },
+}
+
+
+def sample(samples, name, **labels):
+    matches = [value for (metric, items), value in samples.items()
+               if metric == f'{PREFIX}_{name}' and labels.items() <= dict(items).items()]
+    assert len(matches) == 1, (name, labels)
+    return matches[0]
+
+
+def test_render_and_parse_roundtrip(tmp_path):
+    writer = TextfileWriter({'ciudad': 'cdmx'})
+    writer.gauge('prueba', 'Ayuda', 3, archivo='a "b"\\c\nd')
+    writer.gauge('prueba', 'Ayuda', 1e20, archivo='grande')
+    writer.gauge('nan', 'Sin dato', float('nan'))
+    writer.gauge('omitida', 'None no se escribe', None)
+    path = writer.write(tmp_path / 'm.prom')
+
+    text = path.read_text(encoding='utf-8')
+    assert text.count('# TYPE polioxxo_prueba gauge') == 1 and 'omitida' not in text
+    samples = parse_textfile(path)
+    assert samples[('polioxxo_prueba', (('ciudad', 'cdmx'), ('archivo', 'a "b"\\c\nd')))] == 3
+    assert samples[('polioxxo_prueba', (('ciudad', 'cdmx'), ('archivo', 'grande')))] == 1e20
+    assert math.isnan(samples[('polioxxo_nan', (('ciudad', 'cdmx'),))])
+
+
+@pytest.mark.parametrize('text', [
+    'polioxxo_x 1\n',                                                   # sin TYPE
+    '# TYPE polioxxo_x gauge\npolioxxo_x{a="1"} uno\n',                 # valor inválido
+    '# TYPE polioxxo_x gauge\npolioxxo_x{a="1"} 1\npolioxxo_x{a="1"} 2\n',  # serie duplicada
+    '# TYPE polioxxo-x gauge\n',                                        # nombre inválido
+])
+def test_parse_rejects_invalid_files(tmp_path, text):
+    path = tmp_path / 'm.prom'
+    path.write_text(text, encoding='utf-8')
+    with pytest.raises(ValueError):
+        parse_textfile(path)
+
+
+def test_run_metrics_keep_last_success(project_paths):
+    reports = project_paths['reports']
+    reports.mkdir(parents=True)
+    (reports / 'reporte.txt').write_text('x' * 100, encoding='utf-8')
+
+    path = export_run_metrics('run', PROFILE, success=True)
+    assert path == run_textfile_path('run', 'cdmx') and path.name == 'polioxxo_run_cdmx.prom'
+    samples = parse_textfile(path)
+    assert sample(samples, 'run_success', corrida='run', ciudad='cdmx') == 1
+    assert sample(samples, 'run_peak_rss_bytes') == 512 * 1024 * 1024
+    assert sample(samples, 'stage_duration_seconds', etapa='map.alcaldias') == 3.0
+    assert sample(samples, 'stage_rows', etapa='assign') == 4000
+    assert not [key for key in samples if key[0] == 'polioxxo_stage_rows' and ('etapa', 'map.alcaldias') in key[1]]
+    assert sample(samples, 'assignment_points', capa='alcaldia', metodo='proximidad') == 10
+    assert sample(samples, 'cache_hit_ratio', cache='coverage') == 0.75
+    assert sample(samples, 'output_bytes', archivo='reports/reporte.txt') == 100
+    succeeded = sample(samples, 'run_last_success_timestamp_seconds')
+
+    # Una corrida fallida conserva la marca del último éxito
+    samples = parse_textfile(export_run_metrics('run', PROFILE, success=False))
+    assert sample(samples, 'run_success') == 0
+    assert sample(samples, 'run_last_success_timestamp_seconds') == succeeded
+    assert sample(samples, 'run_timestamp_seconds') >= succeeded
+    assert not list(path.parent.glob('.*tmp*'))
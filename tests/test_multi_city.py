@@ -0,0 +1,37 @@
+"""
+Ejecución multi-ciudad (scripts/multi_city.py): planeación de trabajadores
+y un proceso por ciudad con su propia partición
+"""
+
+import csv
+
+from config import settings
+from config.cities import CITIES, active_city_key
+from scripts.multi_city import plan_workers, run_cities
+
+
+def test_plan_workers_respects_memory_budget(monkeypatch):
+    monkeypatch.setattr(settings, 'MULTI_CITY_WORKERS', 0)
+    assert plan_workers(8, workers=6, worker_memory_mb=4096, budget_mb=8192) == 2
+    assert plan_workers(8, workers=6, worker_memory_mb=4096, budget_mb=1024) == 1
+    assert plan_workers(3, workers=6, worker_memory_mb=0, budget_mb=8192) == 3
+    assert plan_workers(8, workers=6, worker_memory_mb=4096, budget_mb=0) == 6
+
+
+def test_each_city_runs_in_its_own_partition(project_paths, monkeypatch):
+    monkeypatch.setenv('POLIOXXO_CITY', 'cdmx')
+    # Sin datos crudos en data/raw/<ciudad>: cada trabajador lo informa en su fila
+    rows = run_cities(['gdl', 'mty'], workers=2)
+
+    assert sorted(row['ciudad'] for row in rows) == ['gdl', 'mty']
+    for row in rows:
+        assert not row['ok']
+        assert row['error'].startswith(f"faltan {CITIES[row['ciudad']].limites}")
+        assert f"data/raw/{row['ciudad']}" in row['error']
+    # La ciudad activa del proceso principal no cambia
+    assert active_city_key() == 'cdmx'
+
+    with open(project_paths['reports'] / 'metricas_ciudades.csv', encoding='utf-8') as f:
+        table = list(csv.DictReader(f))
+    assert [row['ciudad'] for row in table] == ['gdl', 'mty']
+    assert all(row['ok'] == 'False' for row in table)
@@ -0,0 +1,96 @@
+"""
+Corrida nacional por bloques (scripts/nationwide.py): puntos de control y
+reanudación
+"""
+
+import json
+
+import geopandas as gpd
+import numpy as np
+import pandas as pd
+from shapely.geometry import Point, box
+
+import scripts.nationwide as nationwide
+from scripts.nationwide import CheckpointStore, nationwide_paths, run_nationwide
+
+# Municipios sintéticos en tres bloques de un grado
+MUNICIPIOS = {'14039': (-103.6, 20.5, -103.2, 20.8), '09015': (-99.2, 19.3, -99.0, 19.5),
+              '19039': (-100.4, 25.6, -100.2, 25.8)}
+
+
+def write_inputs(raw, extra=0):
+    raw.mkdir(parents=True, exist_ok=True)
+    rng = np.random.default_rng(4)
+    points = []
+    for minx, miny, maxx, maxy in MUNICIPIOS.values():
+        points += [Point(rng.uniform(minx, maxx), rng.uniform(miny, maxy)) for _ in range(20)]
+    points += [Point(-99.1, 19.4)] * extra
+    gpd.GeoDataFrame({'name': ['Oxxo'] * len(points)}, geometry=points, crs='EPSG:4326').to_file(
+        raw / 'oxxos_mexico.gpkg', driver='GPKG')
+    gpd.GeoDataFrame({'CVEGEO': list(MUNICIPIOS)}, geometry=[box(*b) for b in MUNICIPIOS.values()],
+                     crs='EPSG:4326').to_file(raw / 'municipios_mexico.gpkg', driver='GPKG')
+
+
+def counting(monkeypatch):
+    """Registra los bloques que realmente se calculan"""
+    calls = []
+    real = nationwide.process_tile
+
+    def process_tile(inputs, tile, margin=None):
+        calls.append(tile)
+        return real(inputs, tile, margin)
+    monkeypatch.setattr(nationwide, 'process_tile', process_tile)
+    return calls
+
+
+def counts(paths):
+    return pd.read_csv(paths['reports'] / 'conteos_municipio.csv', dtype=str)
+
+
+def test_resume_from_checkpoints(project_paths, monkeypatch):
+    paths = nationwide_paths()
+    write_inputs(paths['data_raw'])
+    calls = counting(monkeypatch)
+
+    first = run_nationwide(tile_deg=1.0)
+    assert first['total_oxxos'] == 60 and first['bloques'] == 3
+    assert first['bloques_procesados'] == 3 and first['bloques_retomados'] == 0
+    assert first['capas']['municipio']['sin_asignar'] == 0
+    expected = counts(paths)
+    assert dict(zip(expected['municipio'], expected['num_oxxos'].astype(int))) == {k: 20 for k in MUNICIPIOS}
+
+    # Caída a mitad de la corrida: un bloque sin punto de control y un temporal a medias
+    store = CheckpointStore(paths['checkpoints'])
+    store.chunk_path(1).unlink()
+    (paths['checkpoints'] / '.bloque_00002.npz.tmp-1').write_bytes(b'incompleto')
+    calls.clear()
+
+    resumed = run_nationwide(tile_deg=1.0)
+    assert resumed['bloques_procesados'] == 1 and resumed['bloques_retomados'] == 2
+    assert len(calls) == 1 and tuple(calls[0]) == tuple(store.load_plan()['bloques'][1])
+    assert counts(paths).equals(expected)
+    summary = json.loads((paths['reports'] / 'resumen_nacional.json').read_text(encoding='utf-8'))
+    assert summary['bloques_retomados'] == 2
+
+    # Sin pendientes: todo se retoma
+    calls.clear()
+    assert run_nationwide(tile_deg=1.0)['bloques_retomados'] == 3 and calls == []
+
+
+def test_changed_inputs_or_config_discard_checkpoints(project_paths, monkeypatch):
+    paths = nationwide_paths()
+    write_inputs(paths['data_raw'])
+    calls = counting(monkeypatch)
+    assert run_nationwide(tile_deg=1.0)['bloques_procesados'] == 3
+
+    # Otra configuración: nuevo plan
+    calls.clear()
+    assert run_nationwide(tile_deg=2.0)['bloques_retomados'] == 0 and calls
+
+    # Otras entradas: nuevo plan y conteos actualizados
+    write_inputs(paths['data_raw'], extra=5)
+    summary = run_nationwide(tile_deg=2.0)
+    assert summary['bloques_retomados'] == 0 and summary['total_oxxos'] == 65
+
+    calls.clear()
+    assert run_nationwide(tile_deg=2.0, fresh=True)['bloques_retomados'] == 0 and calls
@@ -0,0 +1,54 @@
+"""
+Pipeline en memoria (scripts/pipeline.py): los crudos se leen una vez y
+las escrituras van en segundo plano
+"""
+
+import os
+import shutil
+import threading
+
+import geopandas as gpd
+import pytest
+
+from scripts.pipeline import BackgroundWriter, run_pipeline
+
+RAW_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data', 'raw')
+
+
+def test_background_writer_order_and_failures():
+    done = []
+    writer = BackgroundWriter()
+    main_thread = threading.current_thread()
+    writer.submit('uno', lambda: done.append(threading.current_thread() is main_thread))
+    writer.submit('falso', lambda: False)
+    writer.submit('error', lambda: 1 / 0)
+    writer.submit('dos', done.append, 'dos')
+    assert writer.close() is False
+    assert done == [False, 'dos']
+    assert writer.failures == ['falso', 'error']
+    assert BackgroundWriter().close() is True
+
+
+def test_pipeline_reads_raw_inputs_once(project_paths, monkeypatch):
+    raw = project_paths['data_raw']
+    try:
+        shutil.copytree(RAW_DIR, raw)
+    except FileNotFoundError:
+        pytest.skip("Sin datos de muestra")
+
+    reads = []
+    real = gpd.read_file
+
+    def read_file(path, *args, **kwargs):
+        reads.append(str(path))
+        return real(path, *args, **kwargs)
+    monkeypatch.setattr(gpd, 'read_file', read_file)
+
+    assert run_pipeline(persist=True, maps=False)
+    assert sorted(reads) == sorted(str(raw / name) for name in ('alcaldias_cdmx.geojson', 'oxxos_cdmx.geojson'))
+
+    processed = project_paths['data_processed']
+    for name in ('datos_combinados.gpkg', 'oxxos_con_alcaldia.gpkg', 'distritos_electorales.gpkg',
+                 'metricas.json', 'store'):
+        assert (processed / name).exists(), name
+        assert (processed / 'current' / name).exists(), name
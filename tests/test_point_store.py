@@ -0,0 +1,58 @@
+"""
+Almacén columnar de puntos (scripts/point_store.py): columnas densas,
+etiquetas dispersas y selección de filas
+"""
+
+import geopandas as gpd
+import numpy as np
+from shapely.geometry import Point
+
+from scripts.point_store import PointStore
+
+
+def points():
+    return gpd.GeoDataFrame(
+        {
+            'name': ['Oxxo'] * 7,
+            'brand': ['OXXO', 'OXXO', 'Oxxo', 'OXXO', 'OXXO', 'OXXO', 'OXXO'],
+            'phone': ['555-1', '', None, '555-4', '', '555-6', None],
+            'opening_hours': ['24/7', None, None, None, None, None, None],
+        },
+        geometry=[Point(-99.1 + i / 100, 19.4 + i / 100) for i in range(7)],
+        crs='EPSG:4326',
+        index=[10, 11, 12, 13, 14, 15, 16],
+    )
+
+
+def test_dense_and_sparse_columns():
+    store = PointStore.from_geodataframe(points())
+    assert set(store.attributes) == {'name', 'brand'}
+    assert set(store.sparse) == {'phone', 'opening_hours'}
+    rows, values = store.sparse['phone']
+    assert rows.tolist() == [0, 3, 5] and list(values) == ['555-1', '555-4', '555-6']
+
+    frame = store.to_geodataframe()
+    assert frame.index.tolist() == [10, 11, 12, 13, 14, 15, 16]
+    assert frame['phone'].tolist() == ['555-1', '', '', '555-4', '', '555-6', '']
+    assert np.allclose(frame.geometry.x, points().geometry.x)
+
+
+def test_take_remaps_sparse_rows():
+    store = PointStore.from_geodataframe(points())
+
+    # Orden arbitrario: las filas dispersas siguen a sus puntos
+    taken = store.take([5, 1, 3])
+    assert taken.index.tolist() == [15, 11, 13]
+    rows, values = taken.sparse['phone']
+    assert rows.tolist() == [0, 2] and list(values) == ['555-6', '555-4']
+    assert taken['phone'].tolist() == ['555-6', '', '555-4']
+    assert taken.sparse['opening_hours'][0].tolist() == []
+    assert taken['opening_hours'].tolist() == ['', '', '']
+    assert taken['brand'].tolist() == ['OXXO', 'OXXO', 'OXXO']
+
+    # Máscara booleana
+    mask = np.array([True, False, False, True, True, False, False])
+    masked = store.take(mask)
+    assert masked['phone'].tolist() == ['555-1', '555-4', '']
+    assert masked['opening_hours'].tolist() == ['24/7', '', '']
+    assert masked.x.tolist() == store.x[mask].tolist()
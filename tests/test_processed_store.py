@@ -0,0 +1,69 @@
+"""
+Almacén procesado (scripts/processed_store.py): ida y vuelta, lectura con
+mmap y capas de límites conservadas entre escritores
+"""
+
+import geopandas as gpd
+import numpy as np
+import pandas as pd
+from shapely.geometry import Point, box
+
+from scripts.point_store import PointStore
+from scripts.processed_store import ProcessedStore, open_processed_store, write_processed_store
+
+
+def store():
+    gdf = gpd.GeoDataFrame(
+        {
+            'brand': pd.Categorical(['OXXO', 'OXXO', 'Oxxo', 'OXXO']),
+            'distancia_m': [10.5, 20.0, 30.25, 40.0],
+            'phone': ['555-1', '', None, ''],
+        },
+        geometry=[Point(-99.1 + i / 100, 19.4) for i in range(4)],
+        crs='EPSG:4326',
+    )
+    return PointStore.from_geodataframe(gdf)
+
+
+def layer(names):
+    return gpd.GeoDataFrame({'alcaldia': names},
+                            geometry=[box(-99.2 + i / 10, 19.3, -99.1 + i / 10, 19.4) for i in range(len(names))],
+                            crs='EPSG:4326')
+
+
+def test_roundtrip_reads_with_mmap(project_paths):
+    original = store()
+    written = layer(['A', 'B'])
+    assert write_processed_store(original, {'alcaldias': written})
+
+    reader = ProcessedStore()
+    assert len(reader) == 4
+    assert isinstance(reader.x, np.memmap) and isinstance(reader.codes('brand'), np.memmap)
+    assert reader.codes('brand').dtype == np.int8
+    assert np.array_equal(reader.x, original.x) and np.array_equal(reader.y, original.y)
+
+    points = reader.to_point_store()
+    for column in ('brand', 'distancia_m', 'phone'):
+        assert points[column].tolist() == original[column].tolist(), column
+    assert reader.column('phone').tolist() == ['555-1', '', '', '']
+
+    alcaldias = reader.boundaries('alcaldias')
+    assert alcaldias['alcaldia'].tolist() == ['A', 'B']
+    assert alcaldias.geometry.geom_equals_exact(written.geometry, tolerance=0).all()
+
+
+def test_boundaries_kept_across_writers(project_paths):
+    assert write_processed_store(store(), {'alcaldias': layer(['A', 'B'])})
+    # Otro escritor aporta solo distritos: las alcaldías se conservan
+    assert write_processed_store(store(), {'distritos': layer(['D1'])})
+    reader = ProcessedStore()
+    assert sorted(reader.layers) == ['alcaldias', 'distritos']
+    assert reader.boundaries('alcaldias')['alcaldia'].tolist() == ['A', 'B']
+
+    assert write_processed_store(store(), {'distritos': layer(['D1'])}, keep_boundaries=False)
+    assert ProcessedStore().layers == ['distritos']
+
+
+def test_missing_store_is_none(project_paths, tmp_path):
+    assert open_processed_store() is None
+    assert open_processed_store(tmp_path / 'no-existe') is None
@@ -0,0 +1,146 @@
+"""
+Perfil por corrida (scripts/profiling.py): etapas, comparación entre
+corridas y nombre de la corrida y del .prom
+"""
+
+import json
+import sys
+import threading
+
+import pytest
+
+import scripts.profiling as profiling
+from config import settings
+from scripts.metrics_exporter import run_textfile_path
+
+
+@pytest.fixture
+def fresh_profile(monkeypatch):
+    monkeypatch.setattr(profiling, '_ACTIVE', None)
+    monkeypatch.setattr(profiling, '_ACTIVE_NAMED', False)
+
+
+def test_implicit_name_ignores_argv(fresh_profile, monkeypatch):
+    monkeypatch.setattr(sys, 'argv', ['-c'])
+    assert profiling.get_profiler().name == profiling.IMPLICIT_RUN
+    assert run_textfile_path(profiling.get_profiler().name, 'cdmx').name == 'polioxxo_script_cdmx.prom'
+
+
+def test_start_run_replaces_unused_implicit_profile(fresh_profile):
+    implicit = profiling.get_profiler()
+    assert profiling.start_run('process') is not implicit
+    assert profiling.get_profiler().name == 'process'
+    # Una corrida ya nombrada (la CLI) no se reemplaza
+    assert profiling.start_run('pipeline').name == 'process'
+
+
+def test_measured_implicit_profile_is_kept(fresh_profile):
+    profiling.get_profiler().count('cache.prueba', {'aciertos': 1})
+    assert profiling.start_run('process').name == profiling.IMPLICIT_RUN
+
+
+def test_script_names_its_run(fresh_profile, monkeypatch):
+    argv = ['scripts/create_map.py', '--profile=map.*', '--otro']
+    monkeypatch.setattr(profiling, 'enable_stage_profiling', lambda *args: None)
+    profiling.consume_profile_args(argv, run='maps')
+    assert argv == ['scripts/create_map.py', '--otro']
+    assert profiling.get_profiler().name == 'maps'
+    assert run_textfile_path('maps', 'gdl').name == 'polioxxo_maps_gdl.prom'
+
+
+def test_stages_accumulate_and_nest(project_paths, monkeypatch):
+    monkeypatch.setattr(settings, 'PROFILE_TRACEMALLOC_TOP', 3)
+    profiler = profiling.StageProfiler('prueba')
+    for n in (10, 15):
+        with profiler.stage('process') as info:
+            with profiler.stage('assign', rows=n):
+                data = [bytearray(64 * 1024) for _ in range(8)]
+            info['filas'] = n
+
+    # El hilo escritor lleva su propia pila: su etapa no cuelga de la del hilo principal
+    def write():
+        with profiler.stage('save.gpkg'):
+            pass
+    with profiler.stage('analyze'):
+        thread = threading.Thread(target=write)
+        thread.start()
+        thread.join()
+
+    stages = profiler.to_dict()['etapas']
+    assert list(stages) == ['assign', 'process', 'save.gpkg', 'analyze']
+    assert stages['process']['llamadas'] == 2 and stages['process']['filas'] == 25
+    assert stages['assign']['padre'] == 'process' and stages['process']['padre'] is None
+    assert stages['save.gpkg']['padre'] is None
+    assert stages['process']['wall_s'] >= stages['assign']['wall_s']
+    assert stages['assign']['asignaciones_top'][0]['kb'] >= 512
+    del data
+
+    path = profiler.save()
+    assert path.parent == project_paths['logs'] / 'profiles' / profiler.run_id
+    saved = json.loads(path.read_text(encoding='utf-8'))
+    assert saved['nombre'] == 'prueba' and saved['etapas']['assign']['llamadas'] == 2
+
+
+def test_compare_flags_regressions_over_threshold():
+    def profile(wall, rss):
+        return {'run_id': 'x', 'total': {'wall_s': 1.0},
+                'etapas': {name: {'wall_s': w, 'rss_pico_delta_mb': r, 'cpu_s': w}
+                           for name, w, r in zip(('assign', 'map', 'corta'), wall, rss)}}
+
+    before = profile((1.0, 2.0, 0.001), (50, 100, 1))
+    after = profile((1.5, 2.1, 0.01), (50, 180, 5))
+    rows, regressions = profiling.compare_profiles(before, after, threshold_pct=20, min_seconds=0.05)
+    # La etapa corta crece 10x pero por debajo de los mínimos absolutos
+    assert regressions == [('assign', 'wall_s', 1.0, 1.5), ('map', 'rss_pico_delta_mb', 100, 180)]
+    assert [row[0] for row in rows] == ['assign', 'map', 'corta', 'TOTAL']
+
+
+@pytest.fixture
+def stage_profiling(monkeypatch):
+    """Restaura la configuración y el entorno que toca enable_stage_profiling"""
+    for name in ('PROFILE_ENABLED', 'PROFILE_STAGES', 'PROFILE_MODE'):
+        monkeypatch.setattr(settings, name, getattr(settings, name))
+    for name in ('POLIOXXO_PROFILE', 'POLIOXXO_PROFILE_STAGES', 'POLIOXXO_PROFILE_MODE'):
+        monkeypatch.setenv(name, '')
+    monkeypatch.setattr(settings, 'PROFILE_SAMPLE_INTERVAL_MS', 1)
+
+
+def busy(seconds=0.05):
+    end = profiling.time.perf_counter() + seconds
+    total = 0
+    while profiling.time.perf_counter() < end:
+        total += sum(range(200))
+    return total
+
+
+@pytest.mark.parametrize('mode', profiling.PROFILE_MODES)
+def test_selected_stages_get_profiles(project_paths, stage_profiling, mode):
+    import pstats
+
+    profiling.enable_stage_profiling('assign,map.*', mode)
+    assert settings.PROFILE_ENABLED and profiling.os.environ['POLIOXXO_PROFILE_STAGES'] == 'assign,map.*'
+
+    profiler = profiling.StageProfiler('prueba')
+    with profiler.stage('assign'):
+        # Una etapa anidada queda dentro del perfil de la externa
+        with profiler.stage('map.alcaldias'):
+            busy()
+    with profiler.stage('process'):
+        busy()
+    path = profiler.save()
+
+    stages = json.loads(path.read_text(encoding='utf-8'))['etapas']
+    assert set(stages['assign']['perfil']) == ({'pstats', 'pilas', 'muestras'} if mode == 'cprofile' else {'pilas', 'muestras'})
+    assert 'perfil' not in stages['map.alcaldias'] and 'perfil' not in stages['process']
+
+    collapsed = (path.parent / stages['assign']['perfil']['pilas']).read_text(encoding='utf-8').splitlines()
+    assert sum(int(line.rsplit(' ', 1)[1]) for line in collapsed) == stages['assign']['perfil']['muestras'] > 0
+    assert any('busy (test_profiling.py' in line for line in collapsed)
+    if mode == 'cprofile':
+        stats = pstats.Stats(str(path.parent / stages['assign']['perfil']['pstats']))
+        assert any(func[2] == 'busy' for func in stats.stats)
+
+
+def test_unknown_mode_is_rejected(stage_profiling):
+    with pytest.raises(ValueError):
+        profiling.enable_stage_profiling('*', 'perf')
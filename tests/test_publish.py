@@ -0,0 +1,126 @@
+"""
+Versiones publicadas (scripts/publish.py): publicar, activar, podar y
+directorios versionados
+"""
+
+import os
+
+import pytest
+
+import scripts.publish as publish_module
+from scripts.publish import (
+    PublishedResource, activate, current_version, list_versions, prune_versions, publish,
+    published_dir, replace_directory, resolve_pointer
+)
+
+
+def write_outputs(processed, text):
+    processed.mkdir(parents=True, exist_ok=True)
+    # Como los escritores del proyecto: temporal y os.replace (inodo nuevo)
+    (processed / 'metricas.tmp').write_text(text, encoding='utf-8')
+    os.replace(processed / 'metricas.tmp', processed / 'metricas.json')
+    staging = processed / 'store.tmp'
+    staging.mkdir()
+    (staging / 'x.npy').write_text(text, encoding='utf-8')
+    replace_directory(staging, processed / 'store')
+
+
+def test_publish_links_outputs_and_moves_pointer(project_paths, tmp_path):
+    processed = tmp_path / 'processed'
+    write_outputs(processed, 'uno')
+    first = publish(processed, outputs=['metricas.json', 'store', 'falta.gpkg'])
+
+    assert current_version(processed) == first
+    version = published_dir(processed)
+    assert version == processed / 'versiones' / first
+    assert (processed / 'current').is_symlink()
+    # Enlaces duros, no copias; el almacén se publica como directorio real
+    assert os.stat(version / 'metricas.json').st_ino == os.stat(processed / 'metricas.json').st_ino
+    assert not (version / 'store').is_symlink()
+    assert (version / 'store' / 'x.npy').read_text(encoding='utf-8') == 'uno'
+    assert not (version / 'falta.gpkg').exists()
+
+    # Los escritores reemplazan el archivo: la versión publicada no cambia
+    write_outputs(processed, 'dos')
+    assert (version / 'metricas.json').read_text(encoding='utf-8') == 'uno'
+    second = publish(processed, outputs=['metricas.json', 'store'])
+    assert second != first
+    assert (published_dir(processed) / 'store' / 'x.npy').read_text(encoding='utf-8') == 'dos'
+
+
+def test_activate_and_resource_reload(project_paths, tmp_path):
+    processed = tmp_path / 'processed'
+    write_outputs(processed, 'uno')
+    first = publish(processed, outputs=['metricas.json'])
+    write_outputs(processed, 'dos')
+    second = publish(processed, outputs=['metricas.json'])
+
+    resource = PublishedResource('metricas.json', lambda path: path.read_text(encoding='utf-8'), processed)
+    assert resource.get() == 'dos'
+    activate(first, processed)
+    assert current_version(processed) == first
+    assert resource.get() == 'uno'
+    assert list_versions(processed) == sorted([first, second])
+    with pytest.raises(KeyError):
+        activate('no-existe', processed)
+
+
+def test_prune_keeps_recent_active_and_grace(project_paths, tmp_path):
+    processed = tmp_path / 'processed'
+    versions = []
+    for text in ('uno', 'dos', 'tres', 'cuatro'):
+        write_outputs(processed, text)
+        versions.append(publish(processed, outputs=['metricas.json']))
+
+    activate(versions[0], processed)
+    # Todas se reemplazaron hace menos del periodo de gracia
+    assert prune_versions(processed, keep=1, grace_s=60) == []
+    assert prune_versions(processed, keep=1, grace_s=0) == versions[1:3]
+    assert list_versions(processed) == [versions[0], versions[3]]
+
+
+def test_replace_directory_versions_and_legacy(project_paths, tmp_path, monkeypatch):
+    monkeypatch.setattr(publish_module.settings, 'PUBLISH_GRACE_S', 0)
+    pointer = tmp_path / 'cube'
+    pointer.mkdir()
+    (pointer / 'viejo.txt').write_text('directorio real anterior', encoding='utf-8')
+
+    seen = []
+    for n in range(4):
+        staging = tmp_path / f'cube.tmp-{n}'
+        staging.mkdir()
+        (staging / 'n.txt').write_text(str(n), encoding='utf-8')
+        replace_directory(staging, pointer, keep=2)
+        seen.append(resolve_pointer(pointer))
+
+    assert pointer.is_symlink()
+    assert (pointer / 'n.txt').read_text(encoding='utf-8') == '3'
+    assert not (pointer / 'viejo.txt').exists()
+    root = tmp_path / '.cube-versiones'
+    assert sorted(p.name for p in root.iterdir()) == [seen[2].name, seen[3].name]
+    assert len({p.name for p in seen}) == 4
+
+
+def test_pointer_file_without_symlinks(project_paths, tmp_path, monkeypatch):
+    def no_symlinks(*args, **kwargs):
+        raise OSError("sin enlaces simbólicos")
+    monkeypatch.setattr(publish_module.os, 'symlink', no_symlinks)
+
+    processed = tmp_path / 'processed'
+    write_outputs(processed, 'uno')
+    assert (processed / 'store').is_file()
+    assert (resolve_pointer(processed / 'store') / 'x.npy').read_text(encoding='utf-8') == 'uno'
+
+    version = publish(processed, outputs=['metricas.json', 'store'])
+    assert (processed / 'current').is_file()
+    assert current_version(processed) == version
+    assert (published_dir(processed) / 'store' / 'x.npy').read_text(encoding='utf-8') == 'uno'
+    assert resolve_pointer(processed / 'metricas.json') is None
+
+
+def test_small_text_outputs_are_not_pointers(tmp_path):
+    report = tmp_path / 'reporte_procesamiento.txt'
+    report.write_text("=== REPORTE ===\n" + "x" * 400 + "\n", encoding='utf-8')
+    assert resolve_pointer(report) is None
+    (tmp_path / 'nombre').write_text('a' * 300, encoding='utf-8')
+    assert resolve_pointer(tmp_path / 'nombre') is None
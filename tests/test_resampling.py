@@ -0,0 +1,77 @@
+"""
+Motor de remuestreo (scripts/resampling.py): réplicas vectorizadas con semillas fijas
+"""
+
+import numpy as np
+import pandas as pd
+
+import scripts.resampling as resampling
+from scripts.resampling import (
+    ResamplingEngine, bootstrap_weights, permutation_indices, permuted_pearson, weighted_pearson
+)
+
+
+def sample(n=40, seed=7):
+    rng = np.random.default_rng(seed)
+    x = rng.normal(100, 20, n)
+    return x, 0.5 * x + rng.normal(0, 5, n)
+
+
+def test_replicate_rows_match_loop():
+    x, y = sample()
+    rng = np.random.default_rng(np.random.SeedSequence(1))
+    weights = bootstrap_weights(rng, len(x), 5)
+    assert (weights.sum(axis=1) == len(x)).all()
+    for row, r in zip(weights.astype(int), weighted_pearson(weights, x, y)):
+        taken = np.repeat(np.arange(len(x)), row)
+        assert np.isclose(r, np.corrcoef(x[taken], y[taken])[0, 1])
+
+    index = permutation_indices(np.random.default_rng(np.random.SeedSequence(2)), len(x), 5)
+    for row, r in zip(index, permuted_pearson(index, x, y)):
+        assert sorted(row) == list(range(len(x)))
+        assert np.isclose(r, np.corrcoef(x, y[row])[0, 1])
+
+
+def test_correlation_is_reproducible_and_independent_of_workers(monkeypatch):
+    x, y = sample()
+    serial = ResamplingEngine(n_replicates=2000, chunk_size=250, workers=1, seed=11).correlation(x, y)
+    assert serial == ResamplingEngine(n_replicates=2000, chunk_size=250, workers=1, seed=11).correlation(x, y)
+
+    # Forzar el pool: cada bloque usa su semilla derivada, no la del proceso
+    monkeypatch.setattr(resampling, 'PARALLEL_MIN_CELLS', 0)
+    parallel = ResamplingEngine(n_replicates=2000, chunk_size=250, workers=2, seed=11).correlation(x, y)
+    assert parallel == serial
+
+    other = ResamplingEngine(n_replicates=2000, chunk_size=250, workers=1, seed=12).correlation(x, y)
+    assert other['ic_inf'] != serial['ic_inf']
+
+
+def test_correlation_interval_and_p_value():
+    x, y = sample()
+    engine = ResamplingEngine(n_replicates=2000, chunk_size=500, workers=1, seed=3)
+    result = engine.correlation(x, y)
+    assert np.isclose(result['r'], np.corrcoef(x, y)[0, 1])
+    assert result['ic_inf'] < result['r'] < result['ic_sup']
+    # Ninguna permutación alcanza una correlación tan fuerte: p = 1 / (1 + réplicas)
+    assert result['p_valor'] == 1 / 2001
+
+    noise = np.random.default_rng(5).normal(size=len(x))
+    assert engine.correlation(x, noise)['p_valor'] > 0.05
+
+
+def test_group_density_matches_direct_sums():
+    counts = np.array([10, 12, 8, 30, 28, 35, 5, 6], dtype=float)
+    area = np.array([2, 2, 2, 3, 3, 3, 1, 1], dtype=float)
+    groups = ['PAN', 'PAN', 'PAN', 'MORENA', 'MORENA', 'MORENA', 'PRI', 'PRI']
+    engine = ResamplingEngine(n_replicates=1000, chunk_size=250, workers=1, seed=9)
+    table = engine.group_density(counts, area, groups).set_index('grupo')
+
+    frame = pd.DataFrame({'c': counts, 'a': area, 'g': groups})
+    totals = frame.groupby('g')[['c', 'a']].sum()
+    assert np.allclose(table['densidad'], (totals['c'] / totals['a'])[table.index])
+    rest = (counts.sum() - totals['c']) / (area.sum() - totals['a'])
+    assert np.allclose(table['diferencia_vs_resto'], (totals['c'] / totals['a'] - rest)[table.index])
+    assert table['unidades'].to_dict() == {'MORENA': 3, 'PAN': 3, 'PRI': 2}
+    assert ((table['p_valor'] > 0) & (table['p_valor'] <= 1)).all()
+    assert (table['ic_inf'] <= table['densidad']).all() and (table['densidad'] <= table['ic_sup']).all()
+    assert table.equals(engine.group_density(counts, area, groups).set_index('grupo'))
@@ -0,0 +1,65 @@
+"""
+Corridas acotadas (scripts/scope.py): lectura por caja con el índice
+espacial del GPKG y por región resuelta por nombre
+"""
+
+import geopandas as gpd
+import numpy as np
+import pytest
+from shapely.geometry import Point, box
+
+from scripts.scope import SpatialScope, parse_bbox, read_layer
+
+REGIONS = {'CUAUHTÉMOC': (-99.2, 19.4, -99.1, 19.5), 'TLALPAN': (-99.1, 19.4, -99.0, 19.5)}
+
+
+def write_layers(processed):
+    processed.mkdir(parents=True, exist_ok=True)
+    gpd.GeoDataFrame({'alcaldia': list(REGIONS)}, geometry=[box(*b) for b in REGIONS.values()],
+                     crs='EPSG:4326').to_file(processed / 'datos_combinados.gpkg', driver='GPKG')
+    rng = np.random.default_rng(6)
+    x, y = rng.uniform(-99.2, -99.0, 200), rng.uniform(19.4, 19.5, 200)
+    oxxos = gpd.GeoDataFrame({'alcaldia': np.where(x < -99.1, 'CUAUHTÉMOC', 'TLALPAN')},
+                             geometry=[Point(p) for p in zip(x, y)], crs='EPSG:4326')
+    # En metros, como las capas procesadas: la caja se reproyecta al leer
+    oxxos.to_crs('EPSG:6372').to_file(processed / 'oxxos.gpkg', driver='GPKG')
+    return oxxos
+
+
+def test_parse_bbox():
+    assert parse_bbox('-99.2, 19.4,-99.1,19.5') == (-99.2, 19.4, -99.1, 19.5)
+    for text in ('-99.1,19.4,-99.2,19.5', '1,2,3'):
+        with pytest.raises(ValueError):
+            parse_bbox(text)
+
+
+def test_bbox_read_matches_full_filter(project_paths):
+    oxxos = write_layers(project_paths['data_processed'])
+    bbox = (-99.15, 19.42, -99.05, 19.47)
+    scope = SpatialScope(bbox=bbox)
+
+    scoped = read_layer(project_paths['data_processed'] / 'oxxos.gpkg', scope)
+    inside = oxxos.cx[bbox[0]:bbox[2], bbox[1]:bbox[3]]
+    assert 0 < len(scoped) == len(inside) < len(oxxos)
+    assert scoped.crs == 'EPSG:6372'
+    assert scope.output_path('datos.csv').name == 'datos_bbox_m99p150_19p420_m99p050_19p470.csv'
+    assert len(read_layer(project_paths['data_processed'] / 'oxxos.gpkg')) == len(oxxos)
+
+
+def test_region_resolved_by_normalized_name(project_paths):
+    oxxos = write_layers(project_paths['data_processed'])
+    scope = SpatialScope(region='cuauhtemoc')
+
+    scoped = scope.read(project_paths['data_processed'] / 'oxxos.gpkg', columns=[])
+    assert scope.level == 'alcaldia' and scope.name == 'CUAUHTÉMOC'
+    assert scope.bbox == REGIONS['CUAUHTÉMOC']
+    assert len(scoped) == (oxxos['alcaldia'] == 'CUAUHTÉMOC').sum()
+    assert set(scoped['alcaldia']) == {'CUAUHTÉMOC'}
+    assert scope.suffix == '_cuauhtemoc'
+
+    # Capas sin la columna del nivel se filtran por geometría, sin la vecina que solo toca el borde
+    regions = gpd.read_file(project_paths['data_processed'] / 'datos_combinados.gpkg')
+    assert scope.filter(regions.drop(columns='alcaldia')).index.tolist() == [0]
+
+    with pytest.raises(KeyError):
+        SpatialScope(region='Atlantis').resolve()
@@ -0,0 +1,66 @@
+"""
+Áreas de servicio (scripts/service_areas.py): celdas de Voronoi recortadas
+a las alcaldías y su caché
+"""
+
+import geopandas as gpd
+import numpy as np
+import shapely
+from shapely.geometry import Point, box
+
+from scripts.service_areas import compute_service_areas, summarize_service_areas
+
+CRS = 'EPSG:6372'
+X0, Y0 = 2_800_000, 830_000
+
+
+def inputs():
+    alcaldias = gpd.GeoDataFrame({'alcaldia': ['A', 'B']},
+                                 geometry=[box(X0, Y0, X0 + 2000, Y0 + 3000), box(X0 + 2000, Y0, X0 + 4000, Y0 + 3000)],
+                                 crs=CRS)
+    rng = np.random.default_rng(8)
+    coords = np.column_stack([rng.uniform(X0, X0 + 4000, 60), rng.uniform(Y0, Y0 + 3000, 60)])
+    coords = np.vstack([coords, coords[:1]])  # un Oxxo repetido
+    points = gpd.GeoDataFrame(geometry=[Point(x, y) for x, y in coords], crs=CRS)
+    return points, alcaldias
+
+
+def test_cells_partition_the_city(project_paths):
+    points, alcaldias = inputs()
+    areas = compute_service_areas(points, alcaldias, crs=CRS)
+
+    assert len(areas) == len(points)
+    shared = areas['celda_compartida'].to_numpy()
+    assert shared[[0, -1]].all() and shared.sum() == 2
+    assert areas.geometry.iloc[0].equals(areas.geometry.iloc[-1])
+
+    # Sin contar la celda repetida, las celdas cubren la ciudad sin traslapes
+    unique = areas.iloc[:-1]
+    assert np.isclose(unique['area_km2'].sum(), 12.0)
+    assert np.isclose(shapely.union_all(unique.geometry.values).area / 1e6, 12.0)
+
+    # Cada Oxxo está dentro de su celda y la alcaldía es la de mayor traslape
+    assert shapely.covers(areas.geometry.values, points.geometry.values).all()
+    for cell, name in zip(areas.geometry, areas['alcaldia']):
+        overlap = alcaldias.set_index('alcaldia').geometry.intersection(cell).area
+        assert overlap.idxmax() == name
+
+    summary = summarize_service_areas(areas).set_index('alcaldia')
+    assert summary['num_oxxos'].sum() == len(points)
+
+
+def test_cached_by_point_set(project_paths):
+    points, alcaldias = inputs()
+    first = compute_service_areas(points, alcaldias, crs=CRS)
+    cache_dir = project_paths['data_processed'] / 'service_areas'
+    assert len(list(cache_dir.glob('areas_*.npz'))) == 1
+
+    cached = compute_service_areas(points, alcaldias, crs=CRS)
+    assert cached['alcaldia'].tolist() == first['alcaldia'].tolist()
+    assert np.allclose(cached['area_km2'], first['area_km2'])
+    assert cached.geometry.geom_equals_exact(first.geometry, tolerance=1e-6).all()
+
+    moved = points.copy()
+    moved.loc[5, 'geometry'] = Point(X0 + 10, Y0 + 10)
+    compute_service_areas(moved, alcaldias, crs=CRS)
+    assert len(list(cache_dir.glob('areas_*.npz'))) == 2
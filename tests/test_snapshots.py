@@ -0,0 +1,98 @@
+"""
+Cambios entre snapshots por llaves (scripts/snapshots.py)
+"""
+
+import geopandas as gpd
+import numpy as np
+from shapely.geometry import Point
+
+from scripts.snapshots import SnapshotStore, diff_records, snapshot_records
+
+
+def stores(rows):
+    """GeoDataFrame de Oxxos: (name, calle, número, lon, lat, alcaldia_id)"""
+    return gpd.GeoDataFrame(
+        {
+            'name': [r[0] for r in rows],
+            'addr:street': [r[1] for r in rows],
+            'addr:housenumber': [r[2] for r in rows],
+            'alcaldia_id': [r[5] for r in rows],
+        },
+        geometry=[Point(r[3], r[4]) for r in rows],
+        crs='EPSG:4326',
+    )
+
+
+BEFORE = [
+    ('Oxxo Centro', 'Madero', '10', -99.1340, 19.4330, 0),
+    ('Oxxo Roma', 'Orizaba', '5', -99.1600, 19.4190, 0),
+    ('Oxxo Coyoacán', 'Hidalgo', '22', -99.1620, 19.3500, 1),
+]
+
+
+def test_opening_closure_and_move():
+    after = [
+        BEFORE[0],
+        # Misma tienda (mismos atributos) 300 m al norte: movimiento
+        ('Oxxo Roma', 'Orizaba', '5', -99.1600, 19.4217, 0),
+        # Tienda nueva
+        ('Oxxo Narvarte', 'Eugenia', '3', -99.1550, 19.3960, 1),
+    ]
+    changes = diff_records(snapshot_records(stores(BEFORE)), snapshot_records(stores(after)))
+
+    assert len(changes['aperturas']) == 1
+    assert changes['aperturas'].iloc[0]['lon'] == -99.1550
+
+    assert len(changes['cierres']) == 1
+    assert changes['cierres'].iloc[0]['lat'] == 19.3500
+
+    assert len(changes['movimientos']) == 1
+    move = changes['movimientos'].iloc[0]
+    assert (move['lat_anterior'], move['lat']) == (19.4190, 19.4217)
+    assert 250 < move['distancia_m'] < 350
+
+
+def test_far_relocation_is_closure_and_opening():
+    after = BEFORE[:1] + BEFORE[2:] + [('Oxxo Roma', 'Orizaba', '5', -99.0000, 19.3000, 2)]
+    changes = diff_records(snapshot_records(stores(BEFORE)), snapshot_records(stores(after)), max_move=2000)
+    assert (len(changes['aperturas']), len(changes['cierres']), len(changes['movimientos'])) == (1, 1, 0)
+
+
+def test_move_with_stable_id():
+    before = stores(BEFORE).assign(osm_id=['1', '2', '3'])
+    after = before.copy()
+    after.loc[1, 'geometry'] = Point(-99.1610, 19.4195)
+    after.loc[1, 'addr:street'] = 'Otra calle'
+    changes = diff_records(snapshot_records(before), snapshot_records(after))
+    assert (len(changes['aperturas']), len(changes['cierres']), len(changes['movimientos'])) == (0, 0, 1)
+
+
+def test_store_diff_between_appends(tmp_path):
+    store = SnapshotStore(tmp_path)
+    first = store.append(stores(BEFORE))
+    second = store.append(stores(BEFORE[:2]))
+    assert first != second
+    assert [entry['id'] for entry in store.snapshots()] == [first, second]
+    changes = store.diff()
+    assert (len(changes['aperturas']), len(changes['cierres']), len(changes['movimientos'])) == (0, 1, 0)
+
+
+def test_attribute_only_change_writes_new_partition(tmp_path):
+    store = SnapshotStore(tmp_path)
+    store.append(stores(BEFORE))
+    same = store.append(stores(BEFORE))
+    # Misma posición, otro nombre y otra alcaldía (reasignación tras ajustar límites)
+    renamed = [('Oxxo Zócalo', 'Madero', '10', -99.1340, 19.4330, 1)] + BEFORE[1:]
+    changed = store.append(stores(renamed))
+
+    entries = store.snapshots()
+    assert entries[0]['archivo'] == entries[1]['archivo']
+    assert entries[2]['archivo'] != entries[1]['archivo']
+
+    records = store.load(changed)
+    assert sorted(records['alcaldia_id'].tolist()) == [0, 1, 1]
+    assert not np.array_equal(records['attr'], store.load(same)['attr'])
+
+    counts = store.counts(pivot=False)
+    last = counts[counts['snapshot'] == changed].set_index('alcaldia_id')['num_oxxos']
+    assert last.to_dict() == {0: 1, 1: 2}
@@ -0,0 +1,78 @@
+"""
+Estadísticas de patrón de puntos (scripts/spatial_stats.py): KD-tree contra
+cálculo directo por pares
+"""
+
+import geopandas as gpd
+import numpy as np
+import shapely
+from shapely.geometry import Point, box
+
+from scripts.spatial_stats import PointPattern, compute_point_pattern_stats
+
+X0, Y0 = 2_800_000, 830_000
+WINDOW = box(X0, Y0, X0 + 3000, Y0 + 2000)
+
+
+def random_coords(n=300, seed=1):
+    rng = np.random.default_rng(seed)
+    return np.column_stack([rng.uniform(X0, X0 + 3000, n), rng.uniform(Y0, Y0 + 2000, n)])
+
+
+def pairwise(coords):
+    distances = np.hypot(*(coords[:, None, :] - coords[None, :, :]).transpose(2, 0, 1))
+    np.fill_diagonal(distances, np.inf)
+    return distances
+
+
+def test_nearest_neighbors_match_pairwise():
+    coords = random_coords()
+    pattern = PointPattern(coords, WINDOW)
+    assert np.allclose(pattern.nearest_neighbor_distances(), pairwise(coords).min(axis=1))
+    assert pattern.intensity == 300 / 6e6
+
+
+def test_ripley_k_matches_reduced_sample_definition():
+    coords = random_coords()
+    pattern = PointPattern(coords, WINDOW)
+    radii = np.array([100, 250, 500, 750])
+    _, k_values = pattern.ripley_k(radii)
+
+    distances = pairwise(coords)
+    border = shapely.distance(WINDOW.boundary, shapely.points(coords))
+    for r, k in zip(radii, k_values):
+        centers = border >= r
+        pairs = (distances[centers] <= r).sum()
+        assert np.isclose(k, pairs / (centers.sum() * pattern.intensity))
+
+
+def test_clark_evans_separates_regular_and_clustered():
+    xs, ys = np.meshgrid(np.arange(X0 + 50, X0 + 3000, 100), np.arange(Y0 + 50, Y0 + 2000, 100))
+    regular = PointPattern(np.column_stack([xs.ravel(), ys.ravel()]), WINDOW)
+    assert regular.clark_evans()[0] > 1.9
+
+    rng = np.random.default_rng(2)
+    centers = random_coords(10, seed=3)
+    clustered = PointPattern(np.repeat(centers, 30, axis=0) + rng.normal(0, 20, (300, 2)), WINDOW)
+    r, z = clustered.clark_evans()
+    assert r < 0.5 and z < -10
+
+
+def test_pattern_stats_per_region():
+    coords = random_coords()
+    crs = 'EPSG:6372'
+    regions = gpd.GeoDataFrame({'alcaldia': ['A', 'B']},
+                               geometry=[box(X0, Y0, X0 + 1500, Y0 + 2000), box(X0 + 1500, Y0, X0 + 3000, Y0 + 2000)],
+                               crs=crs)
+    points = gpd.GeoDataFrame({'alcaldia': np.where(coords[:, 0] < X0 + 1500, 'A', 'B')},
+                              geometry=[Point(x, y) for x, y in coords], crs=crs)
+    # Un punto asignado por proximidad, fuera de su ventana
+    points.loc[len(points)] = ['A', Point(X0 - 100, Y0 + 100)]
+
+    summary, curves = compute_point_pattern_stats(points, regions, 'alcaldia', crs=crs)
+    summary = summary.set_index('alcaldia')
+    assert summary.loc['TOTAL', 'num_oxxos'] == 300 and summary.loc['TOTAL', 'fuera_ventana'] == 1
+    assert summary.loc['A', 'num_oxxos'] + summary.loc['B', 'num_oxxos'] == 300
+    assert summary.loc['A', 'fuera_ventana'] == 1
+    assert np.isclose(summary.loc['A', 'area_km2'], 3.0)
+    assert set(curves['alcaldia']) == {'TOTAL', 'A', 'B'}